@@ -0,0 +1,105 @@
+import logging
+from enum import Enum
+
+from .env import merged_trace_dir
+from .errors import BinRecError
+from .lib import binrec_lift, convert_lib_error
+
+logger = logging.getLogger("binrec.artifacts")
+
+#: The modules, within the merged trace directory, that can be rendered. Each is
+#: written to ``<stage>.bc`` by the merge or lift stage of the same name.
+RENDER_STAGES = ("captured", "cleaned", "linked", "lifted", "optimized", "recovered")
+
+
+class ArtifactPolicy(Enum):
+    """
+    The files that merging and lifting write for each LLVM module they produce. The
+    modules that a later stage reads are always written, regardless of the policy.
+    Textual IR and MemorySSA dumps that were not written can be produced later, from
+    the bitcode, with :func:`render`.
+    """
+
+    #: only write the modules that a later stage reads
+    NONE = "none"
+    #: also write the bitcode of intermediate modules
+    BITCODE = "bitcode"
+    #: also write the LLVM IR, ``.ll``, and MemorySSA dump, ``-memssa.ll``, of every
+    #: module
+    ALL = "all"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+def render(project_name: str, stage: str) -> None:
+    """
+    Render the LLVM IR and MemorySSA dump of a merged or lifted module.
+
+    **Input:** BINREC_PROJECTS / "{project_name}" / "s2e-out" / "{stage}.bc"
+
+    **Outputs:**
+
+    - BINREC_PROJECTS / "{project_name}" / "s2e-out" / "{stage}.ll"
+    - BINREC_PROJECTS / "{project_name}" / "s2e-out" / "{stage}-memssa.ll"
+
+    :param project_name: the project name
+    :param stage: the module to render, one of :data:`RENDER_STAGES`
+    :raises BinRecError: the stage does not exist, its bitcode was not written, or
+        the operation failed
+    """
+    if stage not in RENDER_STAGES:
+        raise BinRecError(
+            f"unknown stage: {stage}, expected one of: {', '.join(RENDER_STAGES)}"
+        )
+
+    trace_dir = merged_trace_dir(project_name)
+    bitcode = trace_dir / f"{stage}.bc"
+    if not bitcode.is_file():
+        raise BinRecError(
+            f"{stage} bitcode does not exist: {bitcode}, lift the project again with "
+            "'--artifacts bitcode' to keep the intermediate bitcode"
+        )
+
+    logger.info("rendering %s bitcode: %s", stage, bitcode)
+    try:
+        binrec_lift.render(
+            trace_filename=bitcode.name, destination=stage, working_dir=str(trace_dir)
+        )
+    except Exception as err:
+        raise convert_lib_error(err, f"failed to render {stage} bitcode: {bitcode}")
+
+
+def main() -> None:
+    import argparse
+    import sys
+
+    from .core import enable_binrec_debug_mode, init_binrec
+
+    init_binrec()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-v", "--verbose", action="count", help="enable verbose logging"
+    )
+
+    subparsers = parser.add_subparsers(dest="current_parser", required=True)
+
+    render_parser = subparsers.add_parser(
+        "render", help="write the LLVM IR and MemorySSA dump of a module"
+    )
+    render_parser.add_argument("project_name", help="Name of analysis project")
+    render_parser.add_argument("stage", choices=RENDER_STAGES, help="module to render")
+
+    args = parser.parse_args()
+    if args.verbose:
+        enable_binrec_debug_mode()
+
+    if args.current_parser == "render":
+        render(args.project_name, args.stage)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,6 +1,13 @@
+import atexit
 import logging
+import os
+import subprocess
 import sys
-from typing import Iterable
+import threading
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -29,3 +36,205 @@ def enable_python_audit_log(
             logger.debug("%s: %s", event, args)
 
     sys.addaudithook(binrec_audit_event)
+
+
+@dataclass
+class ProcessRecord:
+    """
+    The resource usage of a child process, recorded by
+    :class:`SubprocessAccounting`.
+    """
+
+    #: the process command line
+    argv: List[str]
+    #: the process exit status, or negative signal number
+    returncode: int
+    #: wall clock time, in seconds, from when the process was started until it was
+    #: reaped, ``0`` if the start was not observed
+    seconds: float
+    #: user CPU time in seconds
+    user: float
+    #: system CPU time in seconds
+    system: float
+    #: the peak resident set size, in KiB
+    max_rss: int
+
+    @property
+    def tool(self) -> str:
+        """
+        :returns: the tool name, the basename of the executable
+        """
+        return os.path.basename(self.argv[0]) if self.argv else ""
+
+
+@dataclass
+class ToolUsage:
+    """
+    The total resource usage of every process started for a single tool.
+    """
+
+    #: the tool name
+    tool: str
+    #: the number of processes
+    count: int = 0
+    #: total wall clock time in seconds
+    seconds: float = 0.0
+    #: total user CPU time in seconds
+    user: float = 0.0
+    #: total system CPU time in seconds
+    system: float = 0.0
+    #: the largest peak resident set size, in KiB
+    max_rss: int = 0
+
+    def add(self, record: ProcessRecord) -> None:
+        """
+        Add a process to the totals.
+        """
+        self.count += 1
+        self.seconds += record.seconds
+        self.user += record.user
+        self.system += record.system
+        self.max_rss = max(self.max_rss, record.max_rss)
+
+
+def _argv(args: Any) -> List[str]:
+    if isinstance(args, (str, bytes, os.PathLike)):
+        args = [args]
+    return [os.fsdecode(arg) for arg in args]
+
+
+class SubprocessAccounting:
+    """
+    Records the command line, wall time, CPU time, and peak memory usage of every
+    child process started with :mod:`subprocess`. The process start is observed by
+    the ``subprocess.Popen`` audit event and the resource usage is collected, with
+    :func:`os.wait4`, when the process is reaped by :meth:`subprocess.Popen.wait`,
+    which includes :func:`subprocess.run` and :func:`subprocess.check_call`.
+
+    Processes started by worker processes, such as the merge link prep workers, are
+    not recorded.
+    """
+
+    def __init__(self) -> None:
+        self.records: List[ProcessRecord] = []
+        self._started: Dict[int, List[Tuple[List[str], float]]] = {}
+        self._lock = Lock()
+
+    def audit_event(self, event: str, args: tuple) -> None:
+        """
+        The audit hook, which records the start time of new processes.
+        """
+        if event != "subprocess.Popen":
+            return
+
+        thread = threading.get_ident()
+        with self._lock:
+            self._started.setdefault(thread, []).append(
+                (_argv(args[1]), time.monotonic())
+            )
+
+    def _pop_started(self, argv: List[str]) -> Optional[float]:
+        # processes are waited on by the thread that started them, match the command
+        # line in case several processes were started before waiting on the first
+        with self._lock:
+            started = self._started.get(threading.get_ident())
+            if not started:
+                return None
+
+            for index, (command, timestamp) in enumerate(started):
+                if command[-len(argv) :] == argv:
+                    del started[index]
+                    return timestamp
+
+            return started.pop(0)[1]
+
+    def record(self, popen: subprocess.Popen, status: int, rusage: Any) -> None:
+        """
+        Record a process that was reaped.
+
+        :param popen: the process
+        :param status: the wait status
+        :param rusage: the process resource usage, from :func:`os.wait4`
+        """
+        argv = _argv(popen.args)
+        started = self._pop_started(argv)
+        record = ProcessRecord(
+            argv=argv,
+            returncode=os.waitstatus_to_exitcode(status),
+            seconds=time.monotonic() - started if started is not None else 0.0,
+            user=rusage.ru_utime,
+            system=rusage.ru_stime,
+            max_rss=rusage.ru_maxrss,
+        )
+        logger.debug(
+            "process %s exited with %d: %.3fs", argv, record.returncode, record.seconds
+        )
+        with self._lock:
+            self.records.append(record)
+
+    def by_tool(self) -> Dict[str, ToolUsage]:
+        """
+        :returns: the total resource usage of each tool, ordered by the largest total
+            wall clock time first
+        """
+        tools: Dict[str, ToolUsage] = {}
+        with self._lock:
+            for record in self.records:
+                tools.setdefault(record.tool, ToolUsage(record.tool)).add(record)
+
+        return dict(sorted(tools.items(), key=lambda item: -item[1].seconds))
+
+    def log_summary(self) -> None:
+        """
+        Log the total resource usage of each tool.
+        """
+        for usage in self.by_tool().values():
+            logger.info(
+                "%s: %d processes, %.3fs wall, %.3fs user, %.3fs sys, %d KiB max rss",
+                usage.tool,
+                usage.count,
+                usage.seconds,
+                usage.user,
+                usage.system,
+                usage.max_rss,
+            )
+
+
+_accounting: Optional[SubprocessAccounting] = None
+
+
+def enable_subprocess_accounting(log_summary: bool = True) -> SubprocessAccounting:
+    """
+    Turn on subprocess accounting (see :class:`SubprocessAccounting`). This adds an
+    audit hook, :func:`sys.addaudithook`, to observe new processes and replaces
+    how :class:`subprocess.Popen` reaps processes so that their resource usage is
+    collected. Accounting can only be enabled once per process, subsequent calls
+    return the existing accounting.
+
+    :param log_summary: log the total resource usage of each tool when the process
+        exits
+    :returns: the subprocess accounting
+    """
+    global _accounting
+    if _accounting:
+        return _accounting
+
+    accounting = _accounting = SubprocessAccounting()
+
+    def try_wait(popen: subprocess.Popen, wait_flags: int) -> Tuple[int, int]:
+        # mirrors subprocess.Popen._try_wait using os.wait4 instead of os.waitpid
+        try:
+            pid, status, rusage = os.wait4(popen.pid, wait_flags)
+        except ChildProcessError:
+            return popen.pid, 0
+
+        if pid == popen.pid:
+            accounting.record(popen, status, rusage)
+        return pid, status
+
+    sys.addaudithook(accounting.audit_event)
+    subprocess.Popen._try_wait = try_wait  # type: ignore
+    if log_summary:
+        atexit.register(accounting.log_summary)
+
+    return accounting
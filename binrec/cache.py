@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import suppress
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from .core import AnyPath
+from .env import BINREC_LIB
+
+logger = logging.getLogger("binrec.cache")
+
+#: The default maximum size, in bytes, of a single project cache
+DEFAULT_CACHE_SIZE = 4 * 1024 * 1024 * 1024
+
+#: Read size when hashing files
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(filename: AnyPath, digest: Optional["hashlib._Hash"] = None) -> str:
+    """
+    Hash the content of a file.
+
+    :param filename: the file to hash
+    :param digest: an existing digest to update with the file content, a new SHA-256
+        digest is created if not specified
+    :returns: the hex digest
+    """
+    digest = digest or hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _module_build_id(pattern: str) -> str:
+    digest = hashlib.sha256()
+    modules = sorted(BINREC_LIB.glob(pattern))
+    if not modules:
+        return ""
+
+    for module in modules:
+        hash_file(module, digest)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def binrec_lift_build_id() -> str:
+    """
+    :returns: an identifier of the ``_binrec_lift`` C module build, which is the hash of
+        the compiled module. An empty string is returned if the module could not be
+        found.
+    """
+    return _module_build_id("_binrec_lift*.so")
+
+
+@lru_cache(maxsize=None)
+def binrec_link_build_id() -> str:
+    """
+    :returns: an identifier of the ``_binrec_link`` C module build, see
+        :func:`binrec_lift_build_id`
+    """
+    return _module_build_id("_binrec_link*.so")
+
+
+class ContentCache:
+    """
+    A content-addressed file cache with least recently used eviction. Each cached file
+    is stored under its key and the least recently used files are evicted when the
+    total cache size exceeds ``max_size``. A file is "used" when it is added to or
+    retrieved from the cache.
+
+    The cache is safe to share between processes: files are added atomically and
+    eviction tolerates entries removed by another process.
+    """
+
+    def __init__(
+        self, root: Path, max_size: int = DEFAULT_CACHE_SIZE, namespace: str = ""
+    ):
+        """
+        :param root: cache directory, created on first use
+        :param max_size: maximum total size, in bytes, of all cached files
+        :param namespace: value mixed into every key, such as a tool build identifier,
+            so that entries created by a different build are never used
+        """
+        self.root = root
+        self.max_size = max_size
+        self.namespace = namespace
+
+    def key(self, *filenames: AnyPath, salt: str = "") -> str:
+        """
+        :param filenames: the input files
+        :param salt: additional value mixed into the key, such as an input file name
+            that changes the output
+        :returns: the cache key of the input files
+        """
+        digest = hashlib.sha256(self.namespace.encode())
+        for filename in filenames:
+            digest.update(hash_file(filename).encode())
+        digest.update(salt.encode())
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def get(self, key: str, destination: Path) -> bool:
+        """
+        Copy a cached file to the destination.
+
+        :param key: the cache key
+        :param destination: the output filename
+        :returns: ``True`` if the file was cached and copied, ``False`` otherwise
+        """
+        entry = self._entry(key)
+        try:
+            shutil.copyfile(entry, destination)
+        except FileNotFoundError:
+            return False
+
+        with suppress(OSError):
+            os.utime(entry)  # mark as recently used
+
+        logger.debug("cache hit: %s -> %s", key, destination)
+        return True
+
+    def put(self, key: str, source: Path) -> None:
+        """
+        Add a file to the cache and evict the least recently used files if the cache
+        is over capacity.
+
+        :param key: the cache key
+        :param source: the file to cache
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, self._entry(key))
+        except BaseException:
+            with suppress(OSError):
+                os.remove(tmp)
+            raise
+
+        logger.debug("cache add: %s <- %s", key, source)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used files until the cache is within its maximum
+        size.
+        """
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if entry.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_size:
+                break
+
+            logger.debug("cache evict: %s", entry.name)
+            with suppress(FileNotFoundError):
+                entry.unlink()
+            total -= size
@@ -1,12 +1,31 @@
+import json
 import logging
 import os
-from typing import Union
+import resource
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
 #: Type for any acceptable path
 AnyPath = Union[str, os.PathLike]
 
+#: Environment variable that sets the run id of recorded spans, so that the spans of
+#: several binrec commands, such as a merge followed by a lift, belong to one run
+BINREC_RUN_ID_ENV = "BINREC_RUN_ID"
+
 logger = logging.getLogger(__name__)
 
+_run_id: Optional[str] = None
+_current_span: ContextVar[Optional["Span"]] = ContextVar("binrec_span", default=None)
+_spans_file: ContextVar[Optional[Path]] = ContextVar("binrec_spans_file", default=None)
+_spans_lock = Lock()
+
 
 def init_binrec() -> None:
     """
@@ -18,14 +37,19 @@ def init_binrec() -> None:
     from . import env
 
     logging.basicConfig(
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
-        datefmt="%H:%M:%S",
+        format="%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
         level=logging.INFO,
     )
 
     if env.BINREC_DEBUG:
         enable_binrec_debug_mode()
 
+    if env.BINREC_ACCOUNTING:
+        from .audit import enable_subprocess_accounting
+
+        enable_subprocess_accounting()
+
 
 def enable_binrec_debug_mode() -> None:
     """
@@ -35,3 +59,202 @@ def enable_binrec_debug_mode() -> None:
 
     logging.getLogger("binrec").setLevel(logging.DEBUG)
     os.environ[env.BINREC_DEBUG_ENV] = "1"
+
+
+def run_id() -> str:
+    """
+    :returns: the id of the current run, which is read from the ``BINREC_RUN_ID``
+        environment variable or, if not set, generated from the time this process
+        recorded its first span
+    """
+    global _run_id
+    if _run_id is None:
+        _run_id = os.environ.get(BINREC_RUN_ID_ENV) or (
+            f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        )
+    return _run_id
+
+
+@dataclass
+class Span:
+    """
+    A pipeline stage recorded by :func:`span`.
+    """
+
+    #: the stage name, such as ``"merge"`` or ``"lift.optimize"``
+    name: str
+    #: the run that recorded the span, see :func:`run_id`
+    run: str
+    #: the unique span id
+    id: str
+    #: the id of the enclosing span, ``None`` for top-level spans
+    parent: Optional[str] = None
+    #: the time the stage started, as a POSIX timestamp
+    started: float = 0.0
+    #: the stage run time in seconds
+    seconds: float = 0.0
+    #: the CPU time, in seconds, of the process and its child processes during the
+    #: stage, which includes the CPU time of stages that ran concurrently
+    cpu_seconds: float = 0.0
+    #: the peak resident set size, in KiB, of the process, or of its largest child
+    #: process, when the stage completed
+    peak_rss: int = 0
+    #: the size, in bytes, of each file or directory that the stage produced
+    artifacts: Dict[str, int] = field(default_factory=dict)
+    #: the stage status, ``"completed"`` or ``"failed"``
+    status: str = "completed"
+    _artifact_paths: List[Path] = field(default_factory=list, repr=False)
+
+    @property
+    def finished(self) -> float:
+        """
+        :returns: the time the stage finished, as a POSIX timestamp
+        """
+        return self.started + self.seconds
+
+    def add_artifacts(self, paths: Iterable[Path]) -> None:
+        """
+        Add files or directories that the stage produces. Their sizes are recorded
+        when the stage completes and artifacts that do not exist are ignored.
+
+        :param paths: the artifact paths
+        """
+        self._artifact_paths.extend(paths)
+
+    def _measure_artifacts(self) -> None:
+        from .env import directory_size
+
+        for path in self._artifact_paths:
+            if path.is_dir():
+                self.artifacts[str(path)] = directory_size(path)
+            elif path.is_file():
+                self.artifacts[str(path)] = path.stat().st_size
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        :returns: the JSON representation of the span
+        """
+        return {
+            "name": self.name,
+            "run": self.run,
+            "id": self.id,
+            "parent": self.parent,
+            "started": self.started,
+            "seconds": self.seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss": self.peak_rss,
+            "artifacts": self.artifacts,
+            "status": self.status,
+        }
+
+    @classmethod
+    def from_json(cls, body: Dict[str, Any]) -> "Span":
+        """
+        :param body: the JSON representation of the span, see :meth:`to_json`
+        :returns: the span
+        """
+        return cls(
+            name=body["name"],
+            run=body["run"],
+            id=body["id"],
+            parent=body.get("parent"),
+            started=body["started"],
+            seconds=body["seconds"],
+            cpu_seconds=body.get("cpu_seconds", 0.0),
+            peak_rss=body.get("peak_rss", 0),
+            artifacts=body.get("artifacts", {}),
+            status=body.get("status", "completed"),
+        )
+
+
+def _cpu_time() -> float:
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss() -> int:
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def _write_span(filename: Path, record: Span) -> None:
+    if not filename.parent.is_dir():
+        return
+
+    try:
+        with _spans_lock, filename.open("a") as file:
+            file.write(json.dumps(record.to_json(), sort_keys=True) + "\n")
+    except OSError as err:
+        logger.warning("unable to record span %s: %s: %s", record.name, filename, err)
+
+
+def current_span() -> Optional[Span]:
+    """
+    :returns: the innermost active span of the current thread or task, if any
+    """
+    return _current_span.get()
+
+
+@contextmanager
+def span(
+    name: str, project_name: Optional[str] = None, artifacts: Iterable[Path] = ()
+) -> Iterator[Span]:
+    """
+    Record the run time, CPU time, peak memory usage, and artifact sizes of a
+    pipeline stage. Spans nest: a span started within another span, including within
+    a :class:`~binrec.tasks.TaskGraph` task, records the enclosing span as its
+    parent.
+
+    Completed spans are appended to the project spans file,
+    ``BINREC_PROJECTS / "{project_name}" / "spans.jsonl"``, which can be summarized
+    with ``python -m binrec.report``. Nested spans are written to the file of the
+    enclosing span, and spans outside of a project span are not written.
+
+    .. code-block:: python
+
+        with span("merge", project_name, [merged_trace_dir(project_name)]):
+            # merge the traces
+
+    :param name: the stage name
+    :param project_name: the project the stage operates on, defaults to the project
+        of the enclosing span
+    :param artifacts: the files and directories that the stage produces
+    :returns: the span, which is updated when the stage completes
+    """
+    if project_name:
+        from .env import spans_filename
+
+        filename: Optional[Path] = spans_filename(project_name)
+    else:
+        filename = _spans_file.get()
+
+    parent = _current_span.get()
+    record = Span(
+        name=name,
+        run=run_id(),
+        id=uuid.uuid4().hex[:16],
+        parent=parent.id if parent else None,
+        started=time.time(),
+    )
+    record.add_artifacts(artifacts)
+
+    file_token = _spans_file.set(filename)
+    span_token = _current_span.set(record)
+    started = time.monotonic()
+    cpu_time = _cpu_time()
+    try:
+        yield record
+    except BaseException:
+        record.status = "failed"
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _spans_file.reset(file_token)
+        record.seconds = time.monotonic() - started
+        record.cpu_seconds = _cpu_time() - cpu_time
+        record.peak_rss = _peak_rss()
+        record._measure_artifacts()
+        if filename:
+            _write_span(filename, record)
@@ -0,0 +1,699 @@
+import glob
+import logging
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .core import AnyPath
+from .errors import BinRecError
+
+logger = logging.getLogger("binrec.elf")
+
+ELF_MAGIC = b"\x7fELF"
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+EM_386 = 3
+EM_X86_64 = 62
+
+SHN_UNDEF = 0
+SHN_LORESERVE = 0xFF00
+SHN_XINDEX = 0xFFFF
+
+SHT_RELA = 4
+SHT_DYNAMIC = 6
+SHT_NOBITS = 8
+SHT_REL = 9
+SHT_DYNSYM = 11
+SHT_GNU_VERDEF = 0x6FFFFFFD
+SHT_GNU_VERNEED = 0x6FFFFFFE
+SHT_GNU_VERSYM = 0x6FFFFFFF
+
+STT_NOTYPE = 0
+STT_OBJECT = 1
+STT_FUNC = 2
+
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STB_WEAK = 2
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+#: Size of a PLT entry on x86 and x86-64
+PLT_ENTRY_SIZE = 16
+
+#: Instruction prefixes of a PLT stub: none, ``bnd``, ``endbr64``, and ``endbr32``
+_PLT_STUB_PREFIXES = (
+    b"",
+    b"\xf2",
+    b"\xf3\x0f\x1e\xfa",
+    b"\xf3\x0f\x1e\xfa\xf2",
+    b"\xf3\x0f\x1e\xfb",
+    b"\xf3\x0f\x1e\xfb\xf2",
+)
+#: ModR/M byte of ``jmp *disp32`` (``jmp *disp32(%rip)`` on x86-64)
+_MODRM_DISP32 = b"\x25"
+#: ModR/M byte of ``jmp *disp32(%ebx)``
+_MODRM_EBX_DISP32 = b"\xa3"
+
+#: Library directories searched, after ``ld.so.conf``, for each machine
+_DEFAULT_LIBRARY_DIRS = {
+    EM_386: (
+        "/lib/i386-linux-gnu",
+        "/usr/lib/i386-linux-gnu",
+        "/lib32",
+        "/usr/lib32",
+        "/lib",
+        "/usr/lib",
+    ),
+    EM_X86_64: (
+        "/lib/x86_64-linux-gnu",
+        "/usr/lib/x86_64-linux-gnu",
+        "/lib64",
+        "/usr/lib64",
+        "/lib",
+        "/usr/lib",
+    ),
+}
+
+LD_SO_CONF = "/etc/ld.so.conf"
+
+
+@dataclass
+class ElfSection:
+    """
+    An ELF section header.
+    """
+
+    #: the section index
+    index: int
+    #: the section name
+    name: str
+    #: the section type (``SHT_*``)
+    type: int
+    #: the virtual address of the section when loaded
+    address: int
+    #: the file offset of the section content
+    offset: int
+    #: the section size, in bytes
+    size: int
+    #: the index of the associated section, such as a string table
+    link: int
+    #: the size of each entry for sections that contain a table
+    entsize: int
+
+
+@dataclass
+class ElfSymbol:
+    """
+    A dynamic symbol.
+    """
+
+    #: the symbol name
+    name: str
+    #: the symbol value, typically an address
+    value: int
+    #: the symbol size, in bytes
+    size: int
+    #: the symbol type (``STT_*``)
+    type: int
+    #: the symbol binding (``STB_*``)
+    binding: int
+    #: the index of the section that defines the symbol, ``SHN_UNDEF`` for imports
+    section_index: int
+    #: the symbol version, such as ``GLIBC_2.0``, or ``None`` if the symbol is not
+    #: versioned
+    version: Optional[str] = None
+
+    @property
+    def is_defined(self) -> bool:
+        """
+        :returns: the symbol is defined in a regular section of the file
+        """
+        return SHN_UNDEF < self.section_index < SHN_LORESERVE
+
+
+class ElfFile:
+    """
+    A read-only ELF file parser. The file is memory-mapped and only the headers and
+    tables that are requested are read, so parsing a large binary does not read the
+    code it contains.
+
+    Only the parts of the format that are needed to recover a binary are supported:
+    section headers, dynamic symbols and their versions, PLT relocations, and the
+    dynamic section.
+
+    .. code-block:: python
+
+        with ElfFile("binary") as elf:
+            for section in elf.sections:
+                print(section.name)
+    """
+
+    def __init__(self, filename: AnyPath):
+        """
+        :param filename: the ELF file
+        :raises BinRecError: the file is not a valid ELF file
+        :raises OSError: I/O error
+        """
+        self.filename = Path(filename)
+        with open(filename, "rb") as file:
+            try:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise BinRecError(f"invalid ELF file: {filename}: file is empty")
+
+        self._sections: Optional[List[ElfSection]] = None
+        self._dynamic_symbols: Optional[List[ElfSymbol]] = None
+        try:
+            self._parse_header()
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "ElfFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+        """
+        self._data.close()
+
+    def _error(self, message: str) -> BinRecError:
+        return BinRecError(f"invalid ELF file: {self.filename}: {message}")
+
+    def _unpack(self, fmt: str, offset: int) -> Tuple[int, ...]:
+        try:
+            return struct.unpack_from(self._endian + fmt, self._data, offset)
+        except struct.error:
+            raise self._error(f"truncated structure at offset {offset:#x}")
+
+    def _iter_unpack(self, fmt: str, offset: int, count: int) -> Iterator[tuple]:
+        fmt = self._endian + fmt
+        size = struct.calcsize(fmt)
+        if offset + size * count > len(self._data):
+            raise self._error(f"truncated table at offset {offset:#x}")
+
+        for index in range(count):
+            yield struct.unpack_from(fmt, self._data, offset + index * size)
+
+    def _parse_header(self) -> None:
+        if self._data[:4] != ELF_MAGIC:
+            raise self._error("bad magic")
+
+        self.elf_class = self._data[4]
+        encoding = self._data[5]
+        if self.elf_class not in (ELFCLASS32, ELFCLASS64):
+            raise self._error(f"unsupported class: {self.elf_class}")
+        if encoding not in (ELFDATA2LSB, ELFDATA2MSB):
+            raise self._error(f"unsupported data encoding: {encoding}")
+
+        self._endian = "<" if encoding == ELFDATA2LSB else ">"
+        self.is_64bit = self.elf_class == ELFCLASS64
+        self._addr = "Q" if self.is_64bit else "I"
+
+        (self.machine,) = self._unpack("H", 18)
+        if self.is_64bit:
+            header = self._unpack("QQQIHHHHHH", 24)
+        else:
+            header = self._unpack("IIIIHHHHHH", 24)
+
+        (
+            _entry,
+            _phoff,
+            self._shoff,
+            _flags,
+            _ehsize,
+            _phentsize,
+            _phnum,
+            self._shentsize,
+            self._shnum,
+            self._shstrndx,
+        ) = header
+
+    @property
+    def address_width(self) -> int:
+        """
+        :returns: the number of hex digits in a formatted address
+        """
+        return 16 if self.is_64bit else 8
+
+    @property
+    def sections(self) -> List[ElfSection]:
+        """
+        :returns: the section headers, in file order, including the null section
+        """
+        if self._sections is None:
+            self._sections = self._parse_sections()
+        return self._sections
+
+    def _parse_sections(self) -> List[ElfSection]:
+        if not self._shoff:
+            return []
+
+        if self.is_64bit:
+            fmt = "IIQQQQIIQQ"
+        else:
+            fmt = "IIIIIIIIII"
+
+        if self._shentsize != struct.calcsize(self._endian + fmt):
+            raise self._error(f"unexpected section header size: {self._shentsize}")
+
+        # the real section count and string table index are stored in the null
+        # section when they do not fit in the file header
+        null = self._unpack(fmt, self._shoff)
+        count = self._shnum or null[5]
+        strndx = null[6] if self._shstrndx == SHN_XINDEX else self._shstrndx
+
+        headers = list(self._iter_unpack(fmt, self._shoff, count))
+        if strndx >= count:
+            raise self._error(f"invalid section name table index: {strndx}")
+
+        names_offset = headers[strndx][4]
+        return [
+            ElfSection(
+                index=index,
+                name=self._read_string(names_offset + name),
+                type=sh_type,
+                address=address,
+                offset=offset,
+                size=size,
+                link=link,
+                entsize=entsize,
+            )
+            for index, (
+                name,
+                sh_type,
+                _flags,
+                address,
+                offset,
+                size,
+                link,
+                _info,
+                _align,
+                entsize,
+            ) in enumerate(headers)
+        ]
+
+    def _read_string(self, offset: int) -> str:
+        end = self._data.find(b"\0", offset)
+        if end < 0:
+            raise self._error(f"unterminated string at offset {offset:#x}")
+        return self._data[offset:end].decode("utf-8", errors="replace")
+
+    def section(self, name: str) -> Optional[ElfSection]:
+        """
+        :returns: the first section with the given name, or ``None`` if the section
+            does not exist
+        """
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def _sections_of_type(self, sh_type: int) -> List[ElfSection]:
+        return [section for section in self.sections if section.type == sh_type]
+
+    def _linked_section(self, section: ElfSection) -> ElfSection:
+        if section.link >= len(self.sections):
+            raise self._error(f"invalid section link in {section.name}")
+        return self.sections[section.link]
+
+    def _symbol_versions(self) -> Dict[int, str]:
+        """
+        :returns: the version names of the version definitions and requirements,
+            keyed by version index
+        """
+        versions: Dict[int, str] = {}
+
+        for section in self._sections_of_type(SHT_GNU_VERNEED):
+            strtab = self._linked_section(section).offset
+            offset = section.offset
+            while True:
+                _version, count, _file, aux, next_need = self._unpack("HHIII", offset)
+                aux_offset = offset + aux
+                for _ in range(count):
+                    _hash, _flags, index, name, next_aux = self._unpack(
+                        "IHHII", aux_offset
+                    )
+                    versions[index] = self._read_string(strtab + name)
+                    if not next_aux:
+                        break
+                    aux_offset += next_aux
+
+                if not next_need:
+                    break
+                offset += next_need
+
+        for section in self._sections_of_type(SHT_GNU_VERDEF):
+            strtab = self._linked_section(section).offset
+            offset = section.offset
+            while True:
+                _version, flags, index, count, _hash, aux, next_def = self._unpack(
+                    "HHHHIII", offset
+                )
+                # the first auxiliary entry is the version name
+                if count:
+                    (name, _next_aux) = self._unpack("II", offset + aux)
+                    versions[index] = self._read_string(strtab + name)
+
+                if not next_def:
+                    break
+                offset += next_def
+
+        return versions
+
+    @property
+    def dynamic_symbols(self) -> List[ElfSymbol]:
+        """
+        :returns: the dynamic symbols, in symbol table order, including the null
+            symbol
+        """
+        if self._dynamic_symbols is None:
+            dynsym = self._sections_of_type(SHT_DYNSYM)
+            self._dynamic_symbols = self._parse_symbols(dynsym[0]) if dynsym else []
+        return self._dynamic_symbols
+
+    def _parse_symbols(self, symtab: ElfSection) -> List[ElfSymbol]:
+        if self.is_64bit:
+            fmt = "IBBHQQ"
+        else:
+            fmt = "IIIBBH"
+
+        strtab = self._linked_section(symtab).offset
+        count = symtab.size // struct.calcsize(self._endian + fmt)
+
+        versym: List[int] = []
+        for section in self._sections_of_type(SHT_GNU_VERSYM):
+            if section.link == symtab.index:
+                versym = [
+                    index for (index,) in self._iter_unpack("H", section.offset, count)
+                ]
+        versions = self._symbol_versions() if versym else {}
+
+        symbols = []
+        for index, entry in enumerate(self._iter_unpack(fmt, symtab.offset, count)):
+            if self.is_64bit:
+                name, info, _other, shndx, value, size = entry
+            else:
+                name, value, size, info, _other, shndx = entry
+
+            # bit 15 marks a hidden version, indexes 0 and 1 are unversioned
+            version = versym[index] & 0x7FFF if versym else 0
+            symbols.append(
+                ElfSymbol(
+                    name=self._read_string(strtab + name),
+                    value=value,
+                    size=size,
+                    type=info & 0xF,
+                    binding=info >> 4,
+                    section_index=shndx,
+                    version=versions.get(version) if version > 1 else None,
+                )
+            )
+
+        return symbols
+
+    def _relocated_symbols(self) -> Dict[int, str]:
+        """
+        :returns: the name of the dynamic symbol that each relocated address refers
+            to, for relocations that reference a symbol
+        """
+        slots: Dict[int, str] = {}
+        symbol_shift = 32 if self.is_64bit else 8
+        for section in self.sections:
+            if section.type not in (SHT_REL, SHT_RELA):
+                continue
+            if section.link >= len(self.sections):
+                raise self._error(f"invalid symbol table link in {section.name}")
+            if self.sections[section.link].type != SHT_DYNSYM:
+                continue
+
+            fmt = self._addr * 2
+            if section.type == SHT_RELA:
+                fmt += "q" if self.is_64bit else "i"
+            count = section.size // struct.calcsize(self._endian + fmt)
+
+            symbols = self.dynamic_symbols
+            for entry in self._iter_unpack(fmt, section.offset, count):
+                offset, info = entry[:2]
+                symbol_index = info >> symbol_shift
+                if not symbol_index:
+                    continue
+                if symbol_index >= len(symbols):
+                    raise self._error(f"invalid symbol index in {section.name}")
+                slots.setdefault(offset, symbols[symbol_index].name)
+
+        return slots
+
+    def _plt_stub_slot(self, address: int, stub: bytes, got: int) -> Optional[int]:
+        """
+        Decode the indirect jump of a PLT stub, ``jmp *slot``.
+
+        :param address: the stub address
+        :param stub: the stub code
+        :param got: the address of the global offset table, which is the base of
+            position independent 32-bit stubs
+        :returns: the address of the GOT slot that the stub jumps through, or
+            ``None`` if the stub does not start with an indirect jump
+        """
+        for prefix in _PLT_STUB_PREFIXES:
+            start = len(prefix)
+            if stub[:start] != prefix or stub[start : start + 1] != b"\xff":
+                continue
+
+            modrm = stub[start + 1 : start + 2]
+            (disp,) = struct.unpack_from(self._endian + "i", stub, start + 2)
+            if modrm == _MODRM_DISP32:
+                if self.is_64bit:
+                    # rip relative
+                    return address + start + 6 + disp
+                return disp & 0xFFFFFFFF
+            if modrm == _MODRM_EBX_DISP32 and not self.is_64bit:
+                return (got + disp) & 0xFFFFFFFF
+
+        return None
+
+    def plt_entries(self) -> List[Tuple[int, str]]:
+        """
+        Get the PLT stub of each imported function, which is what ``objdump -d``
+        labels ``<name@plt>``. Each stub in ``.plt``, ``.plt.sec``, and ``.plt.got``
+        is decoded to find the GOT slot it jumps through and the stub is named after
+        the symbol that the slot is relocated to. Stubs for slots that do not
+        reference a symbol, such as ``R_386_IRELATIVE`` relocations, are omitted.
+
+        Only x86 and x86-64 PLTs are supported.
+
+        :returns: list of tuples, ``(stub_address, symbol_name)``, sorted by address
+        """
+        slots = self._relocated_symbols()
+        if not slots:
+            return []
+
+        got = self.section(".got.plt") or self.section(".got")
+        got_address = got.address if got else 0
+
+        entries = []
+        for name in (".plt", ".plt.sec", ".plt.got"):
+            section = self.section(name)
+            if not section or section.type == SHT_NOBITS:
+                continue
+
+            if name == ".plt.got":
+                entry_size = section.entsize if section.entsize in (8, 16) else 8
+            else:
+                entry_size = PLT_ENTRY_SIZE
+
+            end = section.offset + section.size
+            if end > len(self._data):
+                raise self._error(f"truncated section: {name}")
+
+            for offset in range(section.offset, end - entry_size + 1, entry_size):
+                address = section.address + offset - section.offset
+                stub = self._data[offset : offset + entry_size]
+                slot = self._plt_stub_slot(address, stub, got_address)
+                if slot is not None and slot in slots:
+                    entries.append((address, slots[slot]))
+
+        entries.sort()
+        return entries
+
+    def dynamic_entries(self) -> List[Tuple[int, int]]:
+        """
+        :returns: the dynamic section entries, ``(tag, value)``, up to the
+            ``DT_NULL`` terminator
+        """
+        dynamic = self._sections_of_type(SHT_DYNAMIC)
+        if not dynamic:
+            return []
+
+        fmt = ("q" if self.is_64bit else "i") + self._addr
+        count = dynamic[0].size // struct.calcsize(self._endian + fmt)
+        entries = []
+        for tag, value in self._iter_unpack(fmt, dynamic[0].offset, count):
+            if tag == DT_NULL:
+                break
+            entries.append((tag, value))
+        return entries
+
+    def _dynamic_strings(self, tag: int) -> List[str]:
+        dynamic = self._sections_of_type(SHT_DYNAMIC)
+        if not dynamic:
+            return []
+
+        strtab = self._linked_section(dynamic[0]).offset
+        return [
+            self._read_string(strtab + value)
+            for entry_tag, value in self.dynamic_entries()
+            if entry_tag == tag
+        ]
+
+    @property
+    def needed(self) -> List[str]:
+        """
+        :returns: the filenames of the libraries the binary directly depends on
+            (``DT_NEEDED``), in load order
+        """
+        return self._dynamic_strings(DT_NEEDED)
+
+    @property
+    def rpath(self) -> List[str]:
+        """
+        :returns: the library search directories embedded in the binary
+            (``DT_RPATH``)
+        """
+        return [
+            path
+            for value in self._dynamic_strings(DT_RPATH)
+            for path in value.split(":")
+        ]
+
+    @property
+    def runpath(self) -> List[str]:
+        """
+        :returns: the library search directories embedded in the binary
+            (``DT_RUNPATH``)
+        """
+        return [
+            path
+            for value in self._dynamic_strings(DT_RUNPATH)
+            for path in value.split(":")
+        ]
+
+
+def _read_ld_so_conf(filename: str, seen: Optional[set] = None) -> List[str]:
+    """
+    :returns: the library directories listed in a ``ld.so.conf`` file, following
+        ``include`` directives
+    """
+    seen = seen if seen is not None else set()
+    if filename in seen:
+        return []
+    seen.add(filename)
+
+    try:
+        with open(filename) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return []
+
+    dirs = []
+    base = os.path.dirname(filename)
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+
+        if line.startswith("include"):
+            pattern = line.split(maxsplit=1)[1] if " " in line else ""
+            if pattern and not os.path.isabs(pattern):
+                pattern = os.path.join(base, pattern)
+            for include in sorted(glob.glob(pattern)):
+                dirs.extend(_read_ld_so_conf(include, seen))
+        else:
+            dirs.append(line)
+
+    return dirs
+
+
+def _is_compatible_library(filename: str, elf: ElfFile) -> bool:
+    """
+    :returns: the file is an ELF file that can be loaded by the binary
+    """
+    try:
+        with ElfFile(filename) as library:
+            return library.elf_class == elf.elf_class and library.machine == elf.machine
+    except (OSError, BinRecError):
+        return False
+
+
+def library_search_path(elf: ElfFile) -> List[str]:
+    """
+    Get the directories the dynamic loader searches for the libraries of a binary:
+    ``DT_RPATH`` (if there is no ``DT_RUNPATH``), ``LD_LIBRARY_PATH``,
+    ``DT_RUNPATH``, the ``ld.so.conf`` directories, and the default directories for
+    the machine. ``$ORIGIN`` is replaced by the directory containing the binary.
+
+    :param elf: the binary
+    :returns: the library directories in search order
+    """
+    origin = str(elf.filename.parent.absolute())
+    runpath = elf.runpath
+    dirs = [] if runpath else list(elf.rpath)
+    dirs.extend(filter(None, os.environ.get("LD_LIBRARY_PATH", "").split(":")))
+    dirs.extend(runpath)
+    dirs.extend(_read_ld_so_conf(LD_SO_CONF))
+    dirs.extend(_DEFAULT_LIBRARY_DIRS.get(elf.machine, ("/lib", "/usr/lib")))
+
+    result = []
+    for directory in dirs:
+        directory = directory.replace("${ORIGIN}", origin).replace("$ORIGIN", origin)
+        if directory and directory not in result:
+            result.append(directory)
+    return result
+
+
+def resolve_libraries(elf: ElfFile) -> Dict[str, Optional[str]]:
+    """
+    Resolve the direct dependencies of a binary to the absolute path of the library
+    that the dynamic loader would load. Each library must match the class and
+    machine of the binary, so 64-bit libraries are not used for a 32-bit binary.
+
+    The ``ld.so`` cache is not read, so a library that is only registered in the
+    cache is not resolved.
+
+    :param elf: the binary
+    :returns: the absolute path of each ``DT_NEEDED`` library, or ``None`` if the
+        library could not be found, in load order
+    """
+    search_path: Optional[List[str]] = None
+    result: Dict[str, Optional[str]] = {}
+    for name in elf.needed:
+        if "/" in name:
+            result[name] = name if _is_compatible_library(name, elf) else None
+            continue
+
+        if search_path is None:
+            search_path = library_search_path(elf)
+
+        result[name] = None
+        for directory in search_path:
+            candidate = os.path.join(directory, name)
+            if _is_compatible_library(candidate, elf):
+                result[name] = os.path.normpath(candidate)
+                break
+
+    return result
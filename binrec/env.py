@@ -1,13 +1,22 @@
+import fcntl
+import json
+import logging
 import os
 import re
 import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager, suppress
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
 
 from dotenv import load_dotenv
 
 from .errors import BinRecError
 
+logger = logging.getLogger("binrec.env")
+
 __all__ = (
     "BINREC_DEBUG",
     "BINREC_ROOT",
@@ -26,6 +35,15 @@ __all__ = (
     "campaign_filename",
     "s2e_config_filename",
     "project_binary_filename",
+    "project_cache_dir",
+    "trace_manifest_filename",
+    "spans_filename",
+    "directory_size",
+    "load_trace_manifest",
+    "rescan_trace_manifest",
+    "trace_manifest_lock",
+    "record_trace",
+    "next_trace_id",
     "get_trace_dirs",
 )
 
@@ -96,6 +114,11 @@ BINREC_GUESTFS_ROOT = Path(os.environ["BINREC_GUESTFS_ROOT"]).absolute()
 BINREC_DEBUG_ENV = "BINREC_DEBUG"
 #: Binrec is running in debug mode
 BINREC_DEBUG = os.environ.get(BINREC_DEBUG_ENV) == "1"
+#: The environment variable name for the BINREC_ACCOUNTING value
+BINREC_ACCOUNTING_ENV = "BINREC_ACCOUNTING"
+#: Record and log the resource usage of each external tool that binrec runs, see
+#: :func:`binrec.audit.enable_subprocess_accounting`
+BINREC_ACCOUNTING = os.environ.get(BINREC_ACCOUNTING_ENV) == "1"
 
 #: The default filename for the binrec trace config script
 TRACE_CONFIG_FILENAME = "binrec_trace_config.sh"
@@ -103,6 +126,25 @@ TRACE_CONFIG_FILENAME = "binrec_trace_config.sh"
 #: The default input files directory name
 INPUT_FILES_DIRNAME = "input_files"
 
+#: The default filename for the project trace manifest
+TRACE_MANIFEST_FILENAME = "trace-manifest.json"
+
+#: Filename, within the project directory, of the lock file that serializes updates
+#: to the project trace manifest
+TRACE_MANIFEST_LOCK_FILENAME = ".trace-manifest.lock"
+
+#: Filename, within the project directory, of the stage spans recorded by
+#: :func:`binrec.core.span`
+SPANS_FILENAME = "spans.jsonl"
+
+#: Trace directory name pattern, the group is the trace number
+TRACE_DIR_PATTERN = re.compile(r"s2e-out-([0-9]+)$")
+
+#: Trace manifest status of a trace that completed successfully
+TRACE_STATUS_COMPLETED = "completed"
+#: Trace manifest status of a trace that failed
+TRACE_STATUS_FAILED = "failed"
+
 
 def project_dir(project_name: str) -> Path:
     """
@@ -169,16 +211,258 @@ def project_binary_filename(project_name: str) -> Path:
     return binary.readlink()
 
 
-def get_trace_dirs(project_name: str) -> List[Path]:
+def project_cache_dir(project_name: str) -> Path:
     """
-    :returns: the list of project completed trace directories, excluding the merged
-        trace directory
+    :returns: the path to the project cache directory, which stores intermediate
+        results that can be reused between runs
+    """
+    return project_dir(project_name) / ".binrec-cache"
+
+
+def trace_manifest_filename(project_name: str) -> Path:
+    """
+    :returns: the filename of the project trace manifest, which indexes the project
+        trace directories
+    """
+    return project_dir(project_name) / TRACE_MANIFEST_FILENAME
+
+
+def spans_filename(project_name: str) -> Path:
+    """
+    :returns: the filename of the project stage spans, one JSON object per line
+    """
+    return project_dir(project_name) / SPANS_FILENAME
+
+
+def _scan_trace_dirs(root: Path) -> Dict[int, Dict[str, Any]]:
+    """
+    Build the trace manifest entries by scanning the project directory. All trace
+    directories found are considered completed.
+    """
+    traces: Dict[int, Dict[str, Any]] = {}
+    for trace_dir in root.iterdir():
+        match = TRACE_DIR_PATTERN.match(trace_dir.name)
+        if match and trace_dir.is_dir():
+            traces[int(match.group(1))] = {
+                "directory": trace_dir.name,
+                "status": TRACE_STATUS_COMPLETED,
+            }
+    return traces
+
+
+def load_trace_manifest(project_name: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Load the project trace manifest. The manifest maps each trace number to the trace
+    information:
+
+    - ``directory`` - the trace directory name, relative to the project directory
+    - ``status`` - ``"completed"`` or ``"failed"``
+    - ``size`` - the total size, in bytes, of the trace directory
+    - ``started`` / ``finished`` - ISO 8601 timestamps of the trace run
+
+    The manifest is trusted as is, so loading it does not access the trace
+    directories. Projects without a manifest, such as projects created by older
+    versions of binrec, are indexed once by scanning the project directory and the
+    manifest is written from the scan. Trace directories that were deleted, or
+    created outside of binrec, such as traces run directly with S2E, are reconciled
+    with :func:`rescan_trace_manifest`.
+
+    :param project_name: project name
+    :returns: the trace manifest entries, keyed by trace number
+    """
+    return _load_trace_manifest(project_dir(project_name))
+
+
+def _load_trace_manifest(root: Path) -> Dict[int, Dict[str, Any]]:
+    """
+    Load the project trace manifest, and write it from a scan of the project
+    directory when it does not exist.
+
+    :param root: the project directory
+    """
+    traces = _read_trace_manifest(root)
+    if traces is not None:
+        return traces
+
+    with _trace_manifest_lock(root):
+        # another process may have written the manifest while we were unlocked
+        traces = _read_trace_manifest(root)
+        if traces is None:
+            traces = _scan_trace_dirs(root)
+            _write_trace_manifest(root, traces)
+    return traces
+
+
+def rescan_trace_manifest(project_name: str) -> Dict[int, Dict[str, Any]]:
     """
-    pattern = re.compile(r"s2e-out-[0-9]$")
+    Reconcile the project trace manifest with the project directory: entries whose
+    trace directory no longer exists are dropped and trace directories that are not
+    in the manifest are added as completed traces.
+
+    :param project_name: project name
+    :returns: the updated trace manifest entries, keyed by trace number
+    """
+    root = project_dir(project_name)
+    with _trace_manifest_lock(root):
+        scanned = _scan_trace_dirs(root)
+        traces = _read_trace_manifest(root) or {}
+        # keep the recorded status, size, and timestamps of the existing traces
+        current = {num: traces.get(num, trace) for num, trace in scanned.items()}
+        if current != traces or not (root / TRACE_MANIFEST_FILENAME).is_file():
+            logger.debug("updating rescanned trace manifest: %s", root)
+            _write_trace_manifest(root, current)
+    return current
+
+
+def _read_trace_manifest(root: Path) -> Optional[Dict[int, Dict[str, Any]]]:
+    """
+    :param root: the project directory
+    :returns: the trace manifest entries, or None if the manifest does not exist or is
+        invalid
+    """
+    filename = root / TRACE_MANIFEST_FILENAME
+    if not filename.is_file():
+        return None
+
+    try:
+        manifest = json.loads(filename.read_text())
+        return {int(num): trace for num, trace in manifest["traces"].items()}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.warning("ignoring invalid trace manifest: %s", filename)
+        return None
+
+
+def directory_size(dirname: Path) -> int:
+    """
+    :returns: the total size, in bytes, of the files within a directory tree
+    """
+    total = 0
+    for root, _, files in os.walk(dirname):
+        for name in files:
+            with suppress(OSError):
+                total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+def record_trace(
+    project_name: str,
+    trace_dir: Path,
+    status: str = TRACE_STATUS_COMPLETED,
+    started: Optional[datetime] = None,
+    finished: Optional[datetime] = None,
+) -> None:
+    """
+    Add a trace to the project trace manifest. The manifest is replaced atomically so
+    that concurrent readers never observe a partially written manifest, and updates
+    hold a lock on the manifest, ``.trace-manifest.lock``, so that concurrent
+    updates never lose a trace.
+
+    :param project_name: project name
+    :param trace_dir: the trace directory, ``s2e-out-<N>``
+    :param status: the trace status, ``"completed"`` or ``"failed"``
+    :param started: the time the trace started
+    :param finished: the time the trace finished, defaults to now
+    """
+    match = TRACE_DIR_PATTERN.match(trace_dir.name)
+    if not match:
+        raise BinRecError(f"invalid trace directory name: {trace_dir}")
+
+    finished = finished or datetime.now()
+    entry = {
+        "directory": trace_dir.name,
+        "status": status,
+        "size": directory_size(trace_dir),
+        "started": started.isoformat() if started else None,
+        "finished": finished.isoformat(),
+    }
+
+    root = project_dir(project_name)
+    with _trace_manifest_lock(root):
+        traces = _read_trace_manifest(root)
+        if traces is None:
+            traces = _scan_trace_dirs(root)
+        traces[int(match.group(1))] = entry
+        _write_trace_manifest(root, traces)
+
+
+def trace_manifest_lock(project_name: str) -> ContextManager[None]:
+    """
+    Hold an exclusive lock on the project trace manifest so that concurrent updates,
+    from other threads or processes, do not overwrite each other. The lock is
+    reentrant within a thread.
+
+    :param project_name: the project name
+    """
+    return _trace_manifest_lock(project_dir(project_name))
+
+
+#: Project directories whose trace manifest lock is held by the current thread
+_held_trace_manifest_locks = threading.local()
 
-    trace_dirs: List[Path] = []
-    for trace_dir in project_dir(project_name).iterdir():
-        if trace_dir.is_dir() and pattern.match(trace_dir.name):
-            trace_dirs.append(trace_dir)
 
-    return sorted(trace_dirs)
+@contextmanager
+def _trace_manifest_lock(root: Path) -> Iterator[None]:
+    held = getattr(_held_trace_manifest_locks, "roots", None)
+    if held is None:
+        held = _held_trace_manifest_locks.roots = set()
+    key = os.path.realpath(root)
+    if key in held:
+        yield
+        return
+
+    with open(root / TRACE_MANIFEST_LOCK_FILENAME, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_trace_manifest(root: Path, traces: Dict[int, Dict[str, Any]]) -> None:
+    """
+    Replace the project trace manifest atomically.
+
+    :param root: the project directory
+    :param traces: the trace manifest entries, keyed by trace number
+    """
+    filename = root / TRACE_MANIFEST_FILENAME
+    manifest = {"traces": {str(num): traces[num] for num in sorted(traces)}}
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".trace-manifest-")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp, filename)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def next_trace_id(project_name: str) -> int:
+    """
+    :returns: the lowest trace number not used by an existing trace, which is the
+        number that S2E assigns to the next trace
+    """
+    root = project_dir(project_name)
+    used = _load_trace_manifest(root)
+    i = 0
+    # the number is about to be used, so skip traces that are not in the manifest
+    while i in used or (root / f"s2e-out-{i}").exists():
+        i += 1
+    return i
+
+
+def get_trace_dirs(project_name: str) -> List[Path]:
+    """
+    :returns: the list of project completed trace directories, excluding the merged
+        trace directory, sorted by trace number
+    """
+    root = project_dir(project_name)
+    traces = _load_trace_manifest(root)
+    return [
+        root / traces[num]["directory"]
+        for num in sorted(traces)
+        if traces[num]["status"] == TRACE_STATUS_COMPLETED
+    ]
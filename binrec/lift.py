@@ -1,46 +1,62 @@
+import hashlib
+import json
 import logging
 import os
-import re
 import shutil
 import subprocess
 import tempfile
 from contextlib import suppress
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import partial
 from pathlib import Path
-from typing import List, Tuple
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Set
 
 from . import project
+from .artifacts import ArtifactPolicy
+from .cache import binrec_lift_build_id, binrec_link_build_id, hash_file
+from .core import current_span, span
+from .elf import STB_GLOBAL, STT_OBJECT, ElfFile, resolve_libraries
 from .env import BINREC_LIB, BINREC_LINK_LD, BINREC_RUNLIB, llvm_command
 from .errors import BinRecError
 from .lib import binrec_lift, binrec_link, convert_lib_error
+from .tasks import TaskGraph, process_pool
 
 logger = logging.getLogger("binrec.lift")
 
-DATA_IMPORT_PATTERN = re.compile(
-    r"^\s*\d+:\s+"  # symbol index
-    r"([0-9a-fA-F]+)\s+"  # import address (hex)
-    r"(\d+)\s+"  # symbol size (bytes)
-    r"OBJECT\s+"  # symbol type - we only handle OBJECT
-    r"GLOBAL\s+"  # binding - we only handle GLOBAL
-    r"[a-zA-Z_]+\s+"  # visibility
-    r"\d+\s+"  # section index
-    r"([a-zA-F_0-9]+)@",  # symbol name (@ library)
-    re.MULTILINE,
-)
-
-ELF_SECTION_PATTERN = re.compile(
-    r"^\s*\[\s*\d+\]\s+"  # section index
-    r"([a-zA-Z0-9._\-]+)\s+"  # section name (capture group 1)
-    r"[A-Za-z]+\s+"  # section type
-    r"([a-fA-F0-9]+)\s+"  # section start address (capture group 2)
-    r"[a-fA-F0-9]+\s+"  # section file offset
-    r"([a-fA-F0-9]+)\s+",  # section size (capture group 3)
-    re.MULTILINE,
-)
+#: Filename, within the merged trace directory, of the lift stage manifest
+LIFT_MANIFEST_NAME = "lift-manifest.json"
+
+#: Filename, within the merged trace directory, of the lift statistics
+LIFT_STATS_NAME = "lift-stats.json"
+
+#: The statistics of each pass run by a ``binrec_lift`` operation, see
+#: :func:`binrec_lift.run_pipeline`
+PassRecords = List[Dict[str, Any]]
+
+#: File basename prefix, within the trace directory, of the partitions of the lifted
+#: module that are optimized concurrently
+PARTITION_PREFIX = "lifted-part"
+
+#: Lifted modules that define fewer functions are not partitioned, since the cost of
+#: splitting and linking the module outweighs optimizing it on a single thread
+PARTITION_MIN_FUNCTIONS = 256
+
+#: File basename, within the trace directory, of the recovered object file, or of each
+#: recovered object file when code is generated in partitions (see
+#: :func:`_recovered_objects`)
+RECOVERED_OBJECT = "recovered"
+
+#: Maximum number of memory SSA checks performed by the optimizer
+MEMSSA_CHECK_LIMIT = 100000
 
 
 def prep_bitcode_for_linkage(
-    working_dir: Path, source: Path, destination: Path
+    working_dir: Path,
+    source: Path,
+    destination: Path,
+    temp_dir: Optional[Path] = None,
 ) -> None:
     """
     Prepare captured bitcode for linkage. This was originally the content of the
@@ -49,12 +65,14 @@ def prep_bitcode_for_linkage(
     :param working_dir: S2E capture directory (typically ``s2e-out-*``)
     :param source: the input bitcode filename
     :param destination: the output bitcode filename
+    :param temp_dir: directory to store intermediate files in, defaults to the system
+        temporary directory
     :raises BinRecError: operation failed
     :raises OSError: I/O error
     """
     logger.debug("preparing capture bitcode for linkage: %s", source)
 
-    fd, tmp = tempfile.mkstemp()
+    fd, tmp = tempfile.mkstemp(dir=temp_dir)
     os.close(fd)
 
     # tmp.bc is created by the lifting scripts
@@ -71,7 +89,12 @@ def prep_bitcode_for_linkage(
     dest = str(destination)
 
     try:
-        binrec_lift.link_prep_1(trace_filename=src, destination=tmp, working_dir=cwd)
+        binrec_lift.link_prep_1(
+            trace_filename=src,
+            destination=tmp,
+            working_dir=cwd,
+            artifacts=ArtifactPolicy.BITCODE.value,
+        )
     except Exception as err:
         os.remove(tmp)
         with suppress(OSError):
@@ -83,7 +106,12 @@ def prep_bitcode_for_linkage(
 
     shutil.move(tmp_bc, destination)
     try:
-        binrec_lift.link_prep_2(trace_filename=dest, destination=tmp, working_dir=cwd)
+        binrec_lift.link_prep_2(
+            trace_filename=dest,
+            destination=tmp,
+            working_dir=cwd,
+            artifacts=ArtifactPolicy.BITCODE.value,
+        )
     except Exception as err:
         with suppress(OSError):
             os.remove(tmp_bc)
@@ -98,9 +126,32 @@ def prep_bitcode_for_linkage(
     os.remove(tmp)
 
 
+def _read_binary(trace_dir: Path, action: str, reader: Callable[[ElfFile], Any]) -> Any:
+    """
+    Read information from the original binary.
+
+    :param trace_dir: binrec binary trace directory
+    :param action: description of the information being read, used in error messages
+    :param reader: function that accepts the parsed binary and returns the information
+    :returns: the value returned by ``reader``
+    :raises BinRecError: the binary is not a valid ELF file
+    :raises OSError: I/O error
+    """
+    try:
+        with ElfFile(trace_dir / "binary") as elf:
+            return reader(elf)
+    except BinRecError as err:
+        raise BinRecError(
+            f"failed to {action} from binary: {trace_dir.parent.name}: {err}"
+        )
+
+
 def _extract_binary_symbols(trace_dir: Path) -> None:
     """
-    Extract the symbols from the original binary.
+    Extract the PLT entries of the original binary. This creates a text file where
+    each line is an imported function in the following format::
+
+        <plt_entry_address_hex> <symbol_name>
 
     **Inputs:** trace_dir / "binary"
 
@@ -110,32 +161,18 @@ def _extract_binary_symbols(trace_dir: Path) -> None:
     :raises BinRecError: operation failed
     :raises OSError: I/O error
     """
-    plt_entry_re = r"^([0-9a-f]+) <(.+)@plt>:$"
-    output_file = trace_dir / "symbols"
     logger.debug("extracting symbols from binary: %s", trace_dir.parent.name)
-    # TODO(artem): Objdump should be parametrized by target file architecture.
-    # e.g.: i686-linux-gnu-objdump. We will need it for multiarch support
-    try:
-        with open(output_file, "w") as symbols:
-            # capture disassembly of file according to objdump
-            objdump_proc = subprocess.run(
-                ["objdump", "-d", "binary"], cwd=str(trace_dir), stdout=subprocess.PIPE
-            )
-            objdump_proc.check_returncode()
-            objdump_data = objdump_proc.stdout.decode("utf-8")
-            # find every line that look like:
-            # abc12345 <foo@plt>:
-            # and extract out 'abc12345' and 'foo'
-            # and then save these into the 'symbols' file
-            plt_matches = re.findall(plt_entry_re, objdump_data, re.MULTILINE)
-            for plt_match in plt_matches:
-                plt_addr, plt_name = plt_match
-                symbols.write(f"{plt_addr} {plt_name}\n")
+    # TODO(artem): Only x86 PLT layouts are supported. We will need to parse other
+    # layouts for multiarch support
+    width, entries = _read_binary(
+        trace_dir,
+        "extract symbols",
+        lambda elf: (elf.address_width, elf.plt_entries()),
+    )
 
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to extract symbols from trace: {trace_dir.parent.name}"
-        )
+    with open(trace_dir / "symbols", "w") as symbols:
+        for address, name in entries:
+            symbols.write(f"{address:0{width}x} {name}\n")
 
 
 def _extract_data_imports(trace_dir: Path) -> None:
@@ -145,6 +182,9 @@ def _extract_data_imports(trace_dir: Path) -> None:
 
         <symbol_address_hex>  <symbol_size>  <symbol_name>
 
+    A data import is a versioned, global object that is defined in the binary, which
+    is where the dynamic linker copies the library object to.
+
     **Inputs:** trace_dir / "binary"
 
     **Outputs:** trace_dir / "data_imports"
@@ -153,28 +193,60 @@ def _extract_data_imports(trace_dir: Path) -> None:
     :raises BinRecError: operation failed
     :raises OSError: I/O error
     """
-    binary = trace_dir / "binary"
-    data_imports = trace_dir / "data_imports"
-
     logger.debug("extracting data imports from binary: %s", trace_dir.parent.name)
+    width, symbols = _read_binary(
+        trace_dir,
+        "extract data imports",
+        lambda elf: (elf.address_width, elf.dynamic_symbols),
+    )
+
+    with open(trace_dir / "data_imports", "w") as file:
+        for symbol in symbols:
+            if (
+                symbol.type == STT_OBJECT
+                and symbol.binding == STB_GLOBAL
+                and symbol.is_defined
+                and symbol.version
+            ):
+                print(
+                    f"{symbol.value:0{width}x} {symbol.size} {symbol.name}", file=file
+                )
+
 
+def _resolve_dependencies_ldd(binary: Path, lib_names: List[str]) -> Dict[str, str]:
+    """
+    Resolve library filenames to their absolute path using ``ldd``.
+
+    :param binary: the binary that depends on the libraries
+    :param lib_names: the library filenames to resolve
+    :returns: the absolute path of each library that was resolved
+    """
     try:
-        readelf = subprocess.check_output(["readelf", "--dyn-sym", str(binary)])
+        ldd = subprocess.check_output(["ldd", str(binary)])
     except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to extract data imports from binary: {trace_dir.parent.name}"
-        )
+        logger.warning("failed to resolve dependencies with ldd: %s", binary)
+        return {}
+
+    result = {}
+    for line in ldd.decode().splitlines(keepends=False):
+        parts = line.strip().split("=>", 1)
+        if len(parts) == 2:
+            # line: lib_name  =>  lib_path  (hex_address)
+            lib_name = parts[0].strip()
+            lib_path = parts[1].rpartition("(")[0].strip()
+            if lib_name in lib_names and lib_path:
+                result[lib_name] = lib_path
 
-    with open(data_imports, "w") as file:
-        for match in DATA_IMPORT_PATTERN.finditer(readelf.decode()):
-            print(" ".join(match.groups()), file=file)
+    return result
 
 
 def _extract_dependencies(trace_dir: Path) -> None:
     """
     Extract the list of dependency libraries from the original binary and write them
     to a file. This function gets the absolute file path for every direct dependency
-    of the binary.
+    of the binary. Libraries are located using the dynamic loader search path (see
+    :func:`binrec.elf.resolve_libraries`) and ``ldd`` is only used for the
+    libraries that could not be found.
 
     **Inputs:** trace_dir / "binary"
 
@@ -185,59 +257,24 @@ def _extract_dependencies(trace_dir: Path) -> None:
     :raises OSError: I/O error
     """
     binary = trace_dir / "binary"
+    libraries: Dict[str, Optional[str]] = _read_binary(
+        trace_dir, "extract dependencies", resolve_libraries
+    )
 
-    # first, get the list of direct dependencies. direct_deps will be a list of library
-    # _filenames_ (e.g.- libselinux.so.1).
-    direct_deps = []
-    try:
-        objdump = subprocess.check_output(["objdump", "--private-headers", str(binary)])
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to extract direct dependencies from binary: "
-            f"{trace_dir.parent.name}"
-        )
-
-    for line in objdump.decode().splitlines(keepends=False):
-        parts = line.strip().split(maxsplit=1)
-        if len(parts) == 2 and parts[0] == "NEEDED":
-            # line: NEEDED <lib_filename>
-            lib_name = parts[1]
-            direct_deps.append(lib_name)
-
-    # next, get all dependencies, both direct and indirect. all_deps will be a list
-    # of tuples: (lib_name, lib_path)
-    all_deps: List[Tuple[str, str]] = []
-    try:
-        ldd = subprocess.check_output(["ldd", str(binary)])
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to extract all dependencies from binary: {trace_dir.parent.name}"
-        )
-
-    for line in ldd.decode().splitlines(keepends=False):
-        parts = line.strip().split("=>", 1)
-        if len(parts) == 2:
-            # line: lib_name  =>  lib_path  (hex_address)
-            lib_name = parts[0].strip()
-            lib_path = parts[1].rpartition("(")[0].strip()
-            all_deps.append((lib_name, lib_path))
-
-    # We have the list of direct dependency library names and the full path to every
-    # dependency. Resolve each direct dependency to its full path.
-    result = []
-    for lib_name, lib_path in all_deps:
-        if lib_name in direct_deps:
-            result.append(lib_path)
-            direct_deps.remove(lib_name)
+    missing = [name for name, path in libraries.items() if not path]
+    if missing:
+        libraries.update(_resolve_dependencies_ldd(binary, missing))
 
-    if direct_deps:
+    result = [path for path in libraries.values() if path]
+    unresolved = [name for name, path in libraries.items() if not path]
+    if unresolved:
         # We have any remaining direct dependencies that could not be resolved
         # to an absolute file path. This most likely means that the lifted bitcode
         # will not link.
         logger.warning(
             "failed to resolve %d dependencies, linking may fail: %s",
-            len(direct_deps),
-            ", ".join(direct_deps),
+            len(unresolved),
+            ", ".join(unresolved),
         )
 
     # Save dependencies to trace_dir/dependencies, one per line
@@ -264,26 +301,25 @@ def _extract_sections(trace_dir: Path) -> None:
     :raises BinRecError: operation failed
     :raises OSError: I/O error
     """
-    binary = trace_dir / "binary"
-    sections = trace_dir / "sections"
-
     logger.debug("extracting sections from binary: %s", trace_dir.parent.name)
+    width, sections = _read_binary(
+        trace_dir,
+        "extract sections",
+        lambda elf: (elf.address_width, elf.sections),
+    )
 
-    try:
-        readelf = subprocess.check_output(["readelf", "--section-headers", str(binary)])
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to extract sections from binary: {trace_dir.parent.name}"
-        )
-
-    with open(sections, "w") as file:
-        for match in ELF_SECTION_PATTERN.finditer(readelf.decode()):
-            line = list(match.groups())
-            line.append(line.pop(0))  # move the symbol name to the end
-            print(" ".join(line), file=file)
+    with open(trace_dir / "sections", "w") as file:
+        # the first section is the null section
+        for section in sections[1:]:
+            print(
+                f"{section.address:0{width}x} {section.size:06x} {section.name}",
+                file=file,
+            )
 
 
-def _clean_bitcode(trace_dir: Path) -> None:
+def _clean_bitcode(
+    trace_dir: Path, artifacts: ArtifactPolicy = ArtifactPolicy.ALL
+) -> PassRecords:
     """
     Clean the trace for linking with custom helpers.
 
@@ -292,18 +328,21 @@ def _clean_bitcode(trace_dir: Path) -> None:
     **Outputs:**
 
     - trace_dir / "cleaned.bc"
-    - trace_dir / "cleaned.ll"
-    - trace_dir / "cleaned-memssa.ll"
+    - trace_dir / "cleaned.ll", when ``artifacts`` is ``ALL``
+    - trace_dir / "cleaned-memssa.ll", when ``artifacts`` is ``ALL``
 
     :param trace_dir: binrec binary trace directory
+    :param artifacts: the files to write
+    :returns: the statistics of each pass that ``binrec_lift`` ran
     :raises BinRecError: operation failed
     """
     logger.debug("cleaning captured bitcode: %s", trace_dir.parent.name)
     try:
-        binrec_lift.clean(
+        return binrec_lift.clean(
             trace_filename="captured.bc",
             destination="cleaned",
             working_dir=str(trace_dir),
+            artifacts=artifacts.value,
         )
     except Exception as err:
         raise convert_lib_error(
@@ -311,7 +350,9 @@ def _clean_bitcode(trace_dir: Path) -> None:
         )
 
 
-def _apply_fixups(trace_dir: Path) -> None:
+def _apply_fixups(
+    trace_dir: Path, artifacts: ArtifactPolicy = ArtifactPolicy.ALL
+) -> None:
     """
     Apply binrec fixups to the cleaned bitcode.
 
@@ -319,9 +360,10 @@ def _apply_fixups(trace_dir: Path) -> None:
 
     **Outputs:**
       - trace_dir / "linked.bc"
-      - trace_dir / "linked.ll"
+      - trace_dir / "linked.ll", when ``artifacts`` is ``ALL``
 
     :param trace_dir: binrec binary trace directory
+    :param artifacts: the files to write
     :raises BinRecError: operation failed
     """
     logfile = trace_dir / "fixups.log"
@@ -345,6 +387,9 @@ def _apply_fixups(trace_dir: Path) -> None:
             f" see the log for more information: {logfile}"
         )
 
+    if artifacts != ArtifactPolicy.ALL:
+        return
+
     try:
         subprocess.check_call(
             [llvm_command("llvm-dis"), "linked.bc"],
@@ -358,7 +403,9 @@ def _apply_fixups(trace_dir: Path) -> None:
         pass
 
 
-def _lift_bitcode(trace_dir: Path) -> None:
+def _lift_bitcode(
+    trace_dir: Path, artifacts: ArtifactPolicy = ArtifactPolicy.ALL
+) -> PassRecords:
     """
     Lift trace into correct LLVM module.
 
@@ -366,22 +413,25 @@ def _lift_bitcode(trace_dir: Path) -> None:
 
     **Outputs:**
       - trace_dir / "lifted.bc"
-      - trace_dir / "lifted.ll"
-      - trace_dir / "lifted-memssa.ll"
+      - trace_dir / "lifted.ll", when ``artifacts`` is ``ALL``
+      - trace_dir / "lifted-memssa.ll", when ``artifacts`` is ``ALL``
       - trace_dir / "rfuncs"
 
     :param trace_dir: binrec binary trace directory
+    :param artifacts: the files to write
+    :returns: the statistics of each pass that ``binrec_lift`` ran
     :raises BinRecError: operation failed
     """
     logger.debug(
         "performing initial lifting of captured LLVM bitcode: %s", trace_dir.parent.name
     )
     try:
-        binrec_lift.lift(
+        return binrec_lift.lift(
             trace_filename="linked.bc",
             destination="lifted",
             working_dir=str(trace_dir),
             clean_names=True,
+            artifacts=artifacts.value,
         )
     except Exception as err:
         raise convert_lib_error(
@@ -396,41 +446,42 @@ class OptimizationLevel(Enum):
     HIGH = 2
 
 
-def _optimize_bitcode(trace_dir: Path, opt_level: OptimizationLevel) -> None:
+def _optimize_module(
+    trace_dir: Path,
+    opt_level: OptimizationLevel,
+    source: str,
+    destination: str,
+    artifacts: ArtifactPolicy,
+) -> PassRecords:
     """
-    Optimize the lifted LLVM module.
-
-    **Inputs:** trace_dir / "lifted.bc"
-
-    **Outputs:**
-        - trace_dir / "optimized.bc"
-        - trace_dir / "optimized.ll"
-        - trace_dir / "optimized-memssa.ll"
+    Run the optimizer of an optimization level on a single module. This is the
+    worker function of :func:`_optimize_partitions`.
 
     :param trace_dir: binrec binary trace directory
+    :param opt_level: How much effort to put into optimizing lifted bitcode
+    :param source: the bitcode filename, relative to the trace directory
+    :param destination: the output file basename
+    :param artifacts: the files to write
+    :returns: the statistics of each pass that ``binrec_lift`` ran
     :raises BinRecError: operation failed
     """
-
     optimizers = {
         OptimizationLevel.NORMAL: binrec_lift.optimize,
         OptimizationLevel.HIGH: binrec_lift.optimize_better,
     }
 
-    logger.debug(
-        "optimizing lifted bitcode: %s at level %s", trace_dir.parent.name, opt_level
-    )
-
     if opt_level not in optimizers:  # pragma: no cover
         raise BinRecError(f"Unknown optimization level: {opt_level}")
 
     optimizer = optimizers[opt_level]
 
     try:
-        optimizer(
-            trace_filename="lifted.bc",
-            destination="optimized",
-            memssa_check_limit=100000,
+        return optimizer(
+            trace_filename=source,
+            destination=destination,
+            memssa_check_limit=MEMSSA_CHECK_LIMIT,
             working_dir=str(trace_dir),
+            artifacts=artifacts.value,
         )
     except Exception as err:
         raise convert_lib_error(
@@ -438,34 +489,138 @@ def _optimize_bitcode(trace_dir: Path, opt_level: OptimizationLevel) -> None:
         )
 
 
-def _disassemble_bitcode(trace_dir: Path) -> None:
+def _optimize_partitions(
+    trace_dir: Path,
+    opt_level: OptimizationLevel,
+    partitions: List[str],
+    artifacts: ArtifactPolicy,
+) -> PassRecords:
     """
-    Disassemble optimized bitcode.
+    Optimize the partitions of the lifted module concurrently, in worker processes,
+    and link the optimized partitions into the optimized module.
 
-    **Inputs:** trace_dir / "optimized.bc"
+    :param trace_dir: binrec binary trace directory
+    :param opt_level: How much effort to put into optimizing lifted bitcode
+    :param partitions: the partition filenames, relative to the trace directory
+    :param artifacts: the files to write for the optimized module
+    :returns: the statistics of each pass that ``binrec_lift`` ran, the passes that
+        optimized a partition include the ``partition`` index
+    :raises BinRecError: operation failed
+    """
+    optimized = [f"{Path(partition).stem}-optimized" for partition in partitions]
+    passes: PassRecords = []
+    with process_pool(max_workers=len(partitions)) as pool:
+        futures = [
+            pool.submit(
+                _optimize_module,
+                trace_dir,
+                opt_level,
+                partition,
+                destination,
+                ArtifactPolicy.NONE,
+            )
+            for partition, destination in zip(partitions, optimized)
+        ]
+        for index, future in enumerate(futures):
+            passes.extend(
+                dict(record, partition=index) for record in future.result() or []
+            )
+
+    try:
+        passes.extend(
+            binrec_lift.link_partitions(
+                inputs=[f"{destination}.bc" for destination in optimized],
+                destination="optimized",
+                working_dir=str(trace_dir),
+                artifacts=artifacts.value,
+            )
+        )
+    except Exception as err:
+        raise convert_lib_error(
+            err, f"failed to link optimized partitions: {trace_dir.parent.name}"
+        )
 
-    **Outputs:** trace_dir / "optimized.ll"
+    return passes
+
+
+def _optimize_bitcode(
+    trace_dir: Path,
+    opt_level: OptimizationLevel,
+    artifacts: ArtifactPolicy = ArtifactPolicy.ALL,
+    partitions: int = 1,
+) -> PassRecords:
+    """
+    Optimize the lifted LLVM module.
+
+    When ``partitions`` is greater than one, the lifted module is split into at most
+    ``partitions`` modules along call graph boundaries, the partitions are optimized
+    concurrently in worker processes, and the optimized partitions are linked and
+    cleaned up by global optimization and dead global elimination. Modules that
+    define fewer than :data:`PARTITION_MIN_FUNCTIONS` functions, or that cannot be
+    split, are optimized as a whole. Partitioned optimization cannot inline or
+    propagate constants across partitions, so the optimized module may differ from
+    the monolithic optimization.
+
+    **Inputs:** trace_dir / "lifted.bc"
+
+    **Outputs:**
+        - trace_dir / "optimized.bc"
+        - trace_dir / "optimized.ll", when ``artifacts`` is ``ALL``
+        - trace_dir / "optimized-memssa.ll", when ``artifacts`` is ``ALL``
 
     :param trace_dir: binrec binary trace directory
+    :param opt_level: How much effort to put into optimizing lifted bitcode
+    :param artifacts: the files to write
+    :param partitions: the maximum number of partitions to optimize concurrently
+    :returns: the statistics of each pass that ``binrec_lift`` ran
     :raises BinRecError: operation failed
     """
-    logger.debug("disassembling optimized bitcode: %s", trace_dir.parent.name)
-    logfile = trace_dir / "disassembly.log"
+    logger.debug(
+        "optimizing lifted bitcode: %s at level %s", trace_dir.parent.name, opt_level
+    )
+
+    split: List[str] = []
+    if partitions > 1:
+        try:
+            split = binrec_lift.split_module(
+                trace_filename="lifted.bc",
+                destination=PARTITION_PREFIX,
+                partitions=partitions,
+                min_functions=PARTITION_MIN_FUNCTIONS,
+                working_dir=str(trace_dir),
+            )
+        except Exception as err:
+            raise convert_lib_error(
+                err, f"failed to partition lifted LLVM bitcode: {trace_dir.parent.name}"
+            )
+
     try:
-        subprocess.check_call(
-            [llvm_command("llvm-dis"), "optimized.bc"],
-            cwd=str(trace_dir),
-            stdout=logfile.open("w"),
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to disassemble captured LLVM bitcode: {trace_dir.parent.name}, "
-            f"see log for more information: {logfile}"
+        if len(split) > 1:
+            logger.info(
+                "optimizing %d partitions of lifted bitcode: %s",
+                len(split),
+                trace_dir.parent.name,
+            )
+            return _optimize_partitions(trace_dir, opt_level, split, artifacts)
+
+        if partitions > 1:
+            logger.info(
+                "lifted bitcode is too small to partition, optimizing the whole "
+                "module: %s",
+                trace_dir.parent.name,
+            )
+        return _optimize_module(
+            trace_dir, opt_level, "lifted.bc", "optimized", artifacts
         )
+    finally:
+        if partitions > 1:
+            for filename in trace_dir.glob(f"{PARTITION_PREFIX}-*.bc"):
+                filename.unlink()
 
 
-def _recover_bitcode(trace_dir: Path) -> None:
+def _recover_bitcode(
+    trace_dir: Path, artifacts: ArtifactPolicy = ArtifactPolicy.ALL
+) -> PassRecords:
     """
     Compile the trace to an object file. This method recovers the optimized bitcode.
 
@@ -473,20 +628,23 @@ def _recover_bitcode(trace_dir: Path) -> None:
 
     **Outputs:**
         - trace_dir / "recovered.bc"
-        - trace_dir / "recovered.ll"
-        - trace_dir / "recovered-memssa.ll"
+        - trace_dir / "recovered.ll", when ``artifacts`` is ``ALL``
+        - trace_dir / "recovered-memssa.ll", when ``artifacts`` is ``ALL``
 
     :param trace_dir: binrec binary trace directory
+    :param artifacts: the files to write
+    :returns: the statistics of each pass that ``binrec_lift`` ran
     :raises BinRecError: operation failed
     """
     logger.debug(
         "lowering optimized LLVM bitcode for compilation: %s", trace_dir.parent.name
     )
     try:
-        binrec_lift.compile_prep(
+        return binrec_lift.compile_prep(
             trace_filename="optimized.bc",
             destination="recovered",
             working_dir=str(trace_dir),
+            artifacts=artifacts.value,
         )
     except Exception as err:
         raise convert_lib_error(
@@ -494,59 +652,74 @@ def _recover_bitcode(trace_dir: Path) -> None:
         )
 
 
-def _compile_bitcode(trace_dir: Path) -> None:
+def _recovered_objects(codegen_partitions: int = 1) -> List[str]:
+    """
+    :param codegen_partitions: the number of partitions of the recovered module that
+        code is generated for
+    :returns: the recovered object files, relative to the trace directory, which
+        match the files that ``binrec_lift.emit_object`` writes
+    """
+    if codegen_partitions <= 1:
+        return [f"{RECOVERED_OBJECT}.o"]
+    return [f"{RECOVERED_OBJECT}-{index}.o" for index in range(codegen_partitions)]
+
+
+def _compile_bitcode(trace_dir: Path, codegen_partitions: int = 1) -> PassRecords:
     """
-    Compile the recovered bitcode.
+    Compile the recovered bitcode to an object file, in process, with
+    ``binrec_lift.emit_object``. When ``codegen_partitions`` is greater than one,
+    the recovered module is split along its call graph and code is generated for
+    each partition concurrently, on its own thread, to its own object file.
 
     **Inputs:** trace_dir / "recovered.bc"
 
-    **Outputs:** trace_dir / "recovered.o"
+    **Outputs:** trace_dir / "recovered.o", or trace_dir / "recovered-<N>.o" for
+    each partition
 
     :param trace_dir: binrec binary trace directory
+    :param codegen_partitions: the number of partitions to generate code for
+        concurrently
+    :returns: the statistics of each pass that ``binrec_lift`` ran
     :raises BinRecError: operation failed
     """
     logger.debug("compiling recovered LLVM bitcode: %s", trace_dir.parent.name)
-    logfile = trace_dir / "compile.log"
     try:
-        subprocess.check_call(
-            [
-                llvm_command("llc"),
-                "-filetype",
-                "obj",
-                "-o",
-                "recovered.o",
-                "recovered.bc",
-            ],
-            cwd=str(trace_dir),
-            stdout=logfile.open("a"),
-            stderr=subprocess.STDOUT,
+        return binrec_lift.emit_object(
+            trace_filename="recovered.bc",
+            destination=f"{RECOVERED_OBJECT}.o",
+            working_dir=str(trace_dir),
+            partitions=codegen_partitions,
         )
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"failed to compile recovered LLVM bitcode: {trace_dir.parent.name}, "
-            f"see log for more information: {logfile}"
+    except Exception as err:
+        raise convert_lib_error(
+            err, f"failed to compile recovered LLVM bitcode: {trace_dir.parent.name}"
         )
 
 
-def _link_recovered_binary(trace_dir: Path, harden: bool = False) -> None:
+def _link_recovered_binary(
+    trace_dir: Path, harden: bool = False, codegen_partitions: int = 1
+) -> None:
     """
     Linked the recovered binary.
 
-    **Inputs:** trace_dir / "recovered.o"
+    **Inputs:** the recovered object files, see :func:`_recovered_objects`
 
     **Outputs:** trace_dir / "recovered"
 
     :param trace_dir: binrec binary trace directory
+    :param codegen_partitions: the number of partitions the recovered module was
+        compiled in
     :raises BinRecError: operation failed
     """
     i386_ld = str(BINREC_LINK_LD / "i386.ld")
     libbinrec_rt = str(BINREC_LIB / "libbinrec_rt.a")
+    objects = [str(trace_dir / name) for name in _recovered_objects(codegen_partitions)]
 
     logger.debug("linking recovered binary: %s", trace_dir.parent.name)
     try:
         binrec_link.link(
             binary_filename=str(trace_dir / "binary"),
-            recovered_filename=str(trace_dir / "recovered.o"),
+            recovered_filename=objects[0] if len(objects) == 1 else objects,
             runtime_library=libbinrec_rt,
             linker_script=i386_ld,
             destination=str(trace_dir / "recovered"),
@@ -557,20 +730,567 @@ def _link_recovered_binary(trace_dir: Path, harden: bool = False) -> None:
         raise convert_lib_error(err, "failed to link recovered binary")
 
 
+#: The intermediate modules that :func:`_run_lift_pipeline` can save
+PIPELINE_INTERMEDIATES = ("cleaned", "linked", "lifted", "optimized")
+
+
+def _module_artifacts(name: str, artifacts: ArtifactPolicy) -> List[str]:
+    """
+    :param name: the module file basename
+    :param artifacts: the artifact policy
+    :returns: the files written for a module under the artifact policy
+    """
+    if artifacts == ArtifactPolicy.ALL:
+        return [f"{name}.bc", f"{name}.ll", f"{name}-memssa.ll"]
+    return [f"{name}.bc"]
+
+
+def _run_lift_pipeline(
+    trace_dir: Path,
+    opt_level: OptimizationLevel,
+    artifacts: ArtifactPolicy = ArtifactPolicy.NONE,
+    codegen_partitions: int = 1,
+) -> PassRecords:
+    """
+    Clean, link with the custom helpers, lift, optimize, and lower the captured
+    bitcode on a single in-memory module and compile it to an object file. This is
+    equivalent to running :func:`_clean_bitcode`, :func:`_apply_fixups`,
+    :func:`_lift_bitcode`, :func:`_optimize_bitcode`, :func:`_recover_bitcode`, and
+    :func:`_compile_bitcode` but the module is only parsed once and only the
+    recovered module is written.
+
+    **Inputs:** trace_dir / "captured.bc"
+
+    **Outputs:**
+        - trace_dir / "recovered.bc"
+        - the recovered object files, see :func:`_recovered_objects`
+        - trace_dir / "rfuncs"
+        - trace_dir / "<stage>.bc", for each of :data:`PIPELINE_INTERMEDIATES` when
+          ``artifacts`` is ``BITCODE`` or ``ALL``
+        - trace_dir / "<module>.ll" and trace_dir / "<module>-memssa.ll", for the
+          recovered and intermediate modules when ``artifacts`` is ``ALL``
+
+    :param trace_dir: binrec binary trace directory
+    :param opt_level: How much effort to put into optimizing lifted bitcode
+    :param artifacts: the files to write
+    :param codegen_partitions: the number of partitions of the recovered module to
+        generate code for concurrently, see :func:`_compile_bitcode`
+    :returns: the statistics of each pass that ``binrec_lift`` ran
+    :raises BinRecError: operation failed
+    """
+    logger.debug("running lift pipeline: %s", trace_dir.parent.name)
+    try:
+        return binrec_lift.run_pipeline(
+            trace_filename="captured.bc",
+            destination="recovered",
+            helpers_filename=str(BINREC_RUNLIB / "custom-helpers.bc"),
+            working_dir=str(trace_dir),
+            memssa_check_limit=MEMSSA_CHECK_LIMIT,
+            optimize_better=opt_level == OptimizationLevel.HIGH,
+            clean_names=True,
+            artifacts=artifacts.value,
+            object_filename=f"{RECOVERED_OBJECT}.o",
+            object_partitions=codegen_partitions,
+        )
+    except Exception as err:
+        raise convert_lib_error(
+            err, f"failed to lift captured LLVM bitcode: {trace_dir.parent.name}"
+        )
+
+
+@dataclass
+class LiftStage:
+    """
+    A single stage of :func:`lift_trace`. Stages are connected by their files: a
+    stage depends on the stages that produce its inputs.
+    """
+
+    #: the stage name
+    name: str
+    #: the function that performs the stage, which accepts the trace directory and
+    #: returns the statistics of the ``binrec_lift`` passes it ran, if any
+    func: Callable[[Path], Optional[PassRecords]]
+    #: the files, relative to the trace directory, that the stage reads
+    inputs: List[str] = field(default_factory=list)
+    #: the files, relative to the trace directory, that the stage writes
+    outputs: List[str] = field(default_factory=list)
+    #: the parameters that affect the stage outputs
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _lift_stages(
+    opt_level: OptimizationLevel,
+    harden: bool,
+    separate_stages: bool = False,
+    artifacts: ArtifactPolicy = ArtifactPolicy.NONE,
+    partitions: int = 1,
+    codegen_partitions: int = 1,
+) -> List[LiftStage]:
+    """
+    :param opt_level: How much effort to put into optimizing lifted bitcode
+    :param harden: Whether to apply security hardening passes to the lifted bitcode.
+    :param separate_stages: run each bitcode stage separately, writing and reading
+        the module between stages, instead of :func:`_run_lift_pipeline`
+    :param artifacts: the files to write for each module, the intermediate bitcode
+        is always written when ``separate_stages`` is set
+    :param partitions: the maximum number of partitions of the lifted module to
+        optimize concurrently, see :func:`_optimize_bitcode`. The partitions are
+        optimized in worker processes, so the bitcode stages are run separately when
+        this is greater than one.
+    :param codegen_partitions: the number of partitions of the recovered module to
+        generate code for concurrently, see :func:`_compile_bitcode`
+    :returns: the lift stages, in dependency order
+    """
+    objects = _recovered_objects(codegen_partitions)
+    stages = [
+        LiftStage("symbols", _extract_binary_symbols, ["binary"], ["symbols"]),
+        LiftStage("data_imports", _extract_data_imports, ["binary"], ["data_imports"]),
+        LiftStage("sections", _extract_sections, ["binary"], ["sections"]),
+        LiftStage("dependencies", _extract_dependencies, ["binary"], ["dependencies"]),
+    ]
+    if separate_stages or partitions > 1:
+        stages.extend(
+            _separate_bitcode_stages(
+                opt_level, artifacts, partitions, codegen_partitions
+            )
+        )
+    else:
+        intermediates = [
+            filename
+            for name in PIPELINE_INTERMEDIATES
+            if artifacts != ArtifactPolicy.NONE
+            for filename in _module_artifacts(name, artifacts)
+        ]
+        stages.append(
+            LiftStage(
+                "pipeline",
+                lambda d: _run_lift_pipeline(
+                    d, opt_level, artifacts, codegen_partitions
+                ),
+                [
+                    "captured.bc",
+                    "traceInfo.json",
+                    str(BINREC_RUNLIB / "custom-helpers.bc"),
+                    "binary",
+                    "symbols",
+                    "sections",
+                    "data_imports",
+                ],
+                [
+                    *_module_artifacts("recovered", artifacts),
+                    *objects,
+                    "rfuncs",
+                    *intermediates,
+                ],
+                {
+                    "opt_level": opt_level.name,
+                    "memssa_check_limit": MEMSSA_CHECK_LIMIT,
+                    "codegen_partitions": codegen_partitions,
+                },
+            )
+        )
+
+    stages.append(
+        LiftStage(
+            "link",
+            lambda d: _link_recovered_binary(d, harden, codegen_partitions),
+            [
+                "binary",
+                *objects,
+                "dependencies",
+                str(BINREC_LIB / "libbinrec_rt.a"),
+                str(BINREC_LINK_LD / "i386.ld"),
+            ],
+            ["recovered"],
+            {"harden": harden},
+        )
+    )
+    return stages
+
+
+def _separate_bitcode_stages(
+    opt_level: OptimizationLevel,
+    artifacts: ArtifactPolicy = ArtifactPolicy.NONE,
+    partitions: int = 1,
+    codegen_partitions: int = 1,
+) -> List[LiftStage]:
+    """
+    :param opt_level: How much effort to put into optimizing lifted bitcode
+    :param artifacts: the files to write for each module
+    :param partitions: the maximum number of partitions of the lifted module to
+        optimize concurrently
+    :param codegen_partitions: the number of partitions of the recovered module to
+        generate code for concurrently
+    :returns: the bitcode lift stages that each write their output module to disk,
+        from the captured bitcode to the recovered object file
+    """
+    return [
+        LiftStage(
+            "clean",
+            lambda d: _clean_bitcode(d, artifacts),
+            ["captured.bc", "traceInfo.json"],
+            _module_artifacts("cleaned", artifacts),
+        ),
+        LiftStage(
+            "fixups",
+            lambda d: _apply_fixups(d, artifacts),
+            ["cleaned.bc", str(BINREC_RUNLIB / "custom-helpers.bc")],
+            # llvm-dis only writes the LLVM IR
+            _module_artifacts("linked", artifacts)[:2],
+        ),
+        LiftStage(
+            "lift",
+            lambda d: _lift_bitcode(d, artifacts),
+            [
+                "linked.bc",
+                "binary",
+                "traceInfo.json",
+                "symbols",
+                "sections",
+                "data_imports",
+            ],
+            [*_module_artifacts("lifted", artifacts), "rfuncs"],
+        ),
+        LiftStage(
+            "optimize",
+            lambda d: _optimize_bitcode(d, opt_level, artifacts, partitions),
+            ["lifted.bc"],
+            _module_artifacts("optimized", artifacts),
+            {
+                "opt_level": opt_level.name,
+                "memssa_check_limit": MEMSSA_CHECK_LIMIT,
+                "partitions": partitions,
+            },
+        ),
+        LiftStage(
+            "recover",
+            lambda d: _recover_bitcode(d, artifacts),
+            ["optimized.bc"],
+            _module_artifacts("recovered", artifacts),
+        ),
+        LiftStage(
+            "compile",
+            lambda d: _compile_bitcode(d, codegen_partitions),
+            ["recovered.bc"],
+            _recovered_objects(codegen_partitions),
+            {"codegen_partitions": codegen_partitions},
+        ),
+    ]
+
+
+class LiftManifest:
+    """
+    The record of the lift stages that completed in a trace directory,
+    :data:`LIFT_MANIFEST_NAME`. Each stage is recorded with a fingerprint of the
+    content of its inputs, its parameters, and the binrec C module builds. A stage is
+    up to date, and does not need to run again, when its fingerprint is unchanged and
+    all of its outputs exist.
+
+    The manifest is shared by the concurrent lift stages and is rewritten after each
+    stage completes, so an interrupted lift resumes from the first stage that did not
+    complete.
+    """
+
+    def __init__(self, trace_dir: Path):
+        """
+        :param trace_dir: binrec binary trace directory
+        """
+        self.trace_dir = trace_dir
+        self.filename = trace_dir / LIFT_MANIFEST_NAME
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+
+        if self.filename.is_file():
+            try:
+                self.stages = json.loads(self.filename.read_text())["stages"]
+            except (OSError, ValueError, KeyError, TypeError) as err:
+                logger.warning(
+                    "ignoring invalid lift manifest: %s: %s", self.filename, err
+                )
+
+    def _hash_inputs(self, stage: LiftStage) -> Dict[str, str]:
+        hashes = {}
+        for filename in stage.inputs:
+            path = self.trace_dir / filename
+            hashes[filename] = hash_file(path) if path.is_file() else ""
+        return hashes
+
+    def fingerprint(self, stage: LiftStage) -> Dict[str, Any]:
+        """
+        :returns: the current fingerprint of a stage, which includes the content
+            hash of each input, an empty string for missing inputs
+        """
+        entry: Dict[str, Any] = {
+            "inputs": self._hash_inputs(stage),
+            "params": stage.params,
+            "tools": {
+                "binrec_lift": binrec_lift_build_id(),
+                "binrec_link": binrec_link_build_id(),
+            },
+        }
+        digest = hashlib.sha256(json.dumps(entry, sort_keys=True).encode())
+        entry["fingerprint"] = digest.hexdigest()
+        return entry
+
+    def is_current(self, stage: LiftStage, fingerprint: Dict[str, Any]) -> bool:
+        """
+        :returns: the stage was previously completed with the same fingerprint and
+            all of its outputs still exist
+        """
+        with self._lock:
+            previous = self.stages.get(stage.name)
+
+        if not previous or previous.get("fingerprint") != fingerprint["fingerprint"]:
+            return False
+
+        return all((self.trace_dir / output).exists() for output in stage.outputs)
+
+    def discard(self, stage: LiftStage) -> None:
+        """
+        Remove a stage from the manifest before it runs, so that a stage that is
+        interrupted is never considered complete.
+        """
+        with self._lock:
+            if self.stages.pop(stage.name, None) is not None:
+                self._save()
+
+    def record(self, stage: LiftStage, fingerprint: Dict[str, Any]) -> None:
+        """
+        Record that a stage completed.
+        """
+        with self._lock:
+            self.stages[stage.name] = fingerprint
+            self._save()
+
+    def _save(self) -> None:
+        tmp = self.trace_dir / f".{LIFT_MANIFEST_NAME}.tmp"
+        tmp.write_text(json.dumps({"stages": self.stages}, indent=2, sort_keys=True))
+        tmp.replace(self.filename)
+
+
+class LiftStatistics:
+    """
+    The per-pass statistics of the lift stages, written to ``lift-stats.json`` in
+    the trace directory. Each ``binrec_lift`` operation returns the run time, the
+    number of functions, blocks, and instructions before and after, and the peak
+    resident set size of every pass it ran (see :func:`binrec_lift.run_pipeline`).
+
+    Only the stages that ran are replaced when the statistics are saved, so the file
+    keeps the statistics of the last run of stages that were skipped because they
+    were up to date.
+    """
+
+    def __init__(self, trace_dir: Path):
+        """
+        :param trace_dir: binrec binary trace directory
+        """
+        self.trace_dir = trace_dir
+        self.filename = trace_dir / LIFT_STATS_NAME
+        self.stages: Dict[str, PassRecords] = {}
+        self._lock = Lock()
+
+    def record(self, stage_name: str, passes: Optional[PassRecords]) -> None:
+        """
+        Record the passes that a completed stage ran.
+
+        :param stage_name: the lift stage name
+        :param passes: the statistics returned by the stage, if any
+        """
+        with self._lock:
+            self.stages[stage_name] = list(passes or [])
+
+    def slowest_passes(self, count: int = 5) -> List[Dict[str, Any]]:
+        """
+        :param count: the maximum number of passes to return
+        :returns: the slowest recorded passes, excluding pass managers and adaptors
+            that only run nested passes
+        """
+        leaves = []
+        with self._lock:
+            for passes in self.stages.values():
+                for index, record in enumerate(passes):
+                    following = passes[index + 1] if index + 1 < len(passes) else None
+                    if not following or following["depth"] <= record["depth"]:
+                        leaves.append(record)
+
+        return sorted(leaves, key=lambda record: record["seconds"], reverse=True)[
+            :count
+        ]
+
+    def save(self, timings: Dict[str, float]) -> None:
+        """
+        Write the statistics of the stages that ran, merged with the statistics of
+        the previous lift.
+
+        :param timings: the run time, in seconds, of each lift stage
+        """
+        stages: Dict[str, Any] = {}
+        if self.filename.is_file():
+            with suppress(OSError, ValueError, KeyError, TypeError):
+                stages = dict(json.loads(self.filename.read_text())["stages"])
+
+        with self._lock:
+            for name, passes in self.stages.items():
+                stages[name] = {"seconds": timings.get(name, 0.0), "passes": passes}
+
+        tmp = self.trace_dir / f".{LIFT_STATS_NAME}.tmp"
+        tmp.write_text(json.dumps({"stages": stages}, indent=2, sort_keys=True))
+        tmp.replace(self.filename)
+
+
+def _run_stage(
+    trace_dir: Path, stage: LiftStage, statistics: Optional[LiftStatistics]
+) -> None:
+    """
+    Run a lift stage and record the statistics of its passes.
+
+    :param trace_dir: binrec binary trace directory
+    :param stage: the lift stage
+    :param statistics: the lift statistics, if recorded
+    """
+    passes = stage.func(trace_dir)
+    record = current_span()
+    if record:
+        record.add_artifacts(trace_dir / output for output in stage.outputs)
+    if statistics:
+        statistics.record(stage.name, passes)
+
+
+def _run_lift_stage(
+    trace_dir: Path,
+    stage: LiftStage,
+    manifest: LiftManifest,
+    force: bool,
+    statistics: Optional[LiftStatistics] = None,
+) -> None:
+    """
+    Run a lift stage unless it is up to date, and record it in the manifest.
+
+    :param trace_dir: binrec binary trace directory
+    :param stage: the lift stage
+    :param manifest: the trace directory lift manifest
+    :param force: run the stage even if it is up to date
+    :param statistics: the lift statistics, if recorded
+    """
+    fingerprint = manifest.fingerprint(stage)
+    if not force and manifest.is_current(stage, fingerprint):
+        logger.info("lift stage %s is up to date, skipping", stage.name)
+        return
+
+    manifest.discard(stage)
+    _run_stage(trace_dir, stage, statistics)
+    manifest.record(stage, fingerprint)
+
+
+def _build_lift_graph(
+    trace_dir: Path,
+    stages: List[LiftStage],
+    manifest: Optional[LiftManifest] = None,
+    force_from: Optional[str] = None,
+    statistics: Optional[LiftStatistics] = None,
+) -> TaskGraph:
+    """
+    Build the task graph of the lift stages. Each stage depends on the stages that
+    produce its inputs; inputs that no stage produces must already exist in the trace
+    directory.
+
+    :param trace_dir: binrec binary trace directory
+    :param stages: the lift stages, in dependency order
+    :param manifest: the lift manifest used to skip up to date stages, every stage
+        runs if not specified
+    :param force_from: run this stage, and every stage that depends on it, even if
+        it is up to date
+    :param statistics: record the statistics of each stage that runs
+    :returns: the task graph
+    :raises BinRecError: the ``force_from`` stage does not exist
+    """
+    if force_from and force_from not in {stage.name for stage in stages}:
+        raise BinRecError(f"unknown lift stage: {force_from}")
+
+    graph = TaskGraph("lift")
+    producers: Dict[str, str] = {}
+    forced: Set[str] = set()
+    for stage in stages:
+        dependencies = sorted(
+            {producers[filename] for filename in stage.inputs if filename in producers}
+        )
+        if stage.name == force_from or forced.intersection(dependencies):
+            forced.add(stage.name)
+
+        if manifest:
+            func = partial(
+                _run_lift_stage,
+                trace_dir,
+                stage,
+                manifest,
+                stage.name in forced,
+                statistics,
+            )
+        else:
+            func = partial(_run_stage, trace_dir, stage, statistics)
+
+        graph.add(stage.name, func, dependencies)
+        for filename in stage.outputs:
+            producers[filename] = stage.name
+
+    return graph
+
+
 def lift_trace(
     project_name: str,
     opt_level: OptimizationLevel = OptimizationLevel.NORMAL,
     harden: bool = False,
-) -> None:
+    force_from: Optional[str] = None,
+    separate_stages: bool = False,
+    artifacts: ArtifactPolicy = ArtifactPolicy.NONE,
+    partitions: int = 1,
+    codegen_partitions: int = 1,
+) -> Dict[str, float]:
     """
     Lift and recover a binary from a binrec trace. This lifts, compiles, and links
     capture bitcode to a recovered binary. This method works on the binrec trace
     directory, ``s2e-out-<binary>``.
 
+    The lift stages (see :func:`_lift_stages`) run concurrently where their inputs
+    allow. The metadata extraction stages run alongside the bitcode cleanup. By
+    default, the captured bitcode is cleaned, lifted, optimized, and lowered as a
+    single in-memory module (see :func:`_run_lift_pipeline`). When
+    ``separate_stages`` is set, each of these stages writes its module to disk.
+    When ``partitions`` is greater than one, the stages are run separately and the
+    lifted module is optimized in partitions, concurrently (see
+    :func:`_optimize_bitcode`). When ``codegen_partitions`` is greater than one,
+    code is generated for partitions of the recovered module concurrently and the
+    resulting object files are linked together (see :func:`_compile_bitcode`).
+
+    The textual LLVM IR and MemorySSA dumps of each module are only written when
+    ``artifacts`` is :attr:`~binrec.artifacts.ArtifactPolicy.ALL`. They can be
+    rendered later from the bitcode with :func:`binrec.artifacts.render`.
+
+    Completed stages are recorded in the lift manifest (see :class:`LiftManifest`)
+    and a stage is skipped when its inputs, parameters, and the binrec C module
+    builds are unchanged since it last completed. Lifting the same trace again only
+    runs the stages downstream of a change, and an interrupted lift resumes from the
+    first stage that did not complete.
+
+    The run time, module size, and peak memory usage of each pass that the stages
+    run are written to ``lift-stats.json`` (see :class:`LiftStatistics`), even when
+    a stage fails.
+
     :param project_name: name of the s2e project to operate on
     :param opt_level: How much effort to put into optimizing lifted bitcode
     :param harden: Whether to apply security hardening passes to the lifted bitcode.
-
+    :param force_from: run this stage, and every stage downstream of it, even if it
+        is up to date
+    :param separate_stages: run each bitcode stage separately instead of as a single
+        in-memory pipeline
+    :param artifacts: the files to write for each module
+    :param partitions: the maximum number of partitions of the lifted module to
+        optimize concurrently, ``1`` optimizes the whole module on a single thread
+    :param codegen_partitions: the number of partitions of the recovered module to
+        generate code for concurrently, ``1`` compiles the whole module on a single
+        thread
+    :returns: the run time, in seconds, of each lift stage
+    :raises BinRecError: operation failed or the ``force_from`` stage does not exist
     """
     merged_trace_dir = project.merged_trace_dir(project_name)
     if not merged_trace_dir.is_dir():
@@ -580,41 +1300,42 @@ def lift_trace(
 
     logger.info("lifting project %s", project_name)
 
-    # Step 1: extract symbols, data imports, sections, and dependencies
-    _extract_binary_symbols(merged_trace_dir)
-    _extract_data_imports(merged_trace_dir)
-    _extract_sections(merged_trace_dir)
-    _extract_dependencies(merged_trace_dir)
-
-    # Step 2: clean captured LLVM bitcode
-    _clean_bitcode(merged_trace_dir)
-
-    # Step 3: apply fixups to captured bitcode
-    _apply_fixups(merged_trace_dir)
-
-    # Step 4: initial lifting
-    _lift_bitcode(merged_trace_dir)
-
-    # Step 5: optimize the lifted bitcode
-    _optimize_bitcode(merged_trace_dir, opt_level)
-
-    # Step 6: disassemble optimized bitcode
-    _disassemble_bitcode(merged_trace_dir)
-
-    # Step 7: recover the optimized bitcode
-    _recover_bitcode(merged_trace_dir)
-
-    # Step 8: compile recovered bitcode
-    _compile_bitcode(merged_trace_dir)
-
-    # Step 9: Link the recovered binary
-    _link_recovered_binary(merged_trace_dir, harden)
+    statistics = LiftStatistics(merged_trace_dir)
+    graph = _build_lift_graph(
+        merged_trace_dir,
+        _lift_stages(
+            opt_level,
+            harden,
+            separate_stages,
+            artifacts,
+            partitions,
+            codegen_partitions,
+        ),
+        LiftManifest(merged_trace_dir),
+        force_from,
+        statistics,
+    )
+    recovered = merged_trace_dir / "recovered"
+    with span("lift", project_name, [recovered]):
+        try:
+            graph.run()
+        finally:
+            statistics.save(graph.timings())
+
+    for record in statistics.slowest_passes():
+        logger.debug(
+            "slow pass: %s in %s stage: %.3fs",
+            record["pass"],
+            record["stage"],
+            record["seconds"],
+        )
 
     logger.info(
         "successfully lifted and recovered binary for project %s: %s",
         project_name,
-        merged_trace_dir / "recovered",
+        recovered,
     )
+    return graph.timings()
 
 
 def main() -> None:
@@ -640,6 +1361,51 @@ def main() -> None:
         action="store_true",
         help="Enable security hardening optimizations during lifting",
     )
+    parser.add_argument(
+        "--separate-stages",
+        action="store_true",
+        help="run each bitcode lift stage separately, writing the module to disk "
+        "after each stage",
+    )
+    parser.add_argument(
+        "--artifacts",
+        type=ArtifactPolicy,
+        choices=list(ArtifactPolicy),
+        default=ArtifactPolicy.NONE,
+        help="files to write for each module: only the bitcode that later stages "
+        "read (none), the intermediate bitcode (bitcode), or the bitcode, LLVM IR, and "
+        "MemorySSA dumps (all)",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        metavar="N",
+        help="split the lifted module into at most N partitions along call graph "
+        "boundaries and optimize them concurrently, modules with fewer than "
+        f"{PARTITION_MIN_FUNCTIONS} functions are optimized as a whole",
+    )
+    parser.add_argument(
+        "--codegen-partitions",
+        type=int,
+        default=1,
+        metavar="N",
+        help="split the recovered module into N partitions and generate code for them "
+        "concurrently, linking the N object files into the recovered binary",
+    )
+    parser.add_argument(
+        "--force-from",
+        metavar="STAGE",
+        choices=sorted(
+            {
+                stage.name
+                for separate in (False, True)
+                for stage in _lift_stages(OptimizationLevel.NORMAL, False, separate)
+            }
+        ),
+        help="run this lift stage and every stage after it, even if they are up to "
+        "date",
+    )
     parser.add_argument("project_name", help="lift and compile the binary trace")
 
     args = parser.parse_args()
@@ -655,7 +1421,16 @@ def main() -> None:
         logger.debug("Enabling extra performance optimizations during lifting")
         opt_level = OptimizationLevel.HIGH
 
-    lift_trace(args.project_name, opt_level, args.harden)
+    lift_trace(
+        args.project_name,
+        opt_level,
+        args.harden,
+        force_from=args.force_from,
+        separate_stages=args.separate_stages,
+        artifacts=args.artifacts,
+        partitions=args.partitions,
+        codegen_partitions=args.codegen_partitions,
+    )
     sys.exit(0)
 
 
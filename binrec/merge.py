@@ -1,19 +1,140 @@
+import json
 import logging
 import os
 import shutil
 import subprocess
 import tempfile
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import ExitStack, suppress
+from dataclasses import asdict, dataclass, fields
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
-from .env import BINREC_BIN, get_trace_dirs, llvm_command, merged_trace_dir
+from .artifacts import ArtifactPolicy
+from .cache import ContentCache, binrec_lift_build_id, hash_file
+from .core import span
+from .env import (
+    BINREC_BIN,
+    get_trace_dirs,
+    llvm_command,
+    merged_trace_dir,
+    project_cache_dir,
+    rescan_trace_manifest,
+)
 from .errors import BinRecError
+from .lib import binrec_lift, convert_lib_error
 from .lift import prep_bitcode_for_linkage
+from .tasks import TaskGraph, process_pool
 
 logger = logging.getLogger("binrec.merge")
 
+SOURCE_BITCODE_NAME = "captured"
+DESTINATION_SUFFIX = "-link-ready"
+BITCODE_SUFFIX = ".bc"
+TRACE_INFO_NAME = "traceInfo"
+TRACE_SUFFIX = ".json"
 
-def _link_bitcode(base: Path, source: Path, destination: Path):
+#: The filename, within the merged trace directory, that records the merged captures
+MERGE_MANIFEST_NAME = "merge-manifest.json"
+
+#: The filename, within the merged trace directory, of the deduplication report
+DEDUP_REPORT_NAME = "dedup-report.json"
+
+#: The temporary directory of the current link prep worker process
+_prep_worker_temp_dir: Optional[Path] = None
+
+
+def _init_prep_worker(temp_root: Path) -> None:
+    """
+    Initialize a link prep worker process. Each worker gets its own temporary
+    directory, within ``temp_root``, for the intermediate link prep files.
+
+    :param temp_root: parent directory for the worker temporary directories
+    """
+    global _prep_worker_temp_dir
+    _prep_worker_temp_dir = Path(tempfile.mkdtemp(prefix="prep-", dir=temp_root))
+
+
+def _prep_capture(
+    working_dir: Path,
+    source: Path,
+    destination: Path,
+    cache: Optional[ContentCache] = None,
+) -> Path:
+    """
+    Prepare a single capture for linking. When a cache is provided, the link-ready
+    bitcode is retrieved from the cache if the captured bitcode and its trace info
+    have been prepared before and is added to the cache otherwise, see
+    :func:`_link_ready_key`.
+
+    :param working_dir: S2E capture directory
+    :param source: the captured bitcode filename
+    :param destination: the link-ready bitcode filename
+    :param cache: link-ready bitcode cache
+    :returns: the path to the link-ready bitcode
+    """
+    linked = working_dir / destination
+    key = _link_ready_key(cache, working_dir, source) if cache else None
+    if cache and key and cache.get(key, linked):
+        logger.debug("using cached link-ready bitcode: %s", linked)
+        return linked
+
+    prep_bitcode_for_linkage(
+        working_dir, source, destination, temp_dir=_prep_worker_temp_dir
+    )
+
+    if cache and key:
+        cache.put(key, linked)
+
+    return linked
+
+
+def _capture_trace_info(working_dir: Path, source: Path) -> Path:
+    """
+    Get the trace info file that link prep reads for a capture. Numbered captures,
+    ``captured_<N>.bc``, have a correspondingly numbered trace info file,
+    ``traceInfo_<N>.json``. This mirrors the file name selection of the
+    ``RenameBlockFuncsPass`` binrec_lift pass.
+
+    :param working_dir: S2E capture directory
+    :param source: the captured bitcode filename
+    :returns: the trace info filename
+    """
+    name = source.name
+    pos = name.find("_")
+    suffix = name[pos : pos + 2] if pos >= 0 else ""
+    return working_dir / f"{TRACE_INFO_NAME}{suffix}{TRACE_SUFFIX}"
+
+
+def _link_ready_key(
+    cache: ContentCache, working_dir: Path, source: Path
+) -> Optional[str]:
+    """
+    Get the link-ready bitcode cache key of a capture, which covers the captured
+    bitcode, the content and name of the trace info file that link prep reads, and
+    the binrec_lift build, which is the cache namespace.
+
+    :param cache: link-ready bitcode cache
+    :param working_dir: S2E capture directory
+    :param source: the captured bitcode filename
+    :returns: the cache key, or ``None`` if the capture must not be cached because
+        the binrec_lift build is unknown or the trace info file does not exist
+    """
+    trace_info = _capture_trace_info(working_dir, source)
+    if not cache.namespace or not trace_info.is_file():
+        return None
+    return cache.key(working_dir / source, trace_info, salt=trace_info.name)
+
+
+def _link_bitcode(
+    base: Path, source: Path, destination: Path, logfile: Optional[Path] = None
+):
     """
     Link two LLVM bitcode captures.
 
@@ -21,14 +142,15 @@ def _link_bitcode(base: Path, source: Path, destination: Path):
         ``-override`` parameter)
     :param source: input bitcode file to link
     :param destination: output bitcode file
+    :param logfile: llvm-link log file, defaults to ``merge_link.log`` in the
+        destination's parent directory
     """
-    logfile = destination.parent / "merge_link.log"
+    logfile = logfile or destination.parent / "merge_link.log"
     logger.info("linking prepared bitcode: %s", source)
     try:
         subprocess.check_call(
             [
                 llvm_command("llvm-link"),
-                "-print-after-all",
                 "-v",
                 "-o",
                 str(destination),
@@ -42,6 +164,157 @@ def _link_bitcode(base: Path, source: Path, destination: Path):
         raise BinRecError(f"llvm-link failed on captured bitcode: {source}")
 
 
+def _link_many(inputs: List[Path], destination: Path) -> None:
+    """
+    Link multiple LLVM bitcode captures in memory and write the linked bitcode once.
+    Each input is linked with the accumulated module as the override base, which is
+    equivalent to chaining :func:`_link_bitcode` calls.
+
+    :param inputs: bitcode files to link, in order
+    :param destination: output bitcode file, which may also be one of the inputs
+    """
+    logger.info("linking %d prepared bitcode files: %s", len(inputs), destination)
+    try:
+        binrec_lift.link_many(
+            [str(filename) for filename in inputs], str(destination), override_base=True
+        )
+    except Exception as err:
+        raise convert_lib_error(err, f"failed to link captured bitcode: {destination}")
+
+
+@dataclass
+class DedupReport:
+    """
+    Statistics of the deduplication of captured block functions prior to linking.
+    """
+
+    #: the number of captures deduplicated
+    captures: int = 0
+    #: the number of captures that were not linked because all of their block
+    #: functions and other symbols were duplicates
+    skipped_captures: int = 0
+    #: the number of block functions defined by the captures
+    functions: int = 0
+    #: the number of duplicate block functions removed before linking
+    duplicate_functions: int = 0
+
+    def __add__(self, other: "DedupReport") -> "DedupReport":
+        return DedupReport(
+            **{
+                field.name: getattr(self, field.name) + getattr(other, field.name)
+                for field in fields(self)
+            }
+        )
+
+
+class _CaptureDeduplicator:
+    """
+    Removes lifted block functions that are identical to a block function of an
+    earlier capture in the link order. Symbolic traces produce one capture per S2E
+    state and the states share most of their translated blocks.
+
+    The linker keeps the earliest definition of a block function, so removing the
+    duplicate definitions does not change the linked module. A capture is skipped
+    only when its block functions are all duplicates and its other globals and named
+    metadata are identical to ones already linked. Captures must be deduplicated in
+    link order.
+    """
+
+    def __init__(self, temp_dir: Path):
+        """
+        :param temp_dir: directory for the deduplicated bitcode files
+        """
+        self.temp_dir = temp_dir
+        self.report = DedupReport()
+        self._seen: Dict[str, str] = {}
+        self._seen_globals: Dict[str, str] = {}
+        self._kept = 0
+
+    def _fingerprint(self, filename: Path) -> Dict[str, str]:
+        try:
+            return binrec_lift.function_fingerprints(str(filename))
+        except Exception as err:
+            raise convert_lib_error(err, f"failed to fingerprint bitcode: {filename}")
+
+    def _fingerprint_globals(self, filename: Path) -> Dict[str, str]:
+        try:
+            return binrec_lift.global_fingerprints(str(filename))
+        except Exception as err:
+            raise convert_lib_error(err, f"failed to fingerprint bitcode: {filename}")
+
+    def add_base(self, base: Path) -> None:
+        """
+        Record the block functions and globals of an existing linked module that the
+        captures will be linked into.
+
+        :param base: the linked bitcode file
+        """
+        for name, digest in self._fingerprint(base).items():
+            self._seen.setdefault(name, digest)
+        for name, digest in self._fingerprint_globals(base).items():
+            self._seen_globals.setdefault(name, digest)
+        self._kept += 1
+
+    def dedup(self, linked_path: Path) -> Optional[Path]:
+        """
+        Remove the duplicate block functions from a prepared capture.
+
+        :param linked_path: the prepared capture
+        :returns: the bitcode file to link, which is ``linked_path`` when the capture
+            has no duplicates, or ``None`` if the capture adds nothing new
+        """
+        fingerprints = self._fingerprint(linked_path)
+        duplicates = [
+            name
+            for name, digest in fingerprints.items()
+            if self._seen.get(name) == digest
+        ]
+        globals_fingerprints = self._fingerprint_globals(linked_path)
+        new_globals = any(
+            self._seen_globals.get(name) != digest
+            for name, digest in globals_fingerprints.items()
+        )
+        for name, digest in fingerprints.items():
+            self._seen.setdefault(name, digest)
+        for name, digest in globals_fingerprints.items():
+            self._seen_globals.setdefault(name, digest)
+
+        index = self.report.captures
+        self.report.captures += 1
+        self.report.functions += len(fingerprints)
+        self.report.duplicate_functions += len(duplicates)
+
+        if self._kept and len(duplicates) == len(fingerprints) and not new_globals:
+            logger.debug("skipping capture with no new symbols: %s", linked_path)
+            self.report.skipped_captures += 1
+            return None
+
+        self._kept += 1
+        if not duplicates:
+            return linked_path
+
+        logger.debug(
+            "removing %d duplicate blocks from capture: %s",
+            len(duplicates),
+            linked_path,
+        )
+        deduped = self.temp_dir / f"dedup-{index}{BITCODE_SUFFIX}"
+        try:
+            binrec_lift.drop_functions(str(linked_path), str(deduped), duplicates)
+        except Exception as err:
+            raise convert_lib_error(
+                err, f"failed to remove duplicate blocks from bitcode: {linked_path}"
+            )
+        return deduped
+
+    def dedup_future(self, future: "Future[Path]") -> Optional[Path]:
+        """
+        Wait for a capture to be prepared and then deduplicate it, see
+        :meth:`dedup`.
+        """
+        return self.dedup(future.result())
+
+
 def _merge_trace_info(trace_info_files: List[Path], destination: Path) -> None:
     """
     Merge binrec trace information files, ``traceInfo.json``.
@@ -58,42 +331,135 @@ def _merge_trace_info(trace_info_files: List[Path], destination: Path) -> None:
         raise BinRecError(f"binrec_tracemerge failed on trace info: {destination}")
 
 
-def merge_bitcode(capture_dirs: List[Path], destination: Path) -> None:
+def _link_pair(base: Path, source: Path, destination: Path, logfile: Path) -> Path:
     """
-    Perform the actual merging of multiple trace captures or merged captures into a
-    single LLVM bitcode and disassembly. This method performs the following:
+    Link two prepared captures within the link tree.
 
-    - Recursively delete and then recreate the ``destination``
-    - Prepares each captured bitcode, ``captured.bc``, for linkage
-    - Links all the preparsed captured bitcode into a single bitcode file,
-      ``{destination}/captured.bc``
-    - Disassembles the liked capture bitcode to LLVM assembly code,
-      ``{destination}/captured.ll``
-    - Merges all the trace information JSON files to a single trace info,
-      ``{destination}/traceInfo.json``
+    :returns: the path to the linked bitcode, ``destination``
+    """
+    _link_bitcode(base=base, source=source, destination=destination, logfile=logfile)
+    return destination
 
-    :param capture_dirs: list of trace capture directories or merged captures
-    :param outdidestindestinationationr: output directory
+
+def _link_bitcode_tree(
+    linked_paths: Sequence[Union[Path, Future]], outfile: Path, jobs: int
+) -> None:
     """
-    logger.debug("merging captures %s to %s", capture_dirs, destination)
-    SOURCE_BITCODE_NAME = "captured"
-    DESTINATION_SUFFIX = "-link-ready"
-    BITCODE_SUFFIX = ".bc"
-    TRACE_INFO_NAME = "traceInfo"
-    TRACE_SUFFIX = ".json"
+    Link prepared captures pairwise in a balanced tree. Adjacent pairs of modules are
+    linked concurrently, with the left (earlier) module as the ``-override`` base, so
+    that the result is identical to linking every capture into the first one
+    sequentially. A merge of ``N`` captures completes in ``ceil(log2(N))`` rounds.
 
-    # Verify that the output directory (destination) is empty.
-    if destination.exists():
-        shutil.rmtree(destination)
+    Captures can be provided as futures that resolve to the prepared capture path. A
+    pair is linked as soon as both of its modules are ready, so linking overlaps with
+    capture preparation. Every failed capture is reported before an error is raised.
+    A future that resolves to ``None`` is a capture that is skipped.
 
-    destination.mkdir(exist_ok=True)
+    :param linked_paths: prepared captures, or futures of prepared captures, in link
+        order
+    :param outfile: output bitcode file
+    :param jobs: maximum number of concurrent llvm-link processes
+    :raises BinRecError: there are no captures, or a capture could not be prepared
+        or linked
+    """
+    if not linked_paths:
+        raise BinRecError(f"no traces to merge: no captures to link into {outfile}")
 
-    # Check each capture folder for captured bitcode files and prepare each for linking
-    # There may be multiple files per capture: symex tracing produces one file per state
-    linked_paths = []
+    logfile = outfile.parent / "merge_link.log"
+
+    # the number of modules at each level of the tree
+    level_sizes = [len(linked_paths)]
+    while level_sizes[-1] > 1:
+        level_sizes.append((level_sizes[-1] + 1) // 2)
+
+    ready: Dict[Tuple[int, int], Optional[Path]] = {}
+    pending: Dict[Future, Tuple[int, int]] = {}
+    failures: List[str] = []
+    result: Optional[Path] = None
+
+    with tempfile.TemporaryDirectory(dir=outfile.parent) as tmpdir, ThreadPoolExecutor(
+        max_workers=jobs
+    ) as pool:
+
+        def module_ready(level: int, index: int, path: Optional[Path]) -> None:
+            nonlocal result
+            if level_sizes[level] == 1:
+                result = path
+                return
+
+            if index == level_sizes[level] - 1 and index % 2 == 0:
+                # odd module out is promoted to the next level as-is
+                module_ready(level + 1, index // 2, path)
+                return
+
+            if (level, index ^ 1) not in ready:
+                ready[(level, index)] = path
+                return
+
+            sibling = ready.pop((level, index ^ 1))
+            base, source = (path, sibling) if index % 2 == 0 else (sibling, path)
+            if base is None or source is None:
+                # a skipped capture, the other module is promoted as-is
+                module_ready(level + 1, index // 2, base or source)
+                return
+
+            linked = Path(tmpdir) / f"level-{level + 1}-{index // 2}.bc"
+            logger.debug("linking level %d: %s + %s", level + 1, base, source)
+            future = pool.submit(_link_pair, base, source, linked, logfile)
+            pending[future] = (level + 1, index // 2)
+
+        for index, item in enumerate(linked_paths):
+            if isinstance(item, Future):
+                pending[item] = (0, index)
+            else:
+                module_ready(0, index, item)
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                level, index = pending.pop(future)
+                try:
+                    path = future.result()
+                except BinRecError as err:
+                    if level:
+                        raise
+
+                    logger.error("failed to prepare capture for linking: %s", err)
+                    failures.append(str(err))
+                    continue
+
+                module_ready(level, index, path)
+
+        if failures:
+            raise BinRecError(
+                f"failed to prepare {len(failures)} of {len(linked_paths)} captures "
+                "for linking: " + "; ".join(failures)
+            )
+
+        assert result is not None
+        if result != outfile:
+            shutil.copy(result, outfile)
+
+
+def _find_captures(
+    capture_dirs: List[Path],
+) -> Tuple[List[Tuple[Path, Path, Path]], List[Path]]:
+    """
+    Find the captured bitcode and trace info files within capture directories. There
+    may be multiple files per capture: symex tracing produces one file per state.
+
+    :param capture_dirs: list of trace capture directories or merged captures
+    :returns: a tuple of ``(captures, trace_info_files)``, where each capture is a
+        tuple of ``(capture_dir, captured_bitcode, link_ready_bitcode)``
+    """
+    captures: List[Tuple[Path, Path, Path]] = []
     trace_info_files = []
     for capture in capture_dirs:
         for capfile in os.listdir(capture):
+            if capfile.endswith(DESTINATION_SUFFIX + BITCODE_SUFFIX):
+                # prepared bitcode left over from a previous merge
+                continue
+
             if capfile.startswith(SOURCE_BITCODE_NAME) and capfile.endswith(
                 BITCODE_SUFFIX
             ):
@@ -102,28 +468,134 @@ def merge_bitcode(capture_dirs: List[Path], destination: Path) -> None:
                     + DESTINATION_SUFFIX
                     + BITCODE_SUFFIX
                 )
-                linked_paths.append(capture / linked_name)
-                prep_bitcode_for_linkage(capture, Path(capfile), Path(linked_name))
+                captures.append((capture, Path(capfile), Path(linked_name)))
 
             elif capfile.startswith(TRACE_INFO_NAME) and capfile.endswith(TRACE_SUFFIX):
                 trace_info_files.append(capture / capfile)
 
-    # copy the first captured-link-ready.bc to {destination}/captured.bc
-    outfile = destination / (SOURCE_BITCODE_NAME + BITCODE_SUFFIX)
-    shutil.copy(linked_paths[0], outfile)
+    return captures, trace_info_files
 
-    fd, tmp = tempfile.mkstemp(suffix=BITCODE_SUFFIX)
-    os.close(fd)
 
-    for linked_path in linked_paths[1:]:
-        # Link each captured-link-ready.bc to the {destination}/captured.bc
-        _link_bitcode(
-            base=outfile,
-            source=linked_path,
-            destination=Path(tmp),
+def _link_captures(
+    captures: List[Tuple[Path, Path, Path]],
+    outfile: Path,
+    jobs: int,
+    cache: Optional[ContentCache],
+    base: Optional[Path] = None,
+    dedup: bool = True,
+) -> Optional[DedupReport]:
+    """
+    Prepare and link captures into a single bitcode file.
+
+    :param captures: the captures to link, see :func:`_find_captures`
+    :param outfile: the output bitcode file
+    :param jobs: maximum number of concurrent link prep and link operations
+    :param cache: link-ready bitcode cache
+    :param base: an existing linked bitcode file to link the captures into
+    :param dedup: remove duplicate block functions before linking, see
+        :class:`_CaptureDeduplicator`
+    :returns: the deduplication report, or ``None`` if ``dedup`` is ``False``
+    :raises BinRecError: there are no captures and no ``base`` to link
+    """
+    if not captures and not base:
+        raise BinRecError(
+            f"no traces to merge: no captured bitcode found for {outfile}"
         )
-        shutil.move(tmp, outfile)
 
+    deduplicator = None
+    with ExitStack() as stack:
+        if dedup:
+            dedup_dir = stack.enter_context(
+                tempfile.TemporaryDirectory(dir=outfile.parent)
+            )
+            deduplicator = _CaptureDeduplicator(Path(dedup_dir))
+            if base:
+                deduplicator.add_base(base)
+
+        if jobs > 1:
+            _link_captures_tree(captures, outfile, jobs, cache, base, deduplicator)
+        else:
+            linked_paths: List[Optional[Path]] = [
+                _prep_capture(capture, source, linked, cache)
+                for capture, source, linked in captures
+            ]
+            if deduplicator:
+                linked_paths = [
+                    deduplicator.dedup(linked_path)
+                    for linked_path in linked_paths
+                    if linked_path
+                ]
+
+            inputs = ([base] if base else []) + [
+                linked_path for linked_path in linked_paths if linked_path
+            ]
+            if len(inputs) == 1:
+                if inputs[0] != outfile:
+                    # copy the only captured-link-ready.bc to {destination}/captured.bc
+                    shutil.copy(inputs[0], outfile)
+            else:
+                _link_many(inputs, outfile)
+
+    if not deduplicator:
+        return None
+
+    report = deduplicator.report
+    logger.info(
+        "removed %d of %d duplicate blocks and skipped %d of %d captures",
+        report.duplicate_functions,
+        report.functions,
+        report.skipped_captures,
+        report.captures,
+    )
+    return report
+
+
+def _link_captures_tree(
+    captures: List[Tuple[Path, Path, Path]],
+    outfile: Path,
+    jobs: int,
+    cache: Optional[ContentCache],
+    base: Optional[Path],
+    deduplicator: Optional[_CaptureDeduplicator],
+) -> None:
+    """
+    Prepare captures in worker processes and link them in a parallel tree as they
+    become ready, see :func:`_link_bitcode_tree`. When deduplicating, each prepared
+    capture is deduplicated in link order by a single worker thread.
+    """
+    with tempfile.TemporaryDirectory() as prep_root, process_pool(
+        max_workers=jobs,
+        initializer=_init_prep_worker,
+        initargs=(Path(prep_root),),
+    ) as prep_pool, ThreadPoolExecutor(max_workers=1) as dedup_pool:
+        prepared: List[Union[Path, Future]] = [base] if base else []
+        futures: List[Future] = []
+        for capture, source, linked in captures:
+            prep_future = prep_pool.submit(
+                _prep_capture, capture, source, linked, cache
+            )
+            futures.append(prep_future)
+            if deduplicator:
+                dedup_future = dedup_pool.submit(deduplicator.dedup_future, prep_future)
+                futures.append(dedup_future)
+                prepared.append(dedup_future)
+            else:
+                prepared.append(prep_future)
+
+        try:
+            _link_bitcode_tree(prepared, outfile, jobs)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _disassemble_bitcode(outfile: Path) -> None:
+    """
+    Disassemble the linked bitcode to LLVM assembly code.
+
+    :param outfile: the linked bitcode
+    """
     logger.debug("disassembling linked bitcode: %s", outfile)
 
     try:
@@ -131,11 +603,321 @@ def merge_bitcode(capture_dirs: List[Path], destination: Path) -> None:
     except subprocess.CalledProcessError:
         raise BinRecError(f"llvm-dis failed on linked bitcode: {outfile}")
 
-    # merge all found trace info files
-    _merge_trace_info(trace_info_files, destination / (TRACE_INFO_NAME + TRACE_SUFFIX))
 
+def _fingerprint_captures(capture_dirs: List[Path]) -> Dict[str, Dict[str, str]]:
+    """
+    Hash the merge inputs (captured bitcode and trace info) of each capture directory.
+
+    :param capture_dirs: list of trace capture directories or merged captures
+    :returns: a dictionary of ``{capture_dir: {filename: hash}}``
+    """
+    captures, trace_info_files = _find_captures(capture_dirs)
+    fingerprints: Dict[str, Dict[str, str]] = {
+        str(capture): {} for capture in capture_dirs
+    }
+    inputs = [capture / source for capture, source, _ in captures] + trace_info_files
+    for filename in inputs:
+        fingerprints[str(filename.parent)][filename.name] = hash_file(filename)
+
+    return fingerprints
+
+
+def _write_merge_manifest(
+    destination: Path, fingerprints: Dict[str, Dict[str, str]]
+) -> None:
+    """
+    Record the capture directories, and their content hashes, that have been merged
+    into the destination.
+
+    :param destination: the merged trace directory
+    :param fingerprints: the merged capture fingerprints, see
+        :func:`_fingerprint_captures`
+    """
+    manifest = {"build_id": binrec_lift_build_id(), "captures": fingerprints}
+    (destination / MERGE_MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+
+def _write_dedup_report(destination: Path, report: Optional[DedupReport]) -> None:
+    """
+    Write the deduplication report of a merge, if captures were deduplicated.
+
+    :param destination: the merged trace directory
+    :param report: the deduplication report
+    """
+    if report:
+        (destination / DEDUP_REPORT_NAME).write_text(
+            json.dumps(asdict(report), indent=2)
+        )
+
+
+def _read_dedup_report(destination: Path) -> Optional[DedupReport]:
+    """
+    :param destination: the merged trace directory
+    :returns: the deduplication report of the previous merge, or ``None`` if it does
+        not exist or is invalid
+    """
+    try:
+        return DedupReport(**json.loads((destination / DEDUP_REPORT_NAME).read_text()))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError):
+        logger.warning("ignoring invalid deduplication report in %s", destination)
+        return None
+
+
+def _get_incremental_captures(
+    destination: Path, fingerprints: Dict[str, Dict[str, str]]
+) -> Optional[List[Path]]:
+    """
+    Determine which capture directories need to be merged into an existing merged
+    trace. An incremental merge is only possible when every previously merged capture
+    is still present and unchanged.
+
+    :param destination: the merged trace directory
+    :param fingerprints: the current capture fingerprints, see
+        :func:`_fingerprint_captures`
+    :returns: the list of new capture directories, or ``None`` if a full merge is
+        required
+    """
+    manifest_path = destination / MERGE_MANIFEST_NAME
+    outputs = [
+        destination / (SOURCE_BITCODE_NAME + BITCODE_SUFFIX),
+        destination / (TRACE_INFO_NAME + TRACE_SUFFIX),
+    ]
+    if not manifest_path.is_file() or not all(path.is_file() for path in outputs):
+        logger.info("no existing merge found, performing a full merge")
+        return None
+
+    try:
+        manifest = json.loads(manifest_path.read_text())
+        merged = manifest["captures"]
+        build_id = manifest["build_id"]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("invalid merge manifest, performing a full merge")
+        return None
+
+    if build_id != binrec_lift_build_id():
+        logger.info("binrec_lift has changed, performing a full merge")
+        return None
+
+    for capture, hashes in merged.items():
+        if capture not in fingerprints:
+            logger.info("capture was removed, performing a full merge: %s", capture)
+            return None
+        if fingerprints[capture] != hashes:
+            logger.info("capture has changed, performing a full merge: %s", capture)
+            return None
+
+    return [Path(capture) for capture in fingerprints if capture not in merged]
+
+
+def merge_bitcode(
+    capture_dirs: List[Path],
+    destination: Path,
+    jobs: int = 1,
+    cache: Optional[ContentCache] = None,
+    incremental: bool = False,
+    dedup: bool = True,
+    artifacts: ArtifactPolicy = ArtifactPolicy.NONE,
+) -> None:
+    """
+    Perform the actual merging of multiple trace captures or merged captures into a
+    single LLVM bitcode and disassembly. This method performs the following:
+
+    - Recursively delete and then recreate the ``destination``
+    - Prepares each captured bitcode, ``captured.bc``, for linkage
+    - Removes block functions that are identical to a block function of an earlier
+      capture and skips captures that only contain duplicates. The results are
+      written to ``{destination}/dedup-report.json``
+    - Links all the preparsed captured bitcode into a single bitcode file,
+      ``{destination}/captured.bc``
+    - Disassembles the liked capture bitcode to LLVM assembly code,
+      ``{destination}/captured.ll``, when ``artifacts`` is ``ALL``
+    - Merges all the trace information JSON files to a single trace info,
+      ``{destination}/traceInfo.json``, concurrently with the bitcode linking and
+      disassembly
+    - Records the merged capture directories and their content hashes in
+      ``{destination}/merge-manifest.json``
+
+    When ``jobs`` is greater than one, captures are prepared concurrently in ``jobs``
+    worker processes and the prepared captures are linked pairwise in a balanced tree
+    (see :func:`_link_bitcode_tree`), starting as soon as the first prepared captures
+    are ready, instead of sequentially folding each capture into the accumulated
+    module.
+
+    When ``incremental`` is ``True`` and the ``destination`` contains a previous merge
+    of a subset of the captures, only the new captures are linked into the existing
+    ``captured.bc`` and merged into the existing ``traceInfo.json``. A full merge is
+    performed if any previously merged capture was removed or has changed, or if a
+    previous incremental merge failed (see :func:`_merge_new_captures`).
+
+    :param capture_dirs: list of trace capture directories or merged captures
+    :param destination: output directory
+    :param jobs: maximum number of concurrent link prep and link operations
+    :param cache: link-ready bitcode cache, used to skip preparing captures that have
+        already been prepared by a previous merge
+    :param incremental: only merge captures that are not already merged into the
+        destination
+    :param dedup: remove duplicate block functions prior to linking
+    :param artifacts: the files to write, the captured LLVM IR is only written when
+        ``ALL``
+    """
+    logger.debug("merging captures %s to %s", capture_dirs, destination)
+    fingerprints = _fingerprint_captures(capture_dirs)
+
+    new_captures = None
+    if incremental:
+        new_captures = _get_incremental_captures(destination, fingerprints)
+
+    if new_captures is not None:
+        if not new_captures:
+            logger.info("merged trace is up to date: %s", destination)
+            return
+
+        logger.info("merging %d new captures into %s", len(new_captures), destination)
+        capture_dirs = new_captures
+    else:
+        # Verify that the output directory (destination) is empty.
+        if destination.exists():
+            shutil.rmtree(destination)
+
+        destination.mkdir(exist_ok=True)
+
+    # Check each capture folder for captured bitcode files and prepare each for linking
+    captures, trace_info_files = _find_captures(capture_dirs)
+    if new_captures is None:
+        _merge_captures(
+            captures, trace_info_files, destination, jobs, cache, dedup, artifacts
+        )
+    else:
+        _merge_new_captures(
+            captures, trace_info_files, destination, jobs, cache, dedup, artifacts
+        )
+
+    _write_merge_manifest(destination, fingerprints)
+
+
+def _merge_captures(
+    captures: List[Tuple[Path, Path, Path]],
+    trace_info_files: List[Path],
+    destination: Path,
+    jobs: int,
+    cache: Optional[ContentCache],
+    dedup: bool,
+    artifacts: ArtifactPolicy,
+) -> None:
+    """
+    Link the captures into ``captured.bc`` and merge their trace info into
+    ``traceInfo.json`` within an empty destination, see :func:`merge_bitcode`.
+    """
+    outfile = destination / (SOURCE_BITCODE_NAME + BITCODE_SUFFIX)
+    trace_info = destination / (TRACE_INFO_NAME + TRACE_SUFFIX)
+
+    def link() -> None:
+        report = _link_captures(captures, outfile, jobs, cache, dedup=dedup)
+        _write_dedup_report(destination, report)
+
+    # Trace info merging does not depend on the bitcode and runs alongside it
+    graph = TaskGraph("merge")
+    graph.add("link", link)
+    if artifacts == ArtifactPolicy.ALL:
+        graph.add("disassemble", partial(_disassemble_bitcode, outfile), ["link"])
+    graph.add("trace-info", partial(_merge_trace_info, trace_info_files, trace_info))
+    graph.run()
+
+
+def _merge_new_captures(
+    captures: List[Tuple[Path, Path, Path]],
+    trace_info_files: List[Path],
+    destination: Path,
+    jobs: int,
+    cache: Optional[ContentCache],
+    dedup: bool,
+    artifacts: ArtifactPolicy,
+) -> None:
+    """
+    Link new captures into the existing ``captured.bc`` and merge their trace info
+    into the existing ``traceInfo.json`` of an incremental merge, see
+    :func:`merge_bitcode`.
+
+    The merge manifest is deleted first and both outputs are written to temporary
+    files that replace the existing outputs only once both are written, so that an
+    interrupted or failed merge never leaves outputs that the manifest does not
+    describe, and the next incremental merge performs a full merge.
+
+    The deduplication counts of the new captures are added to the report of the
+    previous merge. The report is removed when the previous merge, or this one, did
+    not deduplicate, since it would not cover every merged capture.
+    """
+    outfile = destination / (SOURCE_BITCODE_NAME + BITCODE_SUFFIX)
+    trace_info = destination / (TRACE_INFO_NAME + TRACE_SUFFIX)
+    previous_report = _read_dedup_report(destination)
+    (destination / MERGE_MANIFEST_NAME).unlink()
+
+    temp_files = []
+    for suffix in (BITCODE_SUFFIX, TRACE_SUFFIX):
+        fd, tmp = tempfile.mkstemp(suffix=suffix, dir=destination)
+        os.close(fd)
+        temp_files.append(Path(tmp))
+    linked, merged_info = temp_files
 
-def merge_traces(project_name: str) -> None:
+    report: Optional[DedupReport] = None
+
+    def link() -> None:
+        nonlocal report
+        report = _link_captures(
+            captures, linked, jobs, cache, base=outfile, dedup=dedup
+        )
+
+    try:
+        # Trace info merging does not depend on the bitcode and runs alongside it
+        graph = TaskGraph("merge")
+        graph.add("link", link)
+        graph.add(
+            "trace-info",
+            partial(_merge_trace_info, [trace_info] + trace_info_files, merged_info),
+        )
+        graph.run()
+
+        os.replace(linked, outfile)
+        os.replace(merged_info, trace_info)
+        if report and previous_report:
+            _write_dedup_report(destination, previous_report + report)
+        else:
+            with suppress(FileNotFoundError):
+                (destination / DEDUP_REPORT_NAME).unlink()
+    finally:
+        for filename in temp_files:
+            with suppress(FileNotFoundError):
+                filename.unlink()
+
+    if artifacts == ArtifactPolicy.ALL:
+        _disassemble_bitcode(outfile)
+
+
+def _link_ready_cache(project_name: str) -> Optional[ContentCache]:
+    """
+    :returns: the project's link-ready bitcode cache, or ``None`` if the binrec_lift
+        build could not be identified
+    """
+    build_id = binrec_lift_build_id()
+    if not build_id:
+        logger.warning("unable to identify binrec_lift build, not caching link prep")
+        return None
+
+    return ContentCache(
+        project_cache_dir(project_name) / "link-ready", namespace=build_id
+    )
+
+
+def merge_traces(
+    project_name: str,
+    jobs: int = 1,
+    use_cache: bool = True,
+    incremental: bool = False,
+    dedup: bool = True,
+    artifacts: ArtifactPolicy = ArtifactPolicy.NONE,
+) -> None:
     """
     Merge multiple traces into a single trace.
 
@@ -146,8 +928,21 @@ def merge_traces(project_name: str) -> None:
     This was originally named "merge_all_inputs" bash function.
 
     :param project_name: the name of the project to merge
+    :param jobs: maximum number of concurrent link operations
+    :param use_cache: reuse link-ready bitcode from previous merges of unchanged
+        captures
+    :param incremental: only merge new traces into the existing merged trace, see
+        :func:`merge_bitcode`
+    :param dedup: remove duplicate block functions prior to linking
+    :param artifacts: the files to write, see :func:`merge_bitcode`
     """
     trace_dirs = get_trace_dirs(project_name)
+    if any(not trace_dir.is_dir() for trace_dir in trace_dirs):
+        # a recorded trace was deleted, the captures are read from each trace
+        # directory anyway so checking them here is cheap
+        logger.warning("rescanning out of date trace manifest: %s", project_name)
+        rescan_trace_manifest(project_name)
+        trace_dirs = get_trace_dirs(project_name)
     outdir = merged_trace_dir(project_name)
 
     if not trace_dirs:
@@ -155,8 +950,18 @@ def merge_traces(project_name: str) -> None:
             f"nothing to merge: no captures found for binary: {project_name}"
         )
 
-    merge_bitcode(trace_dirs, outdir)
-    shutil.copy2(trace_dirs[0] / "binary", outdir / "binary")
+    with span("merge", project_name, [outdir]):
+        cache = _link_ready_cache(project_name) if use_cache else None
+        merge_bitcode(
+            trace_dirs,
+            outdir,
+            jobs=jobs,
+            cache=cache,
+            incremental=incremental,
+            dedup=dedup,
+            artifacts=artifacts,
+        )
+        shutil.copy2(trace_dirs[0] / "binary", outdir / "binary")
 
 
 def main() -> None:
@@ -171,6 +976,36 @@ def main() -> None:
     parser.add_argument(
         "-v", "--verbose", action="count", help="enable verbose logging"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="link captures in a parallel tree using up to JOBS concurrent links",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not reuse link-ready bitcode from previous merges",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="only merge new traces into the existing merged trace",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="link every captured block, including duplicates of earlier captures",
+    )
+    parser.add_argument(
+        "--artifacts",
+        type=ArtifactPolicy,
+        choices=list(ArtifactPolicy),
+        default=ArtifactPolicy.NONE,
+        help="write the LLVM IR of the merged bitcode, captured.ll, when 'all'",
+    )
     parser.add_argument("project_name", help="Name of analysis project")
 
     args = parser.parse_args()
@@ -182,7 +1017,14 @@ def main() -> None:
 
             enable_python_audit_log()
 
-    merge_traces(args.project_name)
+    merge_traces(
+        args.project_name,
+        jobs=args.jobs,
+        use_cache=not args.no_cache,
+        incremental=args.incremental,
+        dedup=not args.no_dedup,
+        artifacts=args.artifacts,
+    )
 
     sys.exit(0)
 
@@ -1,16 +1,30 @@
+import base64
 import errno
+import hashlib
 import json
 import logging
 import os
 import re
 import shutil
+import signal
+import statistics
 import subprocess
+import sys
+import tempfile
 import textwrap
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import List, Tuple, Union
+from queue import Queue
+from threading import Lock, Thread
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Set, Tuple, Union
 
 from binrec.campaign import (
     Campaign,
+    CampaignJsonEncoder,
     TraceArg,
     TraceArgType,
     TraceInputFile,
@@ -18,19 +32,94 @@ from binrec.campaign import (
     patch_s2e_project,
 )
 
+from .cache import ContentCache, hash_file
+from .core import span
 from .env import (
     INPUT_FILES_DIRNAME,
+    SPANS_FILENAME,
+    TRACE_CONFIG_FILENAME,
+    TRACE_MANIFEST_FILENAME,
+    TRACE_MANIFEST_LOCK_FILENAME,
+    TRACE_STATUS_COMPLETED,
+    TRACE_STATUS_FAILED,
     campaign_filename,
-    get_trace_dirs,
     input_files_dir,
+    load_trace_manifest,
     merged_trace_dir,
+    next_trace_id,
+    project_cache_dir,
     project_dir,
+    record_trace,
+    rescan_trace_manifest,
     s2e_config_filename,
+    trace_manifest_filename,
+    trace_manifest_lock,
 )
 from .errors import BinRecError
+from .tasks import TaskGraph
 
 logger = logging.getLogger("binrec.project")
 
+#: Suffix of the S2E project copies that the traces of a campaign run in when they run
+#: concurrently, which are hidden directories named ``".<project>-job<N>-<random>"``
+#: (see :func:`_clone_project_workspace`)
+WORKSPACE_SUFFIX = "-job"
+
+#: Name of the file that marks a directory as a project workspace created by binrec,
+#: which contains the name of the project the workspace is a copy of
+WORKSPACE_MARKER_FILENAME = ".binrec-workspace"
+
+#: Project files and directories that hold the state of the project's traces, which are
+#: not copied to a workspace
+_WORKSPACE_EXCLUDE = {
+    INPUT_FILES_DIRNAME,
+    TRACE_CONFIG_FILENAME,
+    TRACE_MANIFEST_FILENAME,
+    TRACE_MANIFEST_LOCK_FILENAME,
+    SPANS_FILENAME,
+    "campaign.json",
+    "s2e-last",
+    "s2e-out",
+    ".binrec-cache",
+}
+
+#: Prefix of the scratch directories, within the merged trace directory, that the
+#: original and recovered binaries run in during validation
+VALIDATION_DIR_PREFIX = "validate-"
+
+#: Name that the original and recovered binaries are linked to, and executed as,
+#: during validation
+VALIDATION_TARGET = "test-target"
+
+#: Size, in bytes, of the blocks that the stdout and stderr content of the original
+#: and recovered binaries is compared in during validation
+VALIDATION_BLOCK_SIZE = 64 * 1024
+
+#: Number of the most recent content blocks of each binary that are kept to find the
+#: exact offset where the content diverges
+VALIDATION_WINDOW_BLOCKS = 16
+
+#: Number of bytes of each binary's content, from the offset where the content
+#: diverges, that are reported
+VALIDATION_CONTEXT = 32
+
+#: Maximum size, in bytes, of the recovered binary's stdout or stderr content that a
+#: ``match_stdout`` or ``match_stderr`` regex pattern is matched against
+VALIDATION_REGEX_LIMIT = 64 * 1024 * 1024
+
+#: Held while a validation binary process is reaped or signaled, so that a process is
+#: never signaled after it was reaped and its pid may have been reused
+_validation_reap_lock = Lock()
+
+#: The maximum size, in bytes, of the project validation result cache
+VALIDATION_CACHE_SIZE = 64 * 1024 * 1024
+
+#: Version of the cached validation results, which is mixed into the cache keys so
+#: that results stored in an older format are never used
+_VALIDATION_CACHE_VERSION = "validation-1"
+
+_VALIDATION_BINARIES = {"original": "binary", "recovered": "recovered"}
+
 
 def listing() -> List[str]:
     try:
@@ -219,18 +308,6 @@ def remove_trace_input_file(
     campaign.save()
 
 
-def _link_lifted_input_files(project_name: str) -> None:
-    """
-    Link the project's input files directory to the final lifted directory so that
-    comarpison between the original and the lifted binary can be performed.
-    """
-    source = input_files_dir(project_name)
-    dest = merged_trace_dir(project_name) / INPUT_FILES_DIRNAME
-
-    if source.is_dir() and not dest.is_dir():
-        dest.symlink_to(source)
-
-
 def _run_trace_setup(campaign: Campaign, trace: TraceParams, cwd: Path) -> None:
     """
     Run the trace setup actions for a given campaign and trace. If the trace does not
@@ -269,11 +346,18 @@ def _run_trace_teardown(campaign: Campaign, trace: TraceParams, cwd: Path) -> No
     logger.info("teardown actions completed")
 
 
-def run_campaign(project_or_campaign: Union[str, Campaign]) -> None:
+def run_campaign(project_or_campaign: Union[str, Campaign], jobs: int = 1) -> None:
     """
     Run an entire campaign and all traces.
 
+    When ``jobs`` is greater than one, up to ``jobs`` traces run concurrently, each
+    in its own copy of the S2E project (see :func:`_clone_project_workspace`), and
+    each trace directory is moved to the project, as ``s2e-out-<N>``, once its S2E
+    run completes. When a trace fails, the traces that are already running complete,
+    the traces that have not started are skipped, and the error is raised.
+
     :param project_or_campaign: the project name (``str``) or the campaign object to run
+    :param jobs: maximum number of traces to run concurrently
     """
     if isinstance(project_or_campaign, str):
         campaign = Campaign.load_project(project_or_campaign)
@@ -282,8 +366,12 @@ def run_campaign(project_or_campaign: Union[str, Campaign]) -> None:
     else:
         raise TypeError("expected project name (str) or campaign object")
 
-    for trace in campaign.traces:
-        _run_campaign_trace(campaign, trace)
+    with span("campaign", campaign.project):
+        if jobs > 1 and len(campaign.traces) > 1:
+            _run_campaign_concurrently(campaign, jobs)
+        else:
+            for trace in campaign.traces:
+                _run_campaign_trace(campaign, trace)
 
 
 def run_campaign_trace(project: str, trace_name_or_id: Union[int, str]) -> None:
@@ -316,43 +404,591 @@ def _run_campaign_trace(campaign: Campaign, trace: TraceParams) -> None:
         trace.name or "<anonymous trace>",
         logfile,
     )
-    try:
-        subprocess.check_call(
-            ["s2e", "run", "--no-tui", campaign.project],
-            stdout=logfile.open("w"),
-            stderr=subprocess.STDOUT,
+    previous = _get_last_trace_dir(campaign.project)
+    started = datetime.now()
+    with span(f"trace.{trace.name or 'anonymous'}", campaign.project) as record:
+        try:
+            subprocess.check_call(
+                ["s2e", "run", "--no-tui", campaign.project],
+                stdout=logfile.open("w"),
+                stderr=subprocess.STDOUT,
+            )
+        except subprocess.CalledProcessError:
+            _record_trace_run(campaign.project, previous, TRACE_STATUS_FAILED, started)
+            raise BinRecError(
+                f"s2e run failed for project: {campaign.project}, for more "
+                f"information view the log file at {logfile}"
+            )
+
+        trace_dir = _record_trace_run(
+            campaign.project, previous, TRACE_STATUS_COMPLETED, started
         )
-    except subprocess.CalledProcessError:
-        raise BinRecError(
-            f"s2e run failed for project: {campaign.project}, for more information "
-            f"view the log file at {logfile}"
+        if trace_dir:
+            record.add_artifacts([trace_dir])
+
+
+def _replace_project_path(content: str, source: Path, dest: Path) -> str:
+    """
+    Replace a project directory path within a project file. Only whole paths are
+    replaced: the source directory must be a token of its own, or followed by ``/``,
+    so that sibling paths that share the source directory as a prefix, such as
+    ``<source>bar``, are unchanged.
+
+    :param content: the file content
+    :param source: the project directory
+    :param dest: the replacement directory
+    :returns: the updated file content
+    """
+    path = re.escape(str(source))
+    pattern = rf"(?<![^\s\"'=:,;({{\[]){path}(?=[/\s\"'=:,;)}}\]]|$)"
+    return re.sub(pattern, lambda _: str(dest), content)
+
+
+def _clone_project_workspace(project: str, index: int) -> str:
+    """
+    Create a copy of a S2E project, a workspace, that a trace can run in while other
+    traces of the project run in other workspaces. Each workspace has its own trace
+    config script, input files directory, and S2E output directories. The project
+    files are copied, replacing the project directory with the workspace directory
+    so that the S2E configuration references the workspace, and the project
+    directories and symlinks, such as the guest tools, are linked. The project trace
+    directories and trace state are not copied.
+
+    The workspace is a new, uniquely named, hidden directory next to the project,
+    marked with :data:`WORKSPACE_MARKER_FILENAME`, so an existing project is never
+    overwritten.
+
+    :param project: the project name
+    :param index: the workspace number
+    :returns: the workspace project name, ``".<project>-job<index>-<random>"``
+    """
+    source = project_dir(project)
+    dest = Path(
+        tempfile.mkdtemp(
+            prefix=f".{project}{WORKSPACE_SUFFIX}{index}-", dir=str(source.parent)
         )
+    )
+    workspace = dest.name
+    logger.debug("creating project workspace: %s", dest)
+    try:
+        (dest / WORKSPACE_MARKER_FILENAME).write_text(project)
+        _copy_project_workspace(source, dest)
+    except BaseException:
+        _remove_project_workspace(project, workspace)
+        raise
+
+    return workspace
+
+
+def _copy_project_workspace(source: Path, dest: Path) -> None:
+    """
+    Populate a new project workspace from the project, see
+    :func:`_clone_project_workspace`.
+
+    :param source: the project directory
+    :param dest: the workspace directory
+    """
+    (dest / INPUT_FILES_DIRNAME).mkdir()
+    for child in source.iterdir():
+        if child.name in _WORKSPACE_EXCLUDE or child.name.startswith("s2e-out-"):
+            continue
+
+        target = dest / child.name
+        if child.is_symlink():
+            target.symlink_to(os.readlink(child))
+        elif child.is_dir():
+            target.symlink_to(child.absolute())
+        else:
+            try:
+                content = child.read_text()
+            except UnicodeDecodeError:
+                shutil.copy2(child, target)
+            else:
+                target.write_text(_replace_project_path(content, source, dest))
+                shutil.copymode(child, target)
+
+
+def _remove_project_workspace(project: str, workspace: str) -> None:
+    """
+    Delete a project workspace created by :func:`_clone_project_workspace`. The
+    directory is only deleted when it is marked as a workspace of the project.
+
+    :param project: the project name
+    :param workspace: the workspace project name
+    """
+    dirname = project_dir(workspace)
+    marker = dirname / WORKSPACE_MARKER_FILENAME
+    try:
+        owner = marker.read_text()
+    except OSError:
+        owner = None
+
+    if owner != project:
+        logger.warning("not deleting unmarked project workspace: %s", dirname)
+        return
+
+    logger.debug("deleting project workspace: %s", dirname)
+    shutil.rmtree(dirname, ignore_errors=True)
+
+
+class _CampaignWorkspaces:
+    """
+    The project workspaces that the traces of a campaign run in concurrently and the
+    trace numbers that are reserved, within the project, for the running traces.
+    """
+
+    def __init__(self, project: str, count: int):
+        """
+        :param project: the project name
+        :param count: the number of workspaces
+        """
+        self.project = project
+        self.count = count
+        self._available: "Queue[str]" = Queue()
+        self._workspaces: List[str] = []
+        self._reserved: Set[int] = set()
+        self._lock = Lock()
+
+    def __enter__(self) -> "_CampaignWorkspaces":
+        try:
+            for index in range(self.count):
+                workspace = _clone_project_workspace(self.project, index)
+                self._workspaces.append(workspace)
+                self._available.put(workspace)
+        except BaseException:
+            self.remove()
+            raise
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.remove()
+
+    def remove(self) -> None:
+        """
+        Delete the workspaces that were created.
+        """
+        while self._workspaces:
+            _remove_project_workspace(self.project, self._workspaces.pop())
+
+    def acquire(self) -> Tuple[str, int]:
+        """
+        Wait for an available workspace and reserve the number of the next trace.
+
+        :returns: a tuple of ``(workspace, trace_id)``
+        """
+        workspace = self._available.get()
+        with self._lock:
+            used = load_trace_manifest(self.project)
+            root = project_dir(self.project)
+            trace_id = 0
+            while (
+                trace_id in used
+                or trace_id in self._reserved
+                or (root / f"s2e-out-{trace_id}").exists()
+            ):
+                trace_id += 1
+            self._reserved.add(trace_id)
+
+        return workspace, trace_id
+
+    def release(self, workspace: str, trace_id: int) -> None:
+        """
+        Make a workspace available for the next trace.
+        """
+        with self._lock:
+            self._reserved.discard(trace_id)
+        self._available.put(workspace)
+
+    def collect(
+        self,
+        workspace: str,
+        previous: Optional[Path],
+        trace_id: int,
+        status: str,
+        started: datetime,
+    ) -> Optional[Path]:
+        """
+        Move the trace directory created by a S2E run in a workspace to the project,
+        as ``s2e-out-<trace_id>``, and add it to the project trace manifest.
+
+        :param workspace: the workspace project name
+        :param previous: the last trace directory of the workspace prior to the run
+        :param trace_id: the reserved trace number
+        :param status: the trace status
+        :param started: the time the run started
+        :returns: the project trace directory, or ``None`` if the run did not create one
+        """
+        source = _get_last_trace_dir(workspace)
+        if not source or source == previous:
+            logger.warning("S2E run did not create a trace directory: %s", workspace)
+            return None
+
+        trace_dir = project_dir(self.project) / f"s2e-out-{trace_id}"
+        logger.debug("recording %s trace: %s (from %s)", status, trace_dir, source)
+        shutil.move(str(source), str(trace_dir))
+        # S2E reuses the workspace output directory number for the next trace
+        (project_dir(workspace) / "s2e-last").unlink()
+        with self._lock:
+            record_trace(self.project, trace_dir, status, started=started)
+        return trace_dir
+
+
+def _run_campaign_concurrently(campaign: Campaign, jobs: int) -> None:
+    """
+    Run the traces of a campaign concurrently, each in a project workspace.
+
+    :param campaign: the campaign
+    :param jobs: maximum number of traces to run concurrently
+    """
+    jobs = min(jobs, len(campaign.traces))
+    logger.info(
+        "running %d campaign traces, %d at a time: %s",
+        len(campaign.traces),
+        jobs,
+        campaign.project,
+    )
+
+    with _CampaignWorkspaces(campaign.project, jobs) as workspaces:
+        graph = TaskGraph("campaign")
+        for index, trace in enumerate(campaign.traces):
+            graph.add(
+                f"{index}-{trace.name or 'anonymous'}",
+                partial(_run_workspace_trace, campaign, trace, workspaces),
+            )
+        graph.run(max_workers=jobs)
+
+
+def _run_workspace_trace(
+    campaign: Campaign, trace: TraceParams, workspaces: _CampaignWorkspaces
+) -> None:
+    """
+    Run a single trace of a campaign in the next available project workspace.
+
+    :param campaign: the campaign
+    :param trace: the trace
+    :param workspaces: the project workspaces
+    """
+    workspace, trace_id = workspaces.acquire()
+    try:
+        trace.setup_input_file_directory(workspace)
+        trace.write_config_script(workspace)
+
+        logfile = project_dir(campaign.project) / f"s2e-out-{trace_id}.log"
+        logger.info(
+            "running campaign trace: %s/%s in %s (saving S2E log to: %s)",
+            campaign.project,
+            trace.name or "<anonymous trace>",
+            workspace,
+            logfile,
+        )
+        previous = _get_last_trace_dir(workspace)
+        started = datetime.now()
+        with span(f"trace.{trace.name or 'anonymous'}", campaign.project) as record:
+            try:
+                with logfile.open("w") as log:
+                    subprocess.check_call(
+                        ["s2e", "run", "--no-tui", workspace],
+                        stdout=log,
+                        stderr=subprocess.STDOUT,
+                    )
+            except subprocess.CalledProcessError:
+                workspaces.collect(
+                    workspace, previous, trace_id, TRACE_STATUS_FAILED, started
+                )
+                raise BinRecError(
+                    f"s2e run failed for project: {campaign.project}, for more "
+                    f"information view the log file at {logfile}"
+                )
+
+            trace_dir = workspaces.collect(
+                workspace, previous, trace_id, TRACE_STATUS_COMPLETED, started
+            )
+            if trace_dir:
+                record.add_artifacts([trace_dir])
+    finally:
+        workspaces.release(workspace, trace_id)
+
+
+def _get_last_trace_dir(project: str) -> Optional[Path]:
+    """
+    :returns: the trace directory that the S2E ``s2e-last`` symlink points to, or
+        ``None`` if the project has no traces
+    """
+    last = project_dir(project) / "s2e-last"
+    if not last.is_symlink():
+        return None
+    return project_dir(project) / last.resolve().name
+
+
+def _record_trace_run(
+    project: str, previous: Optional[Path], status: str, started: datetime
+) -> Optional[Path]:
+    """
+    Add the trace directory created by a S2E run to the project trace manifest.
+
+    :param project: the project name
+    :param previous: the last trace directory prior to the run
+    :param status: the trace status
+    :param started: the time the run started
+    :returns: the trace directory, or ``None`` if the run did not create one
+    """
+    trace_dir = _get_last_trace_dir(project)
+    if not trace_dir or trace_dir == previous:
+        logger.warning("S2E run did not create a trace directory: %s", project)
+        return None
+
+    logger.debug("recording %s trace: %s", status, trace_dir)
+    record_trace(project, trace_dir, status, started=started)
+    return trace_dir
 
 
 def _get_next_trace_log_filename(project: str) -> Path:
     """
     Get the next log file name prior to running a trace.
     """
-    trace_nums = []
-    for entry in get_trace_dirs(project):
-        try:
-            number = int(entry.name.split("-")[-1])
-            trace_nums.append(number)
-        except ValueError:
-            pass
+    return project_dir(project) / f"s2e-out-{next_trace_id(project)}.log"
 
-    i = 0
-    while i in trace_nums:
-        i += 1
 
-    return project_dir(project) / f"s2e-out-{i}.log"
+@dataclass
+class OutputDigest:
+    """
+    A bounded summary of the stdout or stderr content of a binary run during
+    validation. Only the first :data:`VALIDATION_BLOCK_SIZE` bytes are kept.
+    """
+
+    #: the content size, in bytes
+    size: int = 0
+    #: the hex SHA-256 digest of the content
+    sha256: str = ""
+    #: the first :data:`VALIDATION_BLOCK_SIZE` bytes of the content
+    head: bytes = b""
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        :returns: the JSON representation of the digest
+        """
+        return {
+            "size": self.size,
+            "sha256": self.sha256,
+            "head": base64.b64encode(self.head).decode(),
+        }
+
+    @classmethod
+    def from_json(cls, body: Dict[str, Any]) -> "OutputDigest":
+        """
+        :param body: the JSON representation of the digest, see :meth:`to_json`
+        :returns: the digest
+        """
+        return cls(body["size"], body["sha256"], base64.b64decode(body["head"]))
+
+
+@dataclass
+class ResourceUsage:
+    """
+    The resource usage of a single run of a binary during validation, from
+    :func:`os.wait4`.
+    """
+
+    #: wall clock time in seconds
+    seconds: float = 0.0
+    #: user CPU time in seconds
+    user: float = 0.0
+    #: system CPU time in seconds
+    system: float = 0.0
+    #: the peak resident set size, in KiB
+    max_rss: int = 0
+    #: number of page faults serviced without I/O
+    minor_faults: int = 0
+    #: number of page faults that required I/O
+    major_faults: int = 0
+    #: number of voluntary context switches
+    voluntary_switches: int = 0
+    #: number of involuntary context switches
+    involuntary_switches: int = 0
+
+
+@dataclass
+class ValidationRun:
+    """
+    The result of running the original or the recovered binary for a trace.
+    """
+
+    #: the process exit code
+    returncode: int
+    #: the process stdout content
+    stdout: OutputDigest
+    #: the process stderr content
+    stderr: OutputDigest
+    #: the process run time, in seconds, the median of the recorded runs
+    seconds: float
+    #: the process was killed when its output diverged (see ``fail_fast``)
+    stopped: bool = False
+    #: the resource usage of each recorded run
+    samples: List[ResourceUsage] = field(default_factory=list)
+
+    @property
+    def usage(self) -> ResourceUsage:
+        """
+        :returns: the median resource usage of the recorded runs
+        """
+        if not self.samples:
+            return ResourceUsage(seconds=self.seconds)
+        return ResourceUsage(
+            **{
+                name: statistics.median(
+                    getattr(sample, name) for sample in self.samples
+                )
+                for name in ResourceUsage.__dataclass_fields__
+            }
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        :returns: the JSON representation of the run
+        """
+        return {
+            "returncode": self.returncode,
+            "stdout": self.stdout.to_json(),
+            "stderr": self.stderr.to_json(),
+            "seconds": self.seconds,
+            "stopped": self.stopped,
+            "samples": [asdict(sample) for sample in self.samples],
+        }
+
+    @classmethod
+    def from_json(cls, body: Dict[str, Any]) -> "ValidationRun":
+        """
+        :param body: the JSON representation of the run, see :meth:`to_json`
+        :returns: the run
+        """
+        return cls(
+            returncode=body["returncode"],
+            stdout=OutputDigest.from_json(body["stdout"]),
+            stderr=OutputDigest.from_json(body["stderr"]),
+            seconds=body["seconds"],
+            stopped=body["stopped"],
+            samples=[ResourceUsage(**sample) for sample in body["samples"]],
+        )
+
+
+@dataclass
+class ValidationResult:
+    """
+    The result of validating the recovered binary against the original binary for a
+    single trace.
+    """
+
+    #: the trace name, or ``"<anonymous trace>"``
+    name: str
+    #: the command line arguments
+    args: List[str]
+    #: the original binary run, ``None`` if the binary could not be run
+    original: Optional[ValidationRun] = None
+    #: the recovered binary run, ``None`` if the binary could not be run
+    recovered: Optional[ValidationRun] = None
+    #: the comparison criteria that did not match, empty if the trace passed
+    errors: List[str] = field(default_factory=list)
+    #: the result was loaded from the validation cache, see
+    #: :func:`_validation_cache_key`
+    cached: bool = False
+    #: the binaries ran concurrently with each other, or with the binaries of other
+    #: traces, so their wall clock time is affected by contention and the slowdown
+    #: is not reported
+    concurrent: bool = False
+
+    @property
+    def passed(self) -> bool:
+        """
+        :returns: the original and recovered binary runs match
+        """
+        return not self.errors
+
+    @property
+    def slowdown(self) -> Optional[float]:
+        """
+        :returns: the median wall clock time of the recovered binary relative to the
+            original binary, ``None`` if either binary did not run or the binaries
+            ran concurrently, see :attr:`concurrent`
+        """
+        return None if self.concurrent else self._ratio("seconds")
+
+    @property
+    def memory_ratio(self) -> Optional[float]:
+        """
+        :returns: the median peak resident set size of the recovered binary relative
+            to the original binary, ``None`` if either binary did not run
+        """
+        return self._ratio("max_rss")
+
+    def _ratio(self, name: str) -> Optional[float]:
+        if not self.original or not self.recovered:
+            return None
+        original = getattr(self.original.usage, name)
+        recovered = getattr(self.recovered.usage, name)
+        return recovered / original if original > 0 else None
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        :returns: the JSON representation of the result
+        """
+        return {
+            "name": self.name,
+            "args": self.args,
+            "original": self.original.to_json() if self.original else None,
+            "recovered": self.recovered.to_json() if self.recovered else None,
+            "errors": self.errors,
+            "concurrent": self.concurrent,
+        }
+
+    @classmethod
+    def from_json(cls, body: Dict[str, Any]) -> "ValidationResult":
+        """
+        :param body: the JSON representation of the result, see :meth:`to_json`
+        :returns: the result
+        """
+        original = body.get("original")
+        recovered = body.get("recovered")
+        return cls(
+            name=body["name"],
+            args=body["args"],
+            original=ValidationRun.from_json(original) if original else None,
+            recovered=ValidationRun.from_json(recovered) if recovered else None,
+            errors=body["errors"],
+            concurrent=body.get("concurrent", False),
+        )
 
 
-def validate_campaign(project_or_campaign: Union[str, Campaign]) -> None:
+def geometric_mean_ratio(ratios: List[Optional[float]]) -> Optional[float]:
+    """
+    :param ratios: the per-trace ratios, such as :attr:`ValidationResult.slowdown`,
+        ``None`` ratios are ignored
+    :returns: the geometric mean of the ratios, or ``None`` if there are no ratios
+    """
+    values = [ratio for ratio in ratios if ratio]
+    return statistics.geometric_mean(values) if values else None
+
+
+def validate_campaign(
+    project_or_campaign: Union[str, Campaign],
+    jobs: int = 1,
+    fail_fast: bool = False,
+    repeat: int = 1,
+    warmup: int = 0,
+    use_cache: bool = True,
+) -> List[ValidationResult]:
     """
     Validate the lift results for an entire campaign.
 
     :param project_or_campaign: the project name or the campaign object to validate
+    :param jobs: maximum number of binaries to run concurrently
+    :param fail_fast: kill the original and recovered binaries of a trace as soon as
+        their stdout or stderr content diverges
+    :param repeat: number of times each binary runs to record its resource usage
+    :param warmup: number of times each binary runs, prior to the recorded runs,
+        without recording its resource usage
+    :param use_cache: return the stored result of traces that were validated with
+        the same binaries, trace parameters, input files, and options
+    :returns: the validation result of each trace, in campaign order
     """
     if isinstance(project_or_campaign, str):
         campaign = Campaign.load_project(project_or_campaign)
@@ -361,145 +997,721 @@ def validate_campaign(project_or_campaign: Union[str, Campaign]) -> None:
     else:
         raise TypeError("expected project name (str) or campaign object")
 
-    for trace in campaign.traces:
-        _validate_campaign_trace(campaign, trace)
+    return _validate_campaign_traces(
+        campaign, campaign.traces, jobs, fail_fast, repeat, warmup, use_cache
+    )
 
 
-def validate_campaign_trace(project: str, trace_name_or_id: Union[int, str]) -> None:
+def validate_campaign_trace(
+    project: str, trace_name_or_id: Union[int, str], use_cache: bool = True
+) -> ValidationResult:
     """
     Validate the lift result of a single trace within a campaign.
 
     :param project: project name
     :param  trace_name_or_id: the trace name or id to validate (see
         :meth:`Campaign.get_trace`)
+    :param use_cache: return the stored result if the trace was already validated
+    :returns: the validation result
     """
     campaign = Campaign.load_project(project)
     _, trace = _resolve_trace_name_or_id(campaign, trace_name_or_id)
-    _validate_campaign_trace(campaign, trace)
+    return _validate_campaign_traces(campaign, [trace], use_cache=use_cache)[0]
 
 
-def validate_campaign_with_args(project: str, args: List[str]) -> None:
+def validate_campaign_with_args(
+    project: str, args: List[str], use_cache: bool = True
+) -> ValidationResult:
     """
     Validate the list result against the provided command line arguments.
 
     :param args: the command line arguments to validate with
+    :param use_cache: return the stored result if the arguments were already
+        validated
+    :returns: the validation result
     """
     campaign = Campaign.load_project(project)
     trace = TraceParams(args=[TraceArg(TraceArgType.concrete, arg) for arg in args])
-    _validate_campaign_trace(campaign, trace)
+    return _validate_campaign_traces(campaign, [trace], use_cache=use_cache)[0]
+
+
+def _validate_campaign_traces(
+    campaign: Campaign,
+    traces: List[TraceParams],
+    jobs: int = 1,
+    fail_fast: bool = False,
+    repeat: int = 1,
+    warmup: int = 0,
+    use_cache: bool = False,
+) -> List[ValidationResult]:
+    """
+    Compare the original binary against the lifted binary for each trace. Each trace
+    runs in its own scratch directory, within the merged trace directory, so that the
+    traces, and concurrent validations of the project, do not interfere with each
+    other. The original and recovered binaries of a trace run one after the other,
+    so that the resource usage of one is not affected by the other, except with
+    ``fail_fast``, which must stop both binaries once their output diverges. Binaries
+    that run concurrently, with each other or, when ``jobs`` is greater than one,
+    with the binaries of other traces, are marked as
+    :attr:`~ValidationResult.concurrent` and their slowdown is not reported.
+
+    The stdout and stderr content of the binaries is compared while it is read, see
+    :class:`_OutputComparison`, so that the memory used by validation does not
+    depend on the size of the output.
+
+    :param campaign: the campaign
+    :param traces: the traces to validate
+    :param jobs: maximum number of binaries to run concurrently
+    :param fail_fast: kill the binaries of a trace once their output diverges
+    :param repeat: number of times each binary runs to record its resource usage
+    :param warmup: number of unrecorded runs of each binary prior to the recorded runs
+    :param use_cache: return the stored result of traces that were validated with
+        the same binaries, trace parameters, input files, and options, and store the
+        result of the other traces
+    :returns: the validation result of each trace
+    """
+    merged_dir = merged_trace_dir(campaign.project)
+    scratch = Path(tempfile.mkdtemp(prefix=VALIDATION_DIR_PREFIX, dir=merged_dir))
+    results = [
+        ValidationResult(trace.name or "<anonymous trace>", trace.command_line_args)
+        for trace in traces
+    ]
+    keys: List[Optional[str]] = [None] * len(traces)
+    cache = _validation_cache(campaign.project) if use_cache else None
+    if jobs > 1 and len(traces) > 1:
+        logger.warning(
+            "binaries of different traces run concurrently, the slowdown is not "
+            "reported, validate with --jobs 1 to measure it"
+        )
 
+    graph = TaskGraph("validate")
+    try:
+        if cache:
+            options = {
+                "fail_fast": fail_fast,
+                "repeat": repeat,
+                "warmup": warmup,
+                "concurrent": jobs > 1 and len(traces) > 1,
+            }
+            binaries = _hash_validation_binaries(merged_dir)
+            for index, trace in enumerate(traces):
+                if binaries:
+                    keys[index] = _validation_cache_key(
+                        cache, campaign, trace, binaries, options
+                    )
+                cached = _load_cached_validation(cache, keys[index], scratch / "cached")
+                if cached:
+                    results[index] = cached
+
+        for index, (trace, result) in enumerate(zip(traces, results)):
+            if result.cached:
+                logger.info("using cached validation result: %s", result.name)
+                continue
+
+            prefix = f"{index}-{trace.name or 'anonymous'}"
+            run_dir = scratch / str(index)
+            outputs = {
+                name: _OutputComparison(
+                    match is True,
+                    fail_fast,
+                    VALIDATION_REGEX_LIMIT if isinstance(match, str) else 0,
+                )
+                for name, match in (
+                    ("stdout", trace.match_stdout),
+                    ("stderr", trace.match_stderr),
+                )
+            }
+            # the binaries must run concurrently to stop both at the first divergence
+            sequential = not fail_fast or bool(
+                trace.setup or trace.teardown or campaign.setup or campaign.teardown
+            )
+            result.concurrent = not sequential or (jobs > 1 and len(traces) > 1)
+            deps: List[str] = []
+            for kind in ("original", "recovered"):
+                graph.add(
+                    f"{prefix}.{kind}",
+                    partial(
+                        _run_validation_binary,
+                        campaign,
+                        trace,
+                        result,
+                        kind,
+                        merged_dir / _VALIDATION_BINARIES[kind],
+                        run_dir / kind,
+                        outputs,
+                        repeat,
+                        warmup,
+                    ),
+                    deps,
+                )
+                if sequential:
+                    deps = [f"{prefix}.{kind}"]
+
+            graph.add(
+                f"{prefix}.compare",
+                partial(_compare_validation_runs, trace, result, outputs),
+                [f"{prefix}.original", f"{prefix}.recovered"],
+            )
+
+        graph.run(max_workers=jobs)
+
+        if cache:
+            for key, result in zip(keys, results):
+                # results of binaries that could not run depend on the environment
+                if key and not result.cached and result.original and result.recovered:
+                    filename = scratch / f"{key}.json"
+                    filename.write_text(json.dumps(result.to_json()))
+                    cache.put(key, filename)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return results
+
+
+def _validation_cache(project: str) -> ContentCache:
+    """
+    :returns: the project's validation result cache
+    """
+    return ContentCache(
+        project_cache_dir(project) / "validation",
+        max_size=VALIDATION_CACHE_SIZE,
+        namespace=_VALIDATION_CACHE_VERSION,
+    )
 
-def _validate_campaign_trace(campaign: Campaign, trace: TraceParams) -> None:
+
+def _hash_validation_binaries(merged_dir: Path) -> Optional[Dict[str, str]]:
+    """
+    :returns: the content hash of the original and recovered binaries, or ``None``
+        if either binary does not exist
+    """
+    hashes = {}
+    for kind, name in _VALIDATION_BINARIES.items():
+        filename = merged_dir / name
+        if not filename.is_file():
+            return None
+        hashes[kind] = hash_file(filename)
+    return hashes
+
+
+def _validation_cache_key(
+    cache: ContentCache,
+    campaign: Campaign,
+    trace: TraceParams,
+    binaries: Dict[str, str],
+    options: Dict[str, Any],
+) -> str:
     """
-    Compare the original binary against the lifted binary for a given sample of
-    command line arguments. This method runs the original and the lifted binary
-    and then compares the process return code, stdout, and stderr content. An
-    ``AssertionError`` is raised if any of the comparison criteria does not match
-    between the original and lifted sample.
+    Get the validation cache key of a trace, which is the hash of everything that
+    the validation result depends on: the original and recovered binaries, the
+    serialized trace parameters, the setup and teardown actions that run for the
+    trace, the content of the trace input files, and the validation options.
 
+    :param cache: the validation cache
     :param campaign: the campaign
     :param trace: the trace
+    :param binaries: the content hash of the original and recovered binaries
+    :param options: the validation options that change the result
+    :returns: the cache key
     """
-    project = campaign.project
-    logger.info(
-        "Validating project %s with arguments: %s", project, trace.command_line_args
+    fingerprint = {
+        "binaries": binaries,
+        "trace": asdict(trace),
+        "setup": trace.setup or campaign.setup,
+        "teardown": trace.teardown or campaign.teardown,
+        "input_files": [
+            hash_file(item.source) if item.source.is_file() else ""
+            for item in trace.input_files
+        ],
+        "options": options,
+    }
+    digest = hashlib.sha256(cache.namespace.encode())
+    digest.update(
+        json.dumps(fingerprint, sort_keys=True, cls=CampaignJsonEncoder).encode()
     )
+    return digest.hexdigest()
 
-    merged_dir = merged_trace_dir(project)
-    lifted = str(merged_dir / "recovered")
-    original = str(merged_dir / "binary")
-    target_path = merged_dir / "test-target"
-    target = str(target_path)
-
-    if target_path.is_symlink():
-        target_path.unlink()
 
-    # We link to the binary we are running to make sure argv[0] is the same
-    # for the original and the lifted program.
-    os.link(original, target)
+def _load_cached_validation(
+    cache: ContentCache, key: Optional[str], filename: Path
+) -> Optional[ValidationResult]:
+    """
+    :param cache: the validation cache
+    :param key: the trace cache key
+    :param filename: a scratch filename to copy the cached result to
+    :returns: the cached validation result, or ``None`` if the trace is not cached
+    """
+    if not key or not cache.get(key, filename):
+        return None
 
-    trace.setup_input_file_directory(project)
-    _link_lifted_input_files(project)
+    try:
+        result = ValidationResult.from_json(json.loads(filename.read_text()))
+    except (ValueError, KeyError, TypeError) as err:
+        logger.warning("ignoring invalid cached validation result: %s: %s", key, err)
+        return None
+
+    result.cached = True
+    return result
+
+
+def _run_validation_binary(
+    campaign: Campaign,
+    trace: TraceParams,
+    result: ValidationResult,
+    kind: str,
+    binary: Path,
+    cwd: Path,
+    outputs: Dict[str, "_OutputComparison"],
+    repeat: int = 1,
+    warmup: int = 0,
+) -> None:
+    """
+    Run the original or recovered binary of a trace in a scratch directory. The
+    binary is linked to ``test-target`` within the directory, and executed as
+    ``./test-target`` so that ``argv[0]`` is the same for the original and the
+    recovered binary. The trace input files are linked to ``input_files`` within the
+    directory and the setup and teardown actions run in the directory.
 
-    stdin_file = subprocess.PIPE if trace.stdin else subprocess.DEVNULL
+    The binary runs ``warmup`` times, and then ``repeat`` times, recording the
+    resource usage of each of the ``repeat`` runs. The output of the first recorded
+    run is compared against the other binary.
 
-    _run_trace_setup(campaign, trace, merged_dir)
-    logger.debug(">> running original sample with args: %s", trace.command_line_args)
-    original_proc = subprocess.Popen(
-        [target] + trace.command_line_args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        stdin=stdin_file,
-        cwd=str(merged_dir),
-    )
-
-    if trace.stdin and original_proc.stdin:
-        original_proc.stdin.write(trace.stdin.encode())
-        original_proc.stdin.close()
+    :param campaign: the campaign
+    :param trace: the trace
+    :param result: the trace validation result, which the run is stored in
+    :param kind: ``"original"`` or ``"recovered"``
+    :param binary: the binary to run
+    :param cwd: the scratch directory
+    :param outputs: the stdout and stderr comparisons of the trace
+    :param repeat: number of runs to record
+    :param warmup: number of runs, prior to the recorded runs, that are not recorded
+    """
+    target = cwd / VALIDATION_TARGET
+    input_dir = cwd / INPUT_FILES_DIRNAME
+    input_dir.mkdir(parents=True)
+    for item in trace.input_files:
+        if item.source.is_file():
+            (input_dir / item.source.name).symlink_to(item.source.absolute())
 
-    original_proc.wait()
-    os.remove(target)
+    try:
+        # We link to the binary we are running to make sure argv[0] is the same
+        # for the original and the lifted program.
+        os.link(binary, target)
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            result.errors.append(f"unable to run {kind} binary: {err}")
+            return
+        shutil.copy2(binary, target)
+
+    run: Optional[ValidationRun] = None
+    for iteration in range(warmup + max(repeat, 1)):
+        if iteration == warmup:
+            comparisons = outputs
+        else:
+            comparisons = {name: _OutputComparison(False) for name in outputs}
 
-    _run_trace_teardown(campaign, trace, merged_dir)
+        try:
+            returncode, usage = _run_validation_process(
+                campaign, trace, kind, cwd, comparisons
+            )
+        except OSError as err:
+            result.errors.append(f"unable to run {kind} binary: {err}")
+            return
+
+        if iteration < warmup:
+            continue
+
+        if not run:
+            run = ValidationRun(
+                returncode,
+                outputs["stdout"].digests[kind],
+                outputs["stderr"].digests[kind],
+                usage.seconds,
+                stopped=any(comparison.stopped for comparison in outputs.values()),
+            )
+            if run.stopped:
+                # the output diverged, the remaining runs would not be comparable
+                run.samples.append(usage)
+                break
+        run.samples.append(usage)
+
+    if run:
+        run.seconds = run.usage.seconds
+    setattr(result, kind, run)
+
+
+def _run_validation_process(
+    campaign: Campaign,
+    trace: TraceParams,
+    kind: str,
+    cwd: Path,
+    outputs: Dict[str, "_OutputComparison"],
+) -> Tuple[int, "ResourceUsage"]:
+    """
+    Run a binary that was linked into a validation scratch directory once, including
+    the setup and teardown actions. The stdout and stderr content is read
+    concurrently, by a thread each, while the trace stdin is written, and the
+    process is reaped with :func:`os.wait4` to collect its resource usage. The
+    process is reaped while holding the lock that :func:`_kill_validation_process`
+    signals it under.
 
-    original_stdout = original_proc.stdout.read()  # type: ignore
-    original_stderr = original_proc.stderr.read()  # type: ignore
+    :param campaign: the campaign
+    :param trace: the trace
+    :param kind: ``"original"`` or ``"recovered"``
+    :param cwd: the scratch directory
+    :param outputs: the stdout and stderr comparisons that read the content
+    :returns: a tuple of ``(returncode, usage)``
+    :raises OSError: the binary could not be started
+    """
+    _run_trace_setup(campaign, trace, cwd)
+    logger.debug(">> running %s sample with args: %s", kind, trace.command_line_args)
+    started = time.monotonic()
+    try:
+        proc = subprocess.Popen(
+            [f"./{VALIDATION_TARGET}"] + trace.command_line_args,
+            executable=str(cwd / VALIDATION_TARGET),
+            stdin=subprocess.PIPE if trace.stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=str(cwd),
+        )
+    except OSError:
+        _run_trace_teardown(campaign, trace, cwd)
+        raise
 
-    os.link(lifted, target)
-    _run_trace_setup(campaign, trace, merged_dir)
+    try:
+        readers = [
+            Thread(
+                target=outputs[name].read,
+                args=(kind, getattr(proc, name)),
+                name=f"validate-{kind}-{name}",
+            )
+            for name in ("stdout", "stderr")
+        ]
+        for reader in readers:
+            reader.start()
+        for comparison in outputs.values():
+            comparison.attach(proc)
+
+        if trace.stdin and proc.stdin:
+            try:
+                proc.stdin.write(trace.stdin.encode())
+                proc.stdin.close()
+            except BrokenPipeError:
+                # the process exited, or was stopped, before reading its stdin
+                pass
+
+        # wait for the process to exit without reaping it, so that its pid is not
+        # reused while _kill_validation_process() may still signal it
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        seconds = time.monotonic() - started
+        with _validation_reap_lock:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        for reader in readers:
+            reader.join()
+    finally:
+        proc.stdout.close()  # type: ignore
+        proc.stderr.close()  # type: ignore
+        _run_trace_teardown(campaign, trace, cwd)
+
+    usage = ResourceUsage(
+        seconds=seconds,
+        user=rusage.ru_utime,
+        system=rusage.ru_stime,
+        max_rss=rusage.ru_maxrss,
+        minor_faults=rusage.ru_minflt,
+        major_faults=rusage.ru_majflt,
+        voluntary_switches=rusage.ru_nvcsw,
+        involuntary_switches=rusage.ru_nivcsw,
+    )
+    return proc.returncode, usage
 
-    logger.debug(">> running recovered sample with args: %s", trace.command_line_args)
 
-    lifted_proc = subprocess.Popen(
-        [target] + trace.command_line_args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        stdin=stdin_file,
-        cwd=str(merged_dir),
-    )
+class _OutputComparison:
+    """
+    Compare the stdout or stderr content of the original and recovered binaries of a
+    trace while it is read. The content is read in blocks of
+    :data:`VALIDATION_BLOCK_SIZE` bytes and only the digest of each block, and the
+    last :data:`VALIDATION_WINDOW_BLOCKS` blocks, are kept. Each block is compared
+    once both binaries have written it, so the binaries can run concurrently or one
+    after the other. The exact offset of the first divergence is known when the
+    diverging blocks of both binaries are still kept, otherwise the offset of the
+    diverging block is reported.
+
+    When a regex pattern is matched against the content, up to ``retain`` bytes of
+    the recovered binary's content are kept, see :meth:`retained`.
+    """
 
-    if trace.stdin and lifted_proc.stdin:
-        lifted_proc.stdin.write(trace.stdin.encode())
-        lifted_proc.stdin.close()
+    def __init__(self, compare: bool, fail_fast: bool = False, retain: int = 0):
+        """
+        :param compare: compare the content, otherwise only the digests are recorded
+        :param fail_fast: kill both binaries once the content diverges
+        :param retain: maximum number of bytes of the recovered binary's content to
+            keep for regex matching
+        """
+        self.compare = compare
+        self.fail_fast = fail_fast
+        self.retain = retain
+        self._content: Optional[bytearray] = bytearray() if retain else None
+        self.digests = {kind: OutputDigest() for kind in _VALIDATION_BINARIES}
+        #: the offset of the first divergence and the content of each binary at the
+        #: offset, see :meth:`describe_divergence`
+        self.divergence: Optional[Tuple[int, Optional[bytes], Optional[bytes]]] = None
+        #: the binaries were killed once the content diverged
+        self.stopped = False
+        self._blocks: Dict[str, List[bytes]] = {kind: [] for kind in self.digests}
+        self._recent: Dict[str, Deque[bytes]] = {
+            kind: deque(maxlen=VALIDATION_WINDOW_BLOCKS) for kind in self.digests
+        }
+        self._finished: Set[str] = set()
+        self._procs: List[subprocess.Popen] = []
+        self._lock = Lock()
+
+    def attach(self, proc: subprocess.Popen) -> None:
+        """
+        Register a binary process that is killed once the content diverges, when
+        ``fail_fast`` is enabled.
+        """
+        with self._lock:
+            if self.fail_fast and self.divergence:
+                _kill_validation_process(proc)
+            self._procs.append(proc)
+
+    def read(self, kind: str, file: BinaryIO) -> None:
+        """
+        Read the content of a binary until the end of the stream.
+
+        :param kind: ``"original"`` or ``"recovered"``
+        :param file: the stream
+        """
+        digest = self.digests[kind]
+        sha256 = hashlib.sha256()
+        while True:
+            block = file.read(VALIDATION_BLOCK_SIZE)
+            if not block:
+                break
+
+            if not digest.size:
+                digest.head = block
+            digest.size += len(block)
+            sha256.update(block)
+            if self.compare:
+                self._add_block(kind, block)
+            if kind == "recovered" and self._content is not None:
+                if len(self._content) + len(block) > self.retain:
+                    # the content is too large to match, stop keeping it
+                    self._content = None
+                else:
+                    self._content += block
+
+        digest.sha256 = sha256.hexdigest()
+        with self._lock:
+            self._finished.add(kind)
+            other = _other_validation_binary(kind)
+            index = len(self._blocks[kind])
+            if (
+                self.compare
+                and not self.divergence
+                and len(self._blocks[other]) > index
+            ):
+                self._diverge(index)
+
+    def retained(self) -> Optional[bytes]:
+        """
+        :returns: the recovered binary's content, or ``None`` if it was not kept or
+            it exceeded ``retain`` bytes
+        """
+        return bytes(self._content) if self._content is not None else None
+
+    def describe_divergence(self) -> Optional[str]:
+        """
+        :returns: a description of where the content diverges, or ``None`` if the
+            content matches
+        """
+        if not self.divergence:
+            return None
+
+        offset, original, recovered = self.divergence
+        if original is None or recovered is None:
+            return f"in bytes {offset}-{offset + VALIDATION_BLOCK_SIZE - 1}"
+        return f"at byte {offset}: original {original!r}, recovered {recovered!r}"
+
+    def _add_block(self, kind: str, block: bytes) -> None:
+        with self._lock:
+            blocks = self._blocks[kind]
+            blocks.append(hashlib.sha256(block).digest())
+            self._recent[kind].append(block)
+            if self.divergence:
+                return
+
+            index = len(blocks) - 1
+            other = _other_validation_binary(kind)
+            if index < len(self._blocks[other]):
+                if self._blocks[other][index] != blocks[index]:
+                    self._diverge(index)
+            elif other in self._finished:
+                self._diverge(index)
+
+    def _block(self, kind: str, index: int) -> Optional[bytes]:
+        count = len(self._blocks[kind])
+        if index >= count:
+            return b"" if kind in self._finished else None
+        recent = self._recent[kind]
+        if index < count - len(recent):
+            return None
+        return recent[index - count + len(recent)]
+
+    def _diverge(self, index: int) -> None:
+        offset = index * VALIDATION_BLOCK_SIZE
+        original = self._block("original", index)
+        recovered = self._block("recovered", index)
+        if original is None or recovered is None:
+            self.divergence = (offset, None, None)
+        else:
+            position = next(
+                (i for i, (a, b) in enumerate(zip(original, recovered)) if a != b),
+                min(len(original), len(recovered)),
+            )
+            end = position + VALIDATION_CONTEXT
+            self.divergence = (
+                offset + position,
+                original[position:end],
+                recovered[position:end],
+            )
+
+        if self.fail_fast:
+            self.stopped = True
+            for proc in self._procs:
+                _kill_validation_process(proc)
+
+
+def _kill_validation_process(proc: subprocess.Popen) -> None:
+    # Popen.kill() polls the process, which would reap it before the thread running
+    # the process collects its resource usage with os.wait4(). The process is only
+    # reaped while holding the lock, so the pid still belongs to the process, running
+    # or exited, while its return code is unset.
+    with _validation_reap_lock:
+        if proc.returncode is None:
+            os.kill(proc.pid, signal.SIGKILL)
+
+
+def _other_validation_binary(kind: str) -> str:
+    return "recovered" if kind == "original" else "original"
+
+
+def _compare_validation_runs(
+    trace: TraceParams,
+    result: ValidationResult,
+    outputs: Dict[str, _OutputComparison],
+) -> None:
+    """
+    Compare the process return code, stdout, and stderr content of the original and
+    recovered binary runs of a trace. The comparison criteria that do not match are
+    added to the validation result errors. The ``match_stdout`` and ``match_stderr``
+    regex patterns are matched against the entire recovered binary content, which
+    fails validation if the content exceeds :data:`VALIDATION_REGEX_LIMIT` bytes.
 
-    # Only close if stdin is a file / pipe (unsupported at this time)
-    lifted_proc.wait()
-    os.remove(target)
+    :param trace: the trace
+    :param result: the trace validation result
+    :param outputs: the stdout and stderr comparisons of the trace
+    """
+    original = result.original
+    lifted = result.recovered
+    if not original or not lifted:
+        return
 
-    _run_trace_teardown(campaign, trace, merged_dir)
+    if original.stopped or lifted.stopped:
+        result.errors.append("stopped at the first output divergence")
+    elif original.returncode != lifted.returncode:
+        result.errors.append("recovered exit code does not match original")
+
+    for name, match in (("stdout", trace.match_stdout), ("stderr", trace.match_stderr)):
+        if match is True:
+            divergence = outputs[name].describe_divergence()
+            if divergence:
+                result.errors.append(
+                    f"recovered {name} content does not match original {divergence}"
+                )
+        elif isinstance(match, str):
+            content = outputs[name].retained()
+            if content is None:
+                result.errors.append(
+                    f"recovered {name} content exceeded {VALIDATION_REGEX_LIMIT} "
+                    "bytes, regex pattern not evaluated"
+                )
+            elif re.match(match, content.decode(errors="replace")) is None:
+                result.errors.append(f"regex pattern for {name} content does not match")
+
+    if result.passed:
+        logger.info(
+            "Output from original and lifted binaries match for args: %s",
+            result.args,
+        )
+    else:
+        logger.error(
+            "Validation failed for args: %s: %s", result.args, "; ".join(result.errors)
+        )
 
-    lifted_stdout = lifted_proc.stdout.read()  # type: ignore
-    lifted_stderr = lifted_proc.stderr.read()  # type: ignore
 
-    assert (
-        original_proc.returncode == lifted_proc.returncode
-    ), "recovered exit code does not match original"
+def print_validation_results(results: List[ValidationResult]) -> None:
+    """
+    Print the validation result of each trace, the median resource usage of the
+    original and recovered binaries, and the geometric mean slowdown and memory
+    usage ratio of the recovered binary across all traces.
 
-    if trace.match_stdout is True:
-        assert (
-            original_stdout == lifted_stdout
-        ), "recovered stdout content does not match original"
-    elif isinstance(trace.match_stdout, str):
-        assert (
-            re.match(trace.match_stdout, lifted_stdout.decode(errors="replace"))
-            is not None
-        ), "regex pattern for stdout content does not match"
+    :param results: the validation results
+    """
+    print(f"{'Trace':<32} {'Result':<7} {'Exit Code':>11} ", end="")
+    print(f"{'Original':>10} {'Recovered':>10} {'Slowdown':>9} {'Memory':>8}")
+    for result in results:
+        status = "passed" if result.passed else "FAILED"
+        name = f"{result.name} (cached)" if result.cached else result.name
+        codes = "/".join(
+            str(run.returncode) if run else "-"
+            for run in (result.original, result.recovered)
+        )
+        times = [
+            f"{run.seconds:>9.3f}s" if run else f"{'-':>10}"
+            for run in (result.original, result.recovered)
+        ]
+        ratios = [
+            f"{ratio:>{width - 1}.2f}x" if ratio else f"{'-':>{width}}"
+            for ratio, width in ((result.slowdown, 9), (result.memory_ratio, 8))
+        ]
+        print(
+            f"{name:<32} {status:<7} {codes:>11} {times[0]} {times[1]} "
+            f"{ratios[0]} {ratios[1]}"
+        )
+        for error in result.errors:
+            print(f"    {error}")
+        for kind in _VALIDATION_BINARIES:
+            run = getattr(result, kind)
+            if run and run.samples:
+                usage = run.usage
+                print(
+                    f"    {kind}: {usage.user:.3f}s user, {usage.system:.3f}s sys, "
+                    f"{usage.max_rss} KiB max rss, {usage.minor_faults}/"
+                    f"{usage.major_faults} minor/major faults, "
+                    f"{usage.voluntary_switches}/{usage.involuntary_switches} "
+                    f"voluntary/involuntary switches ({len(run.samples)} runs)"
+                )
+
+    slowdown = geometric_mean_ratio([result.slowdown for result in results])
+    memory = geometric_mean_ratio([result.memory_ratio for result in results])
+    if slowdown:
+        print()
+        print(f"Geometric mean slowdown: {slowdown:.2f}x")
+    if any(result.concurrent for result in results):
+        print("Slowdown is not reported for binaries that ran concurrently, ", end="")
+        print("validate with --jobs 1 and without --fail-fast to measure it")
+    if memory:
+        print(f"Geometric mean memory usage: {memory:.2f}x")
 
-    if trace.match_stderr is True:
-        assert (
-            original_stderr == lifted_stderr
-        ), "recovered stderr content does not match original"
-    elif isinstance(trace.match_stderr, str):
-        assert (
-            re.match(trace.match_stderr, lifted_stderr.decode(errors="replace"))
-            is not None
-        ), "regex pattern for stderr content does not match"
 
-    logger.info(
-        "Output from %s's original and lifted binaries match for args: %s",
-        project,
-        str(trace.command_line_args),
-    )
+def _exit_with_validation_results(results: List[ValidationResult]) -> None:
+    print_validation_results(results)
+    if not all(result.passed for result in results):
+        sys.exit(1)
 
 
 def new_project(
@@ -645,9 +1857,18 @@ def clear_project_trace_data(project: str) -> None:
     Delete all trace directories from the project.
     """
     logger.info("clearing trace directory for project: %s", project)
-    for dirname in get_trace_dirs(project):
-        logger.debug("deleting trace directory: %s", dirname)
-        shutil.rmtree(dirname)
+    root = project_dir(project)
+    with trace_manifest_lock(project):
+        # include the trace directories that were not recorded in the manifest
+        for trace in rescan_trace_manifest(project).values():
+            dirname = root / trace["directory"]
+            if dirname.is_dir():
+                logger.debug("deleting trace directory: %s", dirname)
+                shutil.rmtree(dirname)
+
+        manifest = trace_manifest_filename(project)
+        if manifest.is_file():
+            manifest.unlink()
 
     merged = merged_trace_dir(project)
     if merged.is_dir():
@@ -736,6 +1957,14 @@ def main() -> None:
     )
 
     run = subparsers.add_parser("run")
+    run.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="run up to JOBS traces concurrently, each in its own copy of the S2E "
+        "project",
+    )
     run.add_argument("project", help="project name")
 
     run_trace = subparsers.add_parser("run-trace")
@@ -751,9 +1980,44 @@ def main() -> None:
     )
 
     validate = subparsers.add_parser("validate")
+    validate.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "run up to JOBS binaries, of different traces, concurrently, which does "
+            "not report the slowdown"
+        ),
+    )
+    validate.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="run each binary REPEAT times and report the median resource usage",
+    )
+    validate.add_argument(
+        "--warmup",
+        type=int,
+        default=0,
+        help="run each binary WARMUP times before the recorded runs",
+    )
+    validate.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="stop the binaries of a trace once their output diverges",
+    )
+    validate.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="run every trace, even if it was validated with the same binaries",
+    )
     validate.add_argument("project", help="Project name")
 
     validate_args = subparsers.add_parser("validate-args")
+    validate_args.add_argument(
+        "--no-cache", action="store_true", help="do not use a stored result"
+    )
     validate_args.add_argument("project", help="Project name")
     validate_args.add_argument(
         "args", nargs="*", help="command line arguments to validate against"
@@ -763,6 +2027,9 @@ def main() -> None:
     validate_trace.add_argument(
         "-i", "--id", action="store_true", help="force treating 'name' as the trace id"
     )
+    validate_trace.add_argument(
+        "--no-cache", action="store_true", help="do not use a stored result"
+    )
     validate_trace.add_argument("project", help="Project name")
     validate_trace.add_argument(
         "name", help="trace name (or trace id if --id is provided)"
@@ -853,7 +2120,7 @@ def main() -> None:
     elif args.current_parser == "describe":
         describe_campaign(args.project)
     elif args.current_parser == "run":
-        run_campaign(args.project)
+        run_campaign(args.project, jobs=args.jobs)
     elif args.current_parser == "run-trace":
         if args.name:
             name = int(args.name) if args.id else args.name
@@ -864,12 +2131,26 @@ def main() -> None:
 
         run_campaign_trace(args.project, name)
     elif args.current_parser == "validate":
-        validate_campaign(args.project)
+        results = validate_campaign(
+            args.project,
+            jobs=args.jobs,
+            fail_fast=args.fail_fast,
+            repeat=args.repeat,
+            warmup=args.warmup,
+            use_cache=not args.no_cache,
+        )
+        _exit_with_validation_results(results)
     elif args.current_parser == "validate-trace":
         name = int(args.name) if args.id else args.name
-        validate_campaign_trace(args.project, name)
+        result = validate_campaign_trace(
+            args.project, name, use_cache=not args.no_cache
+        )
+        _exit_with_validation_results([result])
     elif args.current_parser == "validate-args":
-        validate_campaign_with_args(args.project, args.args)
+        result = validate_campaign_with_args(
+            args.project, args.args, use_cache=not args.no_cache
+        )
+        _exit_with_validation_results([result])
     elif args.current_parser == "clear-trace-data":
         clear_project_trace_data(args.project)
     elif args.current_parser == "set-trace-stdin":
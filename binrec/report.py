@@ -0,0 +1,300 @@
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .core import Span
+from .env import spans_filename
+from .errors import BinRecError
+
+logger = logging.getLogger("binrec.report")
+
+#: Tolerance, in seconds, when deciding whether a span finished before another started
+_OVERLAP_TOLERANCE = 0.001
+
+
+def load_spans(project_name: str) -> List[Span]:
+    """
+    Load the spans recorded for a project (see :func:`binrec.core.span`). Lines that
+    are not valid spans, such as a line that was partially written when the process
+    was killed, are ignored.
+
+    :param project_name: the project name
+    :returns: the recorded spans, in the order they completed
+    :raises BinRecError: the project has no recorded spans
+    """
+    filename = spans_filename(project_name)
+    if not filename.is_file():
+        raise BinRecError(f"no spans have been recorded for project: {project_name}")
+
+    spans = []
+    with filename.open() as file:
+        for lineno, line in enumerate(file, start=1):
+            try:
+                spans.append(Span.from_json(json.loads(line)))
+            except (ValueError, KeyError, TypeError) as err:
+                logger.warning(
+                    "ignoring invalid span: %s:%d: %s", filename, lineno, err
+                )
+
+    return spans
+
+
+def group_runs(spans: List[Span]) -> Dict[str, List[Span]]:
+    """
+    :param spans: the recorded spans
+    :returns: the spans of each run, ordered by the time the run started
+    """
+    runs: Dict[str, List[Span]] = defaultdict(list)
+    for record in spans:
+        runs[record.run].append(record)
+
+    return dict(
+        sorted(runs.items(), key=lambda item: min(record.started for record in item[1]))
+    )
+
+
+def critical_path(spans: List[Span], parent: Optional[str] = None) -> List[Span]:
+    """
+    Find the chain of spans, directly within ``parent``, that bounds the run time of
+    the parent. Starting from the span that finished last, the path steps back to
+    the span that finished last before the current span started.
+
+    :param spans: the spans of a single run
+    :param parent: the enclosing span id, ``None`` for the top-level spans of the run
+    :returns: the critical path, in execution order
+    """
+    children = [record for record in spans if record.parent == parent]
+    if not children:
+        return []
+
+    path = [max(children, key=lambda record: record.finished)]
+    while True:
+        current = path[-1]
+        predecessors = [
+            record
+            for record in children
+            if record.finished <= current.started + _OVERLAP_TOLERANCE
+            and record.finished < current.finished
+        ]
+        if not predecessors:
+            break
+        path.append(max(predecessors, key=lambda record: record.finished))
+
+    return path[::-1]
+
+
+def critical_path_breakdown(spans: List[Span]) -> List[Tuple[int, Span]]:
+    """
+    Expand the critical path of a run into the critical path of each span on it.
+
+    :param spans: the spans of a single run
+    :returns: each span on the critical path and its nesting depth, in execution
+        order
+    """
+    breakdown: List[Tuple[int, Span]] = []
+
+    def expand(parent: Optional[str], depth: int) -> None:
+        for record in critical_path(spans, parent):
+            breakdown.append((depth, record))
+            expand(record.id, depth + 1)
+
+    expand(None, 0)
+    return breakdown
+
+
+def compare_runs(
+    base: List[Span], current: List[Span]
+) -> List[Tuple[str, Optional[float], Optional[float]]]:
+    """
+    Compare the total run time of each stage between two runs. Spans with the same
+    name, such as each ``lift.optimize`` span, are added together.
+
+    :param base: the spans of the baseline run
+    :param current: the spans of the run to compare
+    :returns: the name, baseline run time, and current run time of each stage,
+        ``None`` if the stage did not run, ordered by the largest slowdown first
+    """
+    totals: Dict[str, List[Optional[float]]] = {}
+    for index, spans in enumerate((base, current)):
+        for record in spans:
+            entry = totals.setdefault(record.name, [None, None])
+            entry[index] = (entry[index] or 0.0) + record.seconds
+
+    rows = [(name, entry[0], entry[1]) for name, entry in totals.items()]
+    return sorted(rows, key=lambda row: (row[2] or 0.0) - (row[1] or 0.0), reverse=True)
+
+
+def _run_seconds(spans: List[Span]) -> float:
+    return max(record.finished for record in spans) - min(
+        record.started for record in spans
+    )
+
+
+def _root_names(spans: List[Span]) -> List[str]:
+    return sorted(record.name for record in spans if record.parent is None)
+
+
+def _previous_run(runs: Dict[str, List[Span]], run: str) -> Optional[str]:
+    # the most recent earlier run of the same top-level stages
+    names = list(runs)
+    for candidate in reversed(names[: names.index(run)]):
+        if _root_names(runs[candidate]) == _root_names(runs[run]):
+            return candidate
+    return None
+
+
+def _select_run(runs: Dict[str, List[Span]], run: Optional[str]) -> str:
+    if not run:
+        return list(runs)[-1]
+    if run not in runs:
+        raise BinRecError(f"run does not exist: {run}")
+    return run
+
+
+def print_runs(runs: Dict[str, List[Span]]) -> None:
+    """
+    Print the recorded runs, oldest first.
+
+    :param runs: the spans of each run, see :func:`group_runs`
+    """
+    for run, spans in runs.items():
+        stages = ", ".join(sorted(set(_root_names(spans))))
+        print(f"{run}  {_run_seconds(spans):10.3f}s  {stages}")
+
+
+def print_breakdown(run: str, spans: List[Span]) -> None:
+    """
+    Print the critical path breakdown of a run.
+
+    :param run: the run id
+    :param spans: the spans of the run
+    """
+    total = _run_seconds(spans)
+    print(f"Run {run}: {len(spans)} spans, {total:.3f}s")
+    print()
+    print(f"{'Critical Path':<40} {'Time':>10} {'%':>6} {'CPU':>10} {'Peak RSS':>12}")
+    for depth, record in critical_path_breakdown(spans):
+        name = "  " * depth + record.name
+        if record.status != "completed":
+            name += f" ({record.status})"
+        percent = 100.0 * record.seconds / total if total else 0.0
+        print(
+            f"{name:<40} {record.seconds:>9.3f}s {percent:>5.1f}% "
+            f"{record.cpu_seconds:>9.3f}s {record.peak_rss // 1024:>8d} MiB"
+        )
+
+    artifacts = {
+        path: size for record in spans for path, size in record.artifacts.items()
+    }
+    if artifacts:
+        print()
+        print("Artifacts:")
+        for path, size in sorted(artifacts.items()):
+            print(f"  {size:>14,d}  {path}")
+
+
+def print_comparison(
+    base_run: str, base: List[Span], current_run: str, current: List[Span]
+) -> None:
+    """
+    Print the run time difference of each stage between two runs.
+
+    :param base_run: the baseline run id
+    :param base: the spans of the baseline run
+    :param current_run: the run id to compare
+    :param current: the spans of the run to compare
+    """
+    print(f"Comparing run {current_run} to {base_run}")
+    print()
+    print(f"{'Stage':<40} {'Base':>10} {'Current':>10} {'Change':>10} {'%':>7}")
+    for name, before, after in compare_runs(base, current):
+        if before is None or after is None:
+            change = "added" if before is None else "removed"
+            print(
+                f"{name:<40} {before or 0.0:>9.3f}s {after or 0.0:>9.3f}s "
+                f"{change:>10}"
+            )
+            continue
+
+        delta = after - before
+        percent = f"{100.0 * delta / before:+6.1f}%" if before else ""
+        print(f"{name:<40} {before:>9.3f}s {after:>9.3f}s {delta:>+9.3f}s {percent:>7}")
+
+
+def report(
+    project_name: str,
+    run: Optional[str] = None,
+    compare: Optional[str] = None,
+    list_runs: bool = False,
+) -> None:
+    """
+    Print a report of the spans recorded for a project.
+
+    :param project_name: the project name
+    :param run: the run to report, defaults to the most recent run
+    :param compare: compare the run to this baseline run, ``"previous"`` selects the
+        most recent earlier run of the same top-level stages
+    :param list_runs: only list the recorded runs
+    :raises BinRecError: the project has no recorded spans or a run does not exist
+    """
+    runs = group_runs(load_spans(project_name))
+    if not runs:
+        raise BinRecError(f"no spans have been recorded for project: {project_name}")
+
+    if list_runs:
+        print_runs(runs)
+        return
+
+    run = _select_run(runs, run)
+    if not compare:
+        print_breakdown(run, runs[run])
+        return
+
+    if compare == "previous":
+        base_run = _previous_run(runs, run)
+        if not base_run:
+            raise BinRecError(f"no previous run of the same stages as run: {run}")
+    else:
+        base_run = _select_run(runs, compare)
+
+    print_comparison(base_run, runs[base_run], run, runs[run])
+
+
+def main() -> None:
+    import argparse
+    import sys
+
+    from .core import enable_binrec_debug_mode, init_binrec
+
+    init_binrec()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-v", "--verbose", action="count", help="enable verbose logging"
+    )
+    parser.add_argument("-r", "--run", help="run to report, defaults to the latest run")
+    parser.add_argument(
+        "-c",
+        "--compare",
+        nargs="?",
+        const="previous",
+        metavar="BASE_RUN",
+        help="compare the run to a baseline run, defaults to the previous run of the "
+        "same stages",
+    )
+    parser.add_argument(
+        "-l", "--list", action="store_true", help="list the recorded runs"
+    )
+    parser.add_argument("project_name", help="Name of analysis project")
+
+    args = parser.parse_args()
+    if args.verbose:
+        enable_binrec_debug_mode()
+
+    report(args.project_name, run=args.run, compare=args.compare, list_runs=args.list)
+    sys.exit(0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,21 +1,26 @@
+from typing import Any, Dict, List
+
 def link_prep_1(
     trace_filename: str,
     destination: str,
     working_dir: str = None,
     memssa_check_limit: int = None,
-) -> None: ...
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
 def link_prep_2(
     trace_filename: str,
     destination: str,
     working_dir: str = None,
     memssa_check_limit: int = None,
-) -> None: ...
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
 def clean(
     trace_filename: str,
     destination: str,
     working_dir: str = None,
     memssa_check_limit: int = None,
-) -> None: ...
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
 def lift(
     trace_filename: str,
     destination: str,
@@ -24,24 +29,83 @@ def lift(
     skip_link: bool = False,
     trace_calls: bool = False,
     memssa_check_limit: int = None,
-) -> None: ...
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
 def optimize(
     trace_filename: str,
     destination: str,
     working_dir: str = None,
     memssa_check_limit: int = None,
-) -> None: ...
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
 def optimize_better(
     trace_filename: str,
     destination: str,
     working_dir: str = None,
     memssa_check_limit: int = None,
-) -> None: ...
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
 def compile_prep(
     trace_filename: str,
     destination: str,
     working_dir: str = None,
     memssa_check_limit: int = None,
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
+def run_pipeline(
+    trace_filename: str,
+    destination: str,
+    helpers_filename: str,
+    working_dir: str = None,
+    memssa_check_limit: int = None,
+    optimize_better: bool = False,
+    clean_names: bool = False,
+    skip_link: bool = False,
+    trace_calls: bool = False,
+    artifacts: str = "none",
+    object_filename: str = None,
+    triple: str = None,
+    cpu: str = None,
+    features: str = None,
+    code_model: str = None,
+    object_partitions: int = 1,
+) -> List[Dict[str, Any]]: ...
+def emit_object(
+    trace_filename: str,
+    destination: str,
+    working_dir: str = None,
+    triple: str = None,
+    cpu: str = None,
+    features: str = None,
+    code_model: str = None,
+    partitions: int = 1,
+) -> List[Dict[str, Any]]: ...
+def render(
+    trace_filename: str,
+    destination: str,
+    working_dir: str = None,
+    memssa_check_limit: int = None,
 ) -> None: ...
+def link_many(
+    inputs: List[str],
+    destination: str,
+    override_base: bool = True,
+) -> None: ...
+def split_module(
+    trace_filename: str,
+    destination: str,
+    partitions: int,
+    min_functions: int = 0,
+    working_dir: str = None,
+) -> List[str]: ...
+def link_partitions(
+    inputs: List[str],
+    destination: str,
+    working_dir: str = None,
+    artifacts: str = "all",
+) -> List[Dict[str, Any]]: ...
+def function_fingerprints(filename: str) -> Dict[str, str]: ...
+def global_fingerprints(filename: str) -> Dict[str, str]: ...
+def drop_functions(filename: str, destination: str, names: List[str]) -> None: ...
 
 class LiftError(Exception): ...
@@ -1,6 +1,8 @@
+from typing import List, Union
+
 def link(
     binary_filename: str,
-    recovered_filename: str,
+    recovered_filename: Union[str, List[str]],
     runtime_library: str,
     linker_script: str,
     destination: str,
@@ -0,0 +1,239 @@
+import contextvars
+import logging
+import multiprocessing
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .core import span
+
+logger = logging.getLogger("binrec.tasks")
+
+#: Start method of the worker processes created by :func:`process_pool`
+PROCESS_START_METHOD = "forkserver"
+
+
+def process_pool(max_workers: int, **kwargs: Any) -> ProcessPoolExecutor:
+    """
+    Create a process pool. Process pools are created from :class:`TaskGraph` worker
+    threads while other tasks are running, and forking a multithreaded process
+    copies the locks held by the other threads, such as logging locks, into the
+    worker, where they are never released. The workers are started by a fork
+    server instead, see :data:`PROCESS_START_METHOD`, so the functions submitted to
+    the pool and their arguments must be picklable.
+
+    :param max_workers: maximum number of worker processes
+    :param kwargs: additional :class:`~concurrent.futures.ProcessPoolExecutor`
+        arguments, such as ``initializer``
+    :returns: the process pool
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+        **kwargs,
+    )
+
+
+@dataclass
+class Task:
+    """
+    A single task within a :class:`TaskGraph`.
+    """
+
+    #: the unique task name
+    name: str
+    #: the function that performs the task
+    func: Callable[[], Any]
+    #: the names of the tasks that must complete before this task starts
+    dependencies: List[str] = field(default_factory=list)
+    #: the time, from :func:`time.monotonic`, that the task started
+    started: Optional[float] = None
+    #: the time, from :func:`time.monotonic`, that the task finished
+    finished: Optional[float] = None
+    #: the task was skipped because a task it depends on failed
+    skipped: bool = False
+
+    @property
+    def duration(self) -> float:
+        """
+        :returns: the task run time in seconds, or ``0`` if the task did not run
+        """
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class TaskGraph:
+    """
+    A set of tasks with dependencies that are run concurrently, in threads, where the
+    dependencies allow. Tasks are added in dependency order, so a task can only
+    depend on tasks that were added before it, which guarantees the graph is acyclic.
+
+    At most ``max_workers`` tasks are submitted to the thread pool at a time. When a
+    task fails, the tasks that have not started are skipped, the tasks that are
+    already running are allowed to complete, and the first error is raised.
+
+    Each task is recorded as a span, ``"<graph name>.<task name>"``, within the span
+    that was active when the graph was run (see :func:`binrec.core.span`).
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: the graph name, used in log messages
+        """
+        self.name = name
+        self.tasks: Dict[str, Task] = {}
+
+    def add(
+        self, name: str, func: Callable[[], Any], dependencies: Iterable[str] = ()
+    ) -> Task:
+        """
+        Add a task to the graph.
+
+        :param name: the unique task name
+        :param func: the function that performs the task
+        :param dependencies: the names of the tasks that must complete first
+        :returns: the new task
+        :raises ValueError: the name is already used or a dependency does not exist
+        """
+        if name in self.tasks:
+            raise ValueError(f"duplicate task: {name}")
+
+        dependencies = list(dependencies)
+        for dependency in dependencies:
+            if dependency not in self.tasks:
+                raise ValueError(f"task {name} depends on unknown task: {dependency}")
+
+        task = self.tasks[name] = Task(name, func, dependencies)
+        return task
+
+    def run(self, max_workers: Optional[int] = None) -> None:
+        """
+        Run all tasks. Each task starts as soon as all of its dependencies have
+        completed. The task timings and the critical path are logged once all tasks
+        have completed.
+
+        :param max_workers: maximum number of tasks that run concurrently, defaults to
+            the number of tasks
+        :raises Exception: the first error raised by a task
+        """
+        remaining = dict(self.tasks)
+        done: List[str] = []
+        error: Optional[BaseException] = None
+        workers = max_workers or max(len(self.tasks), 1)
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=self.name
+        ) as pool:
+            running: Dict[Future, Task] = {}
+
+            def run_task(task: Task, context: contextvars.Context) -> None:
+                task.started = time.monotonic()
+                try:
+                    context.run(run_span, task)
+                finally:
+                    task.finished = time.monotonic()
+
+            def run_span(task: Task) -> None:
+                with span(f"{self.name}.{task.name}"):
+                    task.func()
+
+            def schedule() -> None:
+                # tasks are only submitted when a worker is free, so that the tasks
+                # that have not started can be skipped when a task fails
+                for task in list(remaining.values()):
+                    if len(running) >= workers:
+                        break
+                    if all(dep in done for dep in task.dependencies):
+                        del remaining[task.name]
+                        logger.debug("%s: starting task %s", self.name, task.name)
+                        # tasks run in a copy of the caller's context so that their
+                        # spans are nested within the caller's span
+                        context = contextvars.copy_context()
+                        running[pool.submit(run_task, task, context)] = task
+
+            schedule()
+            while running:
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    exc = future.exception()
+                    if exc:
+                        logger.debug(
+                            "%s: task %s failed: %s", self.name, task.name, exc
+                        )
+                        error = error or exc
+                    else:
+                        done.append(task.name)
+
+                if not error:
+                    schedule()
+
+        for task in remaining.values():
+            task.skipped = True
+
+        self.log_timings()
+        if error:
+            raise error
+
+    def timings(self) -> Dict[str, float]:
+        """
+        :returns: the run time, in seconds, of each task that ran
+        """
+        return {
+            name: task.duration
+            for name, task in self.tasks.items()
+            if task.started is not None
+        }
+
+    def critical_path(self) -> List[Task]:
+        """
+        :returns: the chain of dependent tasks with the longest total run time, which
+            bounds the run time of the graph, in execution order
+        """
+        lengths: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for task in self.tasks.values():
+            # tasks are stored in dependency order
+            longest = max(task.dependencies, key=lambda dep: lengths[dep], default=None)
+            previous[task.name] = longest
+            lengths[task.name] = task.duration + (lengths[longest] if longest else 0.0)
+
+        if not lengths:
+            return []
+
+        path = []
+        name: Optional[str] = max(lengths, key=lambda key: lengths[key])
+        while name:
+            path.append(self.tasks[name])
+            name = previous[name]
+
+        return path[::-1]
+
+    def log_timings(self) -> None:
+        """
+        Log the run time of each task and the critical path.
+        """
+        for task in self.tasks.values():
+            if task.skipped:
+                logger.debug("%s: task %s skipped", self.name, task.name)
+            else:
+                logger.debug(
+                    "%s: task %s took %.3fs", self.name, task.name, task.duration
+                )
+
+        path = self.critical_path()
+        if path:
+            logger.info(
+                "%s: critical path %s (%.3fs)",
+                self.name,
+                " -> ".join(task.name for task in path),
+                sum(task.duration for task in path),
+            )
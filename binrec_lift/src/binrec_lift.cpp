@@ -51,15 +51,28 @@
 #include "tag_inst_pc.hpp"
 #include "utils/intrinsic_cleaner.hpp"
 #include "utils/name_cleaner.hpp"
+#include <llvm/ADT/StringSwitch.h>
 #include <llvm/ADT/Triple.h>
 #include <llvm/Analysis/GlobalsModRef.h>
 #include <llvm/Analysis/MemorySSA.h>
 #include <llvm/Analysis/OptimizationRemarkEmitter.h>
+#include <llvm/Analysis/TargetLibraryInfo.h>
+#include <llvm/Bitcode/BitcodeWriter.h>
 #include <llvm/Bitcode/BitcodeWriterPass.h>
+#include <llvm/CodeGen/ParallelCG.h>
 #include <llvm/IR/IRPrintingPasses.h>
+#include <llvm/IR/LegacyPassManager.h>
+#include <llvm/IR/Verifier.h>
 #include <llvm/IRReader/IRReader.h>
+#include <llvm/Linker/Linker.h>
+#include <llvm/MC/TargetRegistry.h>
 #include <llvm/Passes/OptimizationLevel.h>
 #include <llvm/Passes/PassBuilder.h>
+#include <llvm/Support/Host.h>
+#include <llvm/Support/Path.h>
+#include <llvm/Support/TargetSelect.h>
+#include <llvm/Target/TargetMachine.h>
+#include <llvm/Target/TargetOptions.h>
 #include <llvm/Transforms/IPO/AlwaysInliner.h>
 #include <llvm/Transforms/IPO/GlobalDCE.h>
 #include <llvm/Transforms/IPO/GlobalOpt.h>
@@ -67,6 +80,7 @@
 #include <llvm/Transforms/Scalar/DCE.h>
 #include <llvm/Transforms/Scalar/GVN.h>
 #include <llvm/Transforms/Scalar/LICM.h>
+#include <llvm/Transforms/Utils/SplitModule.h>
 
 using namespace llvm;
 using namespace llvm::cl;
@@ -169,6 +183,13 @@ namespace binrec {
             mpm.addPass(GlobalOptPass{});
         }
 
+        if (ctx.cleanup_partitions) {
+            // The partitions were optimized separately, so the globals that are only
+            // constant or dead across the whole program are cleaned up once they are linked.
+            mpm.addPass(GlobalOptPass{});
+            mpm.addPass(GlobalDCEPass{});
+        }
+
         if (ctx.compile) {
             mpm.addPass(HaltOnDeclarationsPass{});
             mpm.addPass(RemoveSectionsPass{});
@@ -183,23 +204,37 @@ namespace binrec {
         return mpm;
     }
 
-    void run_lift(LiftContext &ctx)
+    /**
+     * Open an output file for a pass that writes the module.
+     */
+    static auto open_output(const string &filename) -> unique_ptr<raw_fd_ostream>
     {
-        // This isn't ideal from the standpoint of a Python API. However, because
-        // binrec_lift appears to be stack-based, breaking this function up may cause
-        // segfaults as structs/classes go out of scope. This method is very fragile.
-        LLVMContext llvm_context;
-        SMDiagnostic err;
-        unique_ptr<Module> module = parseIRFile(ctx.trace_filename, err, llvm_context);
-        if (!module) {
-            string error;
-            raw_string_ostream error_stream{error};
-            err.print("binrec-lift", error_stream);
+        error_code ec;
+        auto output = make_unique<raw_fd_ostream>(filename, ec);
+        if (ec) {
+            LLVM_ERROR(error) << "failed to open file " << filename << ": " << ec.message();
             throw runtime_error{error};
         }
-        Triple triple(module->getTargetTriple());
+        return output;
+    }
 
-        PassBuilder pb;
+    /**
+     * Run the passes enabled by the lift context on a module. If the context has a
+     * destination, the module is written to {destination}.bc once the passes have run and,
+     * when the context's artifact policy is ArtifactPolicy::All, the textual views,
+     * {destination}.ll and {destination}-memssa.ll, are written as well.
+     */
+    static void run_passes(LiftContext &ctx, Module &module)
+    {
+        // This isn't ideal from the standpoint of a Python API. However, because
+        // binrec_lift appears to be stack-based, breaking this function up may cause
+        // segfaults as structs/classes go out of scope. This method is very fragile: the
+        // pass and analysis managers must all live until the passes have run.
+        PassInstrumentationCallbacks pic;
+        if (ctx.statistics) {
+            ctx.statistics->register_callbacks(pic);
+        }
+        PassBuilder pb{nullptr, PipelineTuningOptions{}, None, &pic};
 
         AAManager aa = pb.buildDefaultAAPipeline();
         aa.registerFunctionAnalysis<EnvAa>();
@@ -221,31 +256,445 @@ namespace binrec {
 
         ModulePassManager mpm = build_pipeline(ctx, pb);
 
+        unique_ptr<raw_fd_ostream> output_bc;
+        unique_ptr<raw_fd_ostream> output_ll;
+        unique_ptr<raw_fd_ostream> memssa_ll;
+
+        if (!ctx.destination.empty() && ctx.write_bitcode) {
+            output_bc = open_output(ctx.destination + ".bc");
+            mpm.addPass(BitcodeWriterPass{*output_bc});
+        }
+
+        // The textual views are rarely read and, for large traces, are much larger and
+        // slower to produce than the bitcode. They can be rendered from the bitcode later
+        // with render().
+        if (!ctx.destination.empty() && ctx.artifacts == ArtifactPolicy::All) {
+            output_ll = open_output(ctx.destination + ".ll");
+            mpm.addPass(PrintModulePass{*output_ll});
+
+            memssa_ll = open_output(ctx.destination + "-memssa.ll");
+            mpm.addPass(RequireAnalysisPass<GlobalsAA, Module>{});
+            mpm.addPass(createModuleToFunctionPassAdaptor(MemorySSAPrinterPass{*memssa_ll}));
+        }
+
+        mpm.run(module, mam);
+    }
+
+    void run_lift(LiftContext &ctx)
+    {
+        LLVMContext llvm_context;
+        unique_ptr<Module> module = load_module(ctx.trace_filename, llvm_context);
+        run_passes(ctx, *module);
+    }
+
+    void render(const string &trace_filename, const string &destination)
+    {
+        LLVMContext llvm_context;
+        unique_ptr<Module> module = load_module(trace_filename, llvm_context);
+
+        LiftContext ctx;
+        ctx.destination = destination;
+        ctx.artifacts = ArtifactPolicy::All;
+        ctx.write_bitcode = false;
+        run_passes(ctx, *module);
+    }
+
+    /**
+     * Write an intermediate module of run_pipeline() according to the artifact policy.
+     */
+    static void save_stage(Module &module, const PipelineOptions &options, const string &stage)
+    {
+        if (options.artifacts == ArtifactPolicy::None) {
+            return;
+        }
+
+        LiftContext ctx;
+        ctx.destination = stage;
+        ctx.artifacts = options.artifacts;
+        ctx.statistics = options.statistics;
+        run_passes(ctx, module);
+    }
+
+    void run_pipeline(const PipelineOptions &options)
+    {
+        // The module stays in memory from the captured trace to the recovered module,
+        // which replaces the clean -> llvm-link -> lift -> optimize -> compile_prep chain
+        // where every step wrote and parsed the entire module. Each stage gets new pass
+        // and analysis managers, the same as running the stages separately.
+        LLVMContext llvm_context;
+        unique_ptr<Module> module = load_module(options.trace_filename, llvm_context);
+        PassStatistics *statistics = options.statistics;
+        auto set_stage = [statistics](const string &stage) {
+            if (statistics) {
+                statistics->set_stage(stage);
+            }
+        };
+
+        {
+            set_stage("clean");
+            LiftContext ctx;
+            ctx.clean = true;
+            ctx.statistics = statistics;
+            run_passes(ctx, *module);
+            save_stage(*module, options, "cleaned");
+        }
+
+        // This is equivalent to "llvm-link -o linked.bc cleaned.bc custom-helpers.bc"
+        set_stage("link");
+        if (statistics) {
+            statistics->begin("LinkCustomHelpers", *module);
+        }
+        if (Linker::linkModules(*module, load_module(options.helpers_filename, llvm_context)))
+        {
+            LLVM_ERROR(error) << "failed to link custom helpers: " << options.helpers_filename;
+            throw runtime_error{error};
+        }
+        if (statistics) {
+            statistics->end(module.get());
+        }
+        save_stage(*module, options, "linked");
+
+        {
+            set_stage("lift");
+            LiftContext ctx;
+            ctx.statistics = statistics;
+            ctx.lift = true;
+            ctx.clean_names = options.clean_names;
+            ctx.skip_link = options.skip_link;
+            ctx.trace_calls = options.trace_calls;
+            run_passes(ctx, *module);
+            save_stage(*module, options, "lifted");
+        }
+
+        {
+            set_stage("optimize");
+            LiftContext ctx;
+            ctx.statistics = statistics;
+            ctx.optimize = !options.optimize_better;
+            ctx.optimize_better = options.optimize_better;
+            run_passes(ctx, *module);
+            save_stage(*module, options, "optimized");
+        }
+
+        {
+            set_stage("compile_prep");
+            LiftContext ctx;
+            ctx.statistics = statistics;
+            ctx.compile = true;
+            ctx.destination = options.destination;
+            ctx.artifacts = options.artifacts;
+            run_passes(ctx, *module);
+        }
+
+        // The object file is compiled from the in-memory module instead of running llc on
+        // the recovered bitcode that was just written.
+        if (!options.object_filename.empty()) {
+            set_stage("emit_object");
+            emit_object(*module, options.object, options.object_filename, statistics);
+        }
+    }
+
+    static auto count_definitions(const Module &module) -> unsigned
+    {
+        return count_if(module.begin(), module.end(), [](const Function &function) {
+            return !function.isDeclaration();
+        });
+    }
+
+    auto split_module(
+        const string &trace_filename,
+        const string &destination,
+        unsigned partitions,
+        unsigned min_functions) -> vector<string>
+    {
+        LLVMContext llvm_context;
+        unique_ptr<Module> module = load_module(trace_filename, llvm_context);
+
+        vector<string> filenames;
+        if (partitions < 2 || count_definitions(*module) < min_functions) {
+            return filenames;
+        }
+
+        // Local symbols are preserved, so functions that reference the same internal
+        // functions or globals, directly or through their callees, are kept in the same
+        // partition. Nothing is externalized and each partition is optimized on its own.
+        unsigned index = 0;
+        SplitModule(
+            *module,
+            partitions,
+            [&](unique_ptr<Module> partition) {
+                string filename = destination + "-" + to_string(index++) + ".bc";
+                if (count_definitions(*partition)) {
+                    write_bitcode(*partition, filename);
+                    filenames.push_back(filename);
+                }
+            },
+            true);
+
+        return filenames;
+    }
+
+    void link_partitions(LiftContext &ctx, const vector<string> &inputs)
+    {
+        if (inputs.empty()) {
+            throw runtime_error{"no partitions to link"};
+        }
+
+        LLVMContext llvm_context;
+        unique_ptr<Module> module = load_module(inputs[0], llvm_context);
+        if (ctx.statistics) {
+            ctx.statistics->begin("LinkPartitions", *module);
+        }
+        for (auto input = next(inputs.begin()); input != inputs.end(); ++input) {
+            if (Linker::linkModules(*module, load_module(*input, llvm_context))) {
+                LLVM_ERROR(error) << "failed to link partition: " << *input;
+                throw runtime_error{error};
+            }
+        }
+        if (ctx.statistics) {
+            ctx.statistics->end(module.get());
+        }
+
+        ctx.cleanup_partitions = true;
+        run_passes(ctx, *module);
+    }
+
+    static auto parse_code_model(const string &name) -> Optional<CodeModel::Model>
+    {
+        if (name.empty()) {
+            return None;
+        }
+
+        Optional<CodeModel::Model> model = StringSwitch<Optional<CodeModel::Model>>(name)
+                                               .Case("tiny", CodeModel::Tiny)
+                                               .Case("small", CodeModel::Small)
+                                               .Case("kernel", CodeModel::Kernel)
+                                               .Case("medium", CodeModel::Medium)
+                                               .Case("large", CodeModel::Large)
+                                               .Default(None);
+        if (!model) {
+            LLVM_ERROR(error) << "unknown code model: " << name;
+            throw runtime_error{error};
+        }
+        return model;
+    }
+
+    static auto create_target_machine(
+        const Target &target,
+        const Triple &triple,
+        const ObjectOptions &options) -> unique_ptr<TargetMachine>
+    {
+        unique_ptr<TargetMachine> machine{target.createTargetMachine(
+            triple.getTriple(),
+            options.cpu,
+            options.features,
+            TargetOptions{},
+            None,
+            parse_code_model(options.code_model),
+            CodeGenOpt::Default)};
+        if (!machine) {
+            LLVM_ERROR(error) << "failed to create target machine: " << triple.str();
+            throw runtime_error{error};
+        }
+        return machine;
+    }
+
+    auto object_partition_filenames(const string &filename, unsigned partitions) -> vector<string>
+    {
+        if (partitions <= 1) {
+            return {filename};
+        }
+
+        SmallString<128> stem{filename};
+        string extension = sys::path::extension(filename).str();
+        sys::path::replace_extension(stem, "");
+
+        vector<string> filenames;
+        for (unsigned index = 0; index < partitions; ++index) {
+            filenames.push_back((stem + "-" + Twine{index} + extension).str());
+        }
+        return filenames;
+    }
+
+    static void emit_split_objects(
+        Module &module,
+        const Target &target,
+        const Triple &triple,
+        const ObjectOptions &options,
+        const string &destination,
+        PassStatistics *statistics)
+    {
+        vector<unique_ptr<raw_fd_ostream>> outputs;
+        vector<raw_pwrite_stream *> streams;
+        vector<string> filenames = object_partition_filenames(destination, options.partitions);
+        for (const string &filename : filenames) {
+            error_code ec;
+            auto output = make_unique<raw_fd_ostream>(filename, ec, sys::fs::OF_None);
+            if (ec) {
+                LLVM_ERROR(error) << "failed to open file " << filename << ": " << ec.message();
+                throw runtime_error{error};
+            }
+            streams.push_back(output.get());
+            outputs.push_back(move(output));
+        }
+
+        // splitCodeGen partitions the module along its call graph, promoting the local
+        // symbols that are referenced across partitions to hidden globals, and compiles each
+        // partition in its own context and thread with a target machine from the factory.
+        if (statistics) {
+            statistics->begin("EmitObject", module);
+        }
+        splitCodeGen(
+            module,
+            streams,
+            {},
+            [&] { return create_target_machine(target, triple, options); },
+            CGFT_ObjectFile);
+        if (statistics) {
+            statistics->end(&module);
+        }
+    }
+
+    void emit_object(
+        Module &module,
+        const ObjectOptions &options,
+        const string &destination,
+        PassStatistics *statistics)
+    {
+        // binrec only recovers x86 binaries, so only the native target is registered.
+        static bool initialized = [] {
+            InitializeNativeTarget();
+            InitializeNativeTargetAsmPrinter();
+            return true;
+        }();
+        (void)initialized;
+
+        string triple_name = options.triple.empty() ? module.getTargetTriple() : options.triple;
+        if (triple_name.empty()) {
+            triple_name = sys::getDefaultTargetTriple();
+        }
+        Triple triple{Triple::normalize(triple_name)};
+
+        string lookup_error;
+        const Target *target = TargetRegistry::lookupTarget("", triple, lookup_error);
+        if (!target) {
+            LLVM_ERROR(error) << "unsupported target " << triple.str() << ": " << lookup_error;
+            throw runtime_error{error};
+        }
+
+        unique_ptr<TargetMachine> machine = create_target_machine(*target, triple, options);
+
+        // This matches llc, which overrides the module's data layout with the target's
+        module.setTargetTriple(triple.getTriple());
+        module.setDataLayout(machine->createDataLayout());
+
+        if (options.partitions > 1) {
+            emit_split_objects(module, *target, triple, options, destination, statistics);
+            return;
+        }
+
         error_code ec;
-        raw_fd_ostream output_bc{ctx.destination + ".bc", ec};
+        raw_fd_ostream output{destination, ec, sys::fs::OF_None};
         if (ec) {
-            LLVM_ERROR(error) << "failed to open file " << ctx.destination
-                              << ".bc: " << ec.message();
+            LLVM_ERROR(error) << "failed to open file " << destination << ": " << ec.message();
             throw runtime_error{error};
         }
-        raw_fd_ostream output_ll{ctx.destination + ".ll", ec};
-        if (ec) {
-            LLVM_ERROR(error) << "failed to open file " << ctx.destination
-                              << ".ll: " << ec.message();
+
+        legacy::PassManager pm;
+        TargetLibraryInfoImpl tlii{triple};
+        pm.add(new TargetLibraryInfoWrapperPass{tlii});
+        if (machine->addPassesToEmitFile(pm, output, nullptr, CGFT_ObjectFile)) {
+            LLVM_ERROR(error) << "target cannot emit object files: " << triple.str();
+            throw runtime_error{error};
+        }
+
+        // Code generation runs on the legacy pass manager, which is not instrumented, so
+        // it is recorded as a single pass.
+        if (statistics) {
+            statistics->begin("EmitObject", module);
+        }
+        pm.run(module);
+        if (statistics) {
+            statistics->end(&module);
+        }
+    }
+
+    void emit_object(
+        const string &trace_filename,
+        const ObjectOptions &options,
+        const string &destination,
+        PassStatistics *statistics)
+    {
+        LLVMContext llvm_context;
+        unique_ptr<Module> module = load_module(trace_filename, llvm_context);
+        emit_object(*module, options, destination, statistics);
+    }
+
+    auto load_module(const string &filename, LLVMContext &llvm_context) -> unique_ptr<Module>
+    {
+        SMDiagnostic err;
+        unique_ptr<Module> module = parseIRFile(filename, err, llvm_context);
+        if (!module) {
+            string error;
+            raw_string_ostream error_stream{error};
+            err.print("binrec-lift", error_stream);
             throw runtime_error{error};
         }
-        mpm.addPass(BitcodeWriterPass{output_bc});
-        mpm.addPass(PrintModulePass{output_ll});
+        return module;
+    }
 
-        raw_fd_ostream memssa_ll{ctx.destination + "-memssa.ll", ec};
+    void write_bitcode(Module &module, const string &destination)
+    {
+        error_code ec;
+        raw_fd_ostream output_bc{destination, ec};
         if (ec) {
-            LLVM_ERROR(error) << "failed to open file " << ctx.destination
-                              << "-memssa.ll: " << ec.message();
+            LLVM_ERROR(error) << "failed to open file " << destination << ": " << ec.message();
+            throw runtime_error{error};
+        }
+        WriteBitcodeToFile(module, output_bc);
+    }
+
+    void link_modules(const vector<string> &inputs, const string &destination, bool override_base)
+    {
+        if (inputs.empty()) {
+            throw runtime_error{"no input modules to link"};
+        }
+
+        // The linked module is kept in memory and each input is only parsed once.
+        LLVMContext llvm_context;
+        unique_ptr<Module> composite = load_module(inputs[0], llvm_context);
+
+        for (auto input = next(inputs.begin()); input != inputs.end(); ++input) {
+            unique_ptr<Module> module = load_module(*input, llvm_context);
+            bool failed;
+
+            if (override_base) {
+                // This is equivalent to "llvm-link -override=<composite> <input>": the
+                // input is linked into an empty module and then the composite module is
+                // linked with OverrideFromSrc, so that the definitions already in the
+                // composite module take precedence over the input's definitions.
+                auto linked = make_unique<Module>("llvm-link", llvm_context);
+                Linker linker{*linked};
+                failed = linker.linkInModule(move(module)) ||
+                         linker.linkInModule(move(composite), Linker::Flags::OverrideFromSrc);
+                composite = move(linked);
+            } else {
+                failed = Linker::linkModules(*composite, move(module));
+            }
+
+            if (failed) {
+                LLVM_ERROR(error) << "failed to link module: " << *input;
+                throw runtime_error{error};
+            }
+        }
+
+        string verify_error;
+        raw_string_ostream verify_stream{verify_error};
+        if (verifyModule(*composite, &verify_stream)) {
+            LLVM_ERROR(error) << "linked module is broken: " << verify_stream.str();
             throw runtime_error{error};
         }
-        mpm.addPass(RequireAnalysisPass<GlobalsAA, Module>{});
-        mpm.addPass(createModuleToFunctionPassAdaptor(MemorySSAPrinterPass{memssa_ll}));
 
-        mpm.run(*module, mam);
+        write_bitcode(*composite, destination);
     }
 } // namespace binrec
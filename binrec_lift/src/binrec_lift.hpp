@@ -1,10 +1,56 @@
 #ifndef BINREC_LIFT_HPP
 #define BINREC_LIFT_HPP
 
+#include "debug/pass_statistics.hpp"
 #include "lift_context.hpp"
 #include <llvm/Passes/PassBuilder.h>
+#include <string>
+#include <vector>
 
 namespace binrec {
+    /// Code generation options for emit_object(). Empty options use the same defaults as
+    /// llc.
+    struct ObjectOptions {
+        /// the target triple, defaults to the module's target triple
+        std::string triple;
+        /// the target CPU
+        std::string cpu;
+        /// the target features, such as "+sse2,-avx"
+        std::string features;
+        /// the code model: "tiny", "small", "kernel", "medium", or "large"
+        std::string code_model;
+        /// the number of partitions of the module to generate code for concurrently. Each
+        /// partition is written to its own object file, see object_partition_filenames().
+        unsigned partitions = 1;
+    };
+
+    /// Options for run_pipeline(), which runs every lift stage, from cleaning the captured
+    /// trace to preparing the recovered module for compilation, on a single module.
+    struct PipelineOptions {
+        /// the captured trace bitcode
+        std::string trace_filename;
+        /// the output file basename of the recovered module
+        std::string destination;
+        /// the custom helpers bitcode that is linked into the cleaned module
+        std::string helpers_filename;
+        /// use the optimize_better pipeline instead of the default -O3 pipeline
+        bool optimize_better = false;
+        bool clean_names = false;
+        bool skip_link = false;
+        bool trace_calls = false;
+        /// the files to write: ArtifactPolicy::None only writes the recovered bitcode,
+        /// ArtifactPolicy::Bitcode also writes the intermediate modules to "<stage>.bc" for
+        /// the "cleaned", "linked", "lifted", and "optimized" stages, and ArtifactPolicy::All
+        /// also writes the LLVM IR and MemorySSA dump of every module
+        ArtifactPolicy artifacts = ArtifactPolicy::None;
+        /// the object file to compile the recovered module to, if not empty
+        std::string object_filename;
+        /// the code generation options of the object file
+        ObjectOptions object;
+        /// records the statistics of each pass, if set
+        PassStatistics *statistics = nullptr;
+    };
+
     auto build_pipeline(LiftContext &ctx, llvm::PassBuilder &pb) -> llvm::ModulePassManager;
     auto initialize_lift(LiftContext &ctx, llvm::ModulePassManager &mpm) -> std::error_code;
     void initialize_pipeline(
@@ -13,6 +59,46 @@ namespace binrec {
         llvm::ModuleAnalysisManager &mam,
         llvm::AAManager &aa);
     void run_lift(LiftContext &ctx);
+    void run_pipeline(const PipelineOptions &options);
+    /// Split a module into at most `partitions` modules along call graph boundaries and
+    /// write each partition that defines a function to "<destination>-<N>.bc". Nothing is
+    /// written when the module defines fewer than `min_functions` functions.
+    /// @returns the partition filenames
+    auto split_module(
+        const std::string &trace_filename,
+        const std::string &destination,
+        unsigned partitions,
+        unsigned min_functions) -> std::vector<std::string>;
+    /// Link the optimized partitions of split_module() and run the module-level cleanup
+    /// passes, writing the result to the context's destination.
+    void link_partitions(LiftContext &ctx, const std::vector<std::string> &inputs);
+    /// Write the LLVM IR, "<destination>.ll", and MemorySSA dump, "<destination>-memssa.ll",
+    /// of a bitcode file.
+    void render(const std::string &trace_filename, const std::string &destination);
+    /// @returns the object files that emit_object() writes for `partitions` partitions:
+    /// `filename` for a single partition, otherwise "<stem>-<N><extension>".
+    auto object_partition_filenames(const std::string &filename, unsigned partitions)
+        -> std::vector<std::string>;
+    /// Compile a module to an object file, the same as "llc -filetype obj". When the options
+    /// request multiple partitions, the module is split and each partition is compiled on
+    /// its own thread to object_partition_filenames().
+    void emit_object(
+        llvm::Module &module,
+        const ObjectOptions &options,
+        const std::string &destination,
+        PassStatistics *statistics = nullptr);
+    void emit_object(
+        const std::string &trace_filename,
+        const ObjectOptions &options,
+        const std::string &destination,
+        PassStatistics *statistics = nullptr);
+    auto load_module(const std::string &filename, llvm::LLVMContext &llvm_context)
+        -> std::unique_ptr<llvm::Module>;
+    void write_bitcode(llvm::Module &module, const std::string &destination);
+    void link_modules(
+        const std::vector<std::string> &inputs,
+        const std::string &destination,
+        bool override_base);
 } // namespace binrec
 
 #endif
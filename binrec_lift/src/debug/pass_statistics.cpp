@@ -0,0 +1,95 @@
+#include "pass_statistics.hpp"
+#include <sys/resource.h>
+
+using namespace binrec;
+using namespace llvm;
+
+namespace {
+    auto count_module(const Module &module) -> ModuleCounts
+    {
+        ModuleCounts counts;
+        for (const Function &function : module) {
+            if (function.isDeclaration()) {
+                continue;
+            }
+            counts.functions++;
+            for (const BasicBlock &block : function) {
+                counts.blocks++;
+                counts.instructions += block.size();
+            }
+        }
+        return counts;
+    }
+
+    auto peak_rss() -> long
+    {
+        struct rusage usage {};
+        getrusage(RUSAGE_SELF, &usage);
+        // ru_maxrss is in KiB on Linux
+        return usage.ru_maxrss;
+    }
+
+    auto module_of(Any ir) -> const Module *
+    {
+        return any_isa<const Module *>(ir) ? any_cast<const Module *>(ir) : nullptr;
+    }
+} // namespace
+
+void PassStatistics::set_stage(const std::string &stage)
+{
+    stage_ = stage;
+}
+
+void PassStatistics::register_callbacks(PassInstrumentationCallbacks &pic)
+{
+    // Counting is linear in the module size, so only module passes are recorded. The
+    // passes nested in a module pass adaptor are part of the adaptor's record.
+    pic.registerBeforeNonSkippedPassCallback([this](StringRef name, Any ir) {
+        if (const Module *module = module_of(ir)) {
+            begin(name, *module);
+        }
+    });
+    pic.registerAfterPassCallback([this](StringRef, Any ir, const PreservedAnalyses &) {
+        if (const Module *module = module_of(ir)) {
+            end(module);
+        }
+    });
+    pic.registerAfterPassInvalidatedCallback([this](StringRef name, const PreservedAnalyses &) {
+        // The IR unit of the pass is gone. This never happens to a module, but a
+        // function or CGSCC pass may be invalidated, so only a matching module pass is
+        // finished.
+        if (!running_.empty() && records_[running_.back()].name == name) {
+            end(nullptr);
+        }
+    });
+}
+
+void PassStatistics::begin(StringRef name, const Module &module)
+{
+    PassRecord record;
+    record.stage = stage_;
+    record.name = name.str();
+    record.depth = running_.size();
+    record.before = count_module(module);
+    record.peak_rss_before = peak_rss();
+
+    running_.push_back(records_.size());
+    records_.push_back(std::move(record));
+    started_.push_back(std::chrono::steady_clock::now());
+}
+
+void PassStatistics::end(const Module *module)
+{
+    if (running_.empty()) {
+        return;
+    }
+
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - started_.back();
+    PassRecord &record = records_[running_.back()];
+    running_.pop_back();
+    started_.pop_back();
+
+    record.seconds = elapsed.count();
+    record.after = module ? count_module(*module) : ModuleCounts{};
+    record.peak_rss_after = peak_rss();
+}
@@ -0,0 +1,66 @@
+#ifndef BINREC_PASS_STATISTICS_HPP
+#define BINREC_PASS_STATISTICS_HPP
+
+#include <llvm/IR/Module.h>
+#include <llvm/IR/PassInstrumentation.h>
+#include <chrono>
+#include <string>
+#include <vector>
+
+namespace binrec {
+    /// The size of a module.
+    struct ModuleCounts {
+        size_t functions = 0;
+        size_t blocks = 0;
+        size_t instructions = 0;
+    };
+
+    /// The statistics of a single module pass run.
+    struct PassRecord {
+        /// the lift stage that ran the pass, such as "clean" or "optimize"
+        std::string stage;
+        /// the pass name
+        std::string name;
+        /// the nesting depth of the pass within the stage pipeline, 0 for top-level passes
+        unsigned depth = 0;
+        /// the wall time of the pass, in seconds
+        double seconds = 0.0;
+        ModuleCounts before;
+        ModuleCounts after;
+        /// the peak resident set size of the process, in KiB, before and after the pass
+        long peak_rss_before = 0;
+        long peak_rss_after = 0;
+    };
+
+    /// Records the wall time, module size, and peak memory usage of every module pass.
+    /// Function, loop, and CGSCC passes are accounted for by the module pass adaptor
+    /// that runs them.
+    class PassStatistics {
+    public:
+        /// Set the stage name of the passes that run next.
+        void set_stage(const std::string &stage);
+
+        /// Record the passes run by a pass manager that uses these callbacks.
+        void register_callbacks(llvm::PassInstrumentationCallbacks &pic);
+
+        /// Start recording a pass that is not run by an instrumented pass manager.
+        void begin(llvm::StringRef name, const llvm::Module &module);
+
+        /// Finish recording the most recently started pass.
+        void end(const llvm::Module *module);
+
+        auto records() const -> const std::vector<PassRecord> &
+        {
+            return records_;
+        }
+
+    private:
+        std::string stage_;
+        std::vector<PassRecord> records_;
+        /// the indexes, in records_, of the passes that are running
+        std::vector<size_t> running_;
+        std::vector<std::chrono::steady_clock::time_point> started_;
+    };
+} // namespace binrec
+
+#endif
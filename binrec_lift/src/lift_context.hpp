@@ -4,6 +4,17 @@
 #include <llvm/Passes/PassBuilder.h>
 
 namespace binrec {
+    class PassStatistics;
+
+    /// The files written for each module that a lift operation produces.
+    enum class ArtifactPolicy {
+        /// only the modules that later operations read
+        None,
+        /// the bitcode of every module, including intermediate modules
+        Bitcode,
+        /// the bitcode, LLVM IR, and MemorySSA dump of every module
+        All,
+    };
 
     class LiftContext {
     public:
@@ -14,11 +25,17 @@ namespace binrec {
         bool optimize;
         bool optimize_better;
         bool compile;
+        /// clean up the linked partitions of split_module()
+        bool cleanup_partitions;
         bool skip_link;
         bool clean_names;
         bool trace_calls;
         std::string trace_filename;
         std::string destination;
+        ArtifactPolicy artifacts;
+        bool write_bitcode;
+        /// records the statistics of each pass, if set
+        PassStatistics *statistics;
 
         LiftContext() :
                 link_prep_1{false},
@@ -28,11 +45,15 @@ namespace binrec {
                 optimize{false},
                 optimize_better{false},
                 compile{false},
+                cleanup_partitions{false},
                 skip_link{false},
                 clean_names{false},
                 trace_calls(false),
                 trace_filename{},
-                destination{}
+                destination{},
+                artifacts{ArtifactPolicy::All},
+                write_bitcode{true},
+                statistics{nullptr}
         {
         }
 
@@ -0,0 +1,206 @@
+#include "dedup_functions.hpp"
+#include "binrec_lift.hpp"
+#include "ir/selectors.hpp"
+#include <llvm/ADT/DenseMap.h>
+#include <llvm/IR/Instructions.h>
+#include <llvm/Support/MD5.h>
+
+using namespace binrec;
+using namespace llvm;
+using namespace std;
+
+namespace {
+    /// Hash a function body independently of the module it is in. Local values are
+    /// numbered in order and global values are referenced by name, so that identical
+    /// functions in different captures have the same hash. Metadata is ignored.
+    class FunctionHasher {
+        MD5 hash;
+        DenseMap<const Value *, unsigned> locals;
+
+        void update(StringRef str)
+        {
+            hash.update(str);
+            hash.update(";");
+        }
+
+        void update(uint64_t value)
+        {
+            update(to_string(value));
+        }
+
+        void update(const Type *type)
+        {
+            string str;
+            raw_string_ostream os{str};
+            type->print(os);
+            update(os.str());
+        }
+
+        void update(const Value *value)
+        {
+            auto local = locals.find(value);
+            if (local != locals.end()) {
+                update(local->second);
+                return;
+            }
+
+            string str;
+            raw_string_ostream os{str};
+            if (auto *global = dyn_cast<GlobalValue>(value)) {
+                os << "@" << global->getName();
+            } else if (isa<MetadataAsValue>(value)) {
+                os << "metadata";
+            } else {
+                value->printAsOperand(os, true);
+            }
+            update(os.str());
+        }
+
+        void number(const Value *value)
+        {
+            locals.try_emplace(value, locals.size());
+        }
+
+    public:
+        auto run(const Function &f) -> string
+        {
+            for (const Argument &arg : f.args()) {
+                number(&arg);
+            }
+            for (const BasicBlock &bb : f) {
+                number(&bb);
+                for (const Instruction &inst : bb) {
+                    number(&inst);
+                }
+            }
+
+            update(f.getFunctionType());
+            for (const BasicBlock &bb : f) {
+                update("label");
+                for (const Instruction &inst : bb) {
+                    update(inst.getOpcodeName());
+                    update(inst.getType());
+
+                    if (auto *cmp = dyn_cast<CmpInst>(&inst)) {
+                        update(cmp->getPredicate());
+                    } else if (auto *gep = dyn_cast<GetElementPtrInst>(&inst)) {
+                        update(gep->getSourceElementType());
+                    } else if (auto *alloca = dyn_cast<AllocaInst>(&inst)) {
+                        update(alloca->getAllocatedType());
+                    } else if (auto *load = dyn_cast<LoadInst>(&inst)) {
+                        update(load->getAlign().value());
+                        update(load->isVolatile());
+                    } else if (auto *store = dyn_cast<StoreInst>(&inst)) {
+                        update(store->getAlign().value());
+                        update(store->isVolatile());
+                    } else if (auto *phi = dyn_cast<PHINode>(&inst)) {
+                        for (const BasicBlock *incoming : phi->blocks()) {
+                            update(incoming);
+                        }
+                    }
+
+                    for (const Use &op : inst.operands()) {
+                        update(op.get());
+                    }
+                }
+            }
+
+            MD5::MD5Result result;
+            hash.final(result);
+            return result.digest().str().str();
+        }
+    };
+
+    /// Hash the textual IR of a module item, such as a global variable or a named
+    /// metadata node.
+    template <typename T> auto hash_printed(const T &item) -> string
+    {
+        string str;
+        raw_string_ostream os{str};
+        item.print(os);
+
+        MD5 hash;
+        hash.update(os.str());
+        MD5::MD5Result result;
+        hash.final(result);
+        return result.digest().str().str();
+    }
+} // namespace
+
+auto binrec::fingerprint_functions(const string &filename) -> map<string, string>
+{
+    LLVMContext llvm_context;
+    unique_ptr<Module> module = load_module(filename, llvm_context);
+
+    map<string, string> fingerprints;
+    for (Function &f : LiftedFunctions{*module}) {
+        if (!f.isDeclaration()) {
+            fingerprints[f.getName().str()] = FunctionHasher{}.run(f);
+        }
+    }
+    return fingerprints;
+}
+
+auto binrec::fingerprint_globals(const string &filename) -> map<string, string>
+{
+    LLVMContext llvm_context;
+    unique_ptr<Module> module = load_module(filename, llvm_context);
+
+    map<string, string> fingerprints;
+    string unnamed;
+    auto add = [&](const GlobalValue &value, string digest) {
+        if (value.hasName()) {
+            fingerprints["@" + value.getName().str()] = std::move(digest);
+        } else {
+            unnamed += digest;
+        }
+    };
+
+    for (Function &f : *module) {
+        if (is_lifted_function(f)) {
+            continue;
+        }
+        if (f.isDeclaration()) {
+            add(f, "declare " + hash_printed(*f.getFunctionType()));
+        } else {
+            add(f, FunctionHasher{}.run(f));
+        }
+    }
+    for (GlobalVariable &gv : module->globals()) {
+        add(gv, hash_printed(gv));
+    }
+    for (GlobalAlias &alias : module->aliases()) {
+        add(alias, hash_printed(alias));
+    }
+    for (NamedMDNode &md : module->named_metadata()) {
+        fingerprints["!" + md.getName().str()] = hash_printed(md);
+    }
+    if (!unnamed.empty()) {
+        MD5 hash;
+        hash.update(unnamed);
+        MD5::MD5Result result;
+        hash.final(result);
+        fingerprints["@"] = result.digest().str().str();
+    }
+    return fingerprints;
+}
+
+void binrec::drop_functions(
+    const string &filename,
+    const string &destination,
+    const vector<string> &names)
+{
+    LLVMContext llvm_context;
+    unique_ptr<Module> module = load_module(filename, llvm_context);
+
+    for (const string &name : names) {
+        Function *f = module->getFunction(name);
+        if (f && !f->isDeclaration()) {
+            // The function is defined by an earlier module in the link, so the
+            // declaration resolves to it.
+            f->deleteBody();
+        }
+    }
+
+    write_bitcode(*module, destination);
+}
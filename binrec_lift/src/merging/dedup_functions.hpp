@@ -0,0 +1,29 @@
+#ifndef BINREC_DEDUP_FUNCTIONS_HPP
+#define BINREC_DEDUP_FUNCTIONS_HPP
+
+#include <map>
+#include <string>
+#include <vector>
+
+namespace binrec {
+    /// Hash the body of every lifted block function (``Func_<pc>``) defined in a
+    /// link-ready module. Functions with the same name and hash are identical.
+    auto fingerprint_functions(const std::string &filename)
+        -> std::map<std::string, std::string>;
+
+    /// Hash every global value, other than the lifted block functions, and every named
+    /// metadata node of a link-ready module: function definitions and declarations,
+    /// global variables, and aliases are keyed by ``@<name>`` and named metadata by
+    /// ``!<name>``. Unnamed global values are hashed together under ``@``.
+    auto fingerprint_globals(const std::string &filename)
+        -> std::map<std::string, std::string>;
+
+    /// Delete the bodies of the named functions, leaving declarations, and write the
+    /// module to the destination.
+    void drop_functions(
+        const std::string &filename,
+        const std::string &destination,
+        const std::vector<std::string> &names);
+} // namespace binrec
+
+#endif
@@ -1,12 +1,18 @@
 #include "binrec_lift.hpp"
 #include "error.hpp"
 #include "lift_context.hpp"
+#include "merging/dedup_functions.hpp"
 #include "pass_utils.hpp"
 #include <llvm/ADT/Triple.h>
 #include <llvm/Analysis/AliasAnalysis.h>
 #include <llvm/IRReader/IRReader.h>
 #include <llvm/Passes/PassBuilder.h>
 #include <llvm/Support/CommandLine.h>
+#include <condition_variable>
+#include <exception>
+#include <functional>
+#include <mutex>
+#include <sched.h>
 
 
 extern "C" {
@@ -52,22 +58,140 @@ static int is_binrec_debug_mode()
     return debug && !strcmp(debug, "1");
 }
 
+/**
+ * Parse an artifact policy name: "none", "bitcode", or "all".
+ *
+ * @returns 0 on success or -1, with a Python exception, on error.
+ */
+static int parse_artifact_policy(const char *name, binrec::ArtifactPolicy &policy)
+{
+    if (!strcmp(name, "none")) {
+        policy = binrec::ArtifactPolicy::None;
+    } else if (!strcmp(name, "bitcode")) {
+        policy = binrec::ArtifactPolicy::Bitcode;
+    } else if (!strcmp(name, "all")) {
+        policy = binrec::ArtifactPolicy::All;
+    } else {
+        PyErr_Format(
+            PyExc_ValueError,
+            "invalid artifact policy: %s (expected none, bitcode, or all)",
+            name);
+        return -1;
+    }
+    return 0;
+}
+
 /**
  * Reset LLVM command line arguments.
  */
-static void reset_llvm_options()
+static void reset_llvm_options(bool debug)
 {
     llvm::StringMap<llvm::cl::Option *> &opts = llvm::cl::getRegisteredOptions();
     auto option = (llvm::cl::opt<unsigned> *)opts["memssa-check-limit"];
     option->setValue(option->getDefault().getValue());
 
     auto log_opt = (llvm::cl::opt<logging::Level> *)opts["loglevel"];
-    log_opt->setValue(is_binrec_debug_mode() ? logging::DEBUG : logging::ERROR);
+    log_opt->setValue(debug ? logging::DEBUG : logging::ERROR);
+}
+
+/*
+ * The LLVM command line options are process-wide, so operations that run concurrently, on
+ * other threads, share them. An operation only starts once every running operation uses the
+ * same options.
+ */
+static std::mutex llvm_options_lock;
+static std::condition_variable llvm_options_released;
+static unsigned llvm_options_users = 0;
+static unsigned llvm_options_memssa_check_limit = 0;
+static bool llvm_options_debug = false;
+
+/**
+ * Wait, without holding the GIL, until the LLVM options can be set for an operation and
+ * then set them. Must be paired with release_llvm_options().
+ */
+static void acquire_llvm_options(unsigned memssa_check_limit)
+{
+    bool debug = is_binrec_debug_mode();
+
+    Py_BEGIN_ALLOW_THREADS
+    {
+        // The lock must be released before the GIL is acquired again, since
+        // release_llvm_options() takes the lock while holding the GIL.
+        std::unique_lock<std::mutex> lock{llvm_options_lock};
+        llvm_options_released.wait(lock, [&] {
+            return !llvm_options_users ||
+                (llvm_options_memssa_check_limit == memssa_check_limit &&
+                 llvm_options_debug == debug);
+        });
+
+        if (!llvm_options_users) {
+            reset_llvm_options(debug);
+            if (memssa_check_limit) {
+                set_memssa_check_limit(memssa_check_limit);
+            }
+            llvm_options_memssa_check_limit = memssa_check_limit;
+            llvm_options_debug = debug;
+        }
+        ++llvm_options_users;
+    }
+    Py_END_ALLOW_THREADS
+}
+
+static void release_llvm_options()
+{
+    std::lock_guard<std::mutex> lock{llvm_options_lock};
+    if (!--llvm_options_users) {
+        llvm_options_released.notify_all();
+    }
+}
+
+/**
+ * Give the calling thread its own working directory, so that changing it for the duration of
+ * an operation does not affect the other threads. The thread keeps its own working
+ * directory afterward, so a later os.chdir() on another thread does not change it.
+ *
+ * @returns 0 on success and -1, with a Python exception, on error.
+ */
+static int unshare_working_dir()
+{
+    static thread_local bool unshared = false;
+    if (!unshared) {
+        if (unshare(CLONE_FS)) {
+            PyErr_SetFromErrno(PyExc_OSError);
+            return -1;
+        }
+        unshared = true;
+    }
+    return 0;
+}
+
+/**
+ * Run the native part of an operation without holding the GIL, so that other Python
+ * threads, including other binrec_lift operations, run in the meantime. The work must not
+ * call the Python API. Exceptions are rethrown once the GIL is held again.
+ */
+static void without_gil(const std::function<void()> &work)
+{
+    std::exception_ptr error;
+
+    Py_BEGIN_ALLOW_THREADS
+    try {
+        work();
+    } catch (...) {
+        error = std::current_exception();
+    }
+    Py_END_ALLOW_THREADS
+
+    if (error) {
+        std::rethrow_exception(error);
+    }
 }
 
 /**
  * Helper class that properly sets up LLVM prior to a lift opertion and then cleans up
- * when the operation completes.
+ * when the operation completes. The working directory is only changed for the calling
+ * thread and the LLVM options are shared with the operations running on other threads,
+ * so operations can run concurrently.
  */
 class BinrecCallState {
 public:
@@ -78,106 +202,188 @@ public:
 
     BinrecCallState(const char *working_dir, unsigned memssa_check_limit) :
             working_dir(working_dir),
-            memssa_check_limit(memssa_check_limit)
+            memssa_check_limit(memssa_check_limit),
+            good(false),
+            changed_dir(false)
     {
-        reset_llvm_options();
-        if (memssa_check_limit) {
-            set_memssa_check_limit(memssa_check_limit);
+        if (set_working_dir()) {
+            return;
         }
 
-        good = set_working_dir() == 0;
+        acquire_llvm_options(memssa_check_limit);
+        good = true;
     }
 
     ~BinrecCallState()
     {
+        if (good) {
+            release_llvm_options();
+        }
         reset_working_dir();
     }
 
     /**
-     * Set the current working directory for the duration of the lift operation.
+     * Set the current working directory, of the calling thread, for the duration of the
+     * lift operation.
      *
      * @returns 0 on success and -1, with a Python exception, on error.
      */
     int set_working_dir()
     {
         if (working_dir) {
+            if (unshare_working_dir()) {
+                return -1;
+            }
+
             getcwd(pwd, PATH_MAX);
             if (chdir(working_dir)) {
                 PyErr_SetFromErrnoWithFilename(PyExc_OSError, working_dir);
                 return -1;
             }
+            changed_dir = true;
         }
         return 0;
     }
 
     void reset_working_dir()
     {
-        if (working_dir && good) {
+        if (changed_dir) {
             chdir(pwd);
         }
     }
+
+private:
+    bool changed_dir;
 };
 
 
+/**
+ * Convert the recorded pass statistics to a list of dictionaries, one per pass.
+ *
+ * @returns a new reference to the list or NULL, with a Python exception, on error.
+ */
+static PyObject *pass_statistics_to_list(const binrec::PassStatistics &statistics)
+{
+    // New reference
+    PyObject *ret = PyList_New(0);
+    if (!ret) {
+        return NULL;
+    }
+
+    for (const binrec::PassRecord &record : statistics.records()) {
+        // New reference
+        PyObject *item = Py_BuildValue(
+            "{s:s,s:s,s:I,s:d,s:n,s:n,s:n,s:n,s:n,s:n,s:l,s:l}",
+            "stage",
+            record.stage.c_str(),
+            "pass",
+            record.name.c_str(),
+            "depth",
+            record.depth,
+            "seconds",
+            record.seconds,
+            "functions_before",
+            (Py_ssize_t)record.before.functions,
+            "functions_after",
+            (Py_ssize_t)record.after.functions,
+            "blocks_before",
+            (Py_ssize_t)record.before.blocks,
+            "blocks_after",
+            (Py_ssize_t)record.after.blocks,
+            "instructions_before",
+            (Py_ssize_t)record.before.instructions,
+            "instructions_after",
+            (Py_ssize_t)record.after.instructions,
+            "peak_rss",
+            record.peak_rss_after,
+            "peak_rss_delta",
+            record.peak_rss_after - record.peak_rss_before);
+        if (!item || PyList_Append(ret, item)) {
+            Py_XDECREF(item);
+            Py_DECREF(ret);
+            return NULL;
+        }
+        Py_DECREF(item);
+    }
+
+    return ret;
+}
+
 /**
  * Run a lift operation with the provided context.
  *
- * @returns 0 on success or -1, with a Python exception, on error.
+ * @returns the pass statistics (see pass_statistics_to_list()) on success or NULL, with a
+ *  Python exception, on error.
  */
-static int run_lift_operation(binrec::LiftContext &ctx)
+static PyObject *run_lift_operation(binrec::LiftContext &ctx, const char *stage)
 {
-    int status;
+    binrec::PassStatistics statistics;
+    statistics.set_stage(stage);
+    ctx.statistics = &statistics;
 
     try {
-        binrec::run_lift(ctx);
-        status = 0;
+        without_gil([&] { binrec::run_lift(ctx); });
     } catch (binrec::lifting_error &err) {
         PyErr_SetObject(PyLiftError, Py_BuildValue("(ss)", err.pass(), err.what()));
-        status = -1;
+        return NULL;
     } catch (std::runtime_error &err) {
         PyErr_SetString(PyExc_RuntimeError, err.what());
-        status = -1;
+        return NULL;
     }
 
-    return status;
+    return pass_statistics_to_list(statistics);
 }
 
 PyDoc_STRVAR(
     link_prep_1__doc__,
     "link_prep_1(trace_filename: str, destination: str, working_dir: str = None, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Perform a first-pass bitcode preparation for linking on the trace filename.\n\n"
     ":param trace_filename: the bitcode captured trace to prepare\n"
     ":param destination: the output bitcode file\n"
     ":param working_dir: the working directory, which is typically the capture trace "
     "directory\n"
     ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *link_prep_1(PyObject *self, PyObject *args, PyObject *kwargs)
 {
-    static const char *kwlist[] =
-        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "memssa_check_limit",
+        "artifacts",
+        NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     binrec::LiftContext ctx;
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sI",
+            "ss|sIs",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
             &working_dir,
-            &memssa_check_limit))
+            &memssa_check_limit,
+            &artifacts))
     {
         return NULL;
     }
 
-    llvm::LLVMContext llvm_context;
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
 
     if (!state.good) {
@@ -188,49 +394,59 @@ static PyObject *link_prep_1(PyObject *self, PyObject *args, PyObject *kwargs)
     ctx.destination = destination;
     ctx.link_prep_1 = true;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
-        return NULL;
-    }
-
-    Py_RETURN_NONE;
+    return run_lift_operation(ctx, "link_prep_1");
 }
 
 PyDoc_STRVAR(
     link_prep_2__doc__,
     "link_prep_2(trace_filename: str, destination: str, working_dir: str = None, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Perform a second-pass bitcode preparation for linking on the trace filename.\n\n"
     ":param trace_filename: the bitcode captured trace to prepare\n"
     ":param destination: the output bitcode file\n"
     ":param working_dir: the working directory, which is typically the capture trace "
     "directory\n"
     ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *link_prep_2(PyObject *self, PyObject *args, PyObject *kwargs)
 {
-    static const char *kwlist[] =
-        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "memssa_check_limit",
+        "artifacts",
+        NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     binrec::LiftContext ctx;
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sI",
+            "ss|sIs",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
             &working_dir,
-            &memssa_check_limit))
+            &memssa_check_limit,
+            &artifacts))
     {
         return NULL;
     }
 
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
     if (!state.good) {
         return NULL;
@@ -240,18 +456,13 @@ static PyObject *link_prep_2(PyObject *self, PyObject *args, PyObject *kwargs)
     ctx.destination = destination;
     ctx.link_prep_2 = true;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
-        return NULL;
-    }
-
-    Py_RETURN_NONE;
+    return run_lift_operation(ctx, "link_prep_2");
 }
 
 PyDoc_STRVAR(
     clean__doc__,
     "clean(trace_filename: str, destination: str, working_dir: str = None, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Clean the bitcode trace. This method produces three output files:\n"
     "  - ``{destination}.bc`` - cleaned bitcode\n"
     "  - ``{destination}.ll`` - cleaned LLVM IR\n"
@@ -261,31 +472,46 @@ PyDoc_STRVAR(
     ":param str working_dir: the working directory, which is typically the capture trace "
     "directory\n"
     ":param str memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *clean(PyObject *self, PyObject *args, PyObject *kwargs)
 {
-    static const char *kwlist[] =
-        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "memssa_check_limit",
+        "artifacts",
+        NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     binrec::LiftContext ctx;
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sI",
+            "ss|sIs",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
             &working_dir,
-            &memssa_check_limit))
+            &memssa_check_limit,
+            &artifacts))
     {
         return NULL;
     }
 
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
     if (!state.good) {
         return NULL;
@@ -295,19 +521,14 @@ static PyObject *clean(PyObject *self, PyObject *args, PyObject *kwargs)
     ctx.destination = destination;
     ctx.clean = true;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
-        return NULL;
-    }
-
-    Py_RETURN_NONE;
+    return run_lift_operation(ctx, "clean");
 }
 
 PyDoc_STRVAR(
     lift__doc__,
     "lift(trace_filename: str, destination: str, working_dir: str = None, "
     "clean_names: bool = False, skip_link: bool = False, trace_calls: bool = False, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Lift bitcode to an LLVM module. This function outputs multiple files:\n"
     " - ``{destination}.bc`` - lifted bitcode\n"
     " - ``{destination}.ll`` - lifted LLVM IR\n"
@@ -321,7 +542,11 @@ PyDoc_STRVAR(
     ":param skip_link: do not lift dynamic symbols\n"
     ":param trace_calls: trace calls and register values of recovered functions\n"
     ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *lift(PyObject *self, PyObject *args, PyObject *kwargs)
 {
     static const char *kwlist[] = {
@@ -332,12 +557,14 @@ static PyObject *lift(PyObject *self, PyObject *args, PyObject *kwargs)
         "skip_link",
         "trace_calls",
         "memssa_check_limit",
+        "artifacts",
         NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     int skip_link = 0;
     int clean_names = 0;
     int trace_calls = 0;
@@ -346,7 +573,7 @@ static PyObject *lift(PyObject *self, PyObject *args, PyObject *kwargs)
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sIppp",
+            "ss|sIppps",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
@@ -354,11 +581,16 @@ static PyObject *lift(PyObject *self, PyObject *args, PyObject *kwargs)
             &memssa_check_limit,
             &clean_names,
             &skip_link,
-            &trace_calls))
+            &trace_calls,
+            &artifacts))
     {
         return NULL;
     }
 
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
     if (!state.good) {
         return NULL;
@@ -371,18 +603,13 @@ static PyObject *lift(PyObject *self, PyObject *args, PyObject *kwargs)
     ctx.skip_link = (bool)skip_link;
     ctx.trace_calls = (bool)trace_calls;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
-        return NULL;
-    }
-
-    Py_RETURN_NONE;
+    return run_lift_operation(ctx, "lift");
 }
 
 PyDoc_STRVAR(
     optimize__doc__,
     "optimize(trace_filename: str, destination: str, working_dir: str = None, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Optimize lifted bitcode. These function outputs multiple files:\n"
     " - ``{destination}.bc`` - optimized bitcode\n"
     " - ``{destination}.ll`` - optimized LLVM IR\n"
@@ -392,31 +619,46 @@ PyDoc_STRVAR(
     ":param working_dir: the working directory, which is typically the capture trace "
     "directory\n"
     ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *optimize(PyObject *self, PyObject *args, PyObject *kwargs)
 {
-    static const char *kwlist[] =
-        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "memssa_check_limit",
+        "artifacts",
+        NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     binrec::LiftContext ctx;
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sI",
+            "ss|sIs",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
             &working_dir,
-            &memssa_check_limit))
+            &memssa_check_limit,
+            &artifacts))
     {
         return NULL;
     }
 
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
     if (!state.good) {
         return NULL;
@@ -426,18 +668,13 @@ static PyObject *optimize(PyObject *self, PyObject *args, PyObject *kwargs)
     ctx.destination = destination;
     ctx.optimize = true;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
-        return NULL;
-    }
-
-    Py_RETURN_NONE;
+    return run_lift_operation(ctx, "optimize");
 }
 
 PyDoc_STRVAR(
     optimize_better__doc__,
     "optimize_better(trace_filename: str, destination: str, working_dir: str = None, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Optimize lifted bitcode (better than :func:`optimize`). These function outputs "
     "multiple files:\n"
     " - ``{destination}.bc`` - optimized bitcode\n"
@@ -448,31 +685,46 @@ PyDoc_STRVAR(
     ":param working_dir: the working directory, which is typically the capture trace "
     "directory\n"
     ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *optimize_better(PyObject *self, PyObject *args, PyObject *kwargs)
 {
-    static const char *kwlist[] =
-        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "memssa_check_limit",
+        "artifacts",
+        NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     binrec::LiftContext ctx;
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sI",
+            "ss|sIs",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
             &working_dir,
-            &memssa_check_limit))
+            &memssa_check_limit,
+            &artifacts))
     {
         return NULL;
     }
 
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
     if (!state.good) {
         return NULL;
@@ -482,18 +734,13 @@ static PyObject *optimize_better(PyObject *self, PyObject *args, PyObject *kwarg
     ctx.destination = destination;
     ctx.optimize_better = true;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
-        return NULL;
-    }
-
-    Py_RETURN_NONE;
+    return run_lift_operation(ctx, "optimize_better");
 }
 
 PyDoc_STRVAR(
     compile_prep__doc__,
     "compile_prep(trace_filename: str, destination: str, working_dir: str = None, "
-    "memssa_check_link: int = None) -> None\n\n"
+    "memssa_check_link: int = None, artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
     "Prepare a trace for compilation to an object file. This function outputs "
     "multiple files:\n"
     " - ``{destination}.bc`` - prepped bitcode\n"
@@ -504,31 +751,46 @@ PyDoc_STRVAR(
     ":param working_dir: the working directory, which is typically the capture trace "
     "directory\n"
     ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
-    "trying to walk past (default = 100)\n");
+    "trying to walk past (default = 100)\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
 static PyObject *compile_prep(PyObject *self, PyObject *args, PyObject *kwargs)
 {
-    static const char *kwlist[] =
-        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "memssa_check_limit",
+        "artifacts",
+        NULL};
 
     const char *trace_filename = NULL;
     const char *destination = NULL;
     const char *working_dir = NULL;
     unsigned int memssa_check_limit = 0;
+    const char *artifacts = "all";
     binrec::LiftContext ctx;
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "ss|sI",
+            "ss|sIs",
             const_cast<char **>(kwlist),
             &trace_filename,
             &destination,
             &working_dir,
-            &memssa_check_limit))
+            &memssa_check_limit,
+            &artifacts))
     {
         return NULL;
     }
 
+    if (parse_artifact_policy(artifacts, ctx.artifacts)) {
+        return NULL;
+    }
+
     BinrecCallState state{working_dir, memssa_check_limit};
     if (!state.good) {
         return NULL;
@@ -538,26 +800,714 @@ static PyObject *compile_prep(PyObject *self, PyObject *args, PyObject *kwargs)
     ctx.destination = destination;
     ctx.compile = true;
 
-    int status = run_lift_operation(ctx);
-    if (status) {
+    return run_lift_operation(ctx, "compile_prep");
+}
+/**
+ * Convert a Python sequence of str to a vector of strings.
+ *
+ * @returns 0 on success or -1, with a Python exception, on error.
+ */
+static int
+str_sequence_to_vector(PyObject *obj, const char *message, std::vector<std::string> &strings)
+{
+    // New reference
+    PyObject *seq = PySequence_Fast(obj, message);
+    if (!seq) {
+        return -1;
+    }
+
+    Py_ssize_t count = PySequence_Fast_GET_SIZE(seq);
+    for (Py_ssize_t i = 0; i < count; ++i) {
+        const char *str = PyUnicode_AsUTF8(PySequence_Fast_GET_ITEM(seq, i));
+        if (!str) {
+            Py_DECREF(seq);
+            return -1;
+        }
+        strings.emplace_back(str);
+    }
+
+    Py_DECREF(seq);
+    return 0;
+}
+
+PyDoc_STRVAR(
+    link_many__doc__,
+    "link_many(inputs: List[str], destination: str, override_base: bool = True) -> None\n\n"
+    "Link multiple bitcode modules in memory and write the linked bitcode once.\n\n"
+    ":param inputs: the bitcode files to link, in order\n"
+    ":param destination: the output bitcode file\n"
+    ":param override_base: link each input with the accumulated module as the override "
+    "base, the same as ``llvm-link -override=<accumulated> <input>``, so that the "
+    "definitions of earlier inputs take precedence. When false, conflicting definitions "
+    "are an error.\n");
+static PyObject *link_many(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {"inputs", "destination", "override_base", NULL};
+
+    PyObject *inputs = NULL;
+    const char *destination = NULL;
+    int override_base = 1;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "Os|p",
+            const_cast<char **>(kwlist),
+            &inputs,
+            &destination,
+            &override_base))
+    {
+        return NULL;
+    }
+
+    std::vector<std::string> filenames;
+    if (str_sequence_to_vector(inputs, "inputs must be a sequence of str", filenames)) {
+        return NULL;
+    }
+
+    BinrecCallState state{NULL, 0};
+    try {
+        without_gil([&] { binrec::link_modules(filenames, destination, (bool)override_base); });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
         return NULL;
     }
 
     Py_RETURN_NONE;
 }
 
+PyDoc_STRVAR(
+    split_module__doc__,
+    "split_module(trace_filename: str, destination: str, partitions: int, "
+    "min_functions: int = 0, working_dir: str = None) -> List[str]\n\n"
+    "Split lifted bitcode into at most ``partitions`` modules along call graph boundaries, "
+    "so that each partition can be optimized separately. Functions that reference the same "
+    "internal functions or globals are kept in the same partition. Each partition that "
+    "defines a function is written to ``{destination}-{N}.bc``.\n\n"
+    ":param trace_filename: the bitcode to split\n"
+    ":param destination: the output file basename\n"
+    ":param partitions: the maximum number of partitions\n"
+    ":param min_functions: do not split modules that define fewer functions\n"
+    ":param working_dir: the working directory, which is typically the capture trace "
+    "directory\n"
+    ":returns: the partition filenames, an empty list when the module was not split\n");
+static PyObject *split_module(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "partitions",
+        "min_functions",
+        "working_dir",
+        NULL};
+
+    const char *trace_filename = NULL;
+    const char *destination = NULL;
+    unsigned int partitions = 0;
+    unsigned int min_functions = 0;
+    const char *working_dir = NULL;
+    std::vector<std::string> filenames;
 
-static PyMethodDef LiftMethods[] = {
-    {"link_prep_1", (PyCFunction)link_prep_1, METH_VARARGS | METH_KEYWORDS, link_prep_1__doc__},
-    {"link_prep_2", (PyCFunction)link_prep_2, METH_VARARGS | METH_KEYWORDS, link_prep_2__doc__},
-    {"clean", (PyCFunction)clean, METH_VARARGS | METH_KEYWORDS, clean__doc__},
-    {"lift", (PyCFunction)lift, METH_VARARGS | METH_KEYWORDS, lift__doc__},
-    {"optimize", (PyCFunction)optimize, METH_VARARGS | METH_KEYWORDS, optimize__doc__},
-    {"optimize_better",
-     (PyCFunction)optimize_better,
-     METH_VARARGS | METH_KEYWORDS,
-     optimize_better__doc__},
-    {"compile_prep", (PyCFunction)compile_prep, METH_VARARGS | METH_KEYWORDS, compile_prep__doc__},
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "ssI|Is",
+            const_cast<char **>(kwlist),
+            &trace_filename,
+            &destination,
+            &partitions,
+            &min_functions,
+            &working_dir))
+    {
+        return NULL;
+    }
+
+    BinrecCallState state{working_dir, 0};
+    if (!state.good) {
+        return NULL;
+    }
+
+    try {
+        without_gil([&] {
+            filenames =
+                binrec::split_module(trace_filename, destination, partitions, min_functions);
+        });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    // New reference
+    PyObject *ret = PyList_New(0);
+    if (!ret) {
+        return NULL;
+    }
+
+    for (const std::string &filename : filenames) {
+        PyObject *item = PyUnicode_FromString(filename.c_str());
+        if (!item || PyList_Append(ret, item)) {
+            Py_XDECREF(item);
+            Py_DECREF(ret);
+            return NULL;
+        }
+        Py_DECREF(item);
+    }
+
+    return ret;
+}
+
+PyDoc_STRVAR(
+    link_partitions__doc__,
+    "link_partitions(inputs: List[str], destination: str, working_dir: str = None, "
+    "artifacts: str = \"all\") -> List[Dict[str, Any]]\n\n"
+    "Link the optimized partitions of :func:`split_module` and run the module-level "
+    "cleanup passes, global optimization and dead global elimination, on the linked "
+    "module. This function outputs multiple files:\n"
+    " - ``{destination}.bc`` - linked bitcode\n"
+    " - ``{destination}.ll`` - linked LLVM IR\n"
+    " - ``{destination}-memssa.ll`` - linked LLVM IR run through MemorySSA analysis\n\n"
+    ":param inputs: the optimized partition bitcode files\n"
+    ":param destination: the output file basename\n"
+    ":param working_dir: the working directory, which is typically the capture trace "
+    "directory\n"
+    ":param artifacts: the files to write: ``all`` writes ``{destination}.bc``, "
+    "``{destination}.ll``, and ``{destination}-memssa.ll`` while ``bitcode`` and ``none`` "
+    "only write ``{destination}.bc`` (default = ``all``)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
+static PyObject *link_partitions(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {"inputs", "destination", "working_dir", "artifacts", NULL};
+
+    PyObject *inputs = NULL;
+    const char *destination = NULL;
+    const char *working_dir = NULL;
+    const char *artifacts = "all";
+    binrec::LiftContext ctx;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "Os|ss",
+            const_cast<char **>(kwlist),
+            &inputs,
+            &destination,
+            &working_dir,
+            &artifacts))
+    {
+        return NULL;
+    }
+
+    std::vector<std::string> filenames;
+    if (str_sequence_to_vector(inputs, "inputs must be a sequence of str", filenames) ||
+        parse_artifact_policy(artifacts, ctx.artifacts))
+    {
+        return NULL;
+    }
+
+    BinrecCallState state{working_dir, 0};
+    if (!state.good) {
+        return NULL;
+    }
+
+    binrec::PassStatistics statistics;
+    statistics.set_stage("link_partitions");
+    ctx.statistics = &statistics;
+    ctx.destination = destination;
+
+    try {
+        without_gil([&] { binrec::link_partitions(ctx, filenames); });
+    } catch (binrec::lifting_error &err) {
+        PyErr_SetObject(PyLiftError, Py_BuildValue("(ss)", err.pass(), err.what()));
+        return NULL;
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    return pass_statistics_to_list(statistics);
+}
+
+/**
+ * Set the object code generation options, ignoring unspecified (NULL) options.
+ */
+static void set_object_options(
+    binrec::ObjectOptions &options,
+    const char *triple,
+    const char *cpu,
+    const char *features,
+    const char *code_model)
+{
+    options.triple = triple ? triple : "";
+    options.cpu = cpu ? cpu : "";
+    options.features = features ? features : "";
+    options.code_model = code_model ? code_model : "";
+}
+
+PyDoc_STRVAR(
+    run_pipeline__doc__,
+    "run_pipeline(trace_filename: str, destination: str, helpers_filename: str, "
+    "working_dir: str = None, memssa_check_limit: int = None, optimize_better: bool = False, "
+    "clean_names: bool = False, skip_link: bool = False, trace_calls: bool = False, "
+    "artifacts: str = \"none\", object_filename: str = None, triple: str = None, "
+    "cpu: str = None, features: str = None, code_model: str = None, "
+    "object_partitions: int = 1) -> List[Dict[str, Any]]\n\n"
+    "Run every lift stage on a single in-memory module: :func:`clean`, linking the custom "
+    "helpers, :func:`lift`, :func:`optimize` (or :func:`optimize_better`), and "
+    ":func:`compile_prep`. The module is only read once and the intermediate modules are "
+    "only written when requested. This function outputs multiple files:\n"
+    " - ``{destination}.bc`` - prepped bitcode\n"
+    " - ``rfuncs`` - extracted functions\n"
+    " - ``{stage}.bc`` - intermediate bitcode of the ``cleaned``, ``linked``, ``lifted``, "
+    "and ``optimized`` stages when ``artifacts`` is ``bitcode`` or ``all``\n"
+    " - ``{destination}.ll``, ``{destination}-memssa.ll``, ``{stage}.ll``, and "
+    "``{stage}-memssa.ll`` - LLVM IR and MemorySSA dumps when ``artifacts`` is ``all``\n"
+    " - ``{object_filename}`` - the recovered object file, see :func:`emit_object`\n\n"
+    ":param trace_filename: the bitcode captured trace to lift\n"
+    ":param destination: the output file basename\n"
+    ":param helpers_filename: the custom helpers bitcode\n"
+    ":param working_dir: the working directory, which is typically the capture trace "
+    "directory\n"
+    ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
+    "trying to walk past (default = 100), for every stage\n"
+    ":param optimize_better: optimize with :func:`optimize_better`\n"
+    ":param clean_names: clean symbol names\n"
+    ":param skip_link: do not lift dynamic symbols\n"
+    ":param trace_calls: trace calls and register values of recovered functions\n"
+    ":param artifacts: the files to write: ``none``, ``bitcode``, or ``all`` "
+    "(default = ``none``)\n"
+    ":param object_filename: compile the recovered module to this object file\n"
+    ":param triple: the object target triple\n"
+    ":param cpu: the object target CPU\n"
+    ":param features: the object target features\n"
+    ":param code_model: the object code model\n"
+    ":param object_partitions: the number of partitions of the recovered module to "
+    "compile concurrently, see :func:`emit_object` (default = 1)\n"
+    ":returns: the statistics of each module pass, in the order the passes started, as a "
+    "dictionary of:\n\n"
+    " - ``stage`` - the lift stage that ran the pass: ``clean``, ``link``, ``lift``, "
+    "``optimize``, ``compile_prep``, or ``emit_object``\n"
+    " - ``pass`` - the pass name\n"
+    " - ``depth`` - the nesting depth of the pass, ``0`` for top-level passes\n"
+    " - ``seconds`` - the pass wall time\n"
+    " - ``functions_before``, ``functions_after`` - the number of defined functions\n"
+    " - ``blocks_before``, ``blocks_after`` - the number of basic blocks\n"
+    " - ``instructions_before``, ``instructions_after`` - the number of instructions\n"
+    " - ``peak_rss`` - the peak resident set size of the process after the pass, in KiB\n"
+    " - ``peak_rss_delta`` - the increase of the peak resident set size during the pass, "
+    "in KiB\n\n"
+    "Function, loop, and CGSCC passes are part of the module pass adaptor that runs them.\n");
+static PyObject *run_pipeline(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "helpers_filename",
+        "working_dir",
+        "memssa_check_limit",
+        "optimize_better",
+        "clean_names",
+        "skip_link",
+        "trace_calls",
+        "artifacts",
+        "object_filename",
+        "triple",
+        "cpu",
+        "features",
+        "code_model",
+        "object_partitions",
+        NULL};
+
+    const char *trace_filename = NULL;
+    const char *destination = NULL;
+    const char *helpers_filename = NULL;
+    const char *working_dir = NULL;
+    unsigned int memssa_check_limit = 0;
+    int optimize_better = 0;
+    int clean_names = 0;
+    int skip_link = 0;
+    int trace_calls = 0;
+    const char *artifacts = "none";
+    const char *object_filename = NULL;
+    const char *triple = NULL;
+    const char *cpu = NULL;
+    const char *features = NULL;
+    const char *code_model = NULL;
+    unsigned int object_partitions = 1;
+    binrec::PipelineOptions options;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "sss|sIppppszzzzzI",
+            const_cast<char **>(kwlist),
+            &trace_filename,
+            &destination,
+            &helpers_filename,
+            &working_dir,
+            &memssa_check_limit,
+            &optimize_better,
+            &clean_names,
+            &skip_link,
+            &trace_calls,
+            &artifacts,
+            &object_filename,
+            &triple,
+            &cpu,
+            &features,
+            &code_model,
+            &object_partitions))
+    {
+        return NULL;
+    }
+
+    if (parse_artifact_policy(artifacts, options.artifacts)) {
+        return NULL;
+    }
+
+    BinrecCallState state{working_dir, memssa_check_limit};
+    if (!state.good) {
+        return NULL;
+    }
+
+    options.trace_filename = trace_filename;
+    options.destination = destination;
+    options.helpers_filename = helpers_filename;
+    options.optimize_better = (bool)optimize_better;
+    options.clean_names = (bool)clean_names;
+    options.skip_link = (bool)skip_link;
+    options.trace_calls = (bool)trace_calls;
+    options.object_filename = object_filename ? object_filename : "";
+    set_object_options(options.object, triple, cpu, features, code_model);
+    options.object.partitions = object_partitions;
+
+    binrec::PassStatistics statistics;
+    options.statistics = &statistics;
+
+    try {
+        without_gil([&] { binrec::run_pipeline(options); });
+    } catch (binrec::lifting_error &err) {
+        PyErr_SetObject(PyLiftError, Py_BuildValue("(ss)", err.pass(), err.what()));
+        return NULL;
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    return pass_statistics_to_list(statistics);
+}
+
+PyDoc_STRVAR(
+    render__doc__,
+    "render(trace_filename: str, destination: str, working_dir: str = None, "
+    "memssa_check_limit: int = None) -> None\n\n"
+    "Render the textual views of a bitcode file that were not written by a lift "
+    "operation. This function outputs two files:\n"
+    " - ``{destination}.ll`` - LLVM IR\n"
+    " - ``{destination}-memssa.ll`` - LLVM IR run through MemorySSA analysis\n\n"
+    ":param trace_filename: the bitcode file to render\n"
+    ":param destination: the output file basename\n"
+    ":param working_dir: the working directory, which is typically the capture trace "
+    "directory\n"
+    ":param memssa_check_limit: the maximum number of stores/phis MemorySSA will consider "
+    "trying to walk past (default = 100)\n");
+static PyObject *render(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] =
+        {"trace_filename", "destination", "working_dir", "memssa_check_limit", NULL};
+
+    const char *trace_filename = NULL;
+    const char *destination = NULL;
+    const char *working_dir = NULL;
+    unsigned int memssa_check_limit = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "ss|sI",
+            const_cast<char **>(kwlist),
+            &trace_filename,
+            &destination,
+            &working_dir,
+            &memssa_check_limit))
+    {
+        return NULL;
+    }
+
+    BinrecCallState state{working_dir, memssa_check_limit};
+    if (!state.good) {
+        return NULL;
+    }
+
+    try {
+        without_gil([&] { binrec::render(trace_filename, destination); });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(
+    emit_object__doc__,
+    "emit_object(trace_filename: str, destination: str, working_dir: str = None, "
+    "triple: str = None, cpu: str = None, features: str = None, code_model: str = None, "
+    "partitions: int = 1) -> List[Dict[str, Any]]\n\n"
+    "Compile a bitcode module to an object file. This is equivalent to "
+    "``llc -filetype obj`` without starting a process.\n\n"
+    "When ``partitions`` is greater than one, the module is split along its call graph "
+    "and each partition is compiled concurrently, on its own thread, to "
+    "``{stem}-{N}.o``, where ``{stem}`` is the destination without its extension and "
+    "``N`` is the partition index. A partition may not define any functions, but its "
+    "object file is always written.\n\n"
+    ":param trace_filename: the bitcode file to compile\n"
+    ":param destination: the output object file\n"
+    ":param working_dir: the working directory, which is typically the capture trace "
+    "directory\n"
+    ":param triple: the target triple, defaults to the module's target triple\n"
+    ":param cpu: the target CPU, defaults to the generic CPU of the target\n"
+    ":param features: the target features, such as ``+sse2,-avx``\n"
+    ":param code_model: the code model: ``tiny``, ``small``, ``kernel``, ``medium``, or "
+    "``large``, defaults to the target's default code model\n"
+    ":param partitions: the number of partitions to compile concurrently "
+    "(default = 1)\n"
+    ":returns: the statistics of each module pass, see :func:`run_pipeline`\n");
+static PyObject *emit_object(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {
+        "trace_filename",
+        "destination",
+        "working_dir",
+        "triple",
+        "cpu",
+        "features",
+        "code_model",
+        "partitions",
+        NULL};
+
+    const char *trace_filename = NULL;
+    const char *destination = NULL;
+    const char *working_dir = NULL;
+    const char *triple = NULL;
+    const char *cpu = NULL;
+    const char *features = NULL;
+    const char *code_model = NULL;
+    unsigned int partitions = 1;
+    binrec::ObjectOptions options;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "ss|szzzzI",
+            const_cast<char **>(kwlist),
+            &trace_filename,
+            &destination,
+            &working_dir,
+            &triple,
+            &cpu,
+            &features,
+            &code_model,
+            &partitions))
+    {
+        return NULL;
+    }
+
+    BinrecCallState state{working_dir, 0};
+    if (!state.good) {
+        return NULL;
+    }
+
+    set_object_options(options, triple, cpu, features, code_model);
+    options.partitions = partitions;
+
+    binrec::PassStatistics statistics;
+    statistics.set_stage("emit_object");
+
+    try {
+        without_gil(
+            [&] { binrec::emit_object(trace_filename, options, destination, &statistics); });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    return pass_statistics_to_list(statistics);
+}
+
+/**
+ * Convert a map of fingerprints to a Python dictionary.
+ *
+ * @returns a new reference to the dictionary, or NULL, with a Python exception, on error.
+ */
+static PyObject *fingerprints_to_dict(const std::map<std::string, std::string> &fingerprints)
+{
+    // New reference
+    PyObject *ret = PyDict_New();
+    if (!ret) {
+        return NULL;
+    }
+
+    for (auto &[name, digest] : fingerprints) {
+        PyObject *value = PyUnicode_FromString(digest.c_str());
+        if (!value || PyDict_SetItemString(ret, name.c_str(), value)) {
+            Py_XDECREF(value);
+            Py_DECREF(ret);
+            return NULL;
+        }
+        Py_DECREF(value);
+    }
+
+    return ret;
+}
+
+PyDoc_STRVAR(
+    function_fingerprints__doc__,
+    "function_fingerprints(filename: str) -> Dict[str, str]\n\n"
+    "Hash the body of every lifted block function, ``Func_<pc>``, defined in a "
+    "link-ready bitcode file. Functions with the same name and hash are identical.\n\n"
+    ":param filename: the link-ready bitcode file\n"
+    ":returns: a dictionary of ``{function_name: body_hash}``\n");
+static PyObject *function_fingerprints(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {"filename", NULL};
+
+    const char *filename = NULL;
+    std::map<std::string, std::string> fingerprints;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "s",
+            const_cast<char **>(kwlist),
+            &filename))
+    {
+        return NULL;
+    }
+
+    BinrecCallState state{NULL, 0};
+    try {
+        without_gil([&] { fingerprints = binrec::fingerprint_functions(filename); });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    return fingerprints_to_dict(fingerprints);
+}
+
+PyDoc_STRVAR(
+    global_fingerprints__doc__,
+    "global_fingerprints(filename: str) -> Dict[str, str]\n\n"
+    "Hash every global value, other than the lifted block functions, and every named "
+    "metadata node of a link-ready bitcode file. Global values are keyed by "
+    "``@<name>`` and named metadata by ``!<name>``.\n\n"
+    ":param filename: the link-ready bitcode file\n"
+    ":returns: a dictionary of ``{symbol: hash}``\n");
+static PyObject *global_fingerprints(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {"filename", NULL};
+
+    const char *filename = NULL;
+    std::map<std::string, std::string> fingerprints;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "s",
+            const_cast<char **>(kwlist),
+            &filename))
+    {
+        return NULL;
+    }
+
+    BinrecCallState state{NULL, 0};
+    try {
+        without_gil([&] { fingerprints = binrec::fingerprint_globals(filename); });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    return fingerprints_to_dict(fingerprints);
+}
+
+PyDoc_STRVAR(
+    drop_functions__doc__,
+    "drop_functions(filename: str, destination: str, names: List[str]) -> None\n\n"
+    "Delete the bodies of functions, leaving declarations, and write the result to a "
+    "new bitcode file.\n\n"
+    ":param filename: the input bitcode file\n"
+    ":param destination: the output bitcode file\n"
+    ":param names: the names of the functions to drop\n");
+static PyObject *drop_functions(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+    static const char *kwlist[] = {"filename", "destination", "names", NULL};
+
+    const char *filename = NULL;
+    const char *destination = NULL;
+    PyObject *names = NULL;
+
+    if (!PyArg_ParseTupleAndKeywords(
+            args,
+            kwargs,
+            "ssO",
+            const_cast<char **>(kwlist),
+            &filename,
+            &destination,
+            &names))
+    {
+        return NULL;
+    }
+
+    std::vector<std::string> function_names;
+    if (str_sequence_to_vector(names, "names must be a sequence of str", function_names)) {
+        return NULL;
+    }
+
+    BinrecCallState state{NULL, 0};
+    try {
+        without_gil([&] { binrec::drop_functions(filename, destination, function_names); });
+    } catch (std::runtime_error &err) {
+        PyErr_SetString(PyExc_RuntimeError, err.what());
+        return NULL;
+    }
+
+    Py_RETURN_NONE;
+}
+
+
+static PyMethodDef LiftMethods[] = {
+    {"link_prep_1", (PyCFunction)link_prep_1, METH_VARARGS | METH_KEYWORDS, link_prep_1__doc__},
+    {"link_prep_2", (PyCFunction)link_prep_2, METH_VARARGS | METH_KEYWORDS, link_prep_2__doc__},
+    {"clean", (PyCFunction)clean, METH_VARARGS | METH_KEYWORDS, clean__doc__},
+    {"lift", (PyCFunction)lift, METH_VARARGS | METH_KEYWORDS, lift__doc__},
+    {"optimize", (PyCFunction)optimize, METH_VARARGS | METH_KEYWORDS, optimize__doc__},
+    {"optimize_better",
+     (PyCFunction)optimize_better,
+     METH_VARARGS | METH_KEYWORDS,
+     optimize_better__doc__},
+    {"compile_prep", (PyCFunction)compile_prep, METH_VARARGS | METH_KEYWORDS, compile_prep__doc__},
+    {"link_many", (PyCFunction)link_many, METH_VARARGS | METH_KEYWORDS, link_many__doc__},
+    {"split_module", (PyCFunction)split_module, METH_VARARGS | METH_KEYWORDS, split_module__doc__},
+    {"link_partitions",
+     (PyCFunction)link_partitions,
+     METH_VARARGS | METH_KEYWORDS,
+     link_partitions__doc__},
+    {"run_pipeline", (PyCFunction)run_pipeline, METH_VARARGS | METH_KEYWORDS, run_pipeline__doc__},
+    {"render", (PyCFunction)render, METH_VARARGS | METH_KEYWORDS, render__doc__},
+    {"emit_object", (PyCFunction)emit_object, METH_VARARGS | METH_KEYWORDS, emit_object__doc__},
+    {"function_fingerprints",
+     (PyCFunction)function_fingerprints,
+     METH_VARARGS | METH_KEYWORDS,
+     function_fingerprints__doc__},
+    {"global_fingerprints",
+     (PyCFunction)global_fingerprints,
+     METH_VARARGS | METH_KEYWORDS,
+     global_fingerprints__doc__},
+    {"drop_functions",
+     (PyCFunction)drop_functions,
+     METH_VARARGS | METH_KEYWORDS,
+     drop_functions__doc__},
     {NULL, NULL, 0, NULL}};
 
 static struct PyModuleDef lift_module = {
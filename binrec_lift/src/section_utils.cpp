@@ -45,7 +45,16 @@ void copySection(Module &m, section_meta_t &s, std::byte *data, bool readonly)
 
     // create global
     PASS_ASSERT(m.getGlobalList().size());
-    static GlobalVariable *insertBefore = &*(m.getGlobalList().begin());
+    // Insert the section globals, in order, before the first global of the module. Copied
+    // sections are named after their section, which tells them apart from the module's
+    // globals without keeping state between modules.
+    GlobalVariable *insertBefore = nullptr;
+    for (GlobalVariable &global : m.globals()) {
+        if (!global.hasSection() || global.getSection() != global.getName()) {
+            insertBefore = &global;
+            break;
+        }
+    }
     s.global = new GlobalVariable(
         m,
         initializer->getType(),
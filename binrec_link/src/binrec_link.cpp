@@ -42,12 +42,10 @@ auto binrec::run_link(LinkContext &ctx) -> Error
     SmallString<128> temp_output_path = ctx.work_dir;
     temp_output_path += "/output";
 
-    vector<std::string> input_paths{
-        ctx.recovered_filename,
-        ctx.librt_filename,
-        original_object_filename,
-        "-static-libgcc",
-        "-lgcc"};
+    vector<std::string> input_paths{ctx.recovered_filenames};
+    input_paths.insert(
+        input_paths.end(),
+        {ctx.librt_filename, original_object_filename, "-static-libgcc", "-lgcc"});
 
     if (ctx.dependencies_filename.length()) {
         // Load the list of dependencies and add them to the input paths
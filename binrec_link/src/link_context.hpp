@@ -2,6 +2,8 @@
 #define BINREC_LINK_CONTEXT_HPP
 
 #include <llvm/Object/Binary.h>
+#include <string>
+#include <vector>
 
 namespace binrec {
     class LinkContext {
@@ -9,7 +11,7 @@ namespace binrec {
         llvm::SmallString<128> work_dir;
         llvm::object::OwningBinary<llvm::object::Binary> original_binary;
         llvm::object::OwningBinary<llvm::object::Binary> recovered_binary;
-        std::string recovered_filename;
+        std::vector<std::string> recovered_filenames;
         std::string librt_filename;
         std::string ld_script_filename;
         std::string output_filename;
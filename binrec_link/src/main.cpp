@@ -12,7 +12,7 @@ using namespace llvm::sys::fs;
 using namespace binrec;
 
 static opt<string> Original_Filename{"b", Required, desc("<input original binary>")};
-static opt<string> Recovered_Filename("r", Required, desc("<input recovered object>"));
+static list<string> Recovered_Filenames("r", OneOrMore, desc("<input recovered objects>"));
 static opt<string> Librt_Filename("l", Required, desc("<binrec runtime library>"));
 static opt<string> Output_Filename("o", Required, desc("<output binary>"));
 static opt<string> Ld_Script_Filename("t", Required, desc("<linker script>"));
@@ -36,7 +36,7 @@ auto main(int argc, char *argv[]) -> int
         return 1;
     }
     ctx.original_binary = move(binary.get());
-    ctx.recovered_filename = Recovered_Filename;
+    ctx.recovered_filenames.assign(Recovered_Filenames.begin(), Recovered_Filenames.end());
     ctx.librt_filename = Librt_Filename;
     ctx.output_filename = Output_Filename;
     ctx.ld_script_filename = Ld_Script_Filename;
@@ -1,8 +1,10 @@
 #include "binrec_link.hpp"
 #include "link_error.hpp"
+#include <llvm/Support/Error.h>
 #include <llvm/Support/FileSystem.h>
-#include <llvm/Support/ManagedStatic.h>
 #include <llvm/Support/raw_ostream.h>
+#include <exception>
+#include <functional>
 
 extern "C" {
 
@@ -21,16 +23,81 @@ static void raise_error(const llvm::Error &error)
     PyErr_SetObject(PyExc_ChildProcessError, error_args);
 }
 
+/**
+ * Run the native part of the link without holding the GIL, so that other Python threads
+ * run in the meantime. The work must not call the Python API. Exceptions are rethrown once
+ * the GIL is held again.
+ */
+static void without_gil(const std::function<void()> &work)
+{
+    std::exception_ptr error;
+
+    Py_BEGIN_ALLOW_THREADS
+    try {
+        work();
+    } catch (...) {
+        error = std::current_exception();
+    }
+    Py_END_ALLOW_THREADS
+
+    if (error) {
+        std::rethrow_exception(error);
+    }
+}
+
+/**
+ * Convert a Python str, or sequence of str, to a vector of filenames.
+ *
+ * @returns 0 on success or -1, with a Python exception, on error.
+ */
+static int filenames_to_vector(PyObject *obj, const char *name, std::vector<std::string> &filenames)
+{
+    if (PyUnicode_Check(obj)) {
+        const char *str = PyUnicode_AsUTF8(obj);
+        if (!str) {
+            return -1;
+        }
+        filenames.emplace_back(str);
+        return 0;
+    }
+
+    // New reference
+    PyObject *seq = PySequence_Fast(obj, name);
+    if (!seq) {
+        return -1;
+    }
+
+    Py_ssize_t count = PySequence_Fast_GET_SIZE(seq);
+    for (Py_ssize_t i = 0; i < count; ++i) {
+        const char *str = PyUnicode_AsUTF8(PySequence_Fast_GET_ITEM(seq, i));
+        if (!str) {
+            Py_DECREF(seq);
+            return -1;
+        }
+        filenames.emplace_back(str);
+    }
+
+    Py_DECREF(seq);
+
+    if (filenames.empty()) {
+        PyErr_SetString(PyExc_ValueError, name);
+        return -1;
+    }
+    return 0;
+}
+
 PyDoc_STRVAR(
     binrec_link__doc__,
-    "link(binary_filename: str, recovered_filename: str, runtime_library: str, "
+    "link(binary_filename: str, recovered_filename: Union[str, List[str]], "
+    "runtime_library: str, "
     "linker_script: str, destination: str, dependencies_filename: str = None, "
     "harden: bool = False) -> None\n\n"
     "Recover and link a binary from a merged trace.\n\n"
     ":param binary_filename: the S2E binary filename, which must match the merged "
     "trace directory, ``s2e-out-{binary_filename}``\n"
     ":param recovered_filename: the recovered object filename, typically "
-    "``{trace_dir}/recovered.o``\n"
+    "``{trace_dir}/recovered.o``, or a list of the recovered object filenames when the "
+    "recovered module was compiled in partitions\n"
     ":param runtime_library: the binrec runtime library filename, typically "
     "``{BINREC_LIB}/libbinrec_rt.a``\n"
     ":param linker_script: LD linker script filename, typically "
@@ -54,7 +121,7 @@ static PyObject *binrec_link(PyObject *self, PyObject *args, PyObject *kwargs)
         NULL};
 
     const char *binary_filename = NULL;
-    const char *recovered_filename = NULL;
+    PyObject *recovered_filename = NULL;
     const char *runtime_library = NULL;
     const char *linker_script = NULL;
     const char *destination = NULL;
@@ -65,7 +132,7 @@ static PyObject *binrec_link(PyObject *self, PyObject *args, PyObject *kwargs)
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwargs,
-            "sssss|sp",
+            "sOsss|sp",
             const_cast<char **>(kwlist),
             &binary_filename,
             &recovered_filename,
@@ -78,8 +145,16 @@ static PyObject *binrec_link(PyObject *self, PyObject *args, PyObject *kwargs)
         return NULL;
     }
 
-    llvm::llvm_shutdown_obj y;
+    if (filenames_to_vector(
+            recovered_filename,
+            "recovered_filename must be a str or a non-empty sequence of str",
+            ctx.recovered_filenames))
+    {
+        return NULL;
+    }
 
+    // LLVM is not shut down when the link completes, since other threads may be running
+    // binrec_lift or binrec_link operations.
     if (auto ec = llvm::sys::fs::createUniqueDirectory("binrec_link", ctx.work_dir)) {
         PyObject *error_args = Py_BuildValue("(iss)", ec.value(), ec.message().c_str(), "/tmp");
         PyErr_SetObject(PyExc_OSError, error_args);
@@ -93,7 +168,6 @@ static PyObject *binrec_link(PyObject *self, PyObject *args, PyObject *kwargs)
     }
 
     ctx.original_binary = std::move(binary.get());
-    ctx.recovered_filename = recovered_filename;
     ctx.librt_filename = runtime_library;
     ctx.ld_script_filename = linker_script;
     ctx.output_filename = destination;
@@ -104,7 +178,12 @@ static PyObject *binrec_link(PyObject *self, PyObject *args, PyObject *kwargs)
     }
 
     try {
-        if (auto err = binrec::run_link(ctx)) {
+        llvm::Error err = llvm::Error::success();
+        without_gil([&] {
+            llvm::ErrorAsOutParameter checked{&err};
+            err = binrec::run_link(ctx);
+        });
+        if (err) {
             raise_error(err);
             binrec::cleanup_link(ctx);
 
@@ -0,0 +1,65 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from binrec import artifacts
+from binrec.artifacts import ArtifactPolicy
+from binrec.errors import BinRecError
+
+
+class TestArtifacts:
+
+    def test_policy(self):
+        assert ArtifactPolicy("bitcode") == ArtifactPolicy.BITCODE
+        assert str(ArtifactPolicy.ALL) == "all"
+
+    @patch.object(artifacts, "merged_trace_dir")
+    def test_render(self, mock_trace_dir, mock_lib_module, tmp_path):
+        mock_trace_dir.return_value = tmp_path
+        (tmp_path / "lifted.bc").write_bytes(b"")
+
+        artifacts.render("hello", "lifted")
+
+        mock_trace_dir.assert_called_once_with("hello")
+        mock_lib_module.binrec_lift.render.assert_called_once_with(
+            trace_filename="lifted.bc", destination="lifted", working_dir=str(tmp_path)
+        )
+
+    @patch.object(artifacts, "merged_trace_dir")
+    def test_render_missing_bitcode(self, mock_trace_dir, mock_lib_module, tmp_path):
+        mock_trace_dir.return_value = tmp_path
+        with pytest.raises(BinRecError):
+            artifacts.render("hello", "optimized")
+
+        mock_lib_module.binrec_lift.render.assert_not_called()
+
+    def test_render_unknown_stage(self, mock_lib_module):
+        with pytest.raises(BinRecError):
+            artifacts.render("hello", "asdf")
+
+    @patch.object(artifacts, "merged_trace_dir")
+    def test_render_error(self, mock_trace_dir, mock_lib_module, tmp_path):
+        mock_trace_dir.return_value = tmp_path
+        (tmp_path / "recovered.bc").write_bytes(b"")
+        mock_lib_module.binrec_lift.render.side_effect = OSError()
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
+        with pytest.raises(BinRecError):
+            artifacts.render("hello", "recovered")
+
+        mock_lib_module.convert_lib_error.assert_called_once()
+
+    @patch("sys.argv", ["artifacts", "render", "hello", "optimized"])
+    @patch.object(sys, "exit")
+    @patch.object(artifacts, "render")
+    def test_main_render(self, mock_render, mock_exit):
+        artifacts.main()
+        mock_render.assert_called_once_with("hello", "optimized")
+        mock_exit.assert_called_once_with(0)
+
+    @patch("sys.argv", ["artifacts", "render", "hello", "asdf"])
+    def test_main_render_unknown_stage(self):
+        with pytest.raises(SystemExit) as err:
+            artifacts.main()
+
+        assert err.value.code == 2
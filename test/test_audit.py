@@ -1,4 +1,6 @@
-from unittest.mock import patch
+import subprocess
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 from binrec import audit
 
@@ -26,3 +28,55 @@ class TestAduit:
         func = mock_sys.addaudithook.call_args_list[0].args[0]
         func("HELLO.asdf", ["qwer"])
         mock_logger.debug.assert_called_once_with("%s: %s", "HELLO.asdf", ["qwer"])
+
+
+class TestSubprocessAccounting:
+    def _record(self, argv, seconds=1.0, max_rss=100):
+        return audit.ProcessRecord(argv, 0, seconds, 0.5, 0.25, max_rss)
+
+    @patch.object(audit, "time")
+    def test_record(self, mock_time):
+        mock_time.monotonic.side_effect = [10.0, 11.0, 15.0, 17.0]
+        accounting = audit.SubprocessAccounting()
+        accounting.audit_event("subprocess.Popen", ("ldd", ["ldd", "binary"], None, None))
+        accounting.audit_event(
+            "subprocess.Popen", ("/bin/sh", ["/bin/sh", "-c", "zcat x"], None, None)
+        )
+        accounting.audit_event("os.remove", ("asdf",))
+        rusage = MagicMock(ru_utime=1.5, ru_stime=0.5, ru_maxrss=2048)
+
+        # processes are matched by their command line, not the order they started
+        accounting.record(MagicMock(args="zcat x"), 0, rusage)
+        accounting.record(MagicMock(args=["ldd", Path("binary")]), 256, rusage)
+
+        assert accounting.records == [
+            audit.ProcessRecord(["zcat x"], 0, 4.0, 1.5, 0.5, 2048),
+            audit.ProcessRecord(["ldd", "binary"], 1, 7.0, 1.5, 0.5, 2048),
+        ]
+
+    def test_by_tool(self):
+        accounting = audit.SubprocessAccounting()
+        accounting.records = [
+            self._record(["/usr/bin/nm", "a"], 1.0, 100),
+            self._record(["s2e", "run"], 10.0, 50),
+            self._record(["nm", "b"], 2.0, 200),
+        ]
+        tools = accounting.by_tool()
+        assert list(tools) == ["s2e", "nm"]
+        assert tools["nm"] == audit.ToolUsage("nm", 2, 3.0, 1.0, 0.5, 200)
+
+    @patch.object(audit, "_accounting", new=None)
+    @patch.object(audit.subprocess.Popen, "_try_wait", new=audit.subprocess.Popen._try_wait)
+    @patch.object(audit, "atexit")
+    @patch.object(audit, "sys")
+    def test_enable_subprocess_accounting(self, mock_sys, mock_atexit):
+        accounting = audit.enable_subprocess_accounting()
+        assert audit.enable_subprocess_accounting() is accounting
+        mock_sys.addaudithook.assert_called_once_with(accounting.audit_event)
+        mock_atexit.register.assert_called_once_with(accounting.log_summary)
+
+        subprocess.run(["sh", "-c", "exit 3"])
+
+        assert len(accounting.records) == 1
+        assert accounting.records[0].tool == "sh"
+        assert accounting.records[0].returncode == 3
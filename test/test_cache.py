@@ -0,0 +1,91 @@
+import hashlib
+import os
+from unittest.mock import patch
+
+from binrec import cache
+
+
+class TestCache:
+    def test_hash_file(self, tmp_path):
+        filename = tmp_path / "file"
+        filename.write_bytes(b"hello")
+        assert cache.hash_file(filename) == hashlib.sha256(b"hello").hexdigest()
+
+    def test_build_id(self, tmp_path):
+        module = tmp_path / "_binrec_lift.cpython-39-x86_64-linux-gnu.so"
+        module.write_bytes(b"module")
+        cache.binrec_lift_build_id.cache_clear()
+        with patch.object(cache, "BINREC_LIB", tmp_path):
+            build_id = cache.binrec_lift_build_id()
+        cache.binrec_lift_build_id.cache_clear()
+
+        assert build_id == hashlib.sha256(b"module").hexdigest()
+
+    def test_build_id_missing(self, tmp_path):
+        cache.binrec_lift_build_id.cache_clear()
+        with patch.object(cache, "BINREC_LIB", tmp_path):
+            build_id = cache.binrec_lift_build_id()
+        cache.binrec_lift_build_id.cache_clear()
+
+        assert build_id == ""
+
+    def test_link_build_id(self, tmp_path):
+        (tmp_path / "_binrec_lift.cpython-39-x86_64-linux-gnu.so").write_bytes(b"lift")
+        (tmp_path / "_binrec_link.cpython-39-x86_64-linux-gnu.so").write_bytes(b"link")
+        cache.binrec_link_build_id.cache_clear()
+        with patch.object(cache, "BINREC_LIB", tmp_path):
+            build_id = cache.binrec_link_build_id()
+        cache.binrec_link_build_id.cache_clear()
+
+        assert build_id == hashlib.sha256(b"link").hexdigest()
+
+    def test_key_namespace(self, tmp_path):
+        filename = tmp_path / "file"
+        filename.write_bytes(b"hello")
+        first = cache.ContentCache(tmp_path / "cache", namespace="1")
+        second = cache.ContentCache(tmp_path / "cache", namespace="2")
+        assert first.key(filename) == first.key(filename)
+        assert first.key(filename) != second.key(filename)
+
+    def test_key_files(self, tmp_path):
+        first = tmp_path / "first"
+        first.write_bytes(b"hello")
+        second = tmp_path / "second"
+        second.write_bytes(b"world")
+        content_cache = cache.ContentCache(tmp_path / "cache", namespace="1")
+        key = content_cache.key(first, second)
+        assert key != content_cache.key(first)
+        assert key != content_cache.key(first, second, salt="name")
+        second.write_bytes(b"there")
+        assert key != content_cache.key(first, second)
+
+    def test_get_put(self, tmp_path):
+        source = tmp_path / "source"
+        source.write_bytes(b"hello")
+        dest = tmp_path / "dest"
+        content_cache = cache.ContentCache(tmp_path / "cache")
+
+        assert not content_cache.get("key", dest)
+        assert not dest.exists()
+
+        content_cache.put("key", source)
+        assert content_cache.get("key", dest)
+        assert dest.read_bytes() == b"hello"
+        assert [p.name for p in (tmp_path / "cache").iterdir()] == ["key"]
+
+    def test_evict_lru(self, tmp_path):
+        source = tmp_path / "source"
+        source.write_bytes(b"x" * 10)
+        root = tmp_path / "cache"
+        content_cache = cache.ContentCache(root, max_size=25)
+
+        content_cache.put("first", source)
+        content_cache.put("second", source)
+        os.utime(root / "first", (1, 1))
+        os.utime(root / "second", (2, 2))
+
+        # using "first" makes "second" the least recently used entry
+        assert content_cache.get("first", tmp_path / "dest")
+        content_cache.put("third", source)
+
+        assert sorted(p.name for p in root.iterdir()) == ["first", "third"]
@@ -1,6 +1,11 @@
-from unittest.mock import patch
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
 
 from binrec import core, env
+from binrec.errors import BinRecError
+from binrec.tasks import TaskGraph
 
 
 class TestCore:
@@ -19,6 +24,14 @@ class TestCore:
         mock_logging.basicConfig.assert_called_once()
         mock_debug.assert_called_once()
 
+    @patch.object(core, "logging")
+    @patch.object(core, "os")
+    @patch.object(env, "BINREC_ACCOUNTING", new=True)
+    @patch("binrec.audit.enable_subprocess_accounting")
+    def test_init_binrec_accounting(self, mock_accounting, mock_os, mock_logging):
+        core.init_binrec()
+        mock_accounting.assert_called_once_with()
+
     @patch.object(core, "logging")
     @patch.object(core, "os")
     def test_enable_binrec_debug_mode(self, mock_os, mock_logging):
@@ -27,3 +40,73 @@ class TestCore:
         mock_logging.getLogger.assert_called_once_with("binrec")
         mock_logging.getLogger.return_value.setLevel.assert_called_once_with(mock_logging.DEBUG)
         assert mock_os.environ == {"BINREC_DEBUG": "1"}
+
+
+class TestSpan:
+    def _spans(self, filename):
+        return [
+            core.Span.from_json(json.loads(line))
+            for line in filename.read_text().splitlines()
+        ]
+
+    @patch.object(env, "spans_filename")
+    def test_span(self, mock_filename, tmp_path):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        artifact = tmp_path / "output"
+        with core.span("outer", "hello", [artifact]) as outer:
+            assert core.current_span() is outer
+            with core.span("inner") as inner:
+                artifact.write_bytes(b"1234")
+
+        assert core.current_span() is None
+        mock_filename.assert_called_once_with("hello")
+        spans = self._spans(filename)
+        assert [record.name for record in spans] == ["inner", "outer"]
+        assert spans[0].id == inner.id
+        assert spans[0].parent == outer.id
+        assert spans[1].parent is None
+        assert spans[1].run == spans[0].run == core.run_id()
+        assert spans[1].artifacts == {str(artifact): 4}
+        assert spans[1].status == "completed"
+        assert outer.seconds >= inner.seconds
+
+    @patch.object(env, "spans_filename")
+    def test_span_error(self, mock_filename, tmp_path):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        with pytest.raises(BinRecError):
+            with core.span("outer", "hello"):
+                raise BinRecError("asdf")
+
+        assert self._spans(filename)[0].status == "failed"
+
+    @patch.object(env, "spans_filename")
+    def test_span_missing_project(self, mock_filename, tmp_path):
+        mock_filename.return_value = tmp_path / "missing" / "spans.jsonl"
+        with core.span("outer", "hello"):
+            pass
+
+        assert not (tmp_path / "missing").exists()
+
+    @patch.object(env, "spans_filename")
+    def test_span_task_graph(self, mock_filename, tmp_path):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        graph = TaskGraph("graph")
+        graph.add("a", MagicMock())
+        graph.add("b", MagicMock(), ["a"])
+        with core.span("outer", "hello") as outer:
+            graph.run()
+
+        spans = {record.name: record for record in self._spans(filename)}
+        assert spans["graph.a"].parent == outer.id
+        assert spans["graph.b"].parent == outer.id
+
+    def test_span_without_project(self):
+        with core.span("outer") as outer:
+            pass
+
+        assert outer.seconds >= 0
+
+    @patch.object(core, "_run_id", new=None)
+    @patch.dict("os.environ", {core.BINREC_RUN_ID_ENV: "nightly"})
+    def test_run_id_env(self):
+        assert core.run_id() == "nightly"
@@ -0,0 +1,194 @@
+import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from binrec import elf
+from binrec.elf import ElfFile
+from binrec.errors import BinRecError
+
+# the python interpreter is a dynamically linked ELF binary that is always available
+BINARY = os.path.realpath(sys.executable)
+
+requires_binutils = pytest.mark.skipif(
+    not (shutil.which("readelf") and shutil.which("objdump")),
+    reason="binutils is not installed",
+)
+
+
+def _elf_header(elf_class=elf.ELFCLASS32, machine=elf.EM_386):
+    """
+    :returns: an ELF header without program or section headers
+    """
+    ident = elf.ELF_MAGIC + bytes([elf_class, elf.ELFDATA2LSB, 1]) + bytes(9)
+    if elf_class == elf.ELFCLASS64:
+        return ident + struct.pack("<HHIQQQIHHHHHH", 2, machine, 1, 0, 0, 0, 0, 64,
+                                   0, 0, 64, 0, 0)
+    return ident + struct.pack("<HHIIIIIHHHHHH", 2, machine, 1, 0, 0, 0, 0, 52, 0, 0,
+                               40, 0, 0)
+
+
+class TestElfFile:
+
+    def test_header(self, tmp_path):
+        filename = tmp_path / "binary"
+        filename.write_bytes(_elf_header())
+        with ElfFile(filename) as binary:
+            assert not binary.is_64bit
+            assert binary.machine == elf.EM_386
+            assert binary.address_width == 8
+            assert binary.sections == []
+            assert binary.dynamic_symbols == []
+            assert binary.plt_entries() == []
+            assert binary.needed == []
+
+    def test_bad_magic(self, tmp_path):
+        filename = tmp_path / "binary"
+        filename.write_bytes(b"#!/bin/sh\n" + bytes(64))
+        with pytest.raises(BinRecError):
+            ElfFile(filename)
+
+    def test_empty(self, tmp_path):
+        filename = tmp_path / "binary"
+        filename.write_bytes(b"")
+        with pytest.raises(BinRecError):
+            ElfFile(filename)
+
+    def test_truncated(self, tmp_path):
+        filename = tmp_path / "binary"
+        filename.write_bytes(_elf_header()[:30])
+        with pytest.raises(BinRecError):
+            ElfFile(filename)
+
+    def test_plt_stub_slot_i386(self, tmp_path):
+        filename = tmp_path / "binary"
+        filename.write_bytes(_elf_header())
+        with ElfFile(filename) as binary:
+            # jmp *0x804c00c
+            stub = b"\xff\x25\x0c\xc0\x04\x08\x68\x00\x00\x00\x00\xe9" + bytes(4)
+            assert binary._plt_stub_slot(0x8049030, stub, 0x804c000) == 0x804C00C
+            # jmp *0xc(%ebx)
+            stub = b"\xff\xa3\x0c\x00\x00\x00\x68\x00\x00\x00\x00\xe9" + bytes(4)
+            assert binary._plt_stub_slot(0x1030, stub, 0x4000) == 0x400C
+            # endbr32; jmp *0xc(%ebx)
+            stub = b"\xf3\x0f\x1e\xfb\xff\xa3\x0c\x00\x00\x00" + bytes(6)
+            assert binary._plt_stub_slot(0x1030, stub, 0x4000) == 0x400C
+            # push; jmp
+            stub = b"\x68\x00\x00\x00\x00\xe9" + bytes(10)
+            assert binary._plt_stub_slot(0x1030, stub, 0x4000) is None
+
+    def test_plt_stub_slot_x86_64(self, tmp_path):
+        filename = tmp_path / "binary"
+        filename.write_bytes(_elf_header(elf.ELFCLASS64, elf.EM_X86_64))
+        with ElfFile(filename) as binary:
+            # jmp *0x10(%rip)
+            stub = b"\xff\x25\x10\x00\x00\x00" + bytes(10)
+            assert binary._plt_stub_slot(0x1000, stub, 0) == 0x1016
+            # endbr64; bnd jmp *-0x10(%rip)
+            stub = b"\xf3\x0f\x1e\xfa\xf2\xff\x25\xf0\xff\xff\xff" + bytes(5)
+            assert binary._plt_stub_slot(0x1000, stub, 0) == 0x1000 + 11 - 0x10
+
+    @requires_binutils
+    def test_sections(self):
+        readelf = subprocess.check_output(
+            ["readelf", "--section-headers", "--wide", BINARY]
+        ).decode()
+        expected = re.findall(r"^ *\[ *[1-9]\d*\] +(\S+) +\S+ +([0-9a-f]+) ", readelf,
+                              re.MULTILINE)
+        with ElfFile(BINARY) as binary:
+            assert [
+                (section.name, f"{section.address:0{binary.address_width}x}")
+                for section in binary.sections[1:]
+            ] == expected
+
+    @requires_binutils
+    def test_dynamic_symbols(self):
+        readelf = subprocess.check_output(
+            ["readelf", "--dyn-syms", "--wide", BINARY]
+        ).decode()
+        expected = re.findall(r"^ *[1-9]\d*: +[0-9a-f]+ +\d+ +\w+ +\w+ +\w+ +\w+ +"
+                              r"([^@\s]+)(?:@+(\S+))?", readelf, re.MULTILINE)
+        with ElfFile(BINARY) as binary:
+            assert [
+                (symbol.name, symbol.version or "")
+                for symbol in binary.dynamic_symbols[1:]
+            ] == expected
+
+    @requires_binutils
+    def test_plt_entries(self):
+        objdump = subprocess.check_output(["objdump", "-d", BINARY]).decode()
+        expected = [
+            (int(address, 16), name)
+            for address, name in re.findall(r"^([0-9a-f]+) <(.+)@plt>:$", objdump,
+                                            re.MULTILINE)
+            if not name.startswith("*ABS*")
+        ]
+        with ElfFile(BINARY) as binary:
+            assert binary.plt_entries() == sorted(expected)
+
+    @requires_binutils
+    def test_needed(self):
+        objdump = subprocess.check_output(["objdump", "--private-headers", BINARY])
+        expected = re.findall(r"^\s*NEEDED\s+(\S+)$", objdump.decode(), re.MULTILINE)
+        with ElfFile(BINARY) as binary:
+            assert binary.needed == expected
+
+
+class TestResolveLibraries:
+
+    def test_ld_so_conf(self, tmp_path):
+        (tmp_path / "ld.so.conf.d").mkdir()
+        (tmp_path / "ld.so.conf.d" / "a.conf").write_text("/opt/a\n# comment\n")
+        (tmp_path / "ld.so.conf.d" / "b.conf").write_text("/opt/b  # comment\n")
+        conf = tmp_path / "ld.so.conf"
+        conf.write_text("include ld.so.conf.d/*.conf\n/opt/c\ninclude ld.so.conf\n")
+        assert elf._read_ld_so_conf(str(conf)) == ["/opt/a", "/opt/b", "/opt/c"]
+
+    def test_ld_so_conf_missing(self, tmp_path):
+        assert elf._read_ld_so_conf(str(tmp_path / "ld.so.conf")) == []
+
+    @patch.object(elf, "LD_SO_CONF", "/does/not/exist")
+    @patch.dict(os.environ, {"LD_LIBRARY_PATH": ""})
+    def test_resolve(self, tmp_path):
+        lib64 = tmp_path / "lib64"
+        lib32 = tmp_path / "lib32"
+        lib64.mkdir()
+        lib32.mkdir()
+        # the 64-bit library is found first but does not match the binary
+        (lib64 / "libfoo.so.1").write_bytes(_elf_header(elf.ELFCLASS64, elf.EM_X86_64))
+        (lib32 / "libfoo.so.1").write_bytes(_elf_header())
+        (lib32 / "libbar.so.1").write_text("not an elf file")
+
+        binary = ElfFile.__new__(ElfFile)
+        binary.filename = tmp_path / "binary"
+        binary.elf_class = elf.ELFCLASS32
+        binary.machine = elf.EM_386
+        with patch.multiple(
+            ElfFile,
+            needed=["libfoo.so.1", "libbar.so.1"],
+            rpath=[str(lib64), "$ORIGIN/lib32"],
+            runpath=[],
+        ):
+            assert elf.library_search_path(binary)[:2] == [str(lib64), str(lib32)]
+            assert elf.resolve_libraries(binary) == {
+                "libfoo.so.1": str(lib32 / "libfoo.so.1"),
+                "libbar.so.1": None,
+            }
+
+    @patch.dict(os.environ, {"LD_LIBRARY_PATH": "/env"})
+    def test_search_path_runpath(self, tmp_path):
+        binary = ElfFile.__new__(ElfFile)
+        binary.filename = tmp_path / "binary"
+        binary.machine = elf.EM_386
+        with patch.multiple(ElfFile, rpath=["/rpath"], runpath=["/runpath"]):
+            search_path = elf.library_search_path(binary)
+
+        # DT_RPATH is ignored when DT_RUNPATH is present
+        assert "/rpath" not in search_path
+        assert search_path.index("/env") < search_path.index("/runpath")
+        assert search_path.index("/runpath") < search_path.index("/lib/i386-linux-gnu")
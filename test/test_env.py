@@ -1,5 +1,7 @@
+import json
 import subprocess
-from unittest.mock import patch, MagicMock
+from threading import Thread
+from unittest.mock import ANY, patch, MagicMock
 
 import pytest
 
@@ -78,15 +80,146 @@ class TestEnv:
         assert env.trace_dir("asdf", 100) == env.BINREC_PROJECTS / "asdf" / "s2e-out-100"
 
     @patch.object(env, "project_dir")
-    def test_get_trace_dirs(self, mock_project_dir):
-        root = mock_project_dir.return_value = MockPath("asdf")
-        file = root / MockPath("s2e-out-1", exists=True)
-        not_trace_dir = root / MockPath("asdf", is_dir=True)
-        trace_dir_1 = root / MockPath("s2e-out-2", is_dir=True)
-        trace_dir_2 = root / MockPath("s2e-out-3", is_dir=True)
-
-        assert env.get_trace_dirs("asdf") == [trace_dir_1, trace_dir_2]
+    def test_get_trace_dirs(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        (tmp_path / "s2e-out-1").write_text("")
+        (tmp_path / "asdf").mkdir()
+        (tmp_path / "s2e-out-2").mkdir()
+        (tmp_path / "s2e-out-3").mkdir()
+
+        assert env.get_trace_dirs("asdf") == [tmp_path / "s2e-out-2", tmp_path / "s2e-out-3"]
         mock_project_dir.assert_called_once_with("asdf")
+        # the scanned trace directories are indexed by a new manifest
+        assert env.trace_manifest_filename("asdf").is_file()
+
+    @patch.object(env, "project_dir")
+    def test_get_trace_dirs_numeric_sort(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        for i in (2, 10, 1, 100):
+            (tmp_path / f"s2e-out-{i}").mkdir()
+        (tmp_path / "s2e-out").mkdir()
+        (tmp_path / "s2e-out-1.log").touch()
+
+        assert env.get_trace_dirs("asdf") == [
+            tmp_path / "s2e-out-1",
+            tmp_path / "s2e-out-2",
+            tmp_path / "s2e-out-10",
+            tmp_path / "s2e-out-100",
+        ]
+
+    @patch.object(env, "project_dir")
+    def test_get_trace_dirs_manifest(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        for i in range(12):
+            (tmp_path / f"s2e-out-{i}").mkdir()
+            env.record_trace("asdf", tmp_path / f"s2e-out-{i}")
+        (tmp_path / "s2e-out-12").mkdir()
+        env.record_trace("asdf", tmp_path / "s2e-out-12", env.TRACE_STATUS_FAILED)
+
+        assert env.get_trace_dirs("asdf") == [tmp_path / f"s2e-out-{i}" for i in range(12)]
+        assert env.next_trace_id("asdf") == 13
+
+    @patch.object(env, "project_dir")
+    def test_rescan_trace_manifest(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        for i in range(3):
+            (tmp_path / f"s2e-out-{i}").mkdir()
+            env.record_trace("asdf", tmp_path / f"s2e-out-{i}", env.TRACE_STATUS_FAILED)
+
+        # the manifest is trusted until it is rescanned
+        (tmp_path / "s2e-out-1").rmdir()
+        (tmp_path / "s2e-out-7").mkdir()
+        with patch.object(env.Path, "is_dir") as mock_is_dir:
+            assert sorted(env.load_trace_manifest("asdf")) == [0, 1, 2]
+            mock_is_dir.assert_not_called()
+
+        # deleted trace directories are dropped and trace directories created outside
+        # of binrec are added
+        assert env.rescan_trace_manifest("asdf") == {
+            0: {"directory": "s2e-out-0", "status": "failed", "size": 0,
+                "started": None, "finished": ANY},
+            2: {"directory": "s2e-out-2", "status": "failed", "size": 0,
+                "started": None, "finished": ANY},
+            7: {"directory": "s2e-out-7", "status": "completed"},
+        }
+        manifest = json.loads(env.trace_manifest_filename("asdf").read_text())
+        assert sorted(manifest["traces"], key=int) == ["0", "2", "7"]
+
+        # the next trace number skips unrecorded trace directories
+        (tmp_path / "s2e-out-1").mkdir()
+        assert env.next_trace_id("asdf") == 3
+
+    @patch.object(env, "project_dir")
+    def test_record_trace(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        trace_dir = tmp_path / "s2e-out-3"
+        trace_dir.mkdir()
+        (trace_dir / "captured.bc").write_bytes(b"x" * 10)
+        (tmp_path / "s2e-out-0").mkdir()
+        started = env.datetime(2022, 1, 1, 12)
+        finished = env.datetime(2022, 1, 1, 13)
+
+        env.record_trace("asdf", trace_dir, started=started, finished=finished)
+
+        assert env.load_trace_manifest("asdf") == {
+            0: {"directory": "s2e-out-0", "status": "completed"},
+            3: {
+                "directory": "s2e-out-3",
+                "status": "completed",
+                "size": 10,
+                "started": "2022-01-01T12:00:00",
+                "finished": "2022-01-01T13:00:00",
+            },
+        }
+        assert not list(tmp_path.glob(".trace-manifest-*"))
+
+    @patch.object(env, "project_dir")
+    def test_record_trace_concurrent(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        trace_dirs = [tmp_path / f"s2e-out-{i}" for i in range(16)]
+        trace_dirs[0].mkdir()
+        env.record_trace("asdf", trace_dirs[0])
+        for trace_dir in trace_dirs[1:]:
+            trace_dir.mkdir()
+
+        threads = [
+            Thread(target=env.record_trace, args=("asdf", trace_dir))
+            for trace_dir in trace_dirs[1:]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        manifest = json.loads(env.trace_manifest_filename("asdf").read_text())
+        assert sorted(map(int, manifest["traces"])) == list(range(16))
+        assert (tmp_path / env.TRACE_MANIFEST_LOCK_FILENAME).is_file()
+
+    @patch.object(env, "project_dir")
+    def test_record_trace_invalid_name(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        with pytest.raises(BinRecError):
+            env.record_trace("asdf", tmp_path / "s2e-out")
+
+    @patch.object(env, "project_dir")
+    def test_load_trace_manifest_invalid(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        (tmp_path / "s2e-out-0").mkdir()
+        env.trace_manifest_filename("asdf").write_text("{")
+        assert env.load_trace_manifest("asdf") == {
+            0: {"directory": "s2e-out-0", "status": "completed"}
+        }
+
+    @patch.object(env, "project_dir")
+    def test_next_trace_id(self, mock_project_dir, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        assert env.next_trace_id("asdf") == 0
+        (tmp_path / "s2e-out-0").mkdir()
+        (tmp_path / "s2e-out-2").mkdir()
+        assert env.next_trace_id("asdf") == 1
+
+    def test_project_cache_dir(self):
+        assert env.project_cache_dir("asdf") == env.BINREC_PROJECTS / "asdf" / ".binrec-cache"
 
     def test_input_files_dirs(self):
         assert env.input_files_dir("asdf") == env.BINREC_PROJECTS / "asdf" / "input_files"
@@ -114,5 +114,6 @@ def run_test(plan: Campaign) -> None:
 
     logger.info("successfully ran and merged %d traces; verifying recovered binary",
                 len(plan.traces))
-    project.validate_campaign(plan)
+    results = project.validate_campaign(plan)
+    assert all(result.passed for result in results), [result.errors for result in results]
     logger.info("verified recovered binary")
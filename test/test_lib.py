@@ -1,7 +1,15 @@
+import os
+import shutil
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from unittest.mock import MagicMock
+
+import pytest
 
 from binrec.errors import BinRecError, BinRecLiftingError
-from binrec.env import BINREC_LIB
+from binrec.env import BINREC_LIB, BINREC_RUNLIB
 
 
 class TestLib:
@@ -19,3 +27,60 @@ class TestLib:
         err = real_lib_module.convert_lib_error(real_lib_module.binrec_lift.LiftError('pass_1', 'qwer'), 'asdf')
         assert str(err) == 'asdf: [pass_1] qwer'
         assert isinstance(err, BinRecLiftingError)
+
+    @pytest.mark.parametrize('operation', ['emit_object', 'link_many'])
+    def test_concurrent_operations_overlap(self, real_lib_module, tmp_path, operation):
+        binrec_lift = real_lib_module.binrec_lift
+        helpers = BINREC_RUNLIB / 'custom-helpers.bc'
+        if isinstance(binrec_lift, MagicMock) or not helpers.is_file():
+            pytest.skip('binrec_lift is not built')
+        if (os.cpu_count() or 1) < 2:
+            pytest.skip('concurrent operations require more than one CPU')
+
+        cwd = os.getcwd()
+        projects = []
+        for name in ('hello', 'goodbye'):
+            project_dir = tmp_path / name
+            project_dir.mkdir()
+            shutil.copy(helpers, project_dir / 'recovered.bc')
+            projects.append(project_dir)
+
+        def emit_object(project_dir):
+            # each project is compiled relative to its own working directory
+            binrec_lift.emit_object(
+                trace_filename='recovered.bc', destination='recovered.o', working_dir=str(project_dir)
+            )
+
+        def link_many(project_dir):
+            # linking acquires the LLVM options that the compile on the other thread holds
+            binrec_lift.link_many([str(project_dir / 'recovered.bc')], str(project_dir / 'linked.bc'))
+
+        operations = {'emit_object': emit_object, 'link_many': link_many}
+        barrier = Barrier(len(projects))
+
+        def run(func, project_dir):
+            # record when each call enters and exits the native operation
+            intervals = []
+            barrier.wait()
+            for _ in range(5):
+                entered = time.monotonic()
+                func(project_dir)
+                intervals.append((entered, time.monotonic()))
+            return intervals
+
+        with ThreadPoolExecutor(max_workers=len(projects)) as pool:
+            first = pool.submit(run, emit_object, projects[0])
+            second = pool.submit(run, operations[operation], projects[1])
+            first_intervals, second_intervals = first.result(), second.result()
+
+        # the GIL is released while the operations run and operations using the same LLVM
+        # options share them, so a call on one thread runs while a call on the other
+        # thread is still running
+        assert any(
+            entered_1 < exited_2 and entered_2 < exited_1
+            for entered_1, exited_1 in first_intervals
+            for entered_2, exited_2 in second_intervals
+        )
+        assert (projects[0] / 'recovered.o').is_file()
+        assert (projects[1] / ('recovered.o' if operation == 'emit_object' else 'linked.bc')).is_file()
+        assert os.getcwd() == cwd
@@ -1,63 +1,21 @@
-from unittest import mock
-from unittest.mock import patch, MagicMock, mock_open, call
-from subprocess import CalledProcessError
+import json
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from subprocess import CalledProcessError
+from unittest import mock
+from unittest.mock import MagicMock, PropertyMock, call, mock_open, patch
 
 import pytest
+from helpers.mock_path import MockPath
 
-from binrec import lift, core
-from binrec.lift import OptimizationLevel
+from binrec import audit, core, lift
+from binrec.artifacts import ArtifactPolicy
+from binrec.elf import STB_GLOBAL, STB_WEAK, STT_FUNC, STT_OBJECT, ElfSection, ElfSymbol
 from binrec.env import BINREC_ROOT, llvm_command
 from binrec.errors import BinRecError
-from binrec import audit
-
-from helpers.mock_path import MockPath
-
-
-READELF_DYNSYM_OUTPUT = """
-Symbol table '.dynsym' contains 9 entries:
-   Num:    Value  Size Type    Bind   Vis      Ndx Name
-     0: 00000000     0 NOTYPE  LOCAL  DEFAULT  UND
-     1: 00000000     0 FUNC    GLOBAL DEFAULT  UND printf@GLIBC_2.0 (2)
-     2: 00000000     0 FUNC    GLOBAL DEFAULT  UND fwrite@GLIBC_2.0 (2)
-     3: 00000000     0 NOTYPE  WEAK   DEFAULT  UND __gmon_start__
-     4: 00000000     0 FUNC    GLOBAL DEFAULT  UND __libc_start_main@GLIBC_2.0 (2)
-     5: 0804c044     4 OBJECT  GLOBAL DEFAULT   26 stdout@GLIBC_2.0 (2)
-     6: 0804c020     4 OBJECT  GLOBAL DEFAULT   26 stderr@GLIBC_2.0 (2)
-     7: 0804a004     4 OBJECT  GLOBAL DEFAULT   17 _IO_stdin_used
-"""
-
-READELF_SECTIONS_OUTPUT = """
-There are 36 section headers, starting at offset 0x39e8:
-
-Section Headers:
-  [Nr] Name              Type            Addr     Off    Size   ES Flg Lk Inf Al
-  [ 0]                   NULL            00000000 000000 000000 00      0   0  0
-  [ 1] .interp           PROGBITS        080481b4 0001b4 000013 00   A  0   0  1
-  [ 2] .note.gnu.build-i NOTE            080481c8 0001c8 000024 00   A  0   0  4
-  [10] .rel              REL             0804830c 00030c 000008 08   A  6   0  4
-Key to Flags:
-  W (write), A (alloc), X (execute), M (merge), S (strings), I (info),
-  L (link order), O (extra OS processing required), G (group), T (TLS),
-  C (compressed), x (unknown), o (OS specific), E (exclude),
-  p (processor specific)
-"""
-
-
-OBJDUMP_SYM_OUTPUT = b"""
-abc12340 <foo@plt>:
-    retl 0
-"""
-
-OBJDUMP_DEP_OUTPUT = b"""
-not matched
-  NEEDED      libselinux.so.1
-other
-  NEEDED      libc.so.6
-  NEEDED      libnotfound.so.1
-other
-"""
+from binrec.lift import OptimizationLevel
 
 LDD_DEP_OUTPUT = b"""
 	linux-gate.so.1 (0xf7f10000)
@@ -69,98 +27,95 @@ LDD_DEP_OUTPUT = b"""
 	libpthread.so.0 => /lib/i386-linux-gnu/libpthread.so.0 (0xf7c14000)
 """
 
+
 class TestLifting:
+    @patch.object(lift, "ElfFile")
+    def test_extract_symbols(self, mock_elf, tmp_path):
+        binary = mock_elf.return_value.__enter__.return_value
+        binary.address_width = 8
+        binary.plt_entries.return_value = [(0xABC12340, "foo"), (0xABC12350, "bar")]
 
-    @patch("builtins.open", new_callable=mock.mock_open)
-    @patch.object(lift.subprocess, 'run')
-    def test_extract_symbols(self, mock_run, mock_symbols):
-        trace_dir = MagicMock(name="asdf")
+        lift._extract_binary_symbols(tmp_path)
 
-        symbols_path = trace_dir / "symbols"
+        mock_elf.assert_called_once_with(tmp_path / "binary")
+        assert (tmp_path / "symbols").read_text() == "abc12340 foo\nabc12350 bar\n"
 
-        mock_run.return_value.stdout = OBJDUMP_SYM_OUTPUT
+    @patch.object(lift, "ElfFile")
+    def test_extract_symbols_error(self, mock_elf, tmp_path):
+        mock_elf.side_effect = BinRecError("asdf")
+        with pytest.raises(BinRecError):
+            lift._extract_binary_symbols(tmp_path)
+
+    @patch.object(lift, "ElfFile")
+    def test_extract_data_imports(self, mock_elf, tmp_path):
+        binary = mock_elf.return_value.__enter__.return_value
+        binary.address_width = 8
+        binary.dynamic_symbols = [
+            ElfSymbol("", 0, 0, 0, 0, 0),
+            ElfSymbol("printf", 0, 0, STT_FUNC, STB_GLOBAL, 0, "GLIBC_2.0"),
+            ElfSymbol("__gmon_start__", 0, 0, 0, STB_WEAK, 0),
+            ElfSymbol("stdout", 0x804C044, 4, STT_OBJECT, STB_GLOBAL, 26, "GLIBC_2.0"),
+            ElfSymbol("stderr", 0x804C020, 4, STT_OBJECT, STB_GLOBAL, 26, "GLIBC_2.0"),
+            ElfSymbol("environ", 0x804C028, 4, STT_OBJECT, STB_WEAK, 26, "GLIBC_2.0"),
+            ElfSymbol("_IO_stdin_used", 0x804A004, 4, STT_OBJECT, STB_GLOBAL, 17),
+        ]
 
-        lift._extract_binary_symbols(trace_dir)
+        lift._extract_data_imports(tmp_path)
 
-        mock_symbols.assert_called_once_with(symbols_path, "w")
-        mock_run.assert_called_once_with(["objdump", "-d", "binary"],
-            cwd=str(trace_dir), stdout=subprocess.PIPE)
+        mock_elf.assert_called_once_with(tmp_path / "binary")
+        assert (tmp_path / "data_imports").read_text() == (
+            "0804c044 4 stdout\n0804c020 4 stderr\n"
+        )
 
-    @patch.object(lift.subprocess, 'run')
-    @patch.object(lift.subprocess, 'Popen')
-    def test_extract_symbols_error(self, mock_popen, mock_run):
-        mock_run.side_effect = CalledProcessError(0, 'asdf')
+    @patch.object(lift, "ElfFile")
+    def test_extract_data_imports_error(self, mock_elf, tmp_path):
+        mock_elf.side_effect = BinRecError("asdf")
         with pytest.raises(BinRecError):
-            lift._extract_binary_symbols(MagicMock(name="asdf"))
-
-    @patch.object(lift.subprocess, "check_output")
-    @patch.object(lift, "open", new_callable=mock_open)
-    def test_extract_data_imports(self, mock_file, mock_check_output):
-        trace_dir = MagicMock(name="asdf")
-        mock_check_output.return_value = READELF_DYNSYM_OUTPUT.encode()
-        lift._extract_data_imports(trace_dir)
-
-        mock_check_output.assert_called_once_with(
-            ["readelf", "--dyn-sym", str(trace_dir / "binary")]
-        )
-        mock_file.assert_called_once_with(trace_dir / "data_imports", "w")
-        handle = mock_file()
-        assert handle.write.call_args_list == [
-            call("0804c044 4 stdout"),
-            call("\n"),
-            call("0804c020 4 stderr"),
-            call("\n"),
+            lift._extract_data_imports(tmp_path)
+
+    @patch.object(lift, "ElfFile")
+    def test_extract_sections(self, mock_elf, tmp_path):
+        binary = mock_elf.return_value.__enter__.return_value
+        binary.address_width = 8
+        binary.sections = [
+            ElfSection(0, "", 0, 0, 0, 0, 0, 0),
+            ElfSection(1, ".interp", 1, 0x80481B4, 0x1B4, 0x13, 0, 0),
+            ElfSection(2, ".note.gnu.build-id", 7, 0x80481C8, 0x1C8, 0x24, 0, 0),
+            ElfSection(10, ".rel", 9, 0x804830C, 0x30C, 0x8, 6, 8),
         ]
 
-    @patch.object(lift.subprocess, "check_output")
-    def test_extract_data_imports_error(self, mock_check_output):
-        mock_check_output.side_effect = CalledProcessError(0, "asdf")
-        with pytest.raises(BinRecError):
-            lift._extract_data_imports(MagicMock(name="asdf"))
+        lift._extract_sections(tmp_path)
 
-    @patch.object(lift.subprocess, "check_output")
-    @patch.object(lift, "open", new_callable=mock_open)
-    def test_extract_sections(self, mock_file, mock_check_output):
-        trace_dir = MagicMock(name="asdf")
-        mock_check_output.return_value = READELF_SECTIONS_OUTPUT.encode()
-
-        lift._extract_sections(trace_dir)
-
-        mock_check_output.assert_called_once_with(
-            ["readelf", "--section-headers", str(trace_dir / "binary")]
-        )
-
-        mock_file.assert_called_once_with(trace_dir / "sections", "w")
-        handle = mock_file()
-        assert handle.write.call_args_list == [
-            call("080481b4 000013 .interp"),
-            call("\n"),
-            call("080481c8 000024 .note.gnu.build-i"),
-            call("\n"),
-            call("0804830c 000008 .rel"),
-            call("\n")
-        ]
+        mock_elf.assert_called_once_with(tmp_path / "binary")
+        assert (tmp_path / "sections").read_text() == (
+            "080481b4 000013 .interp\n"
+            "080481c8 000024 .note.gnu.build-id\n"
+            "0804830c 000008 .rel\n"
+        )
 
-    @patch.object(lift.subprocess, "check_output")
-    def test_extract_sections_error(self, mock_check_output):
-        mock_check_output.side_effect = CalledProcessError(0, "asdf")
+    @patch.object(lift, "ElfFile")
+    def test_extract_sections_error(self, mock_elf, tmp_path):
+        mock_elf.return_value.__enter__.return_value = binary = MagicMock()
+        type(binary).sections = PropertyMock(side_effect=BinRecError("asdf"))
         with pytest.raises(BinRecError):
-            lift._extract_sections(MagicMock(name="asdf"))
+            lift._extract_sections(tmp_path)
 
     def test_clean_bitcode(self, mock_lib_module):
         trace_dir = MockPath("asdf")
 
-        lift._clean_bitcode(trace_dir)
+        passes = lift._clean_bitcode(trace_dir)
 
+        assert passes is mock_lib_module.binrec_lift.clean.return_value
         mock_lib_module.binrec_lift.clean.assert_called_once_with(
             trace_filename="captured.bc",
             destination="cleaned",
             working_dir=str(trace_dir),
+            artifacts="all",
         )
 
     def test_clean_bitcode_error(self, mock_lib_module):
         mock_lib_module.binrec_lift.clean.side_effect = OSError()
-        mock_lib_module.convert_lib_error.return_value = BinRecError('asdf')
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
         with pytest.raises(BinRecError):
             lift._clean_bitcode(MockPath("asdf"))
 
@@ -183,16 +138,22 @@ class TestLifting:
                 ],
                 cwd=str(trace_dir),
                 stdout=(trace_dir / "fixups.log").open.return_value,
-                stderr=subprocess.STDOUT
+                stderr=subprocess.STDOUT,
             ),
             call(
                 [llvm_command("llvm-dis"), "linked.bc"],
                 cwd=str(trace_dir),
                 stdout=(trace_dir / "fixups.log").open.return_value,
-                stderr=subprocess.STDOUT
+                stderr=subprocess.STDOUT,
             ),
         ]
 
+    @patch.object(lift.subprocess, "check_call")
+    def test_apply_fixups_bitcode(self, mock_check_call):
+        lift._apply_fixups(MockPath("asdf"), ArtifactPolicy.BITCODE)
+        # linked.ll is not disassembled
+        mock_check_call.assert_called_once()
+
     @patch.object(lift.subprocess, "check_call")
     def test_apply_fixups_error(self, mock_check_call):
         mock_check_call.side_effect = CalledProcessError(0, "asdf")
@@ -209,11 +170,17 @@ class TestLifting:
             destination="lifted",
             clean_names=True,
             working_dir=str(trace_dir),
+            artifacts="all",
         )
 
+    def test_lift_bitcode_artifacts(self, mock_lib_module):
+        lift._lift_bitcode(MockPath("asdf"), ArtifactPolicy.NONE)
+        kwargs = mock_lib_module.binrec_lift.lift.call_args.kwargs
+        assert kwargs["artifacts"] == "none"
+
     def test_lift_bitcode_error(self, mock_lib_module):
         mock_lib_module.binrec_lift.lift.side_effect = OSError()
-        mock_lib_module.convert_lib_error.return_value = BinRecError('asdf')
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
         with pytest.raises(BinRecError):
             lift._lift_bitcode(MockPath("asdf"))
 
@@ -224,39 +191,88 @@ class TestLifting:
 
         lift._optimize_bitcode(trace_dir, lift.OptimizationLevel.NORMAL)
 
-        mock_lib_module.binrec_lift.optimize(
+        mock_lib_module.binrec_lift.optimize.assert_called_once_with(
             trace_filename="lifted.bc",
             destination="optimized",
             memssa_check_limit=100000,
             working_dir=str(trace_dir),
+            artifacts="all",
         )
 
-    def test_optimize_bitcode_error(self, mock_lib_module):
-        mock_lib_module.binrec_lift.optimize.side_effect = OSError()
-        mock_lib_module.convert_lib_error.return_value = BinRecError('asdf')
-        with pytest.raises(BinRecError):
-            lift._optimize_bitcode(MockPath("asdf"), lift.OptimizationLevel.NORMAL)
+    @patch.object(lift, "process_pool", ThreadPoolExecutor)
+    def test_optimize_bitcode_partitions(self, mock_lib_module, tmp_path):
+        partitions = ["lifted-part-0.bc", "lifted-part-1.bc"]
+        for partition in partitions:
+            (tmp_path / partition).write_bytes(b"")
+        (tmp_path / "lifted-part-0-optimized.bc").write_bytes(b"")
+        binrec_lift = mock_lib_module.binrec_lift
+        binrec_lift.split_module.return_value = partitions
+        binrec_lift.optimize_better.return_value = [{"pass": "GVNPass"}]
+        binrec_lift.link_partitions.return_value = [{"pass": "GlobalDCEPass"}]
+
+        passes = lift._optimize_bitcode(
+            tmp_path, OptimizationLevel.HIGH, ArtifactPolicy.BITCODE, partitions=4
+        )
 
-        mock_lib_module.convert_lib_error.assert_called_once()
+        binrec_lift.split_module.assert_called_once_with(
+            trace_filename="lifted.bc",
+            destination="lifted-part",
+            partitions=4,
+            min_functions=lift.PARTITION_MIN_FUNCTIONS,
+            working_dir=str(tmp_path),
+        )
+        assert binrec_lift.optimize_better.call_args_list == [
+            call(
+                trace_filename=partition,
+                destination=f"lifted-part-{index}-optimized",
+                memssa_check_limit=100000,
+                working_dir=str(tmp_path),
+                artifacts="none",
+            )
+            for index, partition in enumerate(partitions)
+        ]
+        binrec_lift.link_partitions.assert_called_once_with(
+            inputs=["lifted-part-0-optimized.bc", "lifted-part-1-optimized.bc"],
+            destination="optimized",
+            working_dir=str(tmp_path),
+            artifacts="bitcode",
+        )
+        assert passes == [
+            {"pass": "GVNPass", "partition": 0},
+            {"pass": "GVNPass", "partition": 1},
+            {"pass": "GlobalDCEPass"},
+        ]
+        assert list(tmp_path.iterdir()) == []
 
-    @patch.object(lift.subprocess, "check_call")
-    def test_disassemble_bitcode(self, mock_check_call):
-        trace_dir = MockPath("asdf")
+    def test_optimize_bitcode_partitions_small(self, mock_lib_module, tmp_path):
+        mock_lib_module.binrec_lift.split_module.return_value = []
 
-        lift._disassemble_bitcode(trace_dir)
+        lift._optimize_bitcode(tmp_path, OptimizationLevel.NORMAL, partitions=4)
 
-        mock_check_call.assert_called_once_with(
-            [llvm_command("llvm-dis"), "optimized.bc"],
-            cwd=str(trace_dir),
-            stdout=(trace_dir / "disassembly.log").open.return_value,
-            stderr=subprocess.STDOUT
+        mock_lib_module.binrec_lift.optimize.assert_called_once_with(
+            trace_filename="lifted.bc",
+            destination="optimized",
+            memssa_check_limit=100000,
+            working_dir=str(tmp_path),
+            artifacts="all",
         )
+        mock_lib_module.binrec_lift.link_partitions.assert_not_called()
 
-    @patch.object(lift.subprocess, "check_call")
-    def test_disassemble_bitcode_error(self, mock_check_call):
-        mock_check_call.side_effect = CalledProcessError(0, "asdf")
+    def test_optimize_bitcode_partitions_error(self, mock_lib_module, tmp_path):
+        mock_lib_module.binrec_lift.split_module.side_effect = OSError()
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
         with pytest.raises(BinRecError):
-            lift._disassemble_bitcode(MockPath("asdf"))
+            lift._optimize_bitcode(tmp_path, OptimizationLevel.NORMAL, partitions=4)
+
+        mock_lib_module.binrec_lift.optimize.assert_not_called()
+
+    def test_optimize_bitcode_error(self, mock_lib_module):
+        mock_lib_module.binrec_lift.optimize.side_effect = OSError()
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
+        with pytest.raises(BinRecError):
+            lift._optimize_bitcode(MockPath("asdf"), lift.OptimizationLevel.NORMAL)
+
+        mock_lib_module.convert_lib_error.assert_called_once()
 
     def test_recover_bitcode(self, mock_lib_module):
         trace_dir = MockPath("asdf")
@@ -267,37 +283,55 @@ class TestLifting:
             trace_filename="optimized.bc",
             destination="recovered",
             working_dir=str(trace_dir),
+            artifacts="all",
         )
 
     def test_recover_bitcode_error(self, mock_lib_module):
         mock_lib_module.binrec_lift.compile_prep.side_effect = OSError()
-        mock_lib_module.convert_lib_error.return_value = BinRecError('asdf')
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
         with pytest.raises(BinRecError):
             lift._recover_bitcode(MockPath("asdf"))
 
         mock_lib_module.convert_lib_error.assert_called_once()
 
-    @patch.object(lift.subprocess, "check_call")
-    def test_compile_bitcode(self, mock_check_call):
+    def test_compile_bitcode(self, mock_lib_module):
         trace_dir = MockPath("asdf")
         lift._compile_bitcode(trace_dir)
 
-        mock_check_call.assert_called_once_with(
-            [
-                llvm_command("llc"), "-filetype", "obj", "-o", "recovered.o",
-                "recovered.bc"
-            ],
-            cwd=str(trace_dir),
-            stdout=(trace_dir / "compile.log").open.return_value,
-            stderr=subprocess.STDOUT
+        mock_lib_module.binrec_lift.emit_object.assert_called_once_with(
+            trace_filename="recovered.bc",
+            destination="recovered.o",
+            working_dir=str(trace_dir),
+            partitions=1,
         )
 
-    @patch.object(lift.subprocess, "check_call")
-    def test_compile_bitcode_error(self, mock_check_call):
-        mock_check_call.side_effect = CalledProcessError(0, "asdf")
+    def test_compile_bitcode_partitions(self, mock_lib_module):
+        trace_dir = MockPath("asdf")
+        lift._compile_bitcode(trace_dir, 4)
+
+        mock_lib_module.binrec_lift.emit_object.assert_called_once_with(
+            trace_filename="recovered.bc",
+            destination="recovered.o",
+            working_dir=str(trace_dir),
+            partitions=4,
+        )
+
+    def test_recovered_objects(self):
+        assert lift._recovered_objects() == ["recovered.o"]
+        assert lift._recovered_objects(3) == [
+            "recovered-0.o",
+            "recovered-1.o",
+            "recovered-2.o",
+        ]
+
+    def test_compile_bitcode_error(self, mock_lib_module):
+        mock_lib_module.binrec_lift.emit_object.side_effect = OSError()
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
         with pytest.raises(BinRecError):
             lift._compile_bitcode(MockPath("asdf"))
 
+        mock_lib_module.convert_lib_error.assert_called_once()
+
     def test_link_recovered_binary(self, mock_lib_module):
         trace_dir = MockPath("asdf")
         i386_ld = str(BINREC_ROOT / "binrec_link" / "ld" / "i386.ld")
@@ -312,12 +346,22 @@ class TestLifting:
             linker_script=i386_ld,
             destination=str(trace_dir / "recovered"),
             dependencies_filename=str(trace_dir / "dependencies"),
-            harden=False
+            harden=False,
         )
 
+    def test_link_recovered_binary_partitions(self, mock_lib_module):
+        trace_dir = MockPath("asdf")
+        lift._link_recovered_binary(trace_dir, codegen_partitions=2)
+
+        kwargs = mock_lib_module.binrec_link.link.call_args.kwargs
+        assert kwargs["recovered_filename"] == [
+            str(trace_dir / "recovered-0.o"),
+            str(trace_dir / "recovered-1.o"),
+        ]
+
     def test_link_recovered_binary_error(self, mock_lib_module):
         mock_lib_module.binrec_link.link.side_effect = CalledProcessError(0, "asdf")
-        mock_lib_module.convert_lib_error.return_value = BinRecError('asdf')
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
         with pytest.raises(BinRecError):
             lift._link_recovered_binary(MagicMock(name="asdf"))
 
@@ -331,7 +375,6 @@ class TestLifting:
     @patch.object(lift, "_apply_fixups")
     @patch.object(lift, "_lift_bitcode")
     @patch.object(lift, "_optimize_bitcode")
-    @patch.object(lift, "_disassemble_bitcode")
     @patch.object(lift, "_recover_bitcode")
     @patch.object(lift, "_compile_bitcode")
     @patch.object(lift, "_link_recovered_binary")
@@ -342,7 +385,6 @@ class TestLifting:
         mock_link,
         mock_compile,
         mock_recover,
-        mock_disasm,
         mock_optimize,
         mock_lift,
         mock_apply,
@@ -355,16 +397,23 @@ class TestLifting:
         mock_project.merged_trace_dir.return_value = trace_dir = MockPath(
             "s2e-out", is_dir=True
         )
-        lift.lift_trace("hello", OptimizationLevel.NORMAL)
+        timings = lift.lift_trace(
+            "hello", OptimizationLevel.NORMAL, separate_stages=True
+        )
+        assert sorted(timings) == sorted(
+            stage.name
+            for stage in lift._lift_stages(OptimizationLevel.NORMAL, False, True)
+        )
         mock_extract.assert_called_once_with(trace_dir)
-        mock_clean.assert_called_once_with(trace_dir)
-        mock_apply.assert_called_once_with(trace_dir)
-        mock_lift.assert_called_once_with(trace_dir)
-        mock_optimize.assert_called_once_with(trace_dir, OptimizationLevel.NORMAL)
-        mock_disasm.assert_called_once_with(trace_dir)
-        mock_recover.assert_called_once_with(trace_dir)
-        mock_compile.assert_called_once_with(trace_dir)
-        mock_link.assert_called_once_with(trace_dir, False)
+        mock_clean.assert_called_once_with(trace_dir, ArtifactPolicy.NONE)
+        mock_apply.assert_called_once_with(trace_dir, ArtifactPolicy.NONE)
+        mock_lift.assert_called_once_with(trace_dir, ArtifactPolicy.NONE)
+        mock_optimize.assert_called_once_with(
+            trace_dir, OptimizationLevel.NORMAL, ArtifactPolicy.NONE, 1
+        )
+        mock_recover.assert_called_once_with(trace_dir, ArtifactPolicy.NONE)
+        mock_compile.assert_called_once_with(trace_dir, 1)
+        mock_link.assert_called_once_with(trace_dir, False, 1)
         mock_data_imports.assert_called_once_with(trace_dir)
         mock_sections.assert_called_once_with(trace_dir)
         mock_deps.assert_called_once_with(trace_dir)
@@ -376,7 +425,6 @@ class TestLifting:
     @patch.object(lift, "_apply_fixups")
     @patch.object(lift, "_lift_bitcode")
     @patch.object(lift, "_optimize_bitcode")
-    @patch.object(lift, "_disassemble_bitcode")
     @patch.object(lift, "_recover_bitcode")
     @patch.object(lift, "_compile_bitcode")
     @patch.object(lift, "_link_recovered_binary")
@@ -387,7 +435,6 @@ class TestLifting:
         mock_link,
         mock_compile,
         mock_recover,
-        mock_disasm,
         mock_optimize,
         mock_lift,
         mock_apply,
@@ -405,21 +452,276 @@ class TestLifting:
         mock_apply.assert_not_called()
         mock_lift.assert_not_called()
         mock_optimize.assert_not_called()
-        mock_disasm.assert_not_called()
         mock_recover.assert_not_called()
         mock_compile.assert_not_called()
         mock_link.assert_not_called()
         mock_sections.assert_not_called()
         mock_deps.assert_not_called()
 
+    def test_lift_graph(self):
+        graph = lift._build_lift_graph(
+            MockPath("s2e-out"),
+            lift._lift_stages(OptimizationLevel.NORMAL, False, separate_stages=True),
+        )
+        dependencies = {name: task.dependencies for name, task in graph.tasks.items()}
+        assert dependencies == {
+            "symbols": [],
+            "data_imports": [],
+            "sections": [],
+            "dependencies": [],
+            "clean": [],
+            "fixups": ["clean"],
+            "lift": ["data_imports", "fixups", "sections", "symbols"],
+            "optimize": ["lift"],
+            "recover": ["optimize"],
+            "compile": ["recover"],
+            "link": ["compile", "dependencies"],
+        }
+
+    @patch.object(lift, "_extract_binary_symbols")
+    @patch.object(lift, "_extract_data_imports")
+    @patch.object(lift, "_extract_sections")
+    @patch.object(lift, "_extract_dependencies")
+    @patch.object(lift, "_clean_bitcode")
+    @patch.object(lift, "_apply_fixups")
+    @patch.object(lift, "project")
+    def test_lift_trace_stage_error(
+        self,
+        mock_project,
+        mock_apply,
+        mock_clean,
+        mock_deps,
+        mock_sections,
+        mock_data_imports,
+        mock_extract,
+    ):
+        mock_project.merged_trace_dir.return_value = trace_dir = MockPath(
+            "s2e-out", is_dir=True
+        )
+        mock_clean.side_effect = BinRecError("asdf")
+        with pytest.raises(BinRecError):
+            lift.lift_trace("hello", OptimizationLevel.NORMAL, separate_stages=True)
+
+        # independent stages still complete
+        mock_extract.assert_called_once_with(trace_dir)
+        mock_deps.assert_called_once_with(trace_dir)
+        mock_apply.assert_not_called()
+
+    def test_lift_graph_pipeline(self):
+        graph = lift._build_lift_graph(
+            MockPath("s2e-out"), lift._lift_stages(OptimizationLevel.NORMAL, False)
+        )
+        dependencies = {name: task.dependencies for name, task in graph.tasks.items()}
+        assert dependencies == {
+            "symbols": [],
+            "data_imports": [],
+            "sections": [],
+            "dependencies": [],
+            "pipeline": ["data_imports", "sections", "symbols"],
+            "link": ["dependencies", "pipeline"],
+        }
+
+    def test_lift_stages_artifacts(self):
+        stages = lift._lift_stages(OptimizationLevel.NORMAL, False)
+        pipeline = {stage.name: stage for stage in stages}["pipeline"]
+        assert pipeline.outputs == ["recovered.bc", "recovered.o", "rfuncs"]
+
+        stages = lift._lift_stages(
+            OptimizationLevel.NORMAL, False, artifacts=ArtifactPolicy.BITCODE
+        )
+        pipeline = {stage.name: stage for stage in stages}["pipeline"]
+        assert "optimized.bc" in pipeline.outputs
+        assert "cleaned.bc" in pipeline.outputs
+        assert "recovered.ll" not in pipeline.outputs
+
+        stages = lift._lift_stages(
+            OptimizationLevel.NORMAL, False, artifacts=ArtifactPolicy.ALL
+        )
+        pipeline = {stage.name: stage for stage in stages}["pipeline"]
+        assert "optimized-memssa.ll" in pipeline.outputs
+        assert "recovered.ll" in pipeline.outputs
+
+    def test_separate_stages_artifacts(self):
+        stages = {
+            stage.name: stage
+            for stage in lift._separate_bitcode_stages(OptimizationLevel.NORMAL)
+        }
+        assert stages["fixups"].outputs == ["linked.bc"]
+        assert stages["lift"].outputs == ["lifted.bc", "rfuncs"]
+
+        stages = {
+            stage.name: stage
+            for stage in lift._separate_bitcode_stages(
+                OptimizationLevel.NORMAL, ArtifactPolicy.ALL
+            )
+        }
+        assert stages["fixups"].outputs == ["linked.bc", "linked.ll"]
+        assert stages["recover"].outputs == [
+            "recovered.bc",
+            "recovered.ll",
+            "recovered-memssa.ll",
+        ]
+
+    @patch.object(lift, "_extract_binary_symbols")
+    @patch.object(lift, "_extract_data_imports")
+    @patch.object(lift, "_extract_sections")
+    @patch.object(lift, "_extract_dependencies")
+    @patch.object(lift, "_run_lift_pipeline")
+    @patch.object(lift, "_clean_bitcode")
+    @patch.object(lift, "_compile_bitcode")
+    @patch.object(lift, "_link_recovered_binary")
+    @patch.object(lift, "project")
+    def test_lift_trace_pipeline(
+        self,
+        mock_project,
+        mock_link,
+        mock_compile,
+        mock_clean,
+        mock_pipeline,
+        mock_deps,
+        mock_sections,
+        mock_data_imports,
+        mock_extract,
+    ):
+        mock_project.merged_trace_dir.return_value = trace_dir = MockPath(
+            "s2e-out", is_dir=True
+        )
+        lift.lift_trace(
+            "hello", OptimizationLevel.HIGH, artifacts=ArtifactPolicy.BITCODE
+        )
+        mock_pipeline.assert_called_once_with(
+            trace_dir, OptimizationLevel.HIGH, ArtifactPolicy.BITCODE, 1
+        )
+        mock_clean.assert_not_called()
+        # the pipeline compiles the recovered object file
+        mock_compile.assert_not_called()
+        mock_link.assert_called_once_with(trace_dir, False, 1)
+
+    def test_run_lift_pipeline(self, mock_lib_module):
+        trace_dir = MockPath("s2e-out")
+        lift._run_lift_pipeline(trace_dir, OptimizationLevel.HIGH)
+        mock_lib_module.binrec_lift.run_pipeline.assert_called_once_with(
+            trace_filename="captured.bc",
+            destination="recovered",
+            helpers_filename=str(lift.BINREC_RUNLIB / "custom-helpers.bc"),
+            working_dir=str(trace_dir),
+            memssa_check_limit=lift.MEMSSA_CHECK_LIMIT,
+            optimize_better=True,
+            clean_names=True,
+            artifacts="none",
+            object_filename="recovered.o",
+            object_partitions=1,
+        )
+
+    def test_run_lift_pipeline_artifacts(self, mock_lib_module):
+        lift._run_lift_pipeline(
+            MockPath("s2e-out"), OptimizationLevel.NORMAL, ArtifactPolicy.ALL
+        )
+        kwargs = mock_lib_module.binrec_lift.run_pipeline.call_args.kwargs
+        assert kwargs["artifacts"] == "all"
+        assert not kwargs["optimize_better"]
+
+    def test_run_lift_pipeline_error(self, mock_lib_module):
+        mock_lib_module.binrec_lift.run_pipeline.side_effect = OSError()
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
+        with pytest.raises(BinRecError):
+            lift._run_lift_pipeline(MockPath("s2e-out"), OptimizationLevel.NORMAL)
+
+        mock_lib_module.convert_lib_error.assert_called_once()
+
+    def test_lift_graph_force_from_unknown(self):
+        with pytest.raises(BinRecError):
+            lift._build_lift_graph(
+                MockPath("s2e-out"),
+                lift._lift_stages(OptimizationLevel.NORMAL, False),
+                force_from="asdf",
+            )
+
     @patch("sys.argv", ["merge", "hello"])
     @patch.object(sys, "exit")
     @patch.object(lift, "lift_trace")
     def test_main(self, mock_lift, mock_exit):
         lift.main()
-        mock_lift.assert_called_once_with("hello", OptimizationLevel.NORMAL, False)
+        mock_lift.assert_called_once_with(
+            "hello",
+            OptimizationLevel.NORMAL,
+            False,
+            force_from=None,
+            separate_stages=False,
+            artifacts=ArtifactPolicy.NONE,
+            partitions=1,
+            codegen_partitions=1,
+        )
         mock_exit.assert_called_once_with(0)
 
+    @patch(
+        "sys.argv", ["lift", "--separate-stages", "--force-from", "optimize", "hello"]
+    )
+    @patch.object(sys, "exit")
+    @patch.object(lift, "lift_trace")
+    def test_main_force_from(self, mock_lift, mock_exit):
+        lift.main()
+        mock_lift.assert_called_once_with(
+            "hello",
+            OptimizationLevel.NORMAL,
+            False,
+            force_from="optimize",
+            separate_stages=True,
+            artifacts=ArtifactPolicy.NONE,
+            partitions=1,
+            codegen_partitions=1,
+        )
+
+    @patch("sys.argv", ["lift", "--partitions", "8", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(lift, "lift_trace")
+    def test_main_partitions(self, mock_lift, mock_exit):
+        lift.main()
+        assert mock_lift.call_args.kwargs["partitions"] == 8
+
+    @patch("sys.argv", ["lift", "--codegen-partitions", "4", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(lift, "lift_trace")
+    def test_main_codegen_partitions(self, mock_lift, mock_exit):
+        lift.main()
+        assert mock_lift.call_args.kwargs["codegen_partitions"] == 4
+
+    def test_lift_stages_codegen_partitions(self):
+        objects = ["recovered-0.o", "recovered-1.o"]
+        for separate_stages in (False, True):
+            stages = {
+                stage.name: stage
+                for stage in lift._lift_stages(
+                    OptimizationLevel.NORMAL,
+                    False,
+                    separate_stages,
+                    codegen_partitions=2,
+                )
+            }
+            compile_stage = stages["compile" if separate_stages else "pipeline"]
+            assert set(objects) <= set(compile_stage.outputs)
+            assert "recovered.o" not in compile_stage.outputs
+            assert compile_stage.params["codegen_partitions"] == 2
+            assert set(objects) <= set(stages["link"].inputs)
+
+    def test_lift_stages_partitions(self):
+        stages = {
+            stage.name: stage
+            for stage in lift._lift_stages(
+                OptimizationLevel.NORMAL, False, partitions=8
+            )
+        }
+        # partitioned optimization runs the bitcode stages separately
+        assert "pipeline" not in stages
+        assert stages["optimize"].params["partitions"] == 8
+
+    @patch("sys.argv", ["lift", "--artifacts", "bitcode", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(lift, "lift_trace")
+    def test_main_artifacts(self, mock_lift, mock_exit):
+        lift.main()
+        assert mock_lift.call_args.kwargs["artifacts"] == ArtifactPolicy.BITCODE
+
     @patch("sys.argv", ["lift"])
     def test_main_usage_error(self):
         with pytest.raises(SystemExit) as err:
@@ -447,38 +749,234 @@ class TestLifting:
         mock_audit.assert_called_once()
         mock_debug.assert_called_once()
 
-    @patch("builtins.open", new_callable=mock.mock_open)
-    @patch.object(lift, "print")
     @patch.object(lift.subprocess, "check_output")
-    def test_extract_dependencies(self, mock_check, mock_print, mock_file):
-        trace_dir = MockPath(name="asdf")
-        deps_path = trace_dir / "dependencies"
-        binary = trace_dir / "binary"
-        mock_check.side_effect = [OBJDUMP_DEP_OUTPUT, LDD_DEP_OUTPUT]
-
-        lift._extract_dependencies(trace_dir)
-
-        mock_file.assert_called_once_with(deps_path, "w")
-        handle = mock_file()
-        assert mock_print.call_args_list == [
-            call("/lib/i386-linux-gnu/libselinux.so.1", file=handle),
-	        call("/lib/i386-linux-gnu/libc.so.6", file=handle)
-        ]
-        assert mock_check.call_args_list == [
-            call(["objdump", "--private-headers", str(binary)]),
-            call(["ldd", str(binary)])
-        ]
+    @patch.object(lift, "resolve_libraries")
+    @patch.object(lift, "ElfFile")
+    def test_extract_dependencies(self, mock_elf, mock_resolve, mock_check, tmp_path):
+        mock_resolve.return_value = {
+            "libselinux.so.1": "/lib/i386-linux-gnu/libselinux.so.1",
+            "libc.so.6": "/lib/i386-linux-gnu/libc.so.6",
+        }
+
+        lift._extract_dependencies(tmp_path)
+
+        mock_resolve.assert_called_once_with(
+            mock_elf.return_value.__enter__.return_value
+        )
+        mock_check.assert_not_called()
+        assert (tmp_path / "dependencies").read_text() == (
+            "/lib/i386-linux-gnu/libselinux.so.1\n/lib/i386-linux-gnu/libc.so.6\n"
+        )
 
     @patch.object(lift.subprocess, "check_output")
-    def test_extract_dependencies_objdump_err(self, mock_check):
-        trace_dir = MockPath(name="asdf")
-        mock_check.side_effect = [subprocess.CalledProcessError(-1, ""), b""]
-        with pytest.raises(BinRecError):
-            lift._extract_dependencies(trace_dir)
+    @patch.object(lift, "resolve_libraries")
+    @patch.object(lift, "ElfFile")
+    def test_extract_dependencies_ldd(
+        self, mock_elf, mock_resolve, mock_check, tmp_path
+    ):
+        mock_resolve.return_value = {
+            "libselinux.so.1": None,
+            "libc.so.6": "/lib/i386-linux-gnu/libc.so.6",
+            "libnotfound.so.1": None,
+        }
+        mock_check.return_value = LDD_DEP_OUTPUT
+
+        lift._extract_dependencies(tmp_path)
+
+        mock_check.assert_called_once_with(["ldd", str(tmp_path / "binary")])
+        assert (tmp_path / "dependencies").read_text() == (
+            "/lib/i386-linux-gnu/libselinux.so.1\n/lib/i386-linux-gnu/libc.so.6\n"
+        )
 
     @patch.object(lift.subprocess, "check_output")
-    def test_extract_dependencies_ldd_err(self, mock_check):
-        trace_dir = MockPath(name="asdf")
-        mock_check.side_effect = [OBJDUMP_DEP_OUTPUT, subprocess.CalledProcessError(-1, "")]
+    @patch.object(lift, "resolve_libraries")
+    @patch.object(lift, "ElfFile")
+    def test_extract_dependencies_ldd_err(
+        self, mock_elf, mock_resolve, mock_check, tmp_path
+    ):
+        mock_resolve.return_value = {
+            "libselinux.so.1": None,
+            "libc.so.6": "/lib/i386-linux-gnu/libc.so.6",
+        }
+        mock_check.side_effect = subprocess.CalledProcessError(-1, "")
+
+        lift._extract_dependencies(tmp_path)
+
+        assert (tmp_path / "dependencies").read_text() == (
+            "/lib/i386-linux-gnu/libc.so.6\n"
+        )
+
+    @patch.object(lift, "ElfFile")
+    def test_extract_dependencies_error(self, mock_elf, tmp_path):
+        mock_elf.side_effect = BinRecError("asdf")
         with pytest.raises(BinRecError):
-            lift._extract_dependencies(trace_dir)
+            lift._extract_dependencies(tmp_path)
+
+
+def _write_stage(trace_dir, stage):
+    # outputs are derived from the inputs, like a real stage
+    content = "".join((trace_dir / name).read_text() for name in stage.inputs)
+    for output in stage.outputs:
+        (trace_dir / output).write_text(f"{stage.name}({content})")
+
+
+class TestLiftManifest:
+    def _stages(self):
+        # a chain of three stages: a -> b -> c
+        return [
+            lift.LiftStage("a", MagicMock(), ["input"], ["a.out"]),
+            lift.LiftStage("b", MagicMock(), ["a.out"], ["b.out"], {"level": 1}),
+            lift.LiftStage("c", MagicMock(), ["b.out"], ["c.out"]),
+        ]
+
+    def _run(self, trace_dir, stages, force_from=None):
+        for stage in stages:
+            stage.func.reset_mock()
+            stage.func.side_effect = partial(_write_stage, stage=stage)
+
+        manifest = lift.LiftManifest(trace_dir)
+        lift._build_lift_graph(trace_dir, stages, manifest, force_from).run()
+        return [stage.name for stage in stages if stage.func.called]
+
+    def test_resume(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        assert self._run(tmp_path, stages) == ["a", "b", "c"]
+        assert (tmp_path / lift.LIFT_MANIFEST_NAME).is_file()
+        assert self._run(tmp_path, stages) == []
+
+    def test_input_changed(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        self._run(tmp_path, stages)
+        (tmp_path / "input").write_text("changed")
+        assert self._run(tmp_path, stages) == ["a", "b", "c"]
+
+    def test_intermediate_changed(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        self._run(tmp_path, stages)
+        (tmp_path / "a.out").write_text("changed")
+        # "a" is up to date since its input and the output exists
+        assert self._run(tmp_path, stages) == ["b", "c"]
+
+    def test_params_changed(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        self._run(tmp_path, stages)
+        stages[1].params = {"level": 2}
+        # "b" writes the same output so "c" is up to date
+        assert self._run(tmp_path, stages) == ["b"]
+
+    def test_output_missing(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        self._run(tmp_path, stages)
+        (tmp_path / "c.out").unlink()
+        assert self._run(tmp_path, stages) == ["c"]
+
+    @patch.object(lift, "binrec_lift_build_id")
+    def test_tool_changed(self, mock_build_id, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        mock_build_id.return_value = "1"
+        self._run(tmp_path, stages)
+        mock_build_id.return_value = "2"
+        assert self._run(tmp_path, stages) == ["a", "b", "c"]
+
+    def test_force_from(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        self._run(tmp_path, stages)
+        assert self._run(tmp_path, stages, force_from="b") == ["b", "c"]
+
+    def test_interrupted(self, tmp_path):
+        (tmp_path / "input").write_text("input")
+        stages = self._stages()
+        self._run(tmp_path, stages)
+        stages[1].params = {"level": 2}
+        for stage in stages:
+            stage.func.reset_mock()
+        stages[1].func.side_effect = BinRecError("asdf")
+        manifest = lift.LiftManifest(tmp_path)
+        with pytest.raises(BinRecError):
+            lift._build_lift_graph(tmp_path, stages, manifest).run()
+
+        # the failed stage is removed from the manifest and is run again, even after
+        # its parameters are restored
+        stages[1].params = {"level": 1}
+        assert self._run(tmp_path, stages) == ["b"]
+
+    def test_invalid_manifest(self, tmp_path):
+        (tmp_path / lift.LIFT_MANIFEST_NAME).write_text("not json")
+        assert lift.LiftManifest(tmp_path).stages == {}
+
+
+def _pass(name, depth=0, seconds=1.0, stage="optimize"):
+    return {"stage": stage, "pass": name, "depth": depth, "seconds": seconds}
+
+
+class TestLiftStatistics:
+    def test_run_stage(self, tmp_path):
+        passes = [_pass("CleanPass")]
+        stage = lift.LiftStage("a", MagicMock(return_value=passes))
+        statistics = lift.LiftStatistics(tmp_path)
+        lift._build_lift_graph(tmp_path, [stage], statistics=statistics).run()
+
+        stage.func.assert_called_once_with(tmp_path)
+        assert statistics.stages == {"a": passes}
+
+    def test_run_stage_manifest(self, tmp_path):
+        stages = [
+            lift.LiftStage("a", MagicMock(return_value=None)),
+            lift.LiftStage("b", MagicMock(return_value=[_pass("LiftPass")])),
+        ]
+        statistics = lift.LiftStatistics(tmp_path)
+        lift._build_lift_graph(
+            tmp_path, stages, lift.LiftManifest(tmp_path), statistics=statistics
+        ).run()
+
+        assert statistics.stages == {"a": [], "b": [_pass("LiftPass")]}
+
+    def test_save(self, tmp_path):
+        statistics = lift.LiftStatistics(tmp_path)
+        statistics.record("a", [_pass("CleanPass")])
+        statistics.save({"a": 2.0, "b": 1.0})
+
+        previous = lift.LiftStatistics(tmp_path)
+        previous.record("b", None)
+        previous.save({"a": 0.0, "b": 1.5})
+
+        stats = json.loads((tmp_path / lift.LIFT_STATS_NAME).read_text())
+        # stages that did not run keep their previous statistics
+        assert stats == {
+            "stages": {
+                "a": {"seconds": 2.0, "passes": [_pass("CleanPass")]},
+                "b": {"seconds": 1.5, "passes": []},
+            }
+        }
+
+    def test_save_invalid(self, tmp_path):
+        (tmp_path / lift.LIFT_STATS_NAME).write_text("not json")
+        statistics = lift.LiftStatistics(tmp_path)
+        statistics.record("a", [])
+        statistics.save({"a": 1.0})
+
+        stats = json.loads((tmp_path / lift.LIFT_STATS_NAME).read_text())
+        assert stats == {"stages": {"a": {"seconds": 1.0, "passes": []}}}
+
+    def test_slowest_passes(self, tmp_path):
+        statistics = lift.LiftStatistics(tmp_path)
+        statistics.record(
+            "optimize",
+            [
+                _pass("PassManager", 0, 10.0),
+                _pass("InstCombinePass", 1, 6.0),
+                _pass("GVNPass", 1, 3.0),
+                _pass("DCEPass", 0, 0.5),
+            ],
+        )
+        statistics.record("clean", [_pass("CleanPass", 0, 4.0, "clean")])
+
+        slowest = [record["pass"] for record in statistics.slowest_passes(3)]
+        assert slowest == ["InstCombinePass", "CleanPass", "GVNPass"]
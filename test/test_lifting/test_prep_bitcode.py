@@ -47,12 +47,14 @@ class TestLiftingPrepBitcode:
         mock_lib_module.binrec_lift.link_prep_1.assert_called_once_with(
             trace_filename=str(source),
             destination="tempfile",
-            working_dir=str(trace_dir)
+            working_dir=str(trace_dir),
+            artifacts="bitcode",
         )
         mock_lib_module.binrec_lift.link_prep_2.assert_called_once_with(
             trace_filename=str(dest),
             destination="tempfile",
-            working_dir=str(trace_dir)
+            working_dir=str(trace_dir),
+            artifacts="bitcode",
         )
 
     @patch.object(lift.subprocess, "check_call")
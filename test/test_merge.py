@@ -1,5 +1,11 @@
+import json
+import re
+import shutil
 import subprocess
+import threading
 import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from unittest.mock import patch, call
 from pathlib import Path
 import logging
@@ -7,6 +13,8 @@ import logging
 import pytest
 
 from binrec import merge, core
+from binrec.artifacts import ArtifactPolicy
+from binrec.cache import ContentCache
 from binrec.env import BINREC_ROOT, llvm_command
 from binrec.errors import BinRecError
 from binrec import audit
@@ -22,7 +30,6 @@ class TestMerge:
         mock_check_call.assert_called_once_with(
             [
                 llvm_command("llvm-link"),
-                "-print-after-all",
                 "-v",
                 "-o",
                 "dest",
@@ -40,6 +47,18 @@ class TestMerge:
         with pytest.raises(BinRecError):
             merge._link_bitcode(Path("base"), Path("source"), dest)
 
+    def test_link_many(self, mock_lib_module):
+        merge._link_many([Path("base"), Path("a"), Path("b")], Path("dest"))
+        mock_lib_module.binrec_lift.link_many.assert_called_once_with(
+            ["base", "a", "b"], "dest", override_base=True
+        )
+
+    def test_link_many_error(self, mock_lib_module):
+        mock_lib_module.binrec_lift.link_many.side_effect = RuntimeError("asdf")
+        mock_lib_module.convert_lib_error.return_value = BinRecError("asdf")
+        with pytest.raises(BinRecError):
+            merge._link_many([Path("base"), Path("a")], Path("dest"))
+
     @patch.object(merge.subprocess, "check_call")
     def test_merge_trace_info(self, mock_check_call):
         binrec_tracemerge = str(BINREC_ROOT / "build" / "bin" / "binrec_tracemerge")
@@ -54,11 +73,12 @@ class TestMerge:
         with pytest.raises(BinRecError):
             merge._merge_trace_info(["asdf"], "qwer")
 
+    @patch.object(merge, "_write_merge_manifest")
+    @patch.object(merge, "_fingerprint_captures")
     @patch.object(merge, "shutil")
     @patch.object(merge, "prep_bitcode_for_linkage")
-    @patch.object(merge.tempfile, "mkstemp")
     @patch.object(merge, "os")
-    @patch.object(merge, "_link_bitcode")
+    @patch.object(merge, "_link_many")
     @patch.object(merge.subprocess, "check_call")
     @patch.object(merge, "_merge_trace_info")
     def test_merge_bitcode(
@@ -67,13 +87,13 @@ class TestMerge:
         mock_check_call,
         mock_link,
         mock_os,
-        mock_mkstemp,
         mock_prep_bitcode,
         mock_shutil,
+        mock_fingerprint,
+        mock_manifest,
     ):
         dest = MockPath() / "does" / "not" / "exist"
         dest.exists.return_value = False
-        mock_mkstemp.return_value = (100, "temp")
         mock_os.listdir.return_value = ["captured.bc", "captured_0.bc", "traceInfo.json", "traceInfo_0.json"]
         outfile = dest / "captured.bc"
         capture_dirs = [
@@ -81,35 +101,29 @@ class TestMerge:
             Path("/") / "I" / "don't" / "either",
         ]
 
-        merge.merge_bitcode(capture_dirs, dest)
+        merge.merge_bitcode(capture_dirs, dest, dedup=False, artifacts=ArtifactPolicy.ALL)
         dest.exists.assert_called_once()
         dest.mkdir.assert_called_once_with(exist_ok=True)
         mock_shutil.rmtree.assert_not_called()
 
         assert mock_prep_bitcode.call_args_list == [
-            call(capture_dirs[0], Path("captured.bc"), Path("captured-link-ready.bc")),
-            call(capture_dirs[0], Path("captured_0.bc"), Path("captured_0-link-ready.bc")),
-            call(capture_dirs[1], Path("captured.bc"), Path("captured-link-ready.bc")),
-            call(capture_dirs[1], Path("captured_0.bc"), Path("captured_0-link-ready.bc"))
+            call(capture_dirs[0], Path("captured.bc"), Path("captured-link-ready.bc"), temp_dir=None),
+            call(capture_dirs[0], Path("captured_0.bc"), Path("captured_0-link-ready.bc"), temp_dir=None),
+            call(capture_dirs[1], Path("captured.bc"), Path("captured-link-ready.bc"), temp_dir=None),
+            call(capture_dirs[1], Path("captured_0.bc"), Path("captured_0-link-ready.bc"), temp_dir=None)
         ]
 
-        mock_shutil.copy.assert_called_once_with(
-            capture_dirs[0] / "captured-link-ready.bc", outfile
+        mock_shutil.copy.assert_not_called()
+        mock_link.assert_called_once_with(
+            [
+                capture_dirs[0] / "captured-link-ready.bc",
+                capture_dirs[0] / "captured_0-link-ready.bc",
+                capture_dirs[1] / "captured-link-ready.bc",
+                capture_dirs[1] / "captured_0-link-ready.bc",
+            ],
+            outfile,
         )
 
-        mock_mkstemp.assert_called_once_with(suffix=".bc")
-        mock_os.close.assert_called_once_with(100)
-
-        assert mock_link.call_args_list == [
-            call(base=outfile, source=capture_dirs[0] / "captured_0-link-ready.bc", destination = Path("temp")),
-            call(base=outfile, source=capture_dirs[1] / "captured-link-ready.bc", destination = Path("temp")),
-            call(base=outfile, source=capture_dirs[1] / "captured_0-link-ready.bc", destination = Path("temp"))
-        ]
-
-        assert mock_shutil.move.call_args_list == [
-            call("temp", outfile), call("temp", outfile), call("temp", outfile)
-        ]
-
         mock_check_call.assert_called_once_with(
             [llvm_command("llvm-dis"), str(outfile)]
         )
@@ -119,6 +133,8 @@ class TestMerge:
             dest / "traceInfo.json",
         )
 
+    @patch.object(merge, "_write_merge_manifest")
+    @patch.object(merge, "_fingerprint_captures")
     @patch.object(merge, "shutil")
     @patch.object(merge, "prep_bitcode_for_linkage")
     @patch.object(merge.tempfile, "mkstemp")
@@ -135,6 +151,8 @@ class TestMerge:
         mock_mkstemp,
         mock_prep_bitcode,
         mock_shutil,
+        mock_fingerprint,
+        mock_manifest,
     ):
         dest = MockPath("/") / "does" / "not" / "exist"
         dest._exists = True
@@ -145,9 +163,13 @@ class TestMerge:
             Path("/") / "I" / "don't" / "either",
         ]
 
-        merge.merge_bitcode(capture_dirs, dest)
+        merge.merge_bitcode(capture_dirs, dest, dedup=False)
         mock_shutil.rmtree.assert_called_once_with(dest)
+        # captured.ll is only written when all artifacts are requested
+        mock_check_call.assert_not_called()
 
+    @patch.object(merge, "_write_merge_manifest")
+    @patch.object(merge, "_fingerprint_captures")
     @patch.object(merge, "shutil")
     @patch.object(merge, "prep_bitcode_for_linkage")
     @patch.object(merge.tempfile, "mkstemp")
@@ -164,6 +186,8 @@ class TestMerge:
         mock_mkstemp,
         mock_prep_bitcode,
         mock_shutil,
+        mock_fingerprint,
+        mock_manifest,
     ):
         dest = MockPath("/") / "does" / "not" / "exist"
         dest.exists.return_value = True
@@ -176,28 +200,312 @@ class TestMerge:
         mock_check_call.side_effect = subprocess.CalledProcessError(0, "asdf")
 
         with pytest.raises(BinRecError):
-            merge.merge_bitcode(capture_dirs, dest)
+            merge.merge_bitcode(capture_dirs, dest, dedup=False, artifacts=ArtifactPolicy.ALL)
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree(self, mock_link, tmp_path):
+        def fake_link(base, source, destination, logfile):
+            destination.write_text(base.read_text() + source.read_text())
+
+        mock_link.side_effect = fake_link
+        inputs = []
+        for i in range(5):
+            inputs.append(tmp_path / f"{i}.bc")
+            inputs[-1].write_text(str(i))
+
+        outfile = tmp_path / "captured.bc"
+        merge._link_bitcode_tree(inputs, outfile, jobs=4)
+
+        # ((0 1) (2 3)) 4 -> the same order as a sequential fold
+        assert outfile.read_text() == "01234"
+        assert mock_link.call_count == 4
+        for link_call in mock_link.call_args_list:
+            assert link_call.kwargs["logfile"] == tmp_path / "merge_link.log"
+
+        # intermediate link outputs are removed
+        assert sorted(tmp_path.iterdir()) == sorted(inputs + [outfile])
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree_single(self, mock_link, tmp_path):
+        source = tmp_path / "0.bc"
+        source.write_text("0")
+        outfile = tmp_path / "captured.bc"
+
+        merge._link_bitcode_tree([source], outfile, jobs=4)
+
+        mock_link.assert_not_called()
+        assert outfile.read_text() == "0"
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree_empty(self, mock_link, tmp_path):
+        with pytest.raises(BinRecError, match="no traces to merge"):
+            merge._link_bitcode_tree([], tmp_path / "captured.bc", jobs=4)
+
+        mock_link.assert_not_called()
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree_error(self, mock_link, tmp_path):
+        mock_link.side_effect = BinRecError("llvm-link failed")
+        inputs = [tmp_path / "0.bc", tmp_path / "1.bc"]
+        for path in inputs:
+            path.write_text("x")
+
+        with pytest.raises(BinRecError):
+            merge._link_bitcode_tree(inputs, tmp_path / "captured.bc", jobs=2)
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree_futures(self, mock_link, tmp_path):
+        def fake_link(base, source, destination, logfile):
+            destination.write_text(base.read_text() + source.read_text())
+
+        mock_link.side_effect = fake_link
+        futures = []
+        for i in range(4):
+            path = tmp_path / f"{i}.bc"
+            path.write_text(str(i))
+            future = Future()
+            future.set_result(path)
+            futures.append(future)
+
+        outfile = tmp_path / "captured.bc"
+        merge._link_bitcode_tree(futures, outfile, jobs=2)
+        assert outfile.read_text() == "0123"
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree_out_of_order(self, mock_link, tmp_path):
+        def fake_link(base, source, destination, logfile):
+            destination.write_text(base.read_text() + source.read_text())
+
+        mock_link.side_effect = fake_link
+        paths = []
+        for i in range(3):
+            paths.append(tmp_path / f"{i}.bc")
+            paths[-1].write_text(str(i))
+
+        # the last capture is prepared first, the first capture is prepared last
+        first = Future()
+        last = Future()
+        last.set_result(paths[2])
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(lambda: time.sleep(0.05) or first.set_result(paths[0]))
+            outfile = tmp_path / "captured.bc"
+            merge._link_bitcode_tree([first, paths[1], last], outfile, jobs=2)
+
+        assert outfile.read_text() == "012"
+
+    @patch.object(merge, "_link_bitcode")
+    def test_link_bitcode_tree_prep_errors(self, mock_link, tmp_path):
+        futures = []
+        for i in range(3):
+            future = Future()
+            if i == 1:
+                path = tmp_path / "1.bc"
+                path.write_text("1")
+                future.set_result(path)
+            else:
+                future.set_exception(BinRecError(f"bad capture {i}"))
+            futures.append(future)
+
+        with pytest.raises(BinRecError) as err:
+            merge._link_bitcode_tree(futures, tmp_path / "captured.bc", jobs=2)
+
+        # every failed capture is reported
+        assert "failed to prepare 2 of 3 captures" in str(err.value)
+        assert "bad capture 0" in str(err.value)
+        assert "bad capture 2" in str(err.value)
+        mock_link.assert_not_called()
+
+    @patch.object(merge, "prep_bitcode_for_linkage")
+    def test_prep_capture(self, mock_prep, tmp_path):
+        merge._init_prep_worker(tmp_path)
+        worker_dir = merge._prep_worker_temp_dir
+        assert worker_dir.parent == tmp_path
+        assert worker_dir.is_dir()
+
+        result = merge._prep_capture(
+            Path("/capture"), Path("captured.bc"), Path("captured-link-ready.bc")
+        )
+        assert result == Path("/capture/captured-link-ready.bc")
+        mock_prep.assert_called_once_with(
+            Path("/capture"),
+            Path("captured.bc"),
+            Path("captured-link-ready.bc"),
+            temp_dir=worker_dir,
+        )
+
+    @patch.object(merge, "_write_merge_manifest")
+    @patch.object(merge, "_fingerprint_captures")
+    @patch.object(merge, "process_pool", ThreadPoolExecutor)
+    @patch.object(merge, "shutil")
+    @patch.object(merge, "prep_bitcode_for_linkage")
+    @patch.object(merge, "os")
+    @patch.object(merge, "_link_bitcode_tree")
+    @patch.object(merge, "_link_bitcode")
+    @patch.object(merge.subprocess, "check_call")
+    @patch.object(merge, "_merge_trace_info")
+    def test_merge_bitcode_jobs(
+        self,
+        mock_merge,
+        mock_check_call,
+        mock_link,
+        mock_link_tree,
+        mock_os,
+        mock_prep_bitcode,
+        mock_shutil,
+        mock_fingerprint,
+        mock_manifest,
+    ):
+        dest = MockPath("/") / "does" / "not" / "exist"
+        mock_os.listdir.return_value = ["captured.bc", "captured_0.bc"]
+        capture_dirs = [Path("/") / "a", Path("/") / "b"]
+
+        def link_tree(prepared, outfile, jobs):
+            # the tree receives futures of the prepared captures, in link order
+            assert [future.result() for future in prepared] == [
+                capture_dirs[0] / "captured-link-ready.bc",
+                capture_dirs[0] / "captured_0-link-ready.bc",
+                capture_dirs[1] / "captured-link-ready.bc",
+                capture_dirs[1] / "captured_0-link-ready.bc",
+            ]
+
+        mock_link_tree.side_effect = link_tree
+
+        merge.merge_bitcode(capture_dirs, dest, jobs=4, dedup=False)
+
+        mock_link_tree.assert_called_once()
+        assert mock_link_tree.call_args.args[1:] == (dest / "captured.bc", 4)
+        assert mock_prep_bitcode.call_count == 4
+        for prep_call in mock_prep_bitcode.call_args_list:
+            # each worker uses its own temporary directory
+            assert prep_call.kwargs["temp_dir"] is not None
+        mock_link.assert_not_called()
 
     @patch.object(merge, "merged_trace_dir")
     @patch.object(merge, "get_trace_dirs")
     @patch.object(merge, "shutil")
     @patch.object(merge, "merge_bitcode")
-    def test_merge_traces(self, mock_merge_bc, mock_shutil, mock_get_trace_dirs, mock_merged_trace_dir):
+    @patch.object(merge, "_link_ready_cache")
+    def test_merge_traces(self, mock_cache, mock_merge_bc, mock_shutil, mock_get_trace_dirs, mock_merged_trace_dir):
         mock_root = MockPath("/")
         outdir = mock_merged_trace_dir.return_value = mock_root / "out"
         trace_dirs = mock_get_trace_dirs.return_value = [
-            mock_root / "1",
-            mock_root / "2",
+            mock_root / MockPath("1", is_dir=True),
+            mock_root / MockPath("2", is_dir=True),
         ]
 
         merge.merge_traces("hello")
 
-        mock_merge_bc.assert_called_once_with(trace_dirs, outdir)
+        mock_merge_bc.assert_called_once_with(
+            trace_dirs, outdir, jobs=1, cache=mock_cache.return_value, incremental=False,
+            dedup=True, artifacts=ArtifactPolicy.NONE,
+        )
+        mock_cache.assert_called_once_with("hello")
 
         mock_shutil.copy2.assert_called_once_with(
             trace_dirs[0] / "binary", outdir / "binary"
         )
 
+    @patch.object(merge, "merged_trace_dir")
+    @patch.object(merge, "get_trace_dirs")
+    @patch.object(merge, "shutil")
+    @patch.object(merge, "merge_bitcode")
+    @patch.object(merge, "_link_ready_cache")
+    def test_merge_traces_no_cache(self, mock_cache, mock_merge_bc, mock_shutil, mock_get_trace_dirs, mock_merged_trace_dir):
+        mock_get_trace_dirs.return_value = [MockPath("/1", is_dir=True)]
+        merge.merge_traces("hello", use_cache=False)
+        mock_cache.assert_not_called()
+        assert mock_merge_bc.call_args.kwargs["cache"] is None
+
+    @patch.object(merge, "binrec_lift_build_id")
+    def test_link_ready_cache(self, mock_build_id):
+        mock_build_id.return_value = "build"
+        cache = merge._link_ready_cache("hello")
+        assert cache.root == merge.project_cache_dir("hello") / "link-ready"
+        assert cache.namespace == "build"
+
+    @patch.object(merge, "binrec_lift_build_id")
+    def test_link_ready_cache_unknown_build(self, mock_build_id):
+        mock_build_id.return_value = ""
+        assert merge._link_ready_cache("hello") is None
+
+    @patch.object(merge, "prep_bitcode_for_linkage")
+    def test_prep_capture_cached(self, mock_prep, tmp_path):
+        def fake_prep(working_dir, source, destination, temp_dir):
+            (working_dir / destination).write_text("prepared")
+
+        mock_prep.side_effect = fake_prep
+        cache = ContentCache(tmp_path / "cache", namespace="build")
+        capture = tmp_path / "s2e-out-0"
+        capture.mkdir()
+        (capture / "captured.bc").write_text("captured")
+        (capture / "traceInfo.json").write_text("{}")
+
+        merge._prep_capture(capture, Path("captured.bc"), Path("ready.bc"), cache)
+        mock_prep.assert_called_once()
+
+        # the second prep of the same capture is served from the cache
+        (capture / "ready.bc").unlink()
+        result = merge._prep_capture(capture, Path("captured.bc"), Path("ready.bc"), cache)
+        mock_prep.assert_called_once()
+        assert result.read_text() == "prepared"
+
+        # a changed capture is prepared again
+        (capture / "captured.bc").write_text("changed")
+        merge._prep_capture(capture, Path("captured.bc"), Path("ready.bc"), cache)
+        assert mock_prep.call_count == 2
+
+        # as is a capture with changed trace info
+        (capture / "traceInfo.json").write_text('{"successors": []}')
+        merge._prep_capture(capture, Path("captured.bc"), Path("ready.bc"), cache)
+        assert mock_prep.call_count == 3
+
+        # and a numbered capture with the same bitcode, which reads other trace info
+        shutil.copy(capture / "captured.bc", capture / "captured_1.bc")
+        shutil.copy(capture / "traceInfo.json", capture / "traceInfo_1.json")
+        merge._prep_capture(capture, Path("captured_1.bc"), Path("ready.bc"), cache)
+        assert mock_prep.call_count == 4
+
+    @patch.object(merge, "prep_bitcode_for_linkage")
+    def test_prep_capture_unknown_build(self, mock_prep, tmp_path):
+        def fake_prep(working_dir, source, destination, temp_dir):
+            (working_dir / destination).write_text("prepared")
+
+        mock_prep.side_effect = fake_prep
+        cache = ContentCache(tmp_path / "cache", namespace="")
+        (tmp_path / "captured.bc").write_text("captured")
+        (tmp_path / "traceInfo.json").write_text("{}")
+
+        # captures are never cached without a binrec_lift build id
+        for _ in range(2):
+            merge._prep_capture(tmp_path, Path("captured.bc"), Path("ready.bc"), cache)
+        assert mock_prep.call_count == 2
+        assert not (tmp_path / "cache").exists()
+
+    def test_capture_trace_info(self):
+        capture = Path("/s2e-out-0")
+        assert merge._capture_trace_info(capture, Path("captured.bc")) == (
+            capture / "traceInfo.json"
+        )
+        assert merge._capture_trace_info(capture, Path("/tmp/captured_3.bc")) == (
+            capture / "traceInfo_3.json"
+        )
+
+    @patch.object(merge, "merged_trace_dir")
+    @patch.object(merge, "rescan_trace_manifest")
+    @patch.object(merge, "get_trace_dirs")
+    @patch.object(merge, "shutil")
+    @patch.object(merge, "merge_bitcode")
+    def test_merge_traces_rescan(self, mock_merge_bc, mock_shutil, mock_get_trace_dirs, mock_rescan, mock_merged_trace_dir):
+        mock_root = MockPath("/")
+        existing = mock_root / MockPath("1", is_dir=True)
+        mock_get_trace_dirs.side_effect = [[existing, mock_root / "2"], [existing]]
+
+        merge.merge_traces("hello", use_cache=False)
+
+        # a deleted trace directory is dropped from the manifest before merging
+        mock_rescan.assert_called_once_with("hello")
+        assert mock_merge_bc.call_args.args[0] == [existing]
+
     @patch.object(merge, "get_trace_dirs")
     def test_merge_traces_no_dirs(self, mock_get_trace_dirs):
         mock_get_trace_dirs.return_value = []
@@ -210,9 +518,59 @@ class TestMerge:
     @patch.object(merge, "merge_traces")
     def test_main_traces(self, mock_merge_traces, mock_exit):
         merge.main()
-        mock_merge_traces.assert_called_once_with("hello")
+        mock_merge_traces.assert_called_once_with(
+            "hello", jobs=1, use_cache=True, incremental=False, dedup=True,
+            artifacts=ArtifactPolicy.NONE,
+        )
         mock_exit.assert_called_once_with(0)
 
+    @patch("sys.argv", ["merge", "--jobs", "8", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(merge, "merge_traces")
+    def test_main_traces_jobs(self, mock_merge_traces, mock_exit):
+        merge.main()
+        mock_merge_traces.assert_called_once_with(
+            "hello", jobs=8, use_cache=True, incremental=False, dedup=True,
+            artifacts=ArtifactPolicy.NONE,
+        )
+
+    @patch("sys.argv", ["merge", "--no-cache", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(merge, "merge_traces")
+    def test_main_traces_no_cache(self, mock_merge_traces, mock_exit):
+        merge.main()
+        mock_merge_traces.assert_called_once_with(
+            "hello", jobs=1, use_cache=False, incremental=False, dedup=True,
+            artifacts=ArtifactPolicy.NONE,
+        )
+
+    @patch("sys.argv", ["merge", "--incremental", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(merge, "merge_traces")
+    def test_main_traces_incremental(self, mock_merge_traces, mock_exit):
+        merge.main()
+        mock_merge_traces.assert_called_once_with(
+            "hello", jobs=1, use_cache=True, incremental=True, dedup=True,
+            artifacts=ArtifactPolicy.NONE,
+        )
+
+    @patch("sys.argv", ["merge", "--no-dedup", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(merge, "merge_traces")
+    def test_main_traces_no_dedup(self, mock_merge_traces, mock_exit):
+        merge.main()
+        mock_merge_traces.assert_called_once_with(
+            "hello", jobs=1, use_cache=True, incremental=False, dedup=False,
+            artifacts=ArtifactPolicy.NONE,
+        )
+
+    @patch("sys.argv", ["merge", "--artifacts", "all", "hello"])
+    @patch.object(sys, "exit")
+    @patch.object(merge, "merge_traces")
+    def test_main_traces_artifacts(self, mock_merge_traces, mock_exit):
+        merge.main()
+        assert mock_merge_traces.call_args.kwargs["artifacts"] == ArtifactPolicy.ALL
+
     @patch("sys.argv", ["merge"])
     def test_main_usage_error(self):
         with pytest.raises(SystemExit) as err:
@@ -237,3 +595,293 @@ class TestMerge:
         merge.main()
         mock_audit.assert_called_once()
         mock_debug.assert_called_once()
+
+
+@patch.object(merge, "binrec_lift_build_id", lambda: "build")
+@patch.object(merge.subprocess, "check_call")
+class TestMergeBitcodeFiles:
+    # Fake bitcode files are a list of "[name]" block functions and "{name}" globals
+
+    @pytest.fixture(autouse=True)
+    def fake_tools(self):
+        def fake_prep(working_dir, source, destination, temp_dir):
+            (working_dir / destination).write_text((working_dir / source).read_text())
+
+        def fake_link(base, source, destination, logfile=None):
+            destination.write_text(base.read_text() + source.read_text())
+
+        def fake_link_many(inputs, destination):
+            destination.write_text("".join(f.read_text() for f in inputs))
+
+        def fake_merge_trace_info(trace_info_files, destination):
+            destination.write_text("".join(f.read_text() for f in trace_info_files))
+
+        def fake_fingerprints(filename):
+            blocks = re.findall(r"\[[^]]*\]", Path(filename).read_text())
+            return {block.split(":")[0]: block for block in blocks}
+
+        def fake_global_fingerprints(filename):
+            symbols = re.findall(r"\{[^}]*\}", Path(filename).read_text())
+            return {symbol.split(":")[0]: symbol for symbol in symbols}
+
+        def fake_drop_functions(filename, destination, names):
+            items = re.findall(r"\[[^]]*\]|\{[^}]*\}", Path(filename).read_text())
+            Path(destination).write_text(
+                "".join(item for item in items if item.split(":")[0] not in names)
+            )
+
+        with patch.object(merge, "prep_bitcode_for_linkage", side_effect=fake_prep) as prep, \
+                patch.object(merge, "_link_bitcode", side_effect=fake_link), \
+                patch.object(merge, "_link_many", side_effect=fake_link_many), \
+                patch.object(merge, "_merge_trace_info", side_effect=fake_merge_trace_info), \
+                patch.object(merge.binrec_lift, "function_fingerprints", side_effect=fake_fingerprints), \
+                patch.object(merge.binrec_lift, "global_fingerprints", side_effect=fake_global_fingerprints), \
+                patch.object(merge.binrec_lift, "drop_functions", side_effect=fake_drop_functions):
+            self.mock_prep = prep
+            yield
+
+    def make_capture(self, root, num, bitcode=None):
+        capture = root / f"s2e-out-{num}"
+        capture.mkdir()
+        (capture / "captured.bc").write_text(bitcode or f"[bc{num}]")
+        (capture / "traceInfo.json").write_text(f"[ti{num}]")
+        return capture
+
+    def test_incremental_new_capture(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert (dest / "captured.bc").read_text() == "[bc0][bc1]"
+        assert self.mock_prep.call_count == 2
+
+        captures.append(self.make_capture(tmp_path, 2))
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        # only the new capture is prepared and linked into the existing result
+        assert self.mock_prep.call_count == 3
+        assert self.mock_prep.call_args.args[0] == captures[2]
+        assert (dest / "captured.bc").read_text() == "[bc0][bc1][bc2]"
+        assert (dest / "traceInfo.json").read_text() == "[ti0][ti1][ti2]"
+
+        manifest = json.loads((dest / "merge-manifest.json").read_text())
+        assert sorted(manifest["captures"]) == [str(c) for c in captures]
+
+    def test_incremental_failed_merge(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        captures.append(self.make_capture(tmp_path, 2))
+        with patch.object(merge, "_merge_trace_info", side_effect=BinRecError("failed")):
+            with pytest.raises(BinRecError):
+                merge.merge_bitcode(captures, dest, incremental=True)
+
+        # the outputs are unchanged and the next merge is a full merge
+        assert sorted(p.name for p in dest.iterdir()) == [
+            "captured.bc", "dedup-report.json", "traceInfo.json"
+        ]
+        assert (dest / "captured.bc").read_text() == "[bc0][bc1]"
+        assert (dest / "traceInfo.json").read_text() == "[ti0][ti1]"
+
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert (dest / "captured.bc").read_text() == "[bc0][bc1][bc2]"
+        assert (dest / "traceInfo.json").read_text() == "[ti0][ti1][ti2]"
+        assert self.mock_prep.call_count == 6
+
+    def test_incremental_up_to_date(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, 0)]
+        merge.merge_bitcode(captures, dest, incremental=True)
+        mock_check_call.reset_mock()
+
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert self.mock_prep.call_count == 1
+        mock_check_call.assert_not_called()
+
+    def test_incremental_changed_capture(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        (captures[0] / "captured.bc").write_text("[changed]")
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        # full rebuild
+        assert self.mock_prep.call_count == 4
+        assert (dest / "captured.bc").read_text() == "[changed][bc1]"
+
+    def test_incremental_removed_capture(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        merge.merge_bitcode(captures[1:], dest, incremental=True)
+
+        assert self.mock_prep.call_count == 3
+        assert (dest / "captured.bc").read_text() == "[bc1]"
+        assert (dest / "traceInfo.json").read_text() == "[ti1]"
+
+    def test_incremental_build_changed(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, 0)]
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        with patch.object(merge, "binrec_lift_build_id", lambda: "new build"):
+            merge.merge_bitcode(captures, dest, incremental=True)
+
+        assert self.mock_prep.call_count == 2
+
+    def test_incremental_no_manifest(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, 0)]
+        merge.merge_bitcode(captures, dest)
+        (dest / "merge-manifest.json").unlink()
+
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert self.mock_prep.call_count == 2
+
+    @patch.object(merge, "process_pool", ThreadPoolExecutor)
+    def test_incremental_jobs(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        merge.merge_bitcode(captures, dest, jobs=4)
+
+        captures += [self.make_capture(tmp_path, i) for i in range(2, 5)]
+        merge.merge_bitcode(captures, dest, jobs=4, incremental=True)
+
+        assert self.mock_prep.call_count == 5
+        assert (dest / "captured.bc").read_text() == "[bc0][bc1][bc2][bc3][bc4]"
+
+    def test_dedup(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [
+            self.make_capture(tmp_path, 0, "[a][b]"),
+            # duplicates of "a" and "b" and a new block "c"
+            self.make_capture(tmp_path, 1, "[a][b][c]"),
+            # all blocks are duplicates
+            self.make_capture(tmp_path, 2, "[b][c]"),
+            # same name, different body
+            self.make_capture(tmp_path, 3, "[a:changed]"),
+        ]
+        merge.merge_bitcode(captures, dest)
+
+        assert (dest / "captured.bc").read_text() == "[a][b][c][a:changed]"
+        assert json.loads((dest / "dedup-report.json").read_text()) == {
+            "captures": 4,
+            "skipped_captures": 1,
+            "functions": 8,
+            "duplicate_functions": 4,
+        }
+
+    def test_dedup_keeps_new_globals(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [
+            self.make_capture(tmp_path, 0, "[a][b]{g}"),
+            # all blocks are duplicates but the global "h" is new
+            self.make_capture(tmp_path, 1, "[a][b]{h}"),
+            # all blocks are duplicates and the global "g" has a new value
+            self.make_capture(tmp_path, 2, "[a]{g:changed}"),
+            # all blocks and globals are duplicates
+            self.make_capture(tmp_path, 3, "[b]{g}{h}"),
+        ]
+        merge.merge_bitcode(captures, dest)
+
+        assert (dest / "captured.bc").read_text() == "[a][b]{g}{h}{g:changed}"
+        report = json.loads((dest / "dedup-report.json").read_text())
+        assert report["skipped_captures"] == 1
+        assert report["duplicate_functions"] == 4
+
+    def test_dedup_disabled(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [
+            self.make_capture(tmp_path, 0, "[a][b]"),
+            self.make_capture(tmp_path, 1, "[a][b]"),
+        ]
+        merge.merge_bitcode(captures, dest, dedup=False)
+
+        assert (dest / "captured.bc").read_text() == "[a][b][a][b]"
+        assert not (dest / "dedup-report.json").exists()
+
+    @patch.object(merge, "process_pool", ThreadPoolExecutor)
+    def test_dedup_jobs(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [
+            self.make_capture(tmp_path, 0, "[a][b]"),
+            self.make_capture(tmp_path, 1, "[a]"),
+            self.make_capture(tmp_path, 2, "[a][c]"),
+            self.make_capture(tmp_path, 3, "[b]"),
+            self.make_capture(tmp_path, 4, "[d]"),
+        ]
+        merge.merge_bitcode(captures, dest, jobs=4)
+
+        assert (dest / "captured.bc").read_text() == "[a][b][c][d]"
+        report = json.loads((dest / "dedup-report.json").read_text())
+        assert report["skipped_captures"] == 2
+        assert report["duplicate_functions"] == 3
+
+    def test_dedup_incremental(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, 0, "[a][b]")]
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        captures.append(self.make_capture(tmp_path, 1, "[a]"))
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert (dest / "captured.bc").read_text() == "[a][b]"
+
+        captures.append(self.make_capture(tmp_path, 2, "[b][c]"))
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert (dest / "captured.bc").read_text() == "[a][b][c]"
+        # the report covers every merged capture
+        assert json.loads((dest / "dedup-report.json").read_text()) == {
+            "captures": 3,
+            "skipped_captures": 1,
+            "functions": 5,
+            "duplicate_functions": 2,
+        }
+
+    def test_dedup_incremental_disabled(self, mock_check_call, tmp_path):
+        dest = tmp_path / "s2e-out"
+        captures = [self.make_capture(tmp_path, 0, "[a][b]")]
+        merge.merge_bitcode(captures, dest, incremental=True)
+
+        # the report would not cover the new capture
+        captures.append(self.make_capture(tmp_path, 1, "[a]"))
+        merge.merge_bitcode(captures, dest, incremental=True, dedup=False)
+        assert not (dest / "dedup-report.json").exists()
+
+        # the report would not cover the previous captures
+        captures.append(self.make_capture(tmp_path, 2, "[c]"))
+        merge.merge_bitcode(captures, dest, incremental=True)
+        assert not (dest / "dedup-report.json").exists()
+
+    def test_trace_info_overlaps_link(self, mock_check_call, tmp_path):
+        # the link and the trace info merge must be running at the same time for the
+        # barrier to pass
+        barrier = threading.Barrier(2, timeout=5)
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        with patch.object(merge, "_link_many", side_effect=lambda *args: barrier.wait()), \
+                patch.object(merge, "_merge_trace_info", side_effect=lambda *args: barrier.wait()):
+            merge.merge_bitcode(captures, tmp_path / "s2e-out")
+
+    @pytest.mark.parametrize("jobs", [1, 4])
+    def test_no_captured_bitcode(self, mock_check_call, tmp_path, jobs):
+        capture = tmp_path / "s2e-out-0"
+        capture.mkdir()
+        (capture / "traceInfo.json").write_text("[ti0]")
+
+        with patch.object(merge, "_link_many") as mock_link_many:
+            with pytest.raises(BinRecError, match="no traces to merge"):
+                merge.merge_bitcode([capture], tmp_path / "s2e-out", jobs=jobs)
+
+        mock_link_many.assert_not_called()
+        assert not (tmp_path / "s2e-out" / "merge-manifest.json").exists()
+
+    def test_link_error(self, mock_check_call, tmp_path):
+        captures = [self.make_capture(tmp_path, i) for i in range(2)]
+        with patch.object(merge, "_link_many", side_effect=BinRecError("asdf")):
+            with pytest.raises(BinRecError):
+                merge.merge_bitcode(captures, tmp_path / "s2e-out")
+
+        mock_check_call.assert_not_called()
+        assert (tmp_path / "s2e-out" / "traceInfo.json").read_text() == "[ti0][ti1]"
+        assert not (tmp_path / "s2e-out" / "merge-manifest.json").exists()
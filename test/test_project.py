@@ -1,10 +1,15 @@
 from pathlib import Path
+import hashlib
+import io
+import json
+import os
+import shutil
 import subprocess
 from unittest.mock import patch, mock_open, call, MagicMock
 
 import pytest
 
-from binrec import project
+from binrec import env, project
 from binrec.env import BINREC_PROJECTS
 from binrec.errors import BinRecError
 from helpers.mock_path import MockPath
@@ -61,16 +66,14 @@ BATCH_WITHOUT_ARGS = ""
 class TestProject:
 
     @patch.object(project, "Campaign")
-    @patch.object(project, "_validate_campaign_trace")
-    def test_validate_campaign(self, mock_validate_lift_result, mock_params_cls):
-        binary = BINREC_PROJECTS / "asdf" / "s2e-out" / "binary"
+    @patch.object(project, "_validate_campaign_traces")
+    def test_validate_campaign(self, mock_validate_traces, mock_params_cls):
         c = mock_params_cls.load_project.return_value = MagicMock(traces=[1, 2, 3], project="asdf")
 
-        project.validate_campaign("asdf")
+        assert project.validate_campaign("asdf", jobs=4) is mock_validate_traces.return_value
 
         mock_params_cls.load_project.assert_called_once_with("asdf")
-        calls = [call(c, 1), call(c, 2), call(c, 3)]
-        mock_validate_lift_result.assert_has_calls(calls, any_order=False)
+        mock_validate_traces.assert_called_once_with(c, [1, 2, 3], 4, False, 1, 0, True)
 
     @patch.object(project, "subprocess")
     def test_run_trace_setup(self, mock_subproc):
@@ -112,6 +115,68 @@ class TestProject:
         )
         mock_log_filename.assert_called_once_with(c.project)
 
+    @patch.object(project, "_record_trace_run")
+    @patch.object(project, "_get_last_trace_dir")
+    @patch.object(project.subprocess, "check_call")
+    @patch.object(project, "_get_next_trace_log_filename")
+    def test_run_campaign_trace_error(self, mock_log_filename, mock_check_call, mock_last, mock_record):
+        c = MagicMock()
+        mock_log_filename.return_value = MockPath("s2e-out-0.log")
+        mock_check_call.side_effect = subprocess.CalledProcessError(1, "s2e")
+        with pytest.raises(BinRecError):
+            project._run_campaign_trace(c, MagicMock())
+
+        mock_record.assert_called_once()
+        assert mock_record.call_args.args[:3] == (c.project, mock_last.return_value, "failed")
+
+    @patch.object(project, "record_trace")
+    @patch.object(project, "project_dir")
+    def test_record_trace_run(self, mock_project_dir, mock_record, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        started = MagicMock()
+        (tmp_path / "s2e-out-1").mkdir()
+        (tmp_path / "s2e-last").symlink_to(tmp_path / "s2e-out-1")
+
+        project._record_trace_run("asdf", tmp_path / "s2e-out-0", "completed", started)
+        mock_record.assert_called_once_with(
+            "asdf", tmp_path / "s2e-out-1", "completed", started=started
+        )
+
+    @patch.object(project, "record_trace")
+    @patch.object(project, "project_dir")
+    def test_record_trace_run_no_trace(self, mock_project_dir, mock_record, tmp_path):
+        mock_project_dir.return_value = tmp_path
+        project._record_trace_run("asdf", None, "completed", MagicMock())
+
+        (tmp_path / "s2e-out-0").mkdir()
+        (tmp_path / "s2e-last").symlink_to(tmp_path / "s2e-out-0")
+        project._record_trace_run("asdf", tmp_path / "s2e-out-0", "completed", MagicMock())
+
+        mock_record.assert_not_called()
+
+    @patch.object(project, "next_trace_id")
+    @patch.object(project, "project_dir")
+    def test_get_next_trace_log_filename(self, mock_project_dir, mock_next_id):
+        mock_project_dir.return_value = MockPath("/project")
+        mock_next_id.return_value = 12
+        assert project._get_next_trace_log_filename("asdf") == MockPath("/project/s2e-out-12.log")
+        mock_next_id.assert_called_once_with("asdf")
+
+    @patch.object(project, "merged_trace_dir")
+    @patch("binrec.env.project_dir")
+    @patch.object(project, "project_dir")
+    def test_clear_project_trace_data(self, mock_project_dir, mock_env_project_dir, mock_merged, tmp_path):
+        mock_project_dir.return_value = mock_env_project_dir.return_value = tmp_path
+        mock_merged.return_value = tmp_path / "s2e-out"
+        for name in ("s2e-out", "s2e-out-0", "s2e-out-1", "input_files"):
+            (tmp_path / name).mkdir()
+        project.record_trace("asdf", tmp_path / "s2e-out-1", "failed")
+
+        project.clear_project_trace_data("asdf")
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            env.TRACE_MANIFEST_LOCK_FILENAME, "input_files"
+        ]
+
     @patch.object(project, "project_dir")
     @patch.object(project.subprocess, "check_call")
     def test_new_project_error(self, mock_check_call, mock_project_dir):
@@ -125,3 +190,494 @@ class TestProject:
         mock_project_dir.return_value = MockPath("/asdf", is_dir=True)
         with pytest.raises(FileExistsError):
             project.new_project("asdf", "/binary")
+
+
+class TestConcurrentCampaign:
+
+    @pytest.fixture(autouse=True)
+    def projects(self, tmp_path):
+        with patch.object(project, "project_dir") as mock_project_dir, \
+                patch("binrec.env.project_dir") as mock_env_project_dir:
+            mock_project_dir.side_effect = mock_env_project_dir.side_effect = \
+                lambda name: tmp_path / name
+            root = tmp_path / "hello"
+            root.mkdir()
+            yield root
+
+    def test_clone_project_workspace(self, projects, tmp_path):
+        (projects / "s2e-config.lua").write_text(
+            f'baseDirs = {{"{projects}"}}\n'
+            f"kernel = '{projects}/guest-tools/vmlinux'\n"
+            f'sibling = "{projects}bar/{projects.name}"\n'
+            f"-- {projects}\n"
+        )
+        (projects / "bootstrap.sh").write_text("#!/bin/bash\n")
+        (projects / "bootstrap.sh").chmod(0o755)
+        (projects / "guest-tools").mkdir()
+        (projects / "hello").symlink_to("/bin/hello")
+        for name in ("s2e-out-0", "s2e-out", "input_files"):
+            (projects / name).mkdir()
+        for name in ("s2e-out-0.log", "binrec_trace_config.sh", "trace-manifest.json"):
+            (projects / name).write_text("")
+
+        name = project._clone_project_workspace("hello", 1)
+        assert name.startswith(".hello-job1-")
+        workspace = tmp_path / name
+        assert sorted(p.name for p in workspace.iterdir()) == [
+            ".binrec-workspace", "bootstrap.sh", "guest-tools", "hello", "input_files",
+            "s2e-config.lua"
+        ]
+        assert (workspace / ".binrec-workspace").read_text() == "hello"
+        assert (workspace / "s2e-config.lua").read_text() == (
+            f'baseDirs = {{"{workspace}"}}\n'
+            f"kernel = '{workspace}/guest-tools/vmlinux'\n"
+            f'sibling = "{projects}bar/{projects.name}"\n'
+            f"-- {workspace}\n"
+        )
+        assert (workspace / "bootstrap.sh").stat().st_mode & 0o777 == 0o755
+        assert (workspace / "guest-tools").resolve() == projects / "guest-tools"
+        assert str((workspace / "hello").readlink()) == "/bin/hello"
+        assert (workspace / "input_files").is_dir()
+        assert not (workspace / "input_files").is_symlink()
+
+    def test_workspaces_reserve_trace_ids(self, projects, tmp_path):
+        (projects / "s2e-out-0").mkdir()
+        (projects / "s2e-out-1").mkdir()
+        project.record_trace("hello", projects / "s2e-out-1", "failed")
+
+        with project._CampaignWorkspaces("hello", 2) as workspaces:
+            job0, trace_id = workspaces.acquire()
+            assert job0.startswith(".hello-job0-") and trace_id == 2
+            assert (tmp_path / job0).is_dir()
+            job1, trace_id = workspaces.acquire()
+            assert job1.startswith(".hello-job1-") and trace_id == 3
+            workspaces.release(job0, 2)
+            assert workspaces.acquire() == (job0, 2)
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["hello"]
+
+    def test_workspaces_keep_existing_projects(self, projects, tmp_path):
+        # a project that is named like a workspace is never overwritten or deleted
+        other = tmp_path / "hello-job0"
+        other.mkdir()
+        (other / "campaign.json").write_text("{}")
+
+        with project._CampaignWorkspaces("hello", 1) as workspaces:
+            workspace, _ = workspaces.acquire()
+            assert workspace != "hello-job0"
+            # an unmarked directory is not deleted
+            project._remove_project_workspace("hello", "hello-job0")
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["hello", "hello-job0"]
+        assert (other / "campaign.json").read_text() == "{}"
+
+    @patch.object(project.subprocess, "check_call")
+    def test_run_campaign_jobs(self, mock_check_call, projects, tmp_path):
+        def s2e_run(args, stdout, stderr):
+            workspace = tmp_path / args[-1]
+            assert not (workspace / "s2e-last").is_symlink()
+            (workspace / "s2e-out-0").mkdir()
+            (workspace / "s2e-out-0" / "captured.bc").write_text(args[-1])
+            (workspace / "s2e-last").symlink_to(workspace / "s2e-out-0")
+
+        mock_check_call.side_effect = s2e_run
+        traces = [MagicMock(name=f"trace{i}") for i in range(3)]
+        campaign = project.Campaign(Path("hello"), traces=traces)
+
+        project.run_campaign(campaign, jobs=2)
+
+        assert mock_check_call.call_count == 3
+        workspaces = {call.args[0][-1] for call in mock_check_call.call_args_list}
+        assert len(workspaces) <= 2
+        assert all(name.startswith((".hello-job0-", ".hello-job1-")) for name in workspaces)
+        for trace in traces:
+            trace.write_config_script.assert_called_once()
+            assert trace.write_config_script.call_args.args[0] in workspaces
+
+        assert sorted(project.load_trace_manifest("hello")) == [0, 1, 2]
+        for trace_id in range(3):
+            assert (projects / f"s2e-out-{trace_id}" / "captured.bc").is_file()
+            assert (projects / f"s2e-out-{trace_id}.log").is_file()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["hello"]
+
+    @patch.object(project.subprocess, "check_call")
+    def test_run_campaign_jobs_error(self, mock_check_call, projects, tmp_path):
+        mock_check_call.side_effect = subprocess.CalledProcessError(1, "s2e")
+        campaign = project.Campaign(Path("hello"), traces=[MagicMock(), MagicMock()])
+
+        with pytest.raises(BinRecError):
+            project.run_campaign(campaign, jobs=2)
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["hello"]
+
+    @patch.object(project, "_run_campaign_concurrently")
+    @patch.object(project, "_run_campaign_trace")
+    def test_run_campaign_single_trace(self, mock_run_trace, mock_concurrent):
+        campaign = project.Campaign(Path("hello"), traces=[MagicMock()])
+        project.run_campaign(campaign, jobs=4)
+        mock_run_trace.assert_called_once_with(campaign, campaign.traces[0])
+        mock_concurrent.assert_not_called()
+
+
+VALIDATION_SCRIPT = """#!/bin/sh
+echo "$@"
+cat
+cat input_files/data.txt
+exit 3
+"""
+
+
+class TestValidation:
+
+    @pytest.fixture
+    def merged_dir(self, tmp_path):
+        (tmp_path / "binary").write_text(VALIDATION_SCRIPT)
+        (tmp_path / "binary").chmod(0o755)
+        (tmp_path / "recovered").write_text(VALIDATION_SCRIPT)
+        (tmp_path / "recovered").chmod(0o755)
+        (tmp_path / "data.txt").write_text("data")
+        with patch.object(project, "merged_trace_dir", return_value=tmp_path):
+            yield tmp_path
+
+    def make_trace(self, merged_dir, **kwargs):
+        return project.TraceParams(
+            args=[project.TraceArg(project.TraceArgType.concrete, "hello")],
+            input_files=[project.TraceInputFile(merged_dir / "data.txt")],
+            stdin="world",
+            **kwargs
+        )
+
+    def test_validate_campaign_traces(self, merged_dir):
+        campaign = project.Campaign(Path("asdf"))
+        traces = [self.make_trace(merged_dir, name=f"trace{i}") for i in range(3)]
+
+        results = project._validate_campaign_traces(campaign, traces, jobs=4)
+
+        assert [result.name for result in results] == ["trace0", "trace1", "trace2"]
+        for result in results:
+            assert result.passed
+            assert result.original.returncode == result.recovered.returncode == 3
+            assert result.recovered.stdout.head == b"hello\nworlddata"
+            assert result.recovered.stdout.size == 15
+
+        assert sorted(p.name for p in merged_dir.iterdir()) == ["binary", "data.txt", "recovered"]
+        # the binaries of different traces ran concurrently
+        assert all(result.concurrent and result.slowdown is None for result in results)
+
+    def test_validate_sequential(self, merged_dir):
+        # the recovered binary only starts once the original binary has exited
+        marker = merged_dir / "original.done"
+        (merged_dir / "binary").write_text(f"#!/bin/sh\nsleep 0.2\necho ok\ntouch {marker}\n")
+        (merged_dir / "recovered").write_text(
+            f"#!/bin/sh\nif [ -e {marker} ]; then echo ok; else echo overlap; fi\n"
+        )
+
+        result, = project._validate_campaign_traces(
+            project.Campaign(Path("asdf")), [project.TraceParams()], jobs=4
+        )
+
+        assert result.passed
+        assert not result.concurrent
+        assert result.slowdown > 0
+
+    def test_validate_campaign_traces_mismatch(self, merged_dir):
+        (merged_dir / "recovered").write_text(VALIDATION_SCRIPT.replace("exit 3", "exit 0"))
+        campaign = project.Campaign(Path("asdf"), setup=["touch setup"])
+        traces = [self.make_trace(merged_dir), self.make_trace(merged_dir, match_stdout="bye")]
+
+        results = project._validate_campaign_traces(campaign, traces)
+
+        assert results[0].name == "<anonymous trace>"
+        assert results[0].errors == ["recovered exit code does not match original"]
+        assert results[1].errors == [
+            "recovered exit code does not match original",
+            "regex pattern for stdout content does not match",
+        ]
+
+    def test_validate_campaign_traces_missing_binary(self, merged_dir):
+        (merged_dir / "recovered").unlink()
+        results = project._validate_campaign_traces(
+            project.Campaign(Path("asdf")), [self.make_trace(merged_dir)]
+        )
+        assert results[0].original
+        assert not results[0].recovered
+        assert len(results[0].errors) == 1
+        assert results[0].errors[0].startswith("unable to run recovered binary")
+
+    def test_validate_argv0(self, merged_dir):
+        shutil.copy2("/bin/sh", merged_dir / "binary")
+        shutil.copy2("/bin/sh", merged_dir / "recovered")
+        trace = project.TraceParams(args=[
+            project.TraceArg(project.TraceArgType.concrete, "-c"),
+            project.TraceArg(project.TraceArgType.concrete, 'echo "$0"; ls input_files'),
+        ], input_files=[project.TraceInputFile(merged_dir / "data.txt")])
+
+        result, = project._validate_campaign_traces(project.Campaign(Path("asdf")), [trace])
+
+        assert result.passed
+        assert result.original.stdout.head == b"./test-target\ndata.txt\n"
+
+    def test_validate_large_output(self, merged_dir):
+        script = "#!/bin/sh\nhead -c 1000000 /dev/zero\nprintf '%s' \"$1\"\n"
+        (merged_dir / "binary").write_text(script)
+        (merged_dir / "recovered").write_text(script)
+        traces = [self.make_trace(merged_dir, name="same")]
+        traces.append(project.TraceParams(
+            args=[project.TraceArg(project.TraceArgType.concrete, "hello")], name="regex",
+            match_stdout="^\0+hello$", match_stderr="^$"
+        ))
+
+        results = project._validate_campaign_traces(project.Campaign(Path("asdf")), traces, jobs=2)
+
+        assert [result.errors for result in results] == [[], []]
+        stdout = results[0].recovered.stdout
+        assert stdout.size == 1000005
+        assert len(stdout.head) == project.VALIDATION_BLOCK_SIZE
+        assert stdout.sha256 == hashlib.sha256(b"\0" * 1000000 + b"hello").hexdigest()
+
+    @patch.object(project, "VALIDATION_REGEX_LIMIT", 100000)
+    def test_validate_regex_limit(self, merged_dir):
+        script = "#!/bin/sh\nhead -c \"$1\" /dev/zero\n"
+        (merged_dir / "binary").write_text(script)
+        (merged_dir / "recovered").write_text(script)
+        traces = [
+            project.TraceParams(
+                args=[project.TraceArg(project.TraceArgType.concrete, size)],
+                match_stdout="^\0+$",
+            )
+            for size in ("99999", "100001")
+        ]
+
+        results = project._validate_campaign_traces(project.Campaign(Path("asdf")), traces)
+
+        assert results[0].errors == []
+        assert results[1].errors == [
+            "recovered stdout content exceeded 100000 bytes, regex pattern not evaluated"
+        ]
+
+    @patch.object(project.os, "kill")
+    def test_kill_validation_process(self, mock_kill):
+        proc = MagicMock(pid=1234, returncode=None)
+        project._kill_validation_process(proc)
+        mock_kill.assert_called_once_with(1234, project.signal.SIGKILL)
+
+        # a reaped process is never signaled, since its pid may have been reused
+        mock_kill.reset_mock()
+        proc.returncode = 0
+        project._kill_validation_process(proc)
+        mock_kill.assert_not_called()
+
+    def test_kill_validation_process_exited(self):
+        proc = subprocess.Popen(["true"])
+        # an exited process that is not reaped yet keeps its pid, and signaling it is
+        # harmless
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        project._kill_validation_process(proc)
+        assert proc.wait() == 0
+
+    def test_validate_output_divergence(self, merged_dir):
+        (merged_dir / "binary").write_text("#!/bin/sh\necho hello world\n")
+        (merged_dir / "recovered").write_text("#!/bin/sh\necho hello there\n")
+
+        result, = project._validate_campaign_traces(
+            project.Campaign(Path("asdf")), [project.TraceParams(name="diverge")]
+        )
+
+        assert result.errors == [
+            "recovered stdout content does not match original at byte 6: "
+            "original b'world\\n', recovered b'there\\n'"
+        ]
+
+    def test_validate_fail_fast(self, merged_dir):
+        (merged_dir / "binary").write_text("#!/bin/sh\nwhile :; do echo same; done\n")
+        (merged_dir / "recovered").write_text(
+            "#!/bin/sh\necho different\nwhile :; do echo same; done\n"
+        )
+
+        result, = project._validate_campaign_traces(
+            project.Campaign(Path("asdf")), [project.TraceParams()], jobs=2, fail_fast=True
+        )
+
+        assert result.original.stopped and result.recovered.stopped
+        assert result.concurrent
+        assert result.errors == [
+            "stopped at the first output divergence",
+            "recovered stdout content does not match original at byte 0: "
+            "original b'same\\nsame\\nsame\\nsame\\nsame\\nsame\\nsa', "
+            "recovered b'different\\nsame\\nsame\\nsame\\nsame\\nsa'",
+        ]
+
+    def test_validate_repeat(self, merged_dir):
+        for name in ("binary", "recovered"):
+            (merged_dir / name).write_text(f"#!/bin/sh\necho run >> {merged_dir}/{name}.count\n")
+
+        result, = project._validate_campaign_traces(
+            project.Campaign(Path("asdf")), [project.TraceParams()], repeat=3, warmup=2
+        )
+
+        assert result.passed
+        for name, run in (("binary", result.original), ("recovered", result.recovered)):
+            assert (merged_dir / f"{name}.count").read_text() == "run\n" * 5
+            assert len(run.samples) == 3
+            assert run.usage.max_rss > 0
+            assert run.seconds == run.usage.seconds
+        assert result.slowdown > 0
+        assert result.memory_ratio > 0
+
+    def test_validation_ratios(self, capsys):
+        def run(seconds, max_rss):
+            usage = project.ResourceUsage(seconds=seconds, max_rss=max_rss)
+            return project.ValidationRun(
+                0, project.OutputDigest(), project.OutputDigest(), seconds, samples=[usage]
+            )
+
+        results = [
+            project.ValidationResult("a", [], original=run(1.0, 100), recovered=run(2.0, 100)),
+            project.ValidationResult("b", [], original=run(1.0, 100), recovered=run(8.0, 400)),
+            project.ValidationResult("c", [], original=run(1.0, 100)),
+        ]
+
+        assert results[0].slowdown == 2.0
+        assert results[1].memory_ratio == 4.0
+        assert results[2].slowdown is None
+        assert project.geometric_mean_ratio([r.slowdown for r in results]) == pytest.approx(4.0)
+        assert project.geometric_mean_ratio([None]) is None
+
+        project.print_validation_results(results)
+        output = capsys.readouterr().out
+        assert "Geometric mean slowdown: 4.00x" in output
+        assert "Geometric mean memory usage: 2.00x" in output
+        assert "not reported" not in output
+
+        # the slowdown of binaries that ran concurrently is not comparable
+        results[1].concurrent = True
+        assert results[1].slowdown is None
+        assert results[1].memory_ratio == 4.0
+        assert project.ValidationResult.from_json(results[1].to_json()).concurrent
+        project.print_validation_results(results)
+        output = capsys.readouterr().out
+        assert "Geometric mean slowdown: 2.00x" in output
+        assert "Slowdown is not reported for binaries that ran concurrently" in output
+
+    @patch.object(project, "project_cache_dir")
+    def test_validate_cache(self, mock_cache_dir, merged_dir, tmp_path):
+        mock_cache_dir.return_value = tmp_path / "cache"
+        for name in ("binary", "recovered"):
+            (merged_dir / name).write_text(
+                f"#!/bin/sh\necho run >> {merged_dir}/{name}.count\ncat input_files/data.txt\n"
+            )
+        campaign = project.Campaign(Path("asdf"))
+        traces = [self.make_trace(merged_dir, name="first"), self.make_trace(merged_dir, name="second")]
+
+        def validate(**kwargs):
+            return project._validate_campaign_traces(campaign, traces, use_cache=True, **kwargs)
+
+        def runs():
+            return len((merged_dir / "recovered.count").read_text().splitlines())
+
+        first = validate()
+        assert runs() == 2
+        assert [result.cached for result in first] == [False, False]
+
+        second = validate()
+        assert runs() == 2
+        assert [result.cached for result in second] == [True, True]
+        assert [result.to_json() for result in second] == [result.to_json() for result in first]
+
+        validate(repeat=2)
+        assert runs() == 6
+
+        traces[1].stdin = "changed"
+        validate()
+        assert runs() == 7
+
+        (merged_dir / "data.txt").write_text("changed")
+        validate()
+        assert runs() == 9
+
+        with (merged_dir / "recovered").open("a") as file:
+            file.write("exit 1\n")
+        results = validate()
+        assert runs() == 11
+        assert not any(result.passed for result in results)
+        assert all(result.cached for result in validate())
+        assert runs() == 11
+
+        project._validate_campaign_traces(campaign, traces)
+        assert runs() == 13
+
+    @patch.object(project, "project_cache_dir")
+    def test_validate_cache_missing_binary(self, mock_cache_dir, merged_dir, tmp_path):
+        mock_cache_dir.return_value = tmp_path / "cache"
+        (merged_dir / "recovered").unlink()
+        project._validate_campaign_traces(
+            project.Campaign(Path("asdf")), [self.make_trace(merged_dir)], use_cache=True
+        )
+        assert not (tmp_path / "cache").exists()
+
+    def test_validation_result_json(self):
+        usage = project.ResourceUsage(1.5, 1.0, 0.5, 1024, 10, 1, 3, 4)
+        run = project.ValidationRun(
+            2, project.OutputDigest(3, "abc", b"\0\xff\n"), project.OutputDigest(), 1.5,
+            stopped=True, samples=[usage]
+        )
+        result = project.ValidationResult("trace", ["a"], run, None, ["error"])
+
+        loaded = project.ValidationResult.from_json(json.loads(json.dumps(result.to_json())))
+        assert loaded == result
+
+    def test_output_comparison_block_offset(self):
+        original = b"\0" * project.VALIDATION_BLOCK_SIZE * 20
+        recovered = bytearray(original)
+        recovered[3 * project.VALIDATION_BLOCK_SIZE + 5] = 1
+        comparison = project._OutputComparison(True)
+
+        comparison.read("original", io.BytesIO(original))
+        comparison.read("recovered", io.BytesIO(recovered))
+
+        offset = 3 * project.VALIDATION_BLOCK_SIZE
+        assert comparison.divergence == (offset, None, None)
+        assert comparison.describe_divergence() == (
+            f"in bytes {offset}-{offset + project.VALIDATION_BLOCK_SIZE - 1}"
+        )
+
+    def test_output_comparison_prefix(self):
+        comparison = project._OutputComparison(True)
+        comparison.read("recovered", io.BytesIO(b"abc"))
+        comparison.read("original", io.BytesIO(b"abcdef"))
+        assert comparison.divergence == (3, b"def", b"")
+
+    def test_output_comparison_diverge_then_truncate(self):
+        # the first divergence is kept when the recovered content then ends early
+        comparison = project._OutputComparison(True)
+        comparison.read("original", io.BytesIO(b"abc" + b"\0" * project.VALIDATION_BLOCK_SIZE))
+        comparison.read("recovered", io.BytesIO(b"abd"))
+        assert comparison.divergence == (
+            2, b"c" + b"\0" * (project.VALIDATION_CONTEXT - 1), b"d"
+        )
+
+    def test_output_comparison_match(self):
+        comparison = project._OutputComparison(True)
+        comparison.read("original", io.BytesIO(b"abc" * 100000))
+        comparison.read("recovered", io.BytesIO(b"abc" * 100000))
+        assert comparison.divergence is None
+        assert comparison.describe_divergence() is None
+        assert comparison.digests["original"] == comparison.digests["recovered"]
+
+    @patch.object(project, "validate_campaign")
+    def test_main_validate_failed(self, mock_validate, capsys):
+        mock_validate.return_value = [
+            project.ValidationResult("good", []),
+            project.ValidationResult("bad", [], errors=["recovered exit code does not match original"]),
+        ]
+        argv = ["project", "validate", "-j", "2", "--repeat", "3", "--warmup", "1", "asdf"]
+        with patch.object(project.sys, "argv", argv):
+            with pytest.raises(SystemExit) as exc:
+                project.main()
+
+        assert exc.value.code == 1
+        mock_validate.assert_called_once_with(
+            "asdf", jobs=2, fail_fast=False, repeat=3, warmup=1, use_cache=True
+        )
+        output = capsys.readouterr().out
+        assert "good" in output and "bad" in output and "FAILED" in output
@@ -0,0 +1,142 @@
+import json
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from binrec import report
+from binrec.core import Span
+from binrec.errors import BinRecError
+
+
+def _span(name, started, seconds, run="run1", parent=None, id=None):
+    return Span(name, run, id or f"{run}-{name}", parent, started, seconds)
+
+
+def _write(filename, spans):
+    filename.write_text(
+        "".join(json.dumps(record.to_json()) + "\n" for record in spans)
+    )
+
+
+def _run(run="run1", start=0.0, lift_seconds=5.0):
+    # a merge followed by a lift, where the lift stages optimize and symbols run
+    # concurrently
+    return [
+        _span("merge", start, 2.0, run),
+        _span("lift.symbols", start + 2.0, 1.0, run, f"{run}-lift"),
+        _span("lift.optimize", start + 2.0, lift_seconds - 1.0, run, f"{run}-lift"),
+        _span("lift.link", start + 1.0 + lift_seconds, 1.0, run, f"{run}-lift"),
+        _span("lift", start + 2.0, lift_seconds, run),
+    ]
+
+
+class TestReport:
+    @patch.object(report, "spans_filename")
+    def test_load_spans(self, mock_filename, tmp_path):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        _write(filename, _run())
+        with filename.open("a") as file:
+            file.write('{"name": "partial')
+
+        spans = report.load_spans("hello")
+        assert [record.name for record in spans] == [
+            record.name for record in _run()
+        ]
+
+    @patch.object(report, "spans_filename")
+    def test_load_spans_missing(self, mock_filename, tmp_path):
+        mock_filename.return_value = tmp_path / "spans.jsonl"
+        with pytest.raises(BinRecError):
+            report.load_spans("hello")
+
+    def test_group_runs(self):
+        runs = report.group_runs(_run("b", 100.0) + _run("a", 0.0))
+        assert list(runs) == ["a", "b"]
+        assert len(runs["a"]) == 5
+
+    def test_critical_path_breakdown(self):
+        breakdown = [
+            (depth, record.name)
+            for depth, record in report.critical_path_breakdown(_run())
+        ]
+        assert breakdown == [
+            (0, "merge"),
+            (0, "lift"),
+            (1, "lift.optimize"),
+            (1, "lift.link"),
+        ]
+
+    def test_compare_runs(self):
+        base = _run("a")
+        current = _run("b", 100.0, lift_seconds=8.0)[1:]
+        rows = report.compare_runs(base, current)
+        assert set(rows[:2]) == {("lift", 5.0, 8.0), ("lift.optimize", 4.0, 7.0)}
+        assert rows[-1] == ("merge", 2.0, None)
+
+    @patch.object(report, "spans_filename")
+    def test_report_compare_previous(self, mock_filename, tmp_path, capsys):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        _write(filename, _run("a") + _run("b", 100.0)[1:] + _run("c", 200.0, 8.0))
+
+        report.report("hello", compare="previous")
+
+        out = capsys.readouterr().out
+        # run "b" only lifted, so the previous run of the same stages is "a"
+        assert "Comparing run c to a" in out
+        assert "+3.000s" in out
+
+    @patch.object(report, "spans_filename")
+    def test_report_no_previous(self, mock_filename, tmp_path):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        _write(filename, _run("a"))
+        with pytest.raises(BinRecError):
+            report.report("hello", compare="previous")
+
+    @patch.object(report, "spans_filename")
+    def test_report_unknown_run(self, mock_filename, tmp_path):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        _write(filename, _run("a"))
+        with pytest.raises(BinRecError):
+            report.report("hello", run="b")
+
+    @patch.object(report, "spans_filename")
+    def test_report_breakdown(self, mock_filename, tmp_path, capsys):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        _write(filename, _run("a") + _run("b", 100.0))
+
+        report.report("hello", run="a")
+
+        out = capsys.readouterr().out
+        assert "Run a: 5 spans, 7.000s" in out
+        assert "lift.optimize" in out
+        assert "lift.symbols" not in out
+
+    @patch.object(report, "spans_filename")
+    def test_report_list(self, mock_filename, tmp_path, capsys):
+        mock_filename.return_value = filename = tmp_path / "spans.jsonl"
+        _write(filename, _run("a") + _run("b", 100.0))
+
+        report.report("hello", list_runs=True)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert [line.split()[0] for line in lines] == ["a", "b"]
+
+    @patch("sys.argv", ["report", "hello", "--compare"])
+    @patch.object(sys, "exit")
+    @patch.object(report, "report")
+    def test_main_compare(self, mock_report, mock_exit):
+        report.main()
+        mock_report.assert_called_once_with(
+            "hello", run=None, compare="previous", list_runs=False
+        )
+        mock_exit.assert_called_once_with(0)
+
+    @patch("sys.argv", ["report", "hello", "--run", "a", "--compare", "b"])
+    @patch.object(sys, "exit")
+    @patch.object(report, "report")
+    def test_main_compare_run(self, mock_report, mock_exit):
+        report.main()
+        mock_report.assert_called_once_with(
+            "hello", run="a", compare="b", list_runs=False
+        )
@@ -0,0 +1,100 @@
+import os
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from binrec.errors import BinRecError
+from binrec.tasks import Task, TaskGraph, process_pool
+
+
+class TestTaskGraph:
+
+    def test_add_duplicate(self):
+        graph = TaskGraph("test")
+        graph.add("a", MagicMock())
+        with pytest.raises(ValueError):
+            graph.add("a", MagicMock())
+
+    def test_add_unknown_dependency(self):
+        graph = TaskGraph("test")
+        with pytest.raises(ValueError):
+            graph.add("a", MagicMock(), ["b"])
+
+    def test_run_order(self):
+        order = []
+        graph = TaskGraph("test")
+        graph.add("a", lambda: order.append("a"))
+        graph.add("b", lambda: order.append("b"), ["a"])
+        graph.add("c", lambda: order.append("c"), ["a", "b"])
+        graph.run()
+        assert order == ["a", "b", "c"]
+
+    def test_run_concurrent(self):
+        # both tasks must be running at the same time for the barrier to pass
+        barrier = threading.Barrier(2, timeout=5)
+        graph = TaskGraph("test")
+        graph.add("a", barrier.wait)
+        graph.add("b", barrier.wait)
+        graph.add("c", MagicMock(), ["a", "b"])
+        graph.run()
+        graph.tasks["c"].func.assert_called_once()
+
+    def test_run_error(self):
+        graph = TaskGraph("test")
+        graph.add("a", MagicMock(side_effect=BinRecError("asdf")))
+        graph.add("b", MagicMock(), ["a"])
+        graph.add("c", MagicMock())
+        with pytest.raises(BinRecError):
+            graph.run()
+
+        graph.tasks["b"].func.assert_not_called()
+        assert graph.tasks["b"].skipped
+        graph.tasks["c"].func.assert_called_once()
+        assert not graph.tasks["c"].skipped
+
+    def test_run_error_skips_pending(self):
+        graph = TaskGraph("test")
+        graph.add("a", MagicMock())
+        graph.add("b", MagicMock(side_effect=BinRecError("asdf")))
+        graph.add("c", MagicMock())
+        graph.add("d", MagicMock())
+        with pytest.raises(BinRecError):
+            graph.run(max_workers=1)
+
+        graph.tasks["a"].func.assert_called_once()
+        for name in ("c", "d"):
+            graph.tasks[name].func.assert_not_called()
+            assert graph.tasks[name].skipped
+
+    def test_critical_path(self):
+        graph = TaskGraph("test")
+        graph.tasks = {
+            "a": Task("a", MagicMock(), [], 0, 1),
+            "b": Task("b", MagicMock(), ["a"], 1, 5),
+            "c": Task("c", MagicMock(), [], 0, 3),
+            "d": Task("d", MagicMock(), ["b", "c"], 5, 6),
+            "e": Task("e", MagicMock(), ["c"], 3, 4),
+        }
+        assert [task.name for task in graph.critical_path()] == ["a", "b", "d"]
+
+    def test_critical_path_empty(self):
+        assert TaskGraph("test").critical_path() == []
+
+    def test_task_duration(self):
+        assert Task("a", MagicMock(), [], 1.5, 4).duration == 2.5
+        assert Task("a", MagicMock()).duration == 0
+
+    def test_timings(self):
+        graph = TaskGraph("test")
+        graph.tasks = {
+            "a": Task("a", MagicMock(), [], 0, 1),
+            "b": Task("b", MagicMock(), ["a"], skipped=True),
+        }
+        assert graph.timings() == {"a": 1}
+
+
+def test_process_pool():
+    with process_pool(max_workers=1) as pool:
+        assert pool._mp_context.get_start_method() == "forkserver"
+        assert pool.submit(os.getpid).result() != os.getpid()